@@ -0,0 +1,185 @@
+"""
+Tenant isolation under load: admission control and CPU offload
+
+One center floods /api/analyze-patterns with large, distinct requests from
+--flood-concurrency clients (in a separate process, backing off for
+Retry-After when turned away) while a second center sends small
+/api/validate requests every --interval seconds and a probe polls
+/health/live as often. Latency is timed from when each request was due, so
+a stalled event loop counts in full. The observations service runs as its
+own __main__ with one worker, started fresh for each configuration:
+
+  unguarded  ADMISSION_ENABLED=false and no CPU offload, as before
+  admission  the settings defaults: per-tenant limits, fair queuing,
+             shedding and offload of large analyses
+
+Reports latency for the second center and the probe, and how the flood's
+requests ended (200, 429 or 503). Exits non-zero when a request from the
+second center or the probe fails, or when a 429/503 has no Retry-After.
+
+Usage: python bench_admission.py [--duration 10] [--interval 0.1] [--flood-concurrency 32] [--observations 2000]
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import random
+import signal
+import subprocess
+import sys
+import time
+from collections import Counter
+
+import httpx
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+GENAI_DIR = os.path.join(BENCH_DIR, "..")
+sys.path.insert(0, GENAI_DIR)
+sys.path.insert(0, BENCH_DIR)
+
+from shared.catalog import ClassificationCatalog  # noqa: E402
+from shared.config import settings  # noqa: E402
+
+from bench_endpoints import free_port, observation, percentile, point_ranges  # noqa: E402
+
+CONFIGURATIONS = {
+    "unguarded": {"ADMISSION_ENABLED": "false", "CPU_OFFLOAD_MIN_ITEMS": str(10 ** 9)},
+    "admission": {},
+}
+TENANT_HEADER = settings.ADMISSION_TENANT_HEADER
+
+
+def summary(latencies) -> dict:
+    ordered = sorted(latencies)
+    return {
+        "requests": len(ordered),
+        "p50_ms": round(percentile(ordered, 0.50) * 1000, 2) if ordered else None,
+        "p95_ms": round(percentile(ordered, 0.95) * 1000, 2) if ordered else None,
+        "max_ms": round(ordered[-1] * 1000, 2) if ordered else None,
+    }
+
+
+async def flood(base_url: str, args) -> dict:
+    """Flood process entry: center-a's clients, each honouring Retry-After when turned away"""
+    catalog = ClassificationCatalog.from_file(settings.CLASSIFICATION_DATA_PATH)
+    rng = random.Random(args.seed)
+    rows = [observation(catalog, rng, index) for index in range(args.observations)]
+    # Encoded once; each request only swaps in a distinct first row so the pattern cache misses
+    rest = json.dumps(rows[1:]).encode()[1:]
+    deadline = time.perf_counter() + args.duration
+    statuses, missing_retry_after = Counter(), 0
+
+    async def worker(client: httpx.AsyncClient, index: int):
+        nonlocal missing_retry_after
+        while time.perf_counter() < deadline:
+            content = b'{"analysis_type": "trend", "observations": [%s, %s}' % (
+                json.dumps({**rows[0], "id": -index}).encode(), rest)
+            response = await client.post("/api/analyze-patterns", content=content,
+                                         headers={TENANT_HEADER: "center-a", "content-type": "application/json"})
+            statuses[response.status_code] += 1
+            if response.status_code in (429, 503):
+                missing_retry_after += "retry-after" not in response.headers
+                await asyncio.sleep(float(response.headers.get("retry-after", 1)))
+            index += args.flood_concurrency
+
+    async with httpx.AsyncClient(base_url=base_url, timeout=120,
+                                 limits=httpx.Limits(max_connections=args.flood_concurrency)) as client:
+        await asyncio.gather(*(worker(client, index) for index in range(args.flood_concurrency)))
+    return {"statuses": {str(status): count for status, count in sorted(statuses.items())},
+            "missing_retry_after": missing_retry_after}
+
+
+async def paced(client: httpx.AsyncClient, path: str, payload, args) -> dict:
+    """center-b requests every --interval seconds, timed from when each was due so stalls count in full"""
+    latencies, errors, started = [], 0, time.perf_counter()
+    for index in range(int(args.duration / args.interval)):
+        due = started + index * args.interval
+        await asyncio.sleep(max(0.0, due - time.perf_counter()))
+        if payload is None:
+            response = await client.get(path)
+        else:
+            response = await client.post(path, json={**payload, "observation_id": index},
+                                         headers={TENANT_HEADER: "center-b"})
+        latencies.append(time.perf_counter() - due)
+        errors += response.status_code != 200
+    return {**summary(latencies), "errors": errors}
+
+
+async def run_server(name: str, args) -> dict:
+    """Start the service's own __main__ with the configuration's settings, flood it and time center-b"""
+    port = free_port()
+    base_url = f"http://127.0.0.1:{port}"
+    env = {**os.environ, "PORT": str(port), "MAX_WORKERS": "1", "LOG_LEVEL": "WARNING", **CONFIGURATIONS[name]}
+    process = subprocess.Popen([sys.executable, "main.py"], cwd=os.path.join(GENAI_DIR, "observations-ai"), env=env)
+    try:
+        deadline = time.monotonic() + 30
+        async with httpx.AsyncClient(base_url=base_url, timeout=120) as client:
+            while True:
+                try:
+                    if (await client.get("/health/live")).status_code == 200:
+                        break
+                except httpx.TransportError:
+                    pass
+                if time.monotonic() > deadline or process.poll() is not None:
+                    raise RuntimeError(f"observations-ai did not become live on port {port}")
+                await asyncio.sleep(0.1)
+
+            # The flood runs in its own process so its client work does not delay center-b's timings
+            flooder = await asyncio.create_subprocess_exec(
+                sys.executable, os.path.abspath(__file__), "--flood", base_url, "--duration", str(args.duration),
+                "--flood-concurrency", str(args.flood_concurrency), "--observations", str(args.observations),
+                "--seed", str(args.seed), stdout=asyncio.subprocess.PIPE)
+            # Let the flood build its payloads and get going
+            await asyncio.sleep(args.ramp)
+            ranges = point_ranges(ClassificationCatalog.from_file(settings.CLASSIFICATION_DATA_PATH))
+            small = {"data_points": {name: int(bounds["min"]) for name, bounds in ranges.items()},
+                     "expected_ranges": ranges}
+            victim, probe = await asyncio.gather(paced(client, "/api/validate", small, args),
+                                                 paced(client, "/health/live", None, args))
+            output, _ = await flooder.communicate()
+            if flooder.returncode != 0:
+                raise RuntimeError("flood process failed")
+            return {"victim": victim, "probe": probe, **json.loads(output.decode().strip().splitlines()[-1])}
+    finally:
+        process.send_signal(signal.SIGTERM)
+        try:
+            process.wait(timeout=30)
+        except subprocess.TimeoutExpired:
+            process.kill()
+
+
+def main(args) -> int:
+    if args.flood:
+        print(json.dumps(asyncio.run(flood(args.flood, args))))
+        return 0
+
+    print(f"{args.flood_concurrency} clients of center-a flooding analyze-patterns/{args.observations} "
+          f"for {args.duration:g}s")
+    print(f"{'configuration':<12} {'route':<24} {'requests':>8} {'p50 ms':>9} {'p95 ms':>9} {'max ms':>9} "
+          f"{'errors':>6}  flood statuses")
+    ok = True
+    for name in CONFIGURATIONS:
+        result = asyncio.run(run_server(name, args))
+        for label, row in (("center-b /api/validate", result["victim"]), ("/health/live", result["probe"])):
+            print(f"{name:<12} {label:<24} {row['requests']:>8} {row['p50_ms']:>9} {row['p95_ms']:>9} "
+                  f"{row['max_ms']:>9} {row['errors']:>6}  "
+                  f"{', '.join(f'{status}: {count}' for status, count in result['statuses'].items())}")
+        if name == "admission":
+            ok = ok and not result["victim"]["errors"] and not result["probe"]["errors"]
+            ok = ok and not result["missing_retry_after"]
+            if result["missing_retry_after"]:
+                print(f"{result['missing_retry_after']} rejections without Retry-After")
+    return 0 if ok else 1
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--duration", type=float, default=10)
+    parser.add_argument("--interval", type=float, default=0.1)
+    parser.add_argument("--flood-concurrency", type=int, default=32)
+    parser.add_argument("--observations", type=int, default=2000)
+    parser.add_argument("--ramp", type=float, default=1)
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--flood", metavar="BASE_URL", help=argparse.SUPPRESS)
+    sys.exit(main(parser.parse_args()))
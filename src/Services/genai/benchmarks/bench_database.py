@@ -0,0 +1,164 @@
+"""
+Pooled database layer: batched fetches, keyset streaming and pool behaviour
+
+Seeds the Planning and Observations tables (same columns and indexes as the
+EF Core models) into a SQLite file, or into the Postgres database given with
+--url, then compares:
+  - one query per plan for its items (N+1) against PlanRepository.with_items
+  - OFFSET paging against keyset streaming over every observation
+  - concurrent reads with a pool of 1 connection against the sized pool
+and checks that each pair returns identical rows.
+
+Usage: python bench_database.py [--plans 2000] [--observations 50000] [--url postgresql://...]
+"""
+
+import argparse
+import asyncio
+import os
+import random
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "reports-ai"))
+
+from shared.database import Database, pool_size_for, quote  # noqa: E402
+from shared.repositories import ObservationRepository, PlanRepository  # noqa: E402
+from sql_schema import table_schema  # noqa: E402
+
+TABLES = ("Plans", "PlanItems", "Observations", "ObservationArtifacts", "Tag")
+SQL_TYPES = {"int": "BIGINT", "text": "TEXT", "date": "TIMESTAMP", "bool": "BOOLEAN"}
+
+
+def value_for(column: str, kind: str, row: int, parents: int, rng: random.Random, dialect: str):
+    if column == "Id":
+        return row + 1
+    if column in ("PlanId", "ObservationId"):
+        return rng.randint(1, parents)
+    if kind == "int":
+        return rng.randint(0, 4)
+    if kind == "bool":
+        return rng.random() < 0.2
+    if kind == "date":
+        moment = datetime(2025, 1, 1) + timedelta(minutes=rng.randrange(525600))
+        return moment if dialect == "postgres" else moment.isoformat(sep=" ")
+    return f"{column.lower()} {rng.randrange(5000)}"
+
+
+async def seed(db: Database, counts, rng: random.Random):
+    for name in TABLES:
+        table = table_schema(name)
+        columns = ", ".join(f"{quote(column)} {SQL_TYPES[kind]}" for column, kind in table.columns.items())
+        primary_key = ", ".join(quote(column) for column in table.indexes[0])
+        await db.execute(f"DROP TABLE IF EXISTS {db.table(name)}")
+        await db.execute(f"CREATE TABLE {db.table(name)} ({columns}, PRIMARY KEY ({primary_key}))")
+        for number, index in enumerate(table.indexes[1:]):
+            indexed = ", ".join(quote(column) for column in index)
+            await db.execute(f'CREATE INDEX "IX_{name}_{number}" ON {db.table(name)} ({indexed})')
+
+        parents = counts["Observations"] if name in ("ObservationArtifacts", "Tag") else counts["Plans"]
+        placeholders = ", ".join(f"${index}" for index in range(1, len(table.columns) + 1))
+        rows = [[value_for(column, kind, row, parents, rng, db.dialect) for column, kind in table.columns.items()]
+                for row in range(counts[name])]
+        await db.executemany(f"INSERT INTO {db.table(name)} VALUES ({placeholders})", rows)
+
+
+def timed(label: str, started: float, queries: int, detail: str = ""):
+    elapsed = (time.perf_counter() - started) * 1000
+    print(f"  {label:<28} {elapsed:>9.1f} ms  {queries:>6} queries  {detail}")
+    return elapsed
+
+
+async def run(db: Database, args) -> bool:
+    ok = True
+    rng = random.Random(3)
+    plan_repository, observation_repository = PlanRepository(db), ObservationRepository(db)
+    plan_ids = list(range(1, args.plans + 1))
+
+    print("Plans with items")
+    queries = db.counters["queries"]
+    started = time.perf_counter()
+    naive = []
+    for plan_id in plan_ids:
+        plan = await db.fetchrow(f'SELECT * FROM {db.table("Plans")} WHERE "Id" = $1', plan_id)
+        items = await db.fetch(f'SELECT * FROM {db.table("PlanItems")} WHERE "PlanId" = $1', plan_id)
+        naive.append({**plan, "Items": items})
+    timed("one query per plan (N+1)", started, db.counters["queries"] - queries)
+    queries = db.counters["queries"]
+    started = time.perf_counter()
+    batched = await plan_repository.with_items(plan_ids)
+    timed("with_items (batched IN)", started, db.counters["queries"] - queries)
+    same = sorted(item["Id"] for plan in naive for item in plan["Items"]) == \
+        sorted(item["Id"] for plan in batched for item in plan["Items"])
+    ok = ok and same and len(batched) == len(naive)
+
+    print("Reading every observation")
+    queries = db.counters["queries"]
+    started = time.perf_counter()
+    offset_ids = []
+    offset = 0
+    while True:
+        page = await db.fetch(f'SELECT * FROM {db.table("Observations")} ORDER BY "Id" LIMIT $1 OFFSET $2',
+                              args.page_size, offset)
+        offset_ids.extend(row["Id"] for row in page)
+        if len(page) < args.page_size:
+            break
+        offset += args.page_size
+    timed("OFFSET paging", started, db.counters["queries"] - queries)
+    queries = db.counters["queries"]
+    started = time.perf_counter()
+    keyset_ids = [row["Id"] async for row in observation_repository.stream(page_size=args.page_size)]
+    timed("keyset stream", started, db.counters["queries"] - queries)
+    ok = ok and offset_ids == keyset_ids and len(keyset_ids) == args.observations
+
+    print(f"Concurrent detail reads ({args.concurrency} tasks x 20 observations)")
+    samples = [rng.sample(range(1, args.observations + 1), 20) for _ in range(args.concurrency)]
+    results = {}
+    for label, size in (("pool of 1", 1), (f"pool of {db.pool_size}", db.pool_size)):
+        pool = Database(db.url, pool_size=size)
+        await pool.start()
+        repository = ObservationRepository(pool)
+        started = time.perf_counter()
+        details = await asyncio.gather(*(repository.with_details(sample) for sample in samples))
+        stats = pool.stats()
+        timed(label, started, stats["queries"], f"acquire_waits={stats['acquire_waits']} size={stats['size']}")
+        results[label] = [sorted((row["Id"], len(row["Artifacts"]), len(row["Tags"])) for row in rows)
+                          for rows in details]
+        await pool.close()
+    ok = ok and len({repr(value) for value in results.values()}) == 1
+
+    print(f"Health check: {await db.ping()}")
+    return ok
+
+
+async def main(args) -> int:
+    with tempfile.TemporaryDirectory() as directory:
+        url = args.url or f"sqlite:///{os.path.join(directory, 'bench.db')}"
+        db = Database(url, pool_size=args.pool_size or pool_size_for())
+        await db.start()
+        if not db.started:
+            print(f"Could not open {url}: {db.error}")
+            return 1
+        counts = {"Plans": args.plans, "PlanItems": args.plans * 5, "Observations": args.observations,
+                  "ObservationArtifacts": args.observations // 2, "Tag": args.observations}
+        started = time.perf_counter()
+        await seed(db, counts, random.Random(5))
+        print(f"{db.dialect}: seeded {sum(counts.values())} rows in {time.perf_counter() - started:.1f}s, "
+              f"pool size {db.pool_size}")
+        ok = await run(db, args)
+        await db.close()
+    print("consistent" if ok else "MISMATCH")
+    return 0 if ok else 1
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--plans", type=int, default=2000)
+    parser.add_argument("--observations", type=int, default=50000)
+    parser.add_argument("--page-size", type=int, default=1000)
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--pool-size", type=int, default=0, help="defaults to the size derived from MAX_WORKERS")
+    parser.add_argument("--url", help="DATABASE_URL to benchmark instead of a temporary SQLite file")
+    sys.exit(asyncio.run(main(parser.parse_args())))
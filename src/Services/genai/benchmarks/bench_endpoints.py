@@ -0,0 +1,433 @@
+"""
+Endpoint latency, throughput and memory for the GenAI services, with baselines
+
+Drives /api/validate, /api/analyze-patterns, /api/insights and
+/api/suggestions with payloads built from the classification catalog
+(observations tagged with real domain, attribute and progression point ids)
+at several sizes. Every request in a run is distinct, so response caches
+miss as they would for real traffic. Each scenario runs in a fresh process,
+in one or both modes:
+
+  asgi     the FastAPI app in process behind httpx.ASGITransport (lifespan
+           included), which isolates application cost from the network stack
+  uvicorn  the service's own __main__ (shared.launcher) on a local port,
+           driven over HTTP
+
+Reports requests/s, p50/p95/p99 latency and peak RSS (the benchmark process
+for asgi, which includes the client; the server process tree for uvicorn).
+Results are compared with a JSON baseline: a metric regresses when it is
+worse by more than --threshold and by more than a small absolute floor, and
+any regression or failed request exits non-zero. Baselines are only
+comparable on the same machine; --update-baseline records a new one.
+
+Usage: python bench_endpoints.py [--mode asgi|uvicorn|both] [--scenarios validate/32,insights-summary]
+                                 [--requests 400] [--concurrency 8] [--baseline baselines/endpoints.json]
+                                 [--update-baseline] [--threshold 0.25] [--output results.json]
+"""
+
+import argparse
+import asyncio
+import json
+import math
+import os
+import platform
+import random
+import resource
+import signal
+import socket
+import subprocess
+import sys
+import time
+from datetime import date, timedelta
+
+import httpx
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+GENAI_DIR = os.path.join(BENCH_DIR, "..")
+DEFAULT_BASELINE = os.path.join(BENCH_DIR, "baselines", "endpoints.json")
+
+sys.path.insert(0, GENAI_DIR)
+
+from shared.catalog import ClassificationCatalog  # noqa: E402
+from shared.config import settings  # noqa: E402
+
+MODES = ("asgi", "uvicorn")
+START_DATE = date(2026, 1, 5)
+
+# (metric, higher is better, absolute change below which differences are noise)
+COMPARED_METRICS = (
+    ("rps", True, 0.0),
+    ("p50_ms", False, 1.0),
+    ("p95_ms", False, 2.0),
+    ("peak_rss_mb", False, 8.0),
+)
+
+
+def observation(catalog: ClassificationCatalog, rng: random.Random, index: int) -> dict:
+    """An ObservationBriefDto-shaped record tagged with catalog ids"""
+    point = rng.choice(list(catalog.progression_points.values()))
+    attribute = catalog.attribute(point.attribute_id)
+    domain = catalog.domain(point.domain_id)
+    child = rng.randint(1, 400)
+    return {
+        "id": index,
+        "childId": child,
+        "teacherId": 1 + child % 25,
+        "centerId": 1 + child % 4,
+        "classroomId": 1 + child % 16,
+        "domainId": domain.id,
+        "domainName": domain.name,
+        "attributeId": attribute.id,
+        "attributeName": attribute.name,
+        "progressionPointId": point.id,
+        "points": point.points,
+        "observationDate": (START_DATE + timedelta(days=rng.randint(0, 180))).isoformat(),
+        "observationTextPreview": f"{point.title}: {point.description}"[:100],
+        "learningContext": rng.choice(("Indoor play", "Outdoor play", "Circle time", "Meal time")),
+        "isDraft": rng.random() < 0.1,
+        "tags": rng.sample(["language", "motor", "social", "numeracy", "art"], 2),
+        "mediaItemCount": rng.randint(0, 3),
+    }
+
+
+def point_ranges(catalog: ClassificationCatalog) -> dict:
+    """Expected min/max points per attribute, keyed like the validation data points"""
+    ranges = {}
+    for attribute in catalog.attributes.values():
+        points = [catalog.progression_point(point_id).points for point_id in attribute.progression_point_ids]
+        if points:
+            ranges[f"attribute_{attribute.id}_points"] = {"min": min(points), "max": max(points)}
+    return ranges
+
+
+class Scenario:
+    """One endpoint at one payload size; `vary` makes every request distinct"""
+
+    __slots__ = ("name", "service", "path", "build", "vary", "setup")
+
+    def __init__(self, name, service, path, build, vary, setup=None):
+        self.name = name
+        self.service = service
+        self.path = path
+        # build(catalog, rng) -> base payload; vary(base, index) -> payload for request `index`
+        self.build = build
+        self.vary = vary
+        # setup(catalog, rng) -> [(path, payload)] sent once before warming up
+        self.setup = setup
+
+
+def validate_scenario(data_points: int) -> Scenario:
+    def build(catalog, rng):
+        ranges = point_ranges(catalog)
+        keys = list(ranges)
+        points, expected = {}, {}
+        for index in range(data_points):
+            # Repeated attributes stand for several observations of the same child
+            name = keys[index % len(keys)]
+            key = name if index < len(keys) else f"{name}_{index // len(keys)}"
+            bounds = ranges[name]
+            # Roughly one in twenty data points falls outside its attribute's range
+            points[key] = rng.randint(int(bounds["min"]), int(bounds["max"])) if rng.random() > 0.05 else -1
+            expected[key] = bounds
+        return {"observation_id": 0, "data_points": points, "expected_ranges": expected}
+
+    return Scenario(f"validate/{data_points}", "observations-ai", "/api/validate", build,
+                    lambda base, index: {**base, "observation_id": index})
+
+
+def patterns_scenario(observations: int, analysis_type: str = "trend") -> Scenario:
+    def build(catalog, rng):
+        return {"observations": [observation(catalog, rng, index) for index in range(observations)],
+                "analysis_type": analysis_type}
+
+    def vary(base, index):
+        rows = base["observations"]
+        return {**base, "observations": [{**rows[0], "id": -index}] + rows[1:]}
+
+    suffix = "" if analysis_type == "trend" else f"-{analysis_type}"
+    return Scenario(f"analyze-patterns{suffix}/{observations}", "observations-ai", "/api/analyze-patterns",
+                    build, vary)
+
+
+def insights_scenario(insight_type: str, seeded_observations: int) -> Scenario:
+    def setup(catalog, rng):
+        events = [{"type": "ObservationCreatedEvent", "version": 1, "data": observation(catalog, rng, index + 1)}
+                  for index in range(seeded_observations)]
+        return [("/api/aggregates/events", {"events": events[start:start + 1000]})
+                for start in range(0, len(events), 1000)]
+
+    def build(catalog, rng):
+        return {"data": {}, "insight_type": insight_type}
+
+    def vary(base, index):
+        # Cycle through the whole-program, per-domain and per-center scopes of a dashboard
+        scope = index % 3
+        data = {} if scope == 0 else {"domainId": 1 + index % 2} if scope == 1 else {"centerId": 1 + index % 4}
+        return {**base, "data": data, "context": f"Dashboard tile {index}"}
+
+    return Scenario(f"insights-{insight_type}/{seeded_observations}", "reports-ai", "/api/insights",
+                    build, vary, setup)
+
+
+def suggestions_scenario(context_sentences: int) -> Scenario:
+    def build(catalog, rng):
+        attributes = list(catalog.attributes.values())
+        context = " ".join(
+            f"{point.title} observed during {rng.choice(('play', 'circle time', 'outdoor time'))}."
+            for point in rng.choices(list(catalog.progression_points.values()), k=context_sentences)
+        )
+        return {"title": rng.choice(attributes).name, "description": "Support the next progression point",
+                "context": context}
+
+    return Scenario(f"suggestions/{context_sentences}", "planning-ai", "/api/suggestions", build,
+                    lambda base, index: {**base, "title": f"{base['title']} plan {index}"})
+
+
+SCENARIOS = {scenario.name: scenario for scenario in (
+    validate_scenario(4),
+    validate_scenario(64),
+    patterns_scenario(10),
+    patterns_scenario(200),
+    patterns_scenario(2000),
+    patterns_scenario(200, "correlation"),
+    insights_scenario("summary", 5000),
+    insights_scenario("trends", 5000),
+    suggestions_scenario(1),
+    suggestions_scenario(20),
+)}
+
+
+def percentile(ordered, fraction: float) -> float:
+    """Nearest-rank percentile of an ascending list"""
+    return ordered[max(0, min(len(ordered) - 1, math.ceil(fraction * len(ordered)) - 1))]
+
+
+async def drive(client: httpx.AsyncClient, scenario: Scenario, args) -> dict:
+    catalog = ClassificationCatalog.from_file(settings.CLASSIFICATION_DATA_PATH)
+    rng = random.Random(args.seed)
+    # Setup goes through admin endpoints such as /api/aggregates/events
+    admin = {settings.PROFILE_HEADER: settings.PROFILE_ADMIN_TOKEN or ""}
+    for path, payload in (scenario.setup(catalog, rng) if scenario.setup else []):
+        (await client.post(path, json=payload, headers=admin)).raise_for_status()
+    base = scenario.build(catalog, rng)
+
+    async def run(first: int, count: int):
+        latencies, errors = [], 0
+        queue = iter(range(first, first + count))
+
+        async def worker():
+            nonlocal errors
+            for index in queue:
+                started = time.perf_counter()
+                response = await client.post(scenario.path, json=scenario.vary(base, index))
+                latencies.append(time.perf_counter() - started)
+                errors += response.status_code != 200
+
+        started = time.perf_counter()
+        await asyncio.gather(*(worker() for _ in range(args.concurrency)))
+        return latencies, errors, time.perf_counter() - started
+
+    await run(1, args.warmup)
+    latencies, errors, elapsed = await run(1 + args.warmup, args.requests)
+    ordered = sorted(latencies)
+    return {
+        "service": scenario.service,
+        "path": scenario.path,
+        "requests": len(latencies),
+        "errors": errors,
+        "rps": round(len(latencies) / elapsed, 1),
+        "p50_ms": round(percentile(ordered, 0.50) * 1000, 2),
+        "p95_ms": round(percentile(ordered, 0.95) * 1000, 2),
+        "p99_ms": round(percentile(ordered, 0.99) * 1000, 2),
+    }
+
+
+async def run_asgi(scenario: Scenario, args) -> dict:
+    """Child process entry: import the service app and drive it without a socket"""
+    service_dir = os.path.join(GENAI_DIR, scenario.service)
+    sys.path.insert(0, service_dir)
+    os.chdir(service_dir)
+    import main
+
+    async with main.app.router.lifespan_context(main.app):
+        transport = httpx.ASGITransport(app=main.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=60) as client:
+            result = await drive(client, scenario, args)
+    # ru_maxrss is in kilobytes on Linux and bytes on macOS
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    result["peak_rss_mb"] = round(peak / (1024 * 1024 if sys.platform == "darwin" else 1024), 1)
+    return result
+
+
+def free_port() -> int:
+    with socket.socket() as probe:
+        probe.bind(("127.0.0.1", 0))
+        return probe.getsockname()[1]
+
+
+def peak_rss_mb(pid: int):
+    """VmHWM summed over a process and its children (Linux), or None"""
+    total_kb, pending = 0, [pid]
+    try:
+        while pending:
+            current = pending.pop()
+            with open(f"/proc/{current}/status") as status:
+                total_kb += next(int(line.split()[1]) for line in status if line.startswith("VmHWM:"))
+            with open(f"/proc/{current}/task/{current}/children") as children:
+                pending.extend(int(child) for child in children.read().split())
+    except (OSError, StopIteration):
+        return None
+    return round(total_kb / 1024, 1)
+
+
+async def run_uvicorn(scenario: Scenario, args) -> dict:
+    port = free_port()
+    env = {**os.environ, "PORT": str(port), "MAX_WORKERS": str(args.workers), "LOG_LEVEL": "WARNING"}
+    process = subprocess.Popen([sys.executable, "main.py"], cwd=os.path.join(GENAI_DIR, scenario.service), env=env)
+    try:
+        base_url = f"http://127.0.0.1:{port}"
+        deadline = time.monotonic() + 30
+        async with httpx.AsyncClient(base_url=base_url, timeout=60,
+                                     limits=httpx.Limits(max_connections=args.concurrency)) as client:
+            while True:
+                try:
+                    if (await client.get("/health/live")).status_code == 200:
+                        break
+                except httpx.TransportError:
+                    pass
+                if time.monotonic() > deadline or process.poll() is not None:
+                    raise RuntimeError(f"{scenario.service} did not become live on port {port}")
+                await asyncio.sleep(0.1)
+            result = await drive(client, scenario, args)
+        result["peak_rss_mb"] = peak_rss_mb(process.pid)
+        return result
+    finally:
+        process.send_signal(signal.SIGTERM)
+        try:
+            process.wait(timeout=30)
+        except subprocess.TimeoutExpired:
+            process.kill()
+
+
+def measure(mode: str, name: str, args) -> dict:
+    """Run one scenario in a fresh interpreter so imports and peak memory are its own"""
+    command = [sys.executable, os.path.abspath(__file__), "--child", mode, name,
+               "--requests", str(args.requests), "--warmup", str(args.warmup),
+               "--concurrency", str(args.concurrency), "--workers", str(args.workers), "--seed", str(args.seed)]
+    # The scenarios' own concurrency would queue or be shed by the route limits; admission control is
+    # measured by bench_admission.py. Set ADMISSION_ENABLED to include it. Scenario setup needs an
+    # admin token.
+    env = {"ADMISSION_ENABLED": "false", "PROFILE_ADMIN_TOKEN": "bench-endpoints", **os.environ,
+           "LOG_LEVEL": "WARNING"}
+    completed = subprocess.run(command, capture_output=True, text=True, env=env)
+    if completed.returncode != 0:
+        return {"error": completed.stderr.strip().splitlines()[-1] if completed.stderr.strip() else "failed"}
+    return json.loads(completed.stdout.strip().splitlines()[-1])
+
+
+def environment() -> dict:
+    return {"python": platform.python_version(), "platform": platform.platform(), "cpus": os.cpu_count()}
+
+
+def compare(results: dict, baseline: dict, threshold: float):
+    """Lines describing each metric against the baseline, and the number of regressions"""
+    lines, regressions = [], 0
+    for key, result in results.items():
+        before = baseline.get("results", {}).get(key)
+        if before is None or "error" in before:
+            lines.append(f"  {key}: no baseline")
+            continue
+        if "error" in result:
+            continue
+        changes = []
+        for metric, higher_is_better, floor in COMPARED_METRICS:
+            old, new = before.get(metric), result.get(metric)
+            if not old or new is None:
+                continue
+            change = (new - old) / old
+            worse = -change if higher_is_better else change
+            regressed = worse > threshold and abs(new - old) > floor
+            regressions += regressed
+            changes.append(f"{metric} {old:g} -> {new:g} ({change:+.0%}){' REGRESSION' if regressed else ''}")
+        lines.append(f"  {key}: " + ", ".join(changes))
+    return lines, regressions
+
+
+def main(args) -> int:
+    names = args.scenarios or list(SCENARIOS)
+    unknown = [name for name in names if name not in SCENARIOS]
+    if unknown:
+        print(f"Unknown scenarios: {', '.join(unknown)} (choose from {', '.join(SCENARIOS)})")
+        return 2
+    modes = MODES if args.mode == "both" else (args.mode,)
+
+    results = {}
+    print(f"{'scenario':<42} {'req/s':>8} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'peak MB':>8}  errors")
+    for mode in modes:
+        for name in names:
+            key = f"{mode}:{name}"
+            result = results[key] = measure(mode, name, args)
+            if "error" in result:
+                print(f"{key:<42} failed: {result['error']}")
+                continue
+            print(f"{key:<42} {result['rps']:>8,.0f} {result['p50_ms']:>8.2f} {result['p95_ms']:>8.2f} "
+                  f"{result['p99_ms']:>8.2f} {result['peak_rss_mb'] or 0:>8.1f}  {result['errors']}")
+
+    report = {"environment": environment(),
+              "settings": {"requests": args.requests, "concurrency": args.concurrency, "workers": args.workers},
+              "results": results}
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as handle:
+            json.dump(report, handle, indent=2)
+
+    failed = sum("error" in result or result["errors"] > 0 for result in results.values())
+    if args.update_baseline:
+        os.makedirs(os.path.dirname(os.path.abspath(args.baseline)), exist_ok=True)
+        previous = {}
+        if os.path.exists(args.baseline):
+            with open(args.baseline, encoding="utf-8") as handle:
+                previous = json.load(handle).get("results", {})
+        report["results"] = {**previous, **results}
+        with open(args.baseline, "w", encoding="utf-8") as handle:
+            json.dump(report, handle, indent=2)
+            handle.write("\n")
+        print(f"baseline written to {args.baseline}")
+        return 1 if failed else 0
+
+    regressions = 0
+    if os.path.exists(args.baseline):
+        with open(args.baseline, encoding="utf-8") as handle:
+            baseline = json.load(handle)
+        if baseline.get("environment") != report["environment"]:
+            print(f"note: baseline recorded on {baseline.get('environment')}, results may not be comparable")
+        lines, regressions = compare(results, baseline, args.threshold)
+        print(f"against {args.baseline} (threshold {args.threshold:.0%}):")
+        print("\n".join(lines))
+    else:
+        print(f"no baseline at {args.baseline}; record one with --update-baseline")
+    print(f"{regressions} regressions, {failed} failed scenarios")
+    return 1 if regressions or failed else 0
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--mode", choices=(*MODES, "both"), default="both")
+    parser.add_argument("--scenarios", type=lambda value: value.split(","), default=None,
+                        help=f"comma separated, from: {', '.join(SCENARIOS)}")
+    parser.add_argument("--requests", type=int, default=400, help="measured requests per scenario")
+    parser.add_argument("--warmup", type=int, default=40, help="unmeasured requests sent first")
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--workers", type=int, default=1, help="MAX_WORKERS for uvicorn mode")
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--baseline", default=DEFAULT_BASELINE)
+    parser.add_argument("--update-baseline", action="store_true", help="record these results as the baseline")
+    parser.add_argument("--threshold", type=float, default=0.25, help="relative change counted as a regression")
+    parser.add_argument("--output", help="also write the results as JSON here")
+    parser.add_argument("--child", nargs=2, metavar=("MODE", "SCENARIO"), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    if args.child:
+        mode, name = args.child
+        runner = run_asgi if mode == "asgi" else run_uvicorn
+        print(json.dumps(asyncio.run(runner(SCENARIOS[name], args))))
+        sys.exit(0)
+    sys.exit(main(args))
@@ -0,0 +1,163 @@
+"""
+Throughput and correctness of the domain event consumer
+
+Publishes platform-shaped plan and observation events (PascalCase payloads,
+eventType/eventId attributes) to the in-memory and the file broker, with a
+share of re-published duplicates and a handler that fails every Nth call.
+The consumer feeds the reports-ai rollups and the observations-ai live
+pattern statistics; afterwards the rollups must equal
+a from-scratch build over the unique events, and no event published once
+may be handled successfully twice (rollups are idempotent, the live
+statistics are not).
+Handlers yield to the event loop so concurrent batches overlap, and a
+separate check fails one event while a slow one is in flight on the same
+topic: the slow one must be handled exactly once.
+
+Usage: python bench_event_consumer.py [--events 20000] [--duplicates 0.1] [--fail-every 10]
+"""
+
+import argparse
+import asyncio
+import json
+import logging
+import os
+import random
+import sys
+import tempfile
+import time
+import uuid
+from collections import Counter
+from datetime import date, timedelta
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "reports-ai"))
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "observations-ai"))
+
+from shared.events import Event, EventConsumer, FileBroker, InMemoryBroker, Message  # noqa: E402
+from aggregates import AggregateEngine, AggregateStore, diff_rollups  # noqa: E402
+from forecasting import ForecastEngine  # noqa: E402
+from live import LiveObservationState  # noqa: E402
+
+TOPICS = ("observationcreated", "plancompleted")
+
+
+def make_events(count: int, seed: int = 7):
+    rng = random.Random(seed)
+    start = date.today() - timedelta(weeks=12)
+    for index in range(count):
+        day = (start + timedelta(days=rng.randrange(84))).isoformat()
+        if index % 4 == 0:
+            payload = {"Plan": {"Id": index, "Status": 2, "CenterId": rng.randrange(5),
+                                "ClassroomId": rng.randrange(20), "OwnerId": rng.randrange(50), "StartDate": day},
+                       "DateOccurred": f"{day}T09:00:00Z"}
+            topic, event_type = "plancompleted", "PlanCompletedEvent"
+        else:
+            payload = {"Observation": {"Id": index, "CenterId": rng.randrange(5), "ClassroomId": rng.randrange(20),
+                                       "DomainId": rng.randrange(1, 9), "TeacherId": rng.randrange(50),
+                                       "IsDraft": rng.random() < 0.2, "ObservationDate": f"{day}T10:00:00",
+                                       "DataPoints": {"score": rng.gauss(3, 1), "minutes": rng.randrange(5, 60)}},
+                       "DateOccurred": f"{day}T10:00:00Z"}
+            topic, event_type = "observationcreated", "ObservationCreatedEvent"
+        yield topic, payload, {"eventType": event_type, "eventId": uuid.UUID(int=rng.getrandbits(128)).hex}
+
+
+async def run(broker, label: str, events, args) -> bool:
+    aggregates = AggregateEngine()
+    live_state = LiveObservationState(ForecastEngine())
+    batches = 0
+    handled = Counter()
+
+    async def observations_handler(batch):
+        nonlocal batches
+        batches += 1
+        # Fail every Nth handler call to exercise nack and redelivery, while other batches are in flight
+        if args.fail_every and batches % args.fail_every == 0:
+            raise RuntimeError("injected handler failure")
+        # Let the other batches in flight run, as a handler awaiting I/O would
+        await asyncio.sleep(0.001)
+        aggregates.consume(batch)
+        live_state.apply_events(batch)
+        handled.update(event.id for event in batch)
+
+    consumer = EventConsumer("bench", broker=broker, batch_size=args.batch_size,
+                             max_concurrency=args.concurrency)
+    consumer.subscribe(list(TOPICS), observations_handler)
+
+    rng = random.Random(11)
+    republished = set()
+    for topic, payload, attributes in events:
+        broker.publish(topic, payload, attributes)
+        if rng.random() < args.duplicates:
+            broker.publish(topic, payload, attributes)
+            republished.add(attributes["eventId"])
+
+    started = time.perf_counter()
+    await consumer.start()
+    await consumer.drain(timeout=120)
+    elapsed = time.perf_counter() - started
+    await consumer.stop()
+
+    expected = AggregateStore()
+    for topic, payload, attributes in events:
+        message = Message(attributes["eventId"], topic, json.dumps(payload).encode(), attributes)
+        expected.apply_event(Event.from_message(message).as_dict())
+    differences = diff_rollups(aggregates.store, expected)
+    # A re-published copy can arrive while the first is still being handled, before dedupe sees it
+    handled_twice = sum(1 for event_id, count in handled.items() if count > 1 and event_id not in republished)
+
+    stats = consumer.stats()
+    print(f"{label:<8} {stats['consumed'] / elapsed:>10,.0f} events/s  {elapsed * 1000:>8.0f} ms  "
+          f"duplicates={stats['duplicates']} failed_batches={stats['failed_batches']} "
+          f"dead_lettered={stats['dead_lettered']} patterns={live_state.stats()['pattern_observations']} "
+          f"handled_twice={handled_twice} "
+          f"{'consistent' if not differences else f'{len(differences)} differences'}")
+    return not differences and not handled_twice
+
+
+async def check_redelivery(broker, label: str) -> bool:
+    """A nack must redeliver only the failed event, not one another batch is still handling"""
+    for index in range(2):
+        broker.publish("redelivery", {"Id": index}, {"eventId": f"redelivery-{index}"})
+    handled = Counter()
+
+    async def handler(batch):
+        event_id = batch[0].id
+        handled[event_id] += 1
+        if event_id == "redelivery-0" and handled[event_id] == 1:
+            raise RuntimeError("injected handler failure")
+        if event_id == "redelivery-1":
+            await asyncio.sleep(0.2)
+
+    consumer = EventConsumer("redelivery", broker=broker, batch_size=1, max_concurrency=2)
+    consumer.subscribe("redelivery", handler)
+    await consumer.start()
+    await consumer.drain(timeout=30)
+    await consumer.stop()
+    ok = handled["redelivery-1"] == 1
+    print(f"{label:<8} redelivery: failed event handled {handled['redelivery-0']}x, in-flight event "
+          f"{handled['redelivery-1']}x ({'ok' if ok else 'redelivered while in flight'})")
+    return ok
+
+
+async def main(args) -> int:
+    # Injected failures are expected; keep their tracebacks out of the report
+    logging.getLogger("shared.events").setLevel(logging.CRITICAL)
+    events = list(make_events(args.events))
+    print(f"{len(events)} events, {args.duplicates:.0%} re-published, batch {args.batch_size}, "
+          f"{args.concurrency} batches in flight")
+    ok = await run(InMemoryBroker(ack_deadline=30), "memory", events, args)
+    ok = await check_redelivery(InMemoryBroker(ack_deadline=30), "memory") and ok
+    with tempfile.TemporaryDirectory() as directory:
+        ok = await run(FileBroker(directory, ack_deadline=30), "file", events, args) and ok
+        ok = await check_redelivery(FileBroker(directory, ack_deadline=30), "file") and ok
+    return 0 if ok else 1
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--events", type=int, default=20000)
+    parser.add_argument("--duplicates", type=float, default=0.1, help="share of events published twice")
+    parser.add_argument("--fail-every", type=int, default=10, help="fail every Nth handler call")
+    parser.add_argument("--batch-size", type=int, default=100)
+    parser.add_argument("--concurrency", type=int, default=4)
+    sys.exit(asyncio.run(main(parser.parse_args())))
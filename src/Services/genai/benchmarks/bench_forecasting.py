@@ -0,0 +1,61 @@
+"""
+Cold-fit versus warm-cache latency for observations-ai forecasting
+
+Usage: python bench_forecasting.py [--series 1000] [--history 365] [--requests 20000]
+"""
+
+import argparse
+import os
+import random
+import sys
+import time
+from datetime import date, timedelta
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "observations-ai"))
+
+from forecasting import ForecastEngine  # noqa: E402
+
+
+def percentile(samples, fraction: float) -> float:
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * fraction))]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--series", type=int, default=1000)
+    parser.add_argument("--history", type=int, default=365)
+    parser.add_argument("--requests", type=int, default=20_000)
+    args = parser.parse_args()
+
+    rng = random.Random(7)
+    engine = ForecastEngine()
+    start = date(2024, 1, 1)
+    for series in range(args.series):
+        base = rng.uniform(1, 3)
+        engine.record(series, [
+            (start + timedelta(days=day), base + day * 0.005 + rng.gauss(0, 0.2))
+            for day in range(args.history)
+        ])
+
+    cold = []
+    for series in range(args.series):
+        started = time.perf_counter()
+        engine.state(series).project(7)
+        cold.append(time.perf_counter() - started)
+
+    warm = []
+    for _ in range(args.requests):
+        series = rng.randrange(args.series)
+        started = time.perf_counter()
+        engine.state(series).project(rng.randint(1, 30))
+        warm.append(time.perf_counter() - started)
+
+    for label, samples in (("cold fit", cold), ("warm cache", warm)):
+        print(f"{label:<12} p50={percentile(samples, 0.50) * 1000:.3f}ms "
+              f"p99={percentile(samples, 0.99) * 1000:.3f}ms")
+    print(f"cache {engine.cache.stats()}")
+
+
+if __name__ == "__main__":
+    main()
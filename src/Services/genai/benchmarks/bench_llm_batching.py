@@ -0,0 +1,121 @@
+"""
+Throughput and latency of planning-ai model calls with and without micro-batching
+
+Starts a local mock completion server whose cost is a fixed per-call latency
+plus a small per-prompt cost, with a limited number of concurrent calls (like
+a model server with a few GPU slots). The same closed-loop load is then sent
+as one upstream call per request and through the MicroBatcher.
+
+Usage: python bench_llm_batching.py [--requests 2000] [--concurrency 64]
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import socket
+import statistics
+import sys
+import threading
+import time
+
+import uvicorn
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "planning-ai"))
+
+from shared.http_client import HttpClientManager  # noqa: E402
+from batching import MicroBatcher  # noqa: E402
+from model_client import ModelClient  # noqa: E402
+
+
+def mock_model_server(call_latency: float, prompt_latency: float, slots: int):
+    semaphore = None
+
+    async def app(scope, receive, send):
+        nonlocal semaphore
+        if scope["type"] != "http":
+            return
+        if semaphore is None:
+            semaphore = asyncio.Semaphore(slots)
+        body = b""
+        while True:
+            message = await receive()
+            body += message.get("body", b"")
+            if not message.get("more_body"):
+                break
+        prompts = json.loads(body)["prompt"]
+        async with semaphore:
+            await asyncio.sleep(call_latency + prompt_latency * len(prompts))
+        payload = {"choices": [{"index": index, "text": f"1. Step for prompt {index}\n2. Review"}
+                               for index in range(len(prompts))]}
+        await send({"type": "http.response.start", "status": 200,
+                    "headers": [(b"content-type", b"application/json")]})
+        await send({"type": "http.response.body", "body": json.dumps(payload).encode()})
+
+    return app
+
+
+def start_server(app) -> str:
+    with socket.socket() as probe:
+        probe.bind(("127.0.0.1", 0))
+        port = probe.getsockname()[1]
+    server = uvicorn.Server(uvicorn.Config(app, host="127.0.0.1", port=port, log_level="warning"))
+    threading.Thread(target=server.run, daemon=True).start()
+    while not server.started:
+        time.sleep(0.01)
+    return f"http://127.0.0.1:{port}"
+
+
+async def drive(call, total: int, concurrency: int):
+    latencies = []
+    remaining = iter(range(total))
+
+    async def worker():
+        for index in remaining:
+            started = time.perf_counter()
+            await call(f"Plan {index}")
+            latencies.append(time.perf_counter() - started)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - started
+    latencies.sort()
+    return total / elapsed, statistics.median(latencies), latencies[int(len(latencies) * 0.95) - 1]
+
+
+def report(label: str, result):
+    throughput, p50, p95 = result
+    print(f"{label:<18}: {throughput:>8,.0f} req/s  p50 {p50 * 1000:>7.1f} ms  p95 {p95 * 1000:>7.1f} ms")
+
+
+async def main(args):
+    base_url = start_server(mock_model_server(args.call_ms / 1000, args.prompt_ms / 1000, args.slots))
+    manager = HttpClientManager(upstreams={"model_api": base_url}, http2=False)
+    await manager.start()
+    client = ModelClient(clients=manager, model_name="mock")
+    try:
+        async def unbatched(prompt):
+            return (await client.complete([prompt]))[0]
+
+        report("one call/request", await drive(unbatched, args.requests, args.concurrency))
+
+        batcher = MicroBatcher(client.complete, max_batch_size=args.batch_size,
+                               max_wait_ms=args.max_wait_ms, max_concurrency=args.slots)
+        report("micro-batched", await drive(batcher.submit, args.requests, args.concurrency))
+        await batcher.close()
+        print(f"batcher stats     : {batcher.stats()}")
+    finally:
+        await manager.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--concurrency", type=int, default=64)
+    parser.add_argument("--batch-size", type=int, default=16)
+    parser.add_argument("--max-wait-ms", type=float, default=5)
+    parser.add_argument("--slots", type=int, default=4, help="concurrent calls the mock model serves")
+    parser.add_argument("--call-ms", type=float, default=40, help="fixed latency per upstream call")
+    parser.add_argument("--prompt-ms", type=float, default=1, help="extra latency per prompt in a call")
+    asyncio.run(main(parser.parse_args()))
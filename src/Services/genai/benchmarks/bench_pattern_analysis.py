@@ -0,0 +1,61 @@
+"""
+Throughput benchmark for observations-ai pattern analysis
+
+Usage: python bench_pattern_analysis.py [--sizes 10000 100000 1000000]
+"""
+
+import argparse
+import itertools
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "observations-ai"))
+
+from analysis import ANALYSIS_TYPES, PatternAnalyzer  # noqa: E402
+
+POOL_SIZE = 10_000
+
+
+def make_pool(seed: int = 42):
+    """Observations shaped like classroom records with a few numeric scores"""
+    rng = random.Random(seed)
+    pool = []
+    for i in range(POOL_SIZE):
+        pool.append({
+            "observation_id": i,
+            "child_id": rng.randint(1, 500),
+            "domain_id": rng.randint(1, 8),
+            "points": rng.randint(1, 3),
+            "score": i * 0.01 + rng.gauss(0, 1),
+            "duration_minutes": rng.uniform(5, 45),
+            "notes": "Observed during free play",
+        })
+    return pool
+
+
+def run(size: int, analysis_type: str, pool) -> float:
+    analyzer = PatternAnalyzer(analysis_type)
+    started = time.perf_counter()
+    analyzer.add_many(itertools.islice(itertools.cycle(pool), size))
+    analyzer.result()
+    return time.perf_counter() - started
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10_000, 100_000, 1_000_000])
+    args = parser.parse_args()
+
+    pool = make_pool()
+    print(f"{'analysis':<12}{'observations':>14}{'seconds':>10}{'obs/sec':>14}")
+    for analysis_type in ANALYSIS_TYPES:
+        for size in args.sizes:
+            elapsed = run(size, analysis_type, pool)
+            print(f"{analysis_type:<12}{size:>14,}{elapsed:>10.3f}{size / elapsed:>14,.0f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,97 @@
+"""
+Plan dependency graph and critical-path scheduling at increasing plan sizes
+
+Generates plans whose items depend on a few earlier items, with durations,
+shared resources and a parallelism limit written as /api/optimize
+constraint lines. Reports the time to parse the constraints, run the
+critical-path analysis and build the resource-constrained schedule, and
+checks every schedule: dependencies respected, no capacity exceeded, and
+the makespan never shorter than the critical path.
+
+Usage: python bench_plan_scheduling.py [--sizes 100,1000,5000,20000] [--fan-in 3]
+"""
+
+import argparse
+import heapq
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "planning-ai"))
+
+from scheduling import build_graph  # noqa: E402
+
+RESOURCES = {"teacher": 3, "room": 2, "bus": 1}
+
+
+def make_plan(size: int, fan_in: int, seed: int = 13):
+    rng = random.Random(seed)
+    items = [f"Item {index + 1}" for index in range(size)]
+    constraints = []
+    for index in range(1, size):
+        # Dependencies reach back a bounded window, like stages of a real plan
+        window = range(max(0, index - 50), index)
+        for before in rng.sample(window, min(len(window), rng.randint(0, fan_in))):
+            constraints.append(f"{items[before]} before {items[index]}")
+    for index in range(size):
+        if rng.random() < 0.5:
+            constraints.append(f"{items[index]} takes {rng.randint(1, 5)} days")
+        if rng.random() < 0.3:
+            resource = rng.choice(list(RESOURCES))
+            constraints.append(f"{items[index]} uses {resource}")
+    constraints.extend(f"{resource} capacity {capacity}" for resource, capacity in RESOURCES.items())
+    constraints.append(f"max {max(4, size // 20)} parallel")
+    return items, constraints
+
+
+def check(graph, analysis, starts, makespan) -> bool:
+    finishes = [starts[i] + graph.durations[i] for i in range(len(graph))]
+    if any(starts[i] < finishes[p] - 1e-9 for i in range(len(graph)) for p in graph.predecessors[i]):
+        return False
+    if makespan < analysis.length - 1e-9 or abs(makespan - max(finishes, default=0.0)) > 1e-9:
+        return False
+    # Sweep over start/finish events; releases sort before acquisitions at the same instant
+    events = []
+    for index in range(len(graph)):
+        for resource, amount in graph.demand(index).items():
+            if resource in graph.capacity:
+                events.append((starts[index], 1, resource, amount))
+                events.append((finishes[index], 0, resource, -amount))
+    heapq.heapify(events)
+    in_use = {resource: 0.0 for resource in graph.capacity}
+    while events:
+        _, _, resource, amount = heapq.heappop(events)
+        in_use[resource] += amount
+        if in_use[resource] > graph.capacity[resource] + 1e-9:
+            return False
+    return True
+
+
+def main(args) -> int:
+    ok = True
+    print(f"{'items':>7} {'deps':>7} {'parse ms':>9} {'analyze ms':>11} {'schedule ms':>12} "
+          f"{'critical':>9} {'makespan':>9}  result")
+    for size in args.sizes:
+        items, constraints = make_plan(size, args.fan_in)
+        started = time.perf_counter()
+        graph, unparsed = build_graph(items, constraints)
+        parsed = time.perf_counter()
+        analysis = graph.analyze()
+        analyzed = time.perf_counter()
+        starts, makespan = graph.schedule(analysis)
+        scheduled = time.perf_counter()
+        valid = not unparsed and check(graph, analysis, starts, makespan)
+        ok = ok and valid
+        print(f"{size:>7} {graph.edges:>7} {(parsed - started) * 1000:>9.1f} {(analyzed - parsed) * 1000:>11.1f} "
+              f"{(scheduled - analyzed) * 1000:>12.1f} {analysis.length:>9g} {makespan:>9g}  "
+              f"{'valid' if valid else 'INVALID'}")
+    return 0 if ok else 1
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--sizes", type=lambda value: [int(size) for size in value.split(",")],
+                        default=[100, 1000, 5000, 20000])
+    parser.add_argument("--fan-in", type=int, default=3, help="maximum dependencies per item")
+    sys.exit(main(parser.parse_args()))
@@ -0,0 +1,130 @@
+"""
+Plan completion scoring: model quality and batch throughput
+
+Simulates plan histories (items completing at an owner-dependent pace,
+some blocked, dates slipping) and takes snapshots part-way through each
+plan, labeled with whether it eventually completed. A model is trained on
+one half with the same code as train_completion_model.py and compared with
+the built-in prior on the other half (AUC). Then a dashboard of plans is
+scored as one batch (cold and with the feature cache warm) and as one
+request per plan, and the probabilities must agree.
+
+Usage: python bench_plan_scoring.py [--plans 4000] [--dashboard 200]
+"""
+
+import argparse
+import asyncio
+import math
+import os
+import random
+import sys
+import time
+from datetime import datetime, timedelta, timezone
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "planning-ai"))
+
+from scoring import (  # noqa: E402
+    CompletionHistory, CompletionModel, FeatureCache, PlanScorer, auc, extract_features, np, training_matrix,
+)
+
+NOW = datetime(2026, 6, 1, tzinfo=timezone.utc)
+
+
+def simulate(count: int, seed: int = 21):
+    """(plan snapshot, snapshot time, eventually completed) triples"""
+    rng = random.Random(seed)
+    owners = {f"owner-{index}": rng.uniform(0.3, 1.2) for index in range(60)}
+    snapshots = []
+    for plan_id in range(1, count + 1):
+        owner = rng.choice(list(owners))
+        pace = owners[owner] * rng.uniform(0.6, 1.4)
+        start = NOW - timedelta(days=rng.randint(0, 120))
+        length = rng.randint(7, 120)
+        end = start + timedelta(days=length)
+        as_of = start + timedelta(days=length * rng.uniform(0.2, 0.8))
+        elapsed = (as_of - start) / (end - start)
+        blocked_share = rng.uniform(0, 0.3) if rng.random() < 0.3 else 0.0
+        items = []
+        for item in range(rng.randint(1, 25)):
+            due = start + timedelta(days=length * (item + 1) / 26)
+            progress = elapsed * pace + rng.gauss(0, 0.15)
+            status = 2 if progress > (item + 1) / 26 else 3 if rng.random() < blocked_share else rng.choice((0, 1))
+            items.append({"Id": plan_id * 100 + item, "PlanId": plan_id, "Status": status,
+                          "DueDate": due.isoformat()})
+        done = sum(item["Status"] == 2 for item in items) / len(items)
+        logit = 3.0 * (pace - 0.85) + 2.0 * (done - elapsed) - 2.5 * blocked_share - 0.02 * len(items)
+        completed = rng.random() < 1 / (1 + math.exp(-logit))
+        plan = {"Id": plan_id, "Title": f"Plan {plan_id}", "Status": 1, "Priority_Value": rng.randint(1, 4),
+                "StartDate": start.isoformat(), "EndDate": end.isoformat(), "OwnerId": owner, "Items": items}
+        snapshots.append((plan, as_of.timestamp(), completed))
+    return snapshots
+
+
+def quality(snapshots) -> float:
+    half = len(snapshots) // 2
+    train, test = snapshots[:half], snapshots[half:]
+    train_features = training_matrix(*zip(*train))
+    train_labels = np.array([completed for _, _, completed in train], dtype=float)
+    started = time.perf_counter()
+    model = CompletionModel.fit(train_features, train_labels)
+    fit_ms = (time.perf_counter() - started) * 1000
+
+    # Held-out plans see only the training half's outcomes as history
+    history = CompletionHistory()
+    for plan, _, completed in train:
+        history.add(plan, completed)
+    test_features = np.vstack([extract_features([plan], history, now=as_of)[0] for plan, as_of, _ in test])
+    test_labels = np.array([completed for _, _, completed in test], dtype=float)
+    trained_auc = auc(test_labels, model.predict(test_features))
+    prior_auc = auc(test_labels, CompletionModel.prior().predict(test_features))
+    print(f"model: {len(train)} training snapshots, fit {fit_ms:.0f} ms, completion rate {train_labels.mean():.2f}")
+    print(f"  held-out AUC  trained {trained_auc:.3f}  prior {prior_auc:.3f}")
+    return trained_auc
+
+
+async def throughput(snapshots, dashboard: int) -> bool:
+    plans = {plan["Id"]: plan for plan, _, _ in snapshots}
+    loads = []
+
+    async def loader(ids):
+        loads.append(len(ids))
+        return [plans[identifier] for identifier in ids if identifier in plans]
+
+    ids = list(plans)[:dashboard]
+    batch_scorer = PlanScorer(loader, model=CompletionModel.prior(), cache=FeatureCache(ttl_seconds=3600))
+    started = time.perf_counter()
+    cold, _ = await batch_scorer.score(ids)
+    cold_ms = (time.perf_counter() - started) * 1000
+    started = time.perf_counter()
+    warm, _ = await batch_scorer.score(ids)
+    warm_ms = (time.perf_counter() - started) * 1000
+
+    single_scorer = PlanScorer(loader, model=CompletionModel.prior(), cache=FeatureCache(ttl_seconds=3600))
+    started = time.perf_counter()
+    single = [(await single_scorer.score([identifier]))[0][0] for identifier in ids]
+    single_ms = (time.perf_counter() - started) * 1000
+
+    print(f"dashboard of {dashboard} plans:")
+    print(f"  one batch, cold      {cold_ms:>8.1f} ms  ({loads[0]} plans loaded in 1 call)")
+    print(f"  one batch, cached    {warm_ms:>8.1f} ms")
+    print(f"  one request per plan {single_ms:>8.1f} ms  ({len(loads) - 1} loader calls)")
+    probabilities = [result["completion_probability"] for result in cold]
+    same = probabilities == [result["completion_probability"] for result in warm] and \
+        np.allclose(probabilities, [result["completion_probability"] for result in single], atol=1e-4)
+    return same
+
+
+async def main(args) -> int:
+    snapshots = simulate(args.plans)
+    trained_auc = quality(snapshots)
+    same = await throughput(snapshots, args.dashboard)
+    print("consistent" if same else "MISMATCH")
+    return 0 if same and trained_auc > 0.5 else 1
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--plans", type=int, default=4000)
+    parser.add_argument("--dashboard", type=int, default=200)
+    sys.exit(asyncio.run(main(parser.parse_args())))
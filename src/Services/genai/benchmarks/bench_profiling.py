@@ -0,0 +1,81 @@
+"""
+Cost of shared.profiling on endpoint latency and throughput
+
+Runs bench_endpoints scenarios (asgi mode, a fresh process each) under:
+
+  off          PROFILING_ENABLED unset, as in production by default
+  slow-watch   every request watched for PROFILE_SLOW_MS; stacks sampled
+               while it runs on the loop and dropped unless it is slow
+  sampled-10%  PROFILE_SAMPLE_RATE=0.1, stack samples only (the default
+               PROFILE_TRACEMALLOC=forced)
+  traced-10%   the same with tracemalloc allocation deltas
+               (PROFILE_TRACEMALLOC=all)
+  sampled-all  every request profiled, stack samples only
+
+and reports each against off. Exits non-zero when a request fails.
+
+Usage: python bench_profiling.py [--scenarios validate/4,analyze-patterns/200] [--requests 400] [--concurrency 8]
+"""
+
+import argparse
+import os
+import sys
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, BENCH_DIR)
+
+from bench_endpoints import SCENARIOS, measure  # noqa: E402
+
+CONFIGURATIONS = {
+    "off": {"PROFILING_ENABLED": "false"},
+    "slow-watch": {"PROFILING_ENABLED": "true", "PROFILE_SLOW_MS": "1000"},
+    "sampled-10%": {"PROFILING_ENABLED": "true", "PROFILE_SAMPLE_RATE": "0.1"},
+    "traced-10%": {"PROFILING_ENABLED": "true", "PROFILE_SAMPLE_RATE": "0.1", "PROFILE_TRACEMALLOC": "all"},
+    "sampled-all": {"PROFILING_ENABLED": "true", "PROFILE_SAMPLE_RATE": "1"},
+}
+
+
+def main(args) -> int:
+    unknown = [name for name in args.scenarios if name not in SCENARIOS]
+    if unknown:
+        print(f"Unknown scenarios: {', '.join(unknown)} (choose from {', '.join(SCENARIOS)})")
+        return 2
+
+    print(f"{'scenario':<26} {'profiling':<12} {'req/s':>8} {'p50 ms':>8} {'p95 ms':>8}  vs off")
+    failed = 0
+    for name in args.scenarios:
+        reference = None
+        for configuration, environment in CONFIGURATIONS.items():
+            # measure() starts the child with this process's environment
+            saved = {key: os.environ.get(key) for key in environment}
+            os.environ.update(environment)
+            try:
+                result = measure("asgi", name, args)
+            finally:
+                for key, value in saved.items():
+                    if value is None:
+                        os.environ.pop(key, None)
+                    else:
+                        os.environ[key] = value
+            if "error" in result:
+                print(f"{name:<26} {configuration:<12} failed: {result['error']}")
+                failed += 1
+                continue
+            failed += result["errors"] > 0
+            reference = reference or result
+            print(f"{name:<26} {configuration:<12} {result['rps']:>8,.0f} {result['p50_ms']:>8.2f} "
+                  f"{result['p95_ms']:>8.2f}  {result['rps'] / reference['rps'] - 1:+.1%} req/s, "
+                  f"{result['p50_ms'] / reference['p50_ms'] - 1:+.1%} p50")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--scenarios", type=lambda value: value.split(","),
+                        default=["validate/4", "analyze-patterns/200"])
+    parser.add_argument("--requests", type=int, default=400)
+    parser.add_argument("--warmup", type=int, default=40)
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--workers", type=int, default=1)
+    parser.add_argument("--seed", type=int, default=7)
+    sys.exit(main(parser.parse_args()))
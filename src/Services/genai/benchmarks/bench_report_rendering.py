@@ -0,0 +1,66 @@
+"""
+Memory and throughput benchmark for streaming report rendering
+
+Renders synthetic observation rows from an async generator through each
+report writer into a discarding sink and records the tracemalloc peak.
+A flat peak across sizes shows rendering runs in constant memory; pdf
+grows only by the 8-byte offset per page object its xref table needs.
+
+Usage: python bench_report_rendering.py [--sizes 10000 100000 500000]
+"""
+
+import argparse
+import asyncio
+import os
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "reports-ai"))
+
+from rendering import WRITERS, create_writer, render_async  # noqa: E402
+
+
+async def observation_rows(count: int):
+    """A center's year of observations, generated lazily"""
+    for i in range(count):
+        yield "observations", {
+            "id": i,
+            "childId": 1000 + i % 120,
+            "childName": f"Child {i % 120}",
+            "teacherName": f"Teacher {i % 12}",
+            "domainName": "Physical Development" if i % 2 else "Communication and Language",
+            "attributeName": "Uses large muscles for movement",
+            "observationDate": f"2024-{1 + i % 12:02d}-{1 + i % 28:02d}",
+            "observationTextPreview": "Climbed the frame confidently and helped a friend reach the top step...",
+            "isDraft": False,
+        }
+
+
+async def run(format: str, size: int):
+    tracemalloc.start()
+    started = time.perf_counter()
+    written = 0
+    async for chunk in render_async(create_writer(format), "Annual Observations Report", observation_rows(size)):
+        written += len(chunk)
+    elapsed = time.perf_counter() - started
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return elapsed, written, peak
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10_000, 100_000, 500_000])
+    args = parser.parse_args()
+
+    print(f"{'format':<8}{'rows':>10}{'seconds':>10}{'rows/sec':>12}{'output MB':>12}{'peak KB':>10}")
+    for format in WRITERS:
+        for size in args.sizes:
+            elapsed, written, peak = asyncio.run(run(format, size))
+            print(f"{format:<8}{size:>10,}{elapsed:>10.2f}{size / elapsed:>12,.0f}"
+                  f"{written / 1e6:>12.1f}{peak / 1024:>10.0f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,176 @@
+"""
+Response serialization: FastAPI's response_model path vs shared.responses
+
+For large responses built by the services themselves (batch validation
+results, a scheduled plan, an analytics batch) and a small one, times:
+
+  standard  response models constructed with validation, then FastAPI's own
+            serialize_response() for the route's response_model and a
+            JSONResponse render, as before
+  fast      models built as the endpoints now build them (model_construct()
+            for containers of the services' own plain data) and rendered in
+            one pass by FastJSONResponse
+
+Times cover building the response and rendering the body; the serialize
+columns render an already built response. Both bodies must decode to the
+same JSON. Also reports the size and time of gzip (and brotli when
+installed) for each body.
+
+Usage: python bench_responses.py [--repeat 20] [--validations 10000] [--plan-items 5000] [--plans 1000]
+"""
+
+import argparse
+import asyncio
+import importlib.util
+import json
+import os
+import statistics
+import sys
+import time
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+GENAI_DIR = os.path.join(BENCH_DIR, "..")
+sys.path.insert(0, GENAI_DIR)
+for service in ("observations-ai", "planning-ai"):
+    sys.path.insert(0, os.path.join(GENAI_DIR, service))
+
+from fastapi.responses import JSONResponse  # noqa: E402
+from fastapi.routing import serialize_response  # noqa: E402
+
+from shared import responses  # noqa: E402
+from shared.responses import FastJSONResponse, compress  # noqa: E402
+
+from bench_plan_scheduling import make_plan  # noqa: E402
+from bench_plan_scoring import simulate  # noqa: E402
+
+
+def load_service(service: str):
+    """Import a service's main.py under a unique module name"""
+    spec = importlib.util.spec_from_file_location(f"{service.replace('-', '_')}_main",
+                                                  os.path.join(GENAI_DIR, service, "main.py"))
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def response_field(app, path: str):
+    return next(route.response_field for route in app.routes if getattr(route, "path", None) == path)
+
+
+def timed(function, repeat: int) -> float:
+    """Median milliseconds per call"""
+    samples = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        function()
+        samples.append((time.perf_counter() - started) * 1000)
+    return statistics.median(samples)
+
+
+def run_now(coroutine):
+    """Result of a coroutine that never suspends (serialize_response for an async endpoint)"""
+    try:
+        coroutine.send(None)
+    except StopIteration as done:
+        return done.value
+    raise RuntimeError("coroutine suspended")
+
+
+def standard_body(field, response) -> bytes:
+    return JSONResponse(run_now(serialize_response(field=field, response_content=response))).body
+
+
+def cases(args):
+    """(name, service route, response model, constructor arguments, endpoint skips validation) per response"""
+    observations = load_service("observations-ai")
+    planning = load_service("planning-ai")
+
+    requests = [observations.DataValidationRequest(
+        observation_id=index, data_points={"score": index % 130, "count": index % 7, "points": index % 5},
+        expected_ranges={"score": {"min": 0, "max": 100}, "points": {"min": 1, "max": 4}})
+        for index in range(args.validations)]
+    validations = [{"is_valid": not anomalies, "anomalies": anomalies, "confidence_score": 0.89,
+                    "suggestions": suggestions or [observations.DEFAULT_SUGGESTION]}
+                   for anomalies, suggestions in observations.validate_batch(
+                       [(r.data_points, r.expected_ranges) for r in requests])]
+
+    items, constraints = make_plan(args.plan_items, 3)
+    plan = planning.optimize_items(items, constraints)
+    titles = plan.graph.titles
+    optimization = {
+        "optimized_items": [titles[i] for i in plan.order], "recommendations": plan.recommendations(),
+        "efficiency_score": plan.efficiency, "critical_path": [titles[i] for i in plan.analysis.critical_path],
+        "parallel_groups": [[titles[i] for i in group] for group in plan.analysis.groups],
+        "schedule": plan.schedule(), "total_duration": plan.makespan,
+        "critical_path_duration": plan.analysis.length, "unparsed_constraints": plan.unparsed,
+    }
+
+    snapshots = simulate(args.plans)
+    scorer = planning.PlanScorer(lambda ids: None)
+    scored, missing = asyncio.run(scorer.score([plan["Id"] for plan, _, _ in snapshots],
+                                               [plan for plan, _, _ in snapshots]))
+
+    return [
+        (f"validate/batch ({args.validations} results)", (observations.app, "/api/validate/batch"),
+         observations.BatchValidationResponse,
+         {"results": (observations.DataValidationResponse, validations), "total": len(validations),
+          "invalid_count": sum(not v["is_valid"] for v in validations)}, False),
+        (f"optimize ({args.plan_items} items)", (planning.app, "/api/optimize"),
+         planning.PlanOptimizationResponse, optimization, True),
+        (f"analytics/batch ({args.plans} plans)", (planning.app, "/api/analytics/batch"),
+         planning.PlanAnalyticsBatchResponse, {"results": scored, "missing": missing}, True),
+        ("validate (single)", (observations.app, "/api/validate"),
+         observations.DataValidationResponse, validations[0], False),
+    ]
+
+
+def build(model, arguments, construct: bool):
+    """
+    The response model with or without validation. Nested item models are
+    always validated: for small models pydantic-core's validating
+    constructor is cheaper than the pure Python model_construct().
+    """
+    values = {}
+    for name, value in arguments.items():
+        if isinstance(value, tuple):
+            # (item model, item arguments) for a list of nested response models
+            item_model, items = value
+            value = [item_model(**item) for item in items]
+        values[name] = value
+    return model.model_construct(**values) if construct else model(**values)
+
+
+def main(args) -> int:
+    print(f"JSON encoder for plain data: {'orjson' if responses.orjson is not None else 'pydantic-core'}; "
+          f"encodings: {', '.join(responses.ENCODINGS)}")
+    print(f"{'response':<34} {'bytes':>10} {'standard ms':>12} {'fast ms':>9} {'speedup':>8} "
+          f"{'serialize ms':>16}  compression")
+    ok = True
+    for name, (app, path), model, arguments, construct in cases(args):
+        field = response_field(app, path)
+        standard_response, fast_response = build(model, arguments, False), build(model, arguments, construct)
+        standard = standard_body(field, standard_response)
+        fast = FastJSONResponse(fast_response).body
+        same = json.loads(standard) == json.loads(fast)
+        ok = ok and same
+        standard_ms = timed(lambda: standard_body(field, build(model, arguments, construct=False)), args.repeat)
+        fast_ms = timed(lambda: FastJSONResponse(build(model, arguments, construct)).body, args.repeat)
+        serialize = (timed(lambda: standard_body(field, standard_response), args.repeat),
+                     timed(lambda: FastJSONResponse(fast_response).body, args.repeat))
+        encoded = []
+        for encoding in responses.ENCODINGS:
+            started = time.perf_counter()
+            size = len(compress(fast, encoding))
+            encoded.append(f"{encoding} {size / len(fast):.0%} in {(time.perf_counter() - started) * 1000:.1f} ms")
+        print(f"{name:<34} {len(fast):>10,} {standard_ms:>12.2f} {fast_ms:>9.2f} {standard_ms / fast_ms:>7.1f}x "
+              f"{serialize[0]:>7.2f} -> {serialize[1]:<6.2f}  {', '.join(encoded)}{'' if same else '  MISMATCH'}")
+    return 0 if ok else 1
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--repeat", type=int, default=20)
+    parser.add_argument("--validations", type=int, default=10000)
+    parser.add_argument("--plan-items", type=int, default=5000)
+    parser.add_argument("--plans", type=int, default=1000)
+    sys.exit(main(parser.parse_args()))
@@ -0,0 +1,105 @@
+"""
+Cold-start budget check for the GenAI services
+
+For each service this measures:
+  - the cumulative import time of main.py from `python -X importtime`
+    (median of several fresh interpreters),
+  - which heavy dependencies were imported eagerly (they must stay lazy),
+  - the wall-clock time from process start to the first 200 on /health/live.
+
+Exits non-zero when any service exceeds a budget or imports a heavy module
+at startup, so it can gate CI and deployments.
+
+Usage: python bench_startup.py [--runs 5] [--import-budget-ms 1500] [--ready-budget-ms 4000]
+"""
+
+import argparse
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import time
+
+import httpx
+
+GENAI_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+SERVICES = ("planning-ai", "observations-ai", "reports-ai")
+
+# Must be loaded through shared.lazy, never on the import path of main.py
+HEAVY_MODULES = ("numpy", "pandas", "httpx", "psutil", "openai", "langchain", "reportlab",
+                 "sklearn", "scipy", "matplotlib", "uvicorn")
+
+
+def import_profile(service: str):
+    """Cumulative import time of main in microseconds plus every top-level module imported"""
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", "import main"],
+        cwd=os.path.join(GENAI_DIR, service), capture_output=True, text=True, check=True,
+    )
+    total_us = 0
+    modules = set()
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        _, cumulative, name = line.split("|")
+        name = name.strip()
+        modules.add(name.split(".")[0])
+        if name == "main":
+            total_us = int(cumulative)
+    return total_us, modules
+
+
+def free_port() -> int:
+    with socket.socket() as probe:
+        probe.bind(("127.0.0.1", 0))
+        return probe.getsockname()[1]
+
+
+def time_to_ready(service: str, timeout: float = 30.0) -> float:
+    port = free_port()
+    env = {**os.environ, "PORT": str(port), "MAX_WORKERS": "1", "LOG_LEVEL": "WARNING"}
+    started = time.perf_counter()
+    process = subprocess.Popen([sys.executable, "main.py"], cwd=os.path.join(GENAI_DIR, service), env=env,
+                               stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    try:
+        while time.perf_counter() - started < timeout:
+            try:
+                if httpx.get(f"http://127.0.0.1:{port}/health/live", timeout=0.5).status_code == 200:
+                    return (time.perf_counter() - started) * 1000
+            except httpx.TransportError:
+                time.sleep(0.01)
+        raise RuntimeError(f"{service} did not answer /health/live within {timeout:.0f}s")
+    finally:
+        process.terminate()
+        process.wait(timeout=30)
+
+
+def main(args) -> int:
+    failures = []
+    print(f"{'service':<18}{'import ms':>10}{'ready ms':>10}  eager heavy imports")
+    for service in SERVICES:
+        profiles = [import_profile(service) for _ in range(args.runs)]
+        import_ms = statistics.median(total for total, _ in profiles) / 1000
+        eager = sorted(set(HEAVY_MODULES) & profiles[0][1])
+        ready_ms = time_to_ready(service)
+        print(f"{service:<18}{import_ms:>10.0f}{ready_ms:>10.0f}  {', '.join(eager) or '-'}")
+
+        if import_ms > args.import_budget_ms:
+            failures.append(f"{service}: import {import_ms:.0f} ms > budget {args.import_budget_ms:.0f} ms")
+        if ready_ms > args.ready_budget_ms:
+            failures.append(f"{service}: ready {ready_ms:.0f} ms > budget {args.ready_budget_ms:.0f} ms")
+        if eager:
+            failures.append(f"{service}: heavy modules imported at startup: {', '.join(eager)}")
+
+    for failure in failures:
+        print(f"FAIL {failure}")
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--import-budget-ms", type=float, default=float(os.getenv("STARTUP_IMPORT_BUDGET_MS", 1500)))
+    parser.add_argument("--ready-budget-ms", type=float, default=float(os.getenv("STARTUP_READY_BUDGET_MS", 4000)))
+    sys.exit(main(parser.parse_args()))
@@ -0,0 +1,84 @@
+"""
+Load test for the shared pooled HTTP client against a local stub upstream
+
+Compares a new httpx.AsyncClient per call (the old health check pattern)
+with the shared HttpClientManager pool.
+
+Usage: python load_http_client.py [--requests 2000] [--concurrency 50]
+"""
+
+import argparse
+import asyncio
+import os
+import socket
+import sys
+import threading
+import time
+
+import httpx
+import uvicorn
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from shared.http_client import HttpClientManager  # noqa: E402
+
+
+async def stub_upstream(scope, receive, send):
+    """Minimal ASGI app answering every request like a healthy MAPP API"""
+    if scope["type"] != "http":
+        return
+    await send({"type": "http.response.start", "status": 200,
+                "headers": [(b"content-type", b"application/json")]})
+    await send({"type": "http.response.body", "body": b'{"status":"healthy"}'})
+
+
+def start_stub() -> str:
+    with socket.socket() as probe:
+        probe.bind(("127.0.0.1", 0))
+        port = probe.getsockname()[1]
+    server = uvicorn.Server(uvicorn.Config(stub_upstream, host="127.0.0.1", port=port, log_level="warning"))
+    threading.Thread(target=server.run, daemon=True).start()
+    while not server.started:
+        time.sleep(0.01)
+    return f"http://127.0.0.1:{port}"
+
+
+async def drive(call, total: int, concurrency: int) -> float:
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def one():
+        async with semaphore:
+            response = await call()
+            response.raise_for_status()
+
+    started = time.perf_counter()
+    await asyncio.gather(*(one() for _ in range(total)))
+    return time.perf_counter() - started
+
+
+async def main(total: int, concurrency: int):
+    base_url = start_stub()
+
+    async def per_call_client():
+        async with httpx.AsyncClient(timeout=5.0) as client:
+            return await client.get(f"{base_url}/health")
+
+    elapsed = await drive(per_call_client, total, concurrency)
+    print(f"client per call : {total / elapsed:>8,.0f} req/s")
+
+    manager = HttpClientManager(upstreams={"stub": base_url}, http2=False)
+    await manager.start()
+    try:
+        elapsed = await drive(lambda: manager.get("stub", "/health"), total, concurrency)
+        print(f"pooled manager  : {total / elapsed:>8,.0f} req/s")
+        print(f"pool stats      : {manager.stats()['stub']}")
+    finally:
+        await manager.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--concurrency", type=int, default=50)
+    args = parser.parse_args()
+    asyncio.run(main(args.requests, args.concurrency))
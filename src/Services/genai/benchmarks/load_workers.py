@@ -0,0 +1,103 @@
+"""
+Requests per second for a GenAI service as the worker count grows
+
+Starts the service's __main__ (shared.launcher) with MAX_WORKERS set to each
+requested count, drives a CPU-bound endpoint from several client processes
+for a fixed duration, then sends SIGTERM and checks the server drains and
+exits. Scaling is bounded by the CPU count of the machine running it.
+
+Usage: python load_workers.py [--workers 1 2 4] [--duration 10] [--clients 4]
+"""
+
+import argparse
+import asyncio
+import multiprocessing
+import os
+import signal
+import socket
+import subprocess
+import sys
+import time
+
+import httpx
+
+SERVICE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "observations-ai")
+ENDPOINT = "/api/validate/batch"
+
+
+def payload(items: int):
+    return {"requests": [
+        {"observation_id": index, "data_points": {"score": index % 120, "count": index % 7},
+         "expected_ranges": {"score": {"min": 0, "max": 100}}}
+        for index in range(items)
+    ]}
+
+
+def free_port() -> int:
+    with socket.socket() as probe:
+        probe.bind(("127.0.0.1", 0))
+        return probe.getsockname()[1]
+
+
+def start_service(workers: int, port: int) -> subprocess.Popen:
+    env = {**os.environ, "MAX_WORKERS": str(workers), "PORT": str(port), "LOG_LEVEL": "WARNING"}
+    process = subprocess.Popen([sys.executable, "main.py"], cwd=SERVICE_DIR, env=env)
+    deadline = time.monotonic() + 30
+    while time.monotonic() < deadline:
+        try:
+            if httpx.get(f"http://127.0.0.1:{port}/health/live", timeout=1).status_code == 200:
+                return process
+        except httpx.TransportError:
+            time.sleep(0.2)
+    process.kill()
+    raise RuntimeError("Service did not become live within 30s")
+
+
+def client_process(port: int, duration: float, concurrency: int, items: int) -> int:
+    async def run() -> int:
+        body = payload(items)
+        completed = 0
+        deadline = time.monotonic() + duration
+        limits = httpx.Limits(max_connections=concurrency)
+        async with httpx.AsyncClient(base_url=f"http://127.0.0.1:{port}", limits=limits, timeout=30) as client:
+            async def worker():
+                nonlocal completed
+                while time.monotonic() < deadline:
+                    response = await client.post(ENDPOINT, json=body)
+                    response.raise_for_status()
+                    completed += 1
+            await asyncio.gather(*(worker() for _ in range(concurrency)))
+        return completed
+
+    return asyncio.run(run())
+
+
+def measure(workers: int, args) -> float:
+    port = free_port()
+    process = start_service(workers, port)
+    try:
+        with multiprocessing.Pool(args.clients) as pool:
+            counts = pool.starmap(client_process, [(port, args.duration, args.concurrency, args.items)] * args.clients)
+    finally:
+        stopping = time.monotonic()
+        process.send_signal(signal.SIGTERM)
+        process.wait(timeout=60)
+    rps = sum(counts) / args.duration
+    print(f"workers={workers:<3} {rps:>8,.0f} req/s  shutdown {time.monotonic() - stopping:.2f}s")
+    return rps
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4])
+    parser.add_argument("--duration", type=float, default=10)
+    parser.add_argument("--clients", type=int, default=4, help="load generator processes")
+    parser.add_argument("--concurrency", type=int, default=16, help="connections per client process")
+    parser.add_argument("--items", type=int, default=200, help="observations per batch request")
+    args = parser.parse_args()
+    print(f"{os.cpu_count()} CPUs available")
+    baseline = None
+    for count in args.workers:
+        rps = measure(count, args)
+        baseline = baseline or rps
+        print(f"           scaling x{rps / baseline:.2f}")
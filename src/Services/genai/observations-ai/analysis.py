@@ -0,0 +1,297 @@
+"""
+Incremental pattern analysis over observation records
+
+Observations are buffered into fixed-size chunks, converted to a columnar
+NumPy matrix (one column per numeric field) and merged into running
+statistics with the pairwise update of Chan et al., so every analysis is a
+single vectorized pass that scales linearly with observation count.
+"""
+
+from typing import Any, Dict, Iterable, List, Tuple
+
+from shared.lazy import lazy_import
+
+np = lazy_import("numpy")
+
+ANALYSIS_TYPES = ("trend", "anomaly", "correlation")
+
+# Numeric fields tracked per analysis; extra fields are ignored to bound memory
+MAX_FIELDS = 32
+# Observations converted to a column matrix at a time
+CHUNK_SIZE = 4096
+# Observations seen before a field is checked for outliers
+ANOMALY_WARMUP = 10
+ANOMALY_Z_THRESHOLD = 3.0
+MAX_ANOMALY_EXAMPLES = 5
+MIN_TREND_R2 = 0.1
+MIN_CORRELATION = 0.5
+
+
+class CoMoments:
+    """
+    Running count, means, second moments and co-moment of (x, y) pairs.
+    Every statistic is an array, so one instance tracks many series at once.
+    """
+
+    __slots__ = ("count", "mean_x", "mean_y", "m2_x", "m2_y", "c_xy")
+
+    def __init__(self, shape):
+        self.count = np.zeros(shape)
+        self.mean_x = np.zeros(shape)
+        self.mean_y = np.zeros(shape)
+        self.m2_x = np.zeros(shape)
+        self.m2_y = np.zeros(shape)
+        self.c_xy = np.zeros(shape)
+
+    def merge(self, count, mean_x, mean_y, m2_x, m2_y, c_xy):
+        """Combine statistics of another partition into this one"""
+        total = self.count + count
+        safe_total = np.where(total > 0, total, 1)
+        delta_x = mean_x - self.mean_x
+        delta_y = mean_y - self.mean_y
+        weight = self.count * count / safe_total
+
+        self.mean_x = self.mean_x + delta_x * count / safe_total
+        self.mean_y = self.mean_y + delta_y * count / safe_total
+        self.m2_x = self.m2_x + m2_x + delta_x * delta_x * weight
+        self.m2_y = self.m2_y + m2_y + delta_y * delta_y * weight
+        self.c_xy = self.c_xy + c_xy + delta_x * delta_y * weight
+        self.count = total
+
+    def slope(self) -> "np.ndarray":
+        with np.errstate(divide="ignore", invalid="ignore"):
+            return np.where(self.m2_x > 0, self.c_xy / self.m2_x, 0.0)
+
+    def correlation(self) -> "np.ndarray":
+        denominator = np.sqrt(self.m2_x * self.m2_y)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            return np.where(denominator > 0, self.c_xy / denominator, 0.0)
+
+
+class PatternAnalyzer:
+    """Consumes observations incrementally and keeps only summary statistics"""
+
+    def __init__(self, analysis_type: str = "trend", max_fields: int = MAX_FIELDS,
+                 chunk_size: int = CHUNK_SIZE):
+        self.analysis_type = analysis_type
+        self.max_fields = max_fields
+        self.chunk_size = chunk_size
+        self.count = 0
+        self.fields: Dict[str, int] = {}
+        self._pending: List[Dict[str, Any]] = []
+
+        self.trends = CoMoments(max_fields)
+        self.correlations = CoMoments((max_fields, max_fields))
+        # Welford state per field for outlier detection
+        self.outlier_count = np.zeros(max_fields)
+        self.outlier_mean = np.zeros(max_fields)
+        self.outlier_m2 = np.zeros(max_fields)
+        self.outliers_found = np.zeros(max_fields, dtype=np.int64)
+        self.outlier_examples: List[List[Tuple[float, int, float]]] = [[] for _ in range(max_fields)]
+
+    def add(self, observation: Dict[str, Any]):
+        """Queue one observation; statistics update once a chunk is full"""
+        self._pending.append(observation)
+        if len(self._pending) >= self.chunk_size:
+            self.flush()
+
+    def add_many(self, observations: Iterable[Dict[str, Any]]):
+        for observation in observations:
+            self.add(observation)
+
+    def flush(self):
+        """Fold all queued observations into the running statistics"""
+        if not self._pending:
+            return
+        start = self.count
+        matrix = self._to_columns(self._pending)
+        self._pending = []
+        self.count += matrix.shape[0]
+
+        if self.analysis_type == "trend":
+            self._update_trends(start, matrix)
+        elif self.analysis_type == "anomaly":
+            self._update_outliers(start, matrix)
+        elif self.analysis_type == "correlation":
+            self._update_correlations(matrix)
+
+    def _to_columns(self, observations: List[Dict[str, Any]]) -> "np.ndarray":
+        """Lay a chunk out as a (rows, max_fields) matrix with NaN for missing values"""
+        matrix = np.full((len(observations), self.max_fields), np.nan)
+        fields = self.fields
+        for row, observation in enumerate(observations):
+            for name, value in observation.items():
+                if isinstance(value, bool) or not isinstance(value, (int, float)):
+                    continue
+                column = fields.get(name)
+                if column is None:
+                    if len(fields) >= self.max_fields:
+                        continue
+                    column = fields[name] = len(fields)
+                try:
+                    matrix[row, column] = value
+                except OverflowError:
+                    pass
+        matrix[~np.isfinite(matrix)] = np.nan
+        return matrix
+
+    def _update_trends(self, start: int, matrix: "np.ndarray"):
+        present = ~np.isnan(matrix)
+        weights = present.astype(np.float64)
+        values = np.where(present, matrix, 0.0)
+        x = np.arange(start, start + matrix.shape[0], dtype=np.float64)[:, None]
+
+        count = weights.sum(axis=0)
+        safe_count = np.where(count > 0, count, 1)
+        mean_x = (weights * x).sum(axis=0) / safe_count
+        mean_y = values.sum(axis=0) / safe_count
+        dx = (x - mean_x) * weights
+        dy = (values - mean_y) * weights
+        self.trends.merge(count, mean_x, mean_y,
+                          (dx * dx).sum(axis=0), (dy * dy).sum(axis=0), (dx * dy).sum(axis=0))
+
+    def _update_correlations(self, matrix: "np.ndarray"):
+        present = ~np.isnan(matrix)
+        weights = present.astype(np.float64)
+        # Shift each column by its chunk mean to keep the raw sums well conditioned
+        column_count = weights.sum(axis=0)
+        shift = np.where(present, matrix, 0.0).sum(axis=0) / np.where(column_count > 0, column_count, 1)
+        centered = np.where(present, matrix - shift, 0.0)
+
+        # [a, b] entries cover only rows where both a and b are present
+        count = weights.T @ weights
+        safe_count = np.where(count > 0, count, 1)
+        sums = centered.T @ weights
+        squares = (centered * centered).T @ weights
+        cross = centered.T @ centered
+
+        mean_x = sums / safe_count
+        mean_y = sums.T / safe_count
+        m2_x = squares - sums * mean_x
+        m2_y = squares.T - sums.T * mean_y
+        c_xy = cross - sums * mean_y
+        self.correlations.merge(count, mean_x + shift[:, None], mean_y + shift[None, :],
+                                np.maximum(m2_x, 0.0), np.maximum(m2_y, 0.0), c_xy)
+
+    def _update_outliers(self, start: int, matrix: "np.ndarray"):
+        for column in np.flatnonzero(~np.isnan(matrix).all(axis=0)):
+            rows = np.flatnonzero(~np.isnan(matrix[:, column]))
+            self._update_outlier_column(column, start + rows, matrix[rows, column])
+
+    def _update_outlier_column(self, column: int, indexes: "np.ndarray", values: "np.ndarray"):
+        """
+        Compare every value with the mean/std of all values before it, then
+        merge the chunk into the field's Welford state.
+        """
+        prior_count = self.outlier_count[column]
+        prior_mean = self.outlier_mean[column]
+        prior_m2 = self.outlier_m2[column]
+        shift = prior_mean if prior_count > 0 else values[0]
+
+        deviations = values - shift
+        # Running sums over values strictly before each position
+        before_sum = np.concatenate(([0.0], np.cumsum(deviations)[:-1]))
+        before_squares = np.concatenate(([0.0], np.cumsum(deviations * deviations)[:-1]))
+        before_count = prior_count + np.arange(len(values), dtype=np.float64)
+        prior_offset = prior_mean - shift
+
+        total_sum = prior_count * prior_offset + before_sum
+        total_squares = prior_m2 + prior_count * prior_offset * prior_offset + before_squares
+        safe_count = np.where(before_count > 0, before_count, 1)
+        mean = shift + total_sum / safe_count
+        m2 = np.maximum(total_squares - total_sum * total_sum / safe_count, 0.0)
+        std = np.sqrt(m2 / np.where(before_count > 1, before_count - 1, 1))
+
+        checked = (before_count >= ANOMALY_WARMUP) & (std > 0)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            scores = np.where(checked, np.abs(values - mean) / np.where(std > 0, std, 1), 0.0)
+        flagged = np.flatnonzero(scores >= ANOMALY_Z_THRESHOLD)
+        if len(flagged):
+            self.outliers_found[column] += len(flagged)
+            examples = self.outlier_examples[column]
+            top = flagged[np.argsort(scores[flagged])[::-1][:MAX_ANOMALY_EXAMPLES]]
+            examples.extend((float(scores[i]), int(indexes[i]), float(values[i])) for i in top)
+            examples.sort(reverse=True)
+            del examples[MAX_ANOMALY_EXAMPLES:]
+
+        count = prior_count + len(values)
+        final_sum = prior_count * prior_offset + deviations.sum()
+        final_squares = prior_m2 + prior_count * prior_offset * prior_offset + (deviations * deviations).sum()
+        self.outlier_count[column] = count
+        self.outlier_mean[column] = shift + final_sum / count
+        self.outlier_m2[column] = max(final_squares - final_sum * final_sum / count, 0.0)
+
+    def result(self) -> Tuple[List[str], List[str], float]:
+        """Summarise the statistics as (patterns, insights, confidence_score)"""
+        self.flush()
+        if self.analysis_type == "trend":
+            patterns, insights = self._trend_result()
+        elif self.analysis_type == "anomaly":
+            patterns, insights = self._anomaly_result()
+        elif self.analysis_type == "correlation":
+            patterns, insights = self._correlation_result()
+        else:
+            patterns, insights = [], []
+
+        if self.count == 0:
+            insights.append("No observations received")
+        elif not self.fields:
+            insights.append("No numeric fields found in observations")
+        return patterns, insights, confidence_for(self.count)
+
+    def _trend_result(self) -> Tuple[List[str], List[str]]:
+        patterns, insights = [], []
+        slopes = self.trends.slope()
+        r2 = self.trends.correlation() ** 2
+        for name, column in self.fields.items():
+            count = int(self.trends.count[column])
+            if count < 2:
+                continue
+            slope = float(slopes[column])
+            if r2[column] < MIN_TREND_R2 or slope == 0:
+                patterns.append(f"No clear trend in {name} (r²={r2[column]:.2f})")
+                continue
+            direction = "Increasing" if slope > 0 else "Decreasing"
+            patterns.append(f"{direction} trend detected in {name} (slope {slope:+.4g} per observation, r²={r2[column]:.2f})")
+            insights.append(f"{name} changed by {slope * (count - 1):+.4g} across {count} observations")
+        return patterns, insights
+
+    def _anomaly_result(self) -> Tuple[List[str], List[str]]:
+        patterns, insights = [], []
+        for name, column in self.fields.items():
+            found = int(self.outliers_found[column])
+            if found == 0:
+                continue
+            patterns.append(f"{found} outlier values detected in {name}")
+            score, index, value = self.outlier_examples[column][0]
+            insights.append(f"Largest deviation in {name}: {value:g} at observation {index} (z={score:.1f})")
+        if not patterns and self.fields:
+            patterns.append("No outliers detected")
+        return patterns, insights
+
+    def _correlation_result(self) -> Tuple[List[str], List[str]]:
+        patterns, insights = [], []
+        correlation = self.correlations.correlation()
+        names = sorted(self.fields, key=self.fields.get)
+        ranked = []
+        for i, name_a in enumerate(names):
+            for j in range(i + 1, len(names)):
+                if self.correlations.count[i, j] >= 3:
+                    ranked.append((abs(float(correlation[i, j])), i, j))
+        ranked.sort(key=lambda item: item[0], reverse=True)
+
+        for strength, i, j in ranked:
+            if strength < MIN_CORRELATION:
+                break
+            r = float(correlation[i, j])
+            sign = "positive" if r > 0 else "negative"
+            patterns.append(f"Strong {sign} correlation between {names[i]} and {names[j]} (r={r:.2f})")
+        if ranked:
+            _, i, j = ranked[0]
+            insights.append(f"Most related fields: {names[i]} and {names[j]} over {int(self.correlations.count[i, j])} observations")
+        return patterns, insights
+
+
+def confidence_for(count: int) -> float:
+    """Confidence grows with sample size and saturates at 0.95"""
+    return round(min(0.95, count / (count + 10)), 2)
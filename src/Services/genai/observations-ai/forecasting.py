@@ -0,0 +1,207 @@
+"""
+Holt linear exponential smoothing with a fitted-state cache
+
+Fitting searches smoothing parameters over the whole series once; the
+fitted state is cached per observation series so later requests only
+project it forward by the requested number of days. One smoothing step is
+one observation, so the fitted trend is scaled by the median spacing
+between observation dates when it is projected day by day.
+"""
+
+from collections import OrderedDict, deque
+from datetime import date, timedelta
+from typing import Callable, Deque, Dict, Iterable, List, Optional, Tuple
+import math
+import time
+
+# Points kept per series for fitting
+MAX_HISTORY = 365
+# Series kept; the least recently recorded or forecast is dropped beyond this
+MAX_SERIES = 10_000
+MAX_FORECAST_DAYS = 365
+CACHE_MAX_ENTRIES = 10_000
+CACHE_TTL_SECONDS = 15 * 60
+
+_SMOOTHING_GRID = (0.1, 0.2, 0.3, 0.4, 0.5, 0.6, 0.7, 0.8, 0.9)
+
+
+class HoltState:
+    """Fitted level/trend of one series plus the error statistics used for confidence"""
+
+    __slots__ = ("level", "trend", "alpha", "beta", "last_date", "step_days", "residual_std", "accuracy", "points")
+
+    def __init__(self, level: float, trend: float, alpha: float, beta: float, last_date: date, step_days: float,
+                 residual_std: Optional[float], accuracy: float, points: int):
+        self.level = level
+        # Change per smoothing step, i.e. per observation
+        self.trend = trend
+        self.alpha = alpha
+        self.beta = beta
+        self.last_date = last_date
+        # Median days between observations
+        self.step_days = step_days
+        # None when the series is too short to measure one-step-ahead error
+        self.residual_std = residual_std
+        self.accuracy = accuracy
+        self.points = points
+
+    def project(self, days: int) -> List[Dict[str, object]]:
+        """Roll the fitted state forward one value per day"""
+        scale = max(abs(self.level), 1e-9)
+        predictions = []
+        for day in range(1, days + 1):
+            steps = day / self.step_days
+            if self.residual_std is None:
+                confidence = 0.0
+            else:
+                confidence = 1.0 / (1.0 + self.residual_std * math.sqrt(steps) / scale)
+            predictions.append({
+                "date": (self.last_date + timedelta(days=day)).isoformat(),
+                "value": round(self.level + steps * self.trend, 4),
+                "confidence": round(confidence, 2),
+            })
+        return predictions
+
+
+def _smooth(values: List[float], alpha: float, beta: float) -> Tuple[float, float, float, float]:
+    """Run Holt's recursion and return (level, trend, sse, sum of absolute percentage errors)"""
+    level = values[0]
+    trend = values[1] - values[0]
+    sse = 0.0
+    ape = 0.0
+    for value in values[1:]:
+        forecast = level + trend
+        error = value - forecast
+        sse += error * error
+        if value != 0:
+            ape += abs(error / value)
+        previous_level = level
+        level = alpha * value + (1 - alpha) * forecast
+        trend = beta * (level - previous_level) + (1 - beta) * trend
+    return level, trend, sse, ape
+
+
+def median_spacing(dates: List[date]) -> float:
+    """Median days between consecutive dates; 1 for a single date"""
+    gaps = sorted((later - earlier).days for earlier, later in zip(dates, dates[1:]))
+    if not gaps:
+        return 1.0
+    middle = len(gaps) // 2
+    median = gaps[middle] if len(gaps) % 2 else (gaps[middle - 1] + gaps[middle]) / 2
+    return max(float(median), 1.0)
+
+
+def fit_holt(points: List[Tuple[date, float]]) -> HoltState:
+    """Pick the smoothing parameters with the lowest one-step-ahead squared error"""
+    values = [value for _, value in points]
+    last_date = points[-1][0]
+    step_days = median_spacing([day for day, _ in points])
+    if len(values) < 3:
+        trend = values[-1] - values[0] if len(values) == 2 else 0.0
+        # Nothing is left over to score the fit against, so predictions carry no confidence
+        return HoltState(values[-1], trend, 1.0, 1.0, last_date, step_days, None, 0.0, len(values))
+
+    best = None
+    for alpha in _SMOOTHING_GRID:
+        for beta in _SMOOTHING_GRID:
+            level, trend, sse, ape = _smooth(values, alpha, beta)
+            if best is None or sse < best[0]:
+                best = (sse, ape, alpha, beta, level, trend)
+
+    sse, ape, alpha, beta, level, trend = best
+    steps = len(values) - 1
+    accuracy = max(0.0, 1.0 - ape / steps)
+    return HoltState(level, trend, alpha, beta, last_date, step_days, math.sqrt(sse / steps), round(accuracy, 2),
+                     len(values))
+
+
+class ForecastCache:
+    """LRU of fitted states with a time-to-live per entry"""
+
+    def __init__(self, max_entries: int = CACHE_MAX_ENTRIES, ttl_seconds: float = CACHE_TTL_SECONDS,
+                 clock: Callable[[], float] = time.monotonic):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.clock = clock
+        self._entries: "OrderedDict[int, Tuple[float, HoltState]]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: int) -> Optional[HoltState]:
+        entry = self._entries.get(key)
+        if entry is None or self.clock() - entry[0] > self.ttl_seconds:
+            if entry is not None:
+                del self._entries[key]
+            self.misses += 1
+            return None
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return entry[1]
+
+    def put(self, key: int, state: HoltState):
+        self._entries[key] = (self.clock(), state)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def invalidate(self, key: int):
+        self._entries.pop(key, None)
+
+    def stats(self) -> Dict[str, int]:
+        return {"entries": len(self._entries), "hits": self.hits, "misses": self.misses}
+
+
+class ForecastEngine:
+    """Keeps recent history for the most recently used series and serves forecasts from cached fits"""
+
+    def __init__(self, cache: Optional[ForecastCache] = None, max_history: int = MAX_HISTORY,
+                 max_series: int = MAX_SERIES):
+        self.cache = cache or ForecastCache()
+        self.max_history = max_history
+        self.max_series = max_series
+        self._history: "OrderedDict[int, Deque[Tuple[date, float]]]" = OrderedDict()
+        self.evicted = 0
+
+    def record(self, observation_id: int, points: Iterable[Tuple[date, float]]):
+        """
+        Add new points to a series and invalidate its fitted state. A point for
+        a date already in the series replaces it, so re-recording is harmless.
+        """
+        history = self._history.get(observation_id)
+        if history is None:
+            history = self._history[observation_id] = deque(maxlen=self.max_history)
+            while len(self._history) > self.max_series:
+                evicted, _ = self._history.popitem(last=False)
+                self.invalidate(evicted)
+                self.evicted += 1
+        else:
+            self._history.move_to_end(observation_id)
+        by_date = dict(history)
+        by_date.update(points)
+        merged = sorted(by_date.items(), key=lambda point: point[0])
+        history.clear()
+        history.extend(merged)
+        self.invalidate(observation_id)
+
+    def invalidate(self, observation_id: int):
+        """Drop the cached fit so the next forecast refits from history"""
+        self.cache.invalidate(observation_id)
+
+    def has_series(self, observation_id: int) -> bool:
+        return bool(self._history.get(observation_id))
+
+    def state(self, observation_id: int) -> Optional[HoltState]:
+        """Fitted state for a series, fitting it on a cache miss"""
+        history = self._history.get(observation_id)
+        if not history:
+            return None
+        self._history.move_to_end(observation_id)
+        state = self.cache.get(observation_id)
+        if state is None:
+            state = fit_holt(list(history))
+            self.cache.put(observation_id, state)
+        return state
+
+    def stats(self) -> Dict[str, int]:
+        return {**self.cache.stats(), "series": len(self._history), "max_series": self.max_series,
+                "evicted_series": self.evicted}
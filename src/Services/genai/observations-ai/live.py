@@ -0,0 +1,84 @@
+"""
+Observation state maintained from domain events
+
+Events that carry a numeric value extend the observation's forecast series
+and refit it right away, and events that carry data points are folded into
+running pattern statistics for every analysis type. /api/predictions and
+/api/analyze-patterns/live then only read state that is already current.
+
+Forecast updates are idempotent (a re-delivered point replaces itself);
+pattern statistics rely on the consumer's message-id dedupe window.
+"""
+
+from datetime import date, datetime
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from shared.events import Event
+
+from analysis import ANALYSIS_TYPES, PatternAnalyzer
+from forecasting import ForecastEngine
+
+
+def _as_date(value: Any) -> Optional[date]:
+    if isinstance(value, str) and value:
+        try:
+            return datetime.fromisoformat(value.replace("Z", "+00:00")).date()
+        except ValueError:
+            return None
+    return None
+
+
+def _series_point(data: Dict[str, Any]) -> Optional[Tuple[int, date, float]]:
+    value = data.get("value")
+    if isinstance(value, bool) or not isinstance(value, (int, float)):
+        return None
+    series_id = data.get("observationId", data.get("observation_id", data.get("id")))
+    day = _as_date(data.get("observationDate") or data.get("observation_date"))
+    if series_id is None or day is None:
+        return None
+    return int(series_id), day, float(value)
+
+
+class LiveObservationState:
+    def __init__(self, forecast_engine: ForecastEngine):
+        self.forecast_engine = forecast_engine
+        # Created on first use so numpy stays off the import path
+        self._patterns: Dict[str, PatternAnalyzer] = {}
+        self.events = 0
+        self.series_refits = 0
+
+    def apply_events(self, events: Iterable[Event]) -> int:
+        series: Dict[int, List[Tuple[date, float]]] = {}
+        rows = []
+        for event in events:
+            self.events += 1
+            point = _series_point(event.data)
+            if point is not None:
+                series_id, day, value = point
+                series.setdefault(series_id, []).append((day, value))
+            data_points = event.data.get("dataPoints", event.data.get("data_points"))
+            if isinstance(data_points, dict):
+                rows.append(data_points)
+
+        for series_id, points in series.items():
+            self.forecast_engine.record(series_id, points)
+            self.forecast_engine.state(series_id)
+        self.series_refits += len(series)
+        if rows:
+            for analyzer in self.patterns.values():
+                analyzer.add_many(rows)
+                analyzer.flush()
+        return len(series) + len(rows)
+
+    @property
+    def patterns(self) -> Dict[str, PatternAnalyzer]:
+        if not self._patterns:
+            self._patterns = {analysis_type: PatternAnalyzer(analysis_type) for analysis_type in ANALYSIS_TYPES}
+        return self._patterns
+
+    def analysis(self, analysis_type: str) -> Tuple[List[str], List[str], float]:
+        return self.patterns[analysis_type].result()
+
+    def stats(self) -> Dict[str, int]:
+        return {"events": self.events, "series_refits": self.series_refits,
+                "pattern_observations": self._patterns[ANALYSIS_TYPES[0]].count if self._patterns else 0}
@@ -3,21 +3,69 @@ Observations AI Service - FastAPI application for Gen-AI features
 Integrated with MAPP Observations domain
 """
 
-from fastapi import FastAPI, HTTPException
+from fastapi import FastAPI, HTTPException, Query, Request
 from fastapi.middleware.cors import CORSMiddleware
 from pydantic import BaseModel
 from typing import List, Optional, Dict, Any
-import uvicorn
 import os
-from datetime import datetime
+import sys
+from contextlib import asynccontextmanager
+from datetime import date
+
+# Make the shared GenAI package importable when run from the service directory
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from shared.admission import install_admission, offload
+from shared.config import settings
+from shared.events import EventConsumer, topic_list
+from shared.database import database
+from shared.health import HealthMonitor, database_check, upstream_check
+from shared.http_client import http_clients
+from shared.launcher import serve
+from shared.lazy import warmup
+from shared.metrics import install_metrics, loop_lag_monitor, stage
+from shared.profiling import install_profiling, profiler
+from shared.response_cache import ResponseCache
+from shared.responses import CompressionMiddleware, FastJSONResponse, compression_stats
+
+from analysis import ANALYSIS_TYPES, PatternAnalyzer
+from forecasting import MAX_FORECAST_DAYS, ForecastEngine
+from live import LiveObservationState
+from streaming import StreamFormatError, iter_observations
+from validation import DEFAULT_SUGGESTION, validate_batch
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Create pooled upstream clients on startup and close them on shutdown"""
+    await http_clients.start()
+    await database.start()
+    await health_monitor.start()
+    loop_lag_monitor.start()
+    warmup.start()
+    await event_consumer.start()
+    yield
+    await event_consumer.stop()
+    await warmup.stop()
+    await loop_lag_monitor.stop()
+    await health_monitor.stop()
+    await database.close()
+    await http_clients.close()
 
 # Initialize FastAPI app
 app = FastAPI(
     title="MAPP Observations AI Service",
     description="Gen-AI features for Observations domain",
-    version="1.0.0"
+    version="1.0.0",
+    lifespan=lifespan,
+    default_response_class=FastJSONResponse
 )
 
+# Fair queuing per center and load shedding; installed first so rejections still get CORS headers
+admission = install_admission(app, route_limits={
+    "/api/analyze-patterns": 4,
+    "/api/validate/batch": 8,
+})
+
 # Add CORS middleware
 app.add_middleware(
     CORSMiddleware,
@@ -27,6 +75,51 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# gzip/brotli for large complete responses (batch validation results)
+app.add_middleware(CompressionMiddleware)
+
+# Pattern analysis responses keyed by model name and normalized request content
+patterns_cache = ResponseCache("observations-patterns")
+
+# Fitted forecasting models, cached per observation series
+forecast_engine = ForecastEngine()
+
+# Forecasts and pattern statistics kept current from observation events
+live_state = LiveObservationState(forecast_engine)
+event_consumer = EventConsumer("observations-ai")
+event_consumer.subscribe(topic_list(settings.OBSERVATION_EVENT_TOPICS), live_state.apply_events)
+
+# /health, /health/ready and /health/live answer from a snapshot refreshed in the background
+health_monitor = HealthMonitor(
+    "observations-ai",
+    domain="Observations",
+    dependencies={
+        "observations_api": upstream_check("observations_api") if os.getenv("OBSERVATIONS_API_URL") else None,
+        "database": database_check(),
+    },
+)
+health_monitor.install(app)
+
+# Deferred construction finished in the background once the server is accepting requests
+warmup.register(http_clients.warm)
+warmup.preload("numpy")
+
+# Latency histograms, loop lag and pool gauges on /metrics
+install_metrics(app, pools={
+    "http_clients": http_clients.stats,
+    "database": database.stats,
+    "patterns_cache": patterns_cache.stats,
+    "forecast_cache": forecast_engine.stats,
+    "event_consumer": event_consumer.stats,
+    "live_state": live_state.stats,
+    "compression": compression_stats.stats,
+    "admission": admission.stats,
+    "profiler": profiler.stats,
+})
+
+# Sampled and slow-request stack profiles; /admin/profiles when PROFILE_ADMIN_TOKEN is set
+install_profiling(app)
+
 # Pydantic models
 class DataValidationRequest(BaseModel):
     observation_id: int
@@ -39,6 +132,14 @@ class DataValidationResponse(BaseModel):
     confidence_score: float
     suggestions: List[str]
 
+class BatchValidationRequest(BaseModel):
+    requests: List[DataValidationRequest]
+
+class BatchValidationResponse(BaseModel):
+    results: List[DataValidationResponse]
+    total: int
+    invalid_count: int
+
 class PatternAnalysisRequest(BaseModel):
     observations: List[Dict[str, Any]]
     analysis_type: str = "trend"  # trend, anomaly, correlation
@@ -49,10 +150,12 @@ class PatternAnalysisResponse(BaseModel):
     confidence_score: float
     visualizations: Optional[List[str]] = None
 
-# Health check endpoint
-@app.get("/health")
-async def health_check():
-    return {"status": "healthy", "service": "observations-ai", "timestamp": datetime.utcnow()}
+class SeriesPoint(BaseModel):
+    date: date
+    value: float
+
+class SeriesHistoryRequest(BaseModel):
+    points: List[SeriesPoint]
 
 # Observations AI endpoints
 @app.post("/api/validate", response_model=DataValidationResponse)
@@ -61,90 +164,154 @@ async def validate_observation_data(request: DataValidationRequest):
     Validate observation data using AI-powered analysis
     """
     try:
-        # Mock validation logic - replace with actual AI implementation
-        anomalies = []
-        suggestions = []
-        
-        for key, value in request.data_points.items():
-            if isinstance(value, (int, float)):
-                if value < 0:
-                    anomalies.append(f"Negative value detected for {key}: {value}")
-                    suggestions.append(f"Verify {key} measurement accuracy")
-        
-        is_valid = len(anomalies) == 0
-        
-        return DataValidationResponse(
-            is_valid=is_valid,
+        return FastJSONResponse(build_validation_responses([request])[0])
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error validating data: {str(e)}")
+
+@app.post("/api/validate/batch", response_model=BatchValidationResponse)
+async def validate_observation_data_batch(request: BatchValidationRequest):
+    """
+    Validate many observations in one call using the columnar validation engine
+    """
+    try:
+        if len(request.requests) >= settings.CPU_OFFLOAD_MIN_ITEMS:
+            results = await offload(build_validation_responses, request.requests, preload=("numpy",))
+        else:
+            results = build_validation_responses(request.requests)
+        return FastJSONResponse(BatchValidationResponse(
+            results=results,
+            total=len(results),
+            invalid_count=sum(1 for result in results if not result.is_valid)
+        ))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error validating data: {str(e)}")
+
+def build_validation_responses(requests: List[DataValidationRequest]) -> List[DataValidationResponse]:
+    """Run the validation engine and wrap each result in a response model"""
+    with stage("validate"):
+        results = validate_batch([(r.data_points, r.expected_ranges) for r in requests])
+    return [
+        DataValidationResponse(
+            is_valid=len(anomalies) == 0,
             anomalies=anomalies,
             confidence_score=0.89,
-            suggestions=suggestions if suggestions else ["Data appears normal"]
+            suggestions=suggestions if suggestions else [DEFAULT_SUGGESTION]
         )
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Error validating data: {str(e)}")
+        for anomalies, suggestions in results
+    ]
 
 @app.post("/api/analyze-patterns", response_model=PatternAnalysisResponse)
 async def analyze_patterns(request: PatternAnalysisRequest):
     """
     Analyze patterns in observation data using AI
     """
+    check_analysis_type(request.analysis_type)
     try:
-        # Mock pattern analysis - replace with actual AI implementation
-        patterns = []
-        insights = []
-        
-        if request.analysis_type == "trend":
-            patterns = [
-                "Increasing trend detected in temperature readings",
-                "Seasonal variation pattern identified",
-                "Weekly cyclical behavior observed"
-            ]
-            insights = [
-                "Temperature shows 2°C increase over last month",
-                "Peak values occur on weekends",
-                "Consider environmental factors"
-            ]
-        elif request.analysis_type == "anomaly":
-            patterns = [
-                "3 outlier values detected in dataset",
-                "Unusual spike on 2024-01-15",
-                "Missing data pattern identified"
-            ]
-            insights = [
-                "Outliers may indicate equipment malfunction",
-                "Spike correlates with maintenance activity",
-                "Implement data quality checks"
-            ]
-        
-        return PatternAnalysisResponse(
+        # Fingerprinting a large request costs more than analyzing it, so both leave the loop
+        key = None
+        if len(request.observations) >= settings.CPU_OFFLOAD_MIN_ITEMS:
+            key = await offload(patterns_cache.key_for, request)
+        return FastJSONResponse(await patterns_cache.get_or_compute(
+            request, PatternAnalysisResponse, lambda: build_pattern_analysis(request), key=key
+        ))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error analyzing patterns: {str(e)}")
+
+def check_analysis_type(analysis_type: str):
+    if analysis_type not in ANALYSIS_TYPES:
+        raise HTTPException(status_code=400, detail=f"Unsupported analysis type '{analysis_type}'")
+
+async def build_pattern_analysis(request: PatternAnalysisRequest) -> PatternAnalysisResponse:
+    """Run the pattern analyzer for a cache miss, off the event loop for large requests"""
+    if len(request.observations) >= settings.CPU_OFFLOAD_MIN_ITEMS:
+        patterns, insights, confidence_score = await offload(analyze, request, preload=("numpy",))
+    else:
+        patterns, insights, confidence_score = analyze(request)
+
+    return PatternAnalysisResponse(
+        patterns=patterns,
+        insights=insights,
+        confidence_score=confidence_score
+    )
+
+def analyze(request: PatternAnalysisRequest):
+    with stage("analyze_patterns"):
+        analyzer = PatternAnalyzer(request.analysis_type)
+        analyzer.add_many(request.observations)
+        return analyzer.result()
+
+@app.post("/api/analyze-patterns/stream", response_model=PatternAnalysisResponse)
+async def analyze_patterns_stream(request: Request, analysis_type: str = "trend"):
+    """
+    Analyze patterns over an NDJSON or JSON array body without buffering it.
+    Observations are folded into running statistics as they arrive.
+    """
+    check_analysis_type(analysis_type)
+    analyzer = PatternAnalyzer(analysis_type)
+    try:
+        with stage("parse_stream"):
+            async for observation in iter_observations(request.stream()):
+                analyzer.add(observation)
+    except StreamFormatError as e:
+        raise HTTPException(status_code=400, detail=f"Invalid observation stream: {str(e)}")
+
+    try:
+        patterns, insights, confidence_score = analyzer.result()
+        return FastJSONResponse(PatternAnalysisResponse(
             patterns=patterns,
             insights=insights,
-            confidence_score=0.82,
-            visualizations=["trend_chart.png", "anomaly_plot.png"]
-        )
+            confidence_score=confidence_score
+        ))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error analyzing patterns: {str(e)}")
+
+@app.get("/api/analyze-patterns/live", response_model=PatternAnalysisResponse)
+async def analyze_patterns_live(analysis_type: str = "trend"):
+    """
+    Patterns over every observation received as a domain event, from running statistics
+    """
+    check_analysis_type(analysis_type)
+    try:
+        patterns, insights, confidence_score = live_state.analysis(analysis_type)
+        return FastJSONResponse(PatternAnalysisResponse(
+            patterns=patterns,
+            insights=insights,
+            confidence_score=confidence_score
+        ))
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error analyzing patterns: {str(e)}")
 
 @app.get("/api/predictions/{observation_id}")
-async def get_predictions(observation_id: int, forecast_days: int = 7):
+async def get_predictions(observation_id: int, forecast_days: int = Query(7, ge=1, le=MAX_FORECAST_DAYS)):
     """
     Generate predictions for future observation values
     """
     try:
-        # Mock prediction logic - replace with actual AI implementation
-        return {
-            "observation_id": observation_id,
-            "forecast_period": f"{forecast_days} days",
-            "predictions": [
-                {"date": "2024-01-20", "value": 23.5, "confidence": 0.85},
-                {"date": "2024-01-21", "value": 24.1, "confidence": 0.82},
-                {"date": "2024-01-22", "value": 23.8, "confidence": 0.79}
-            ],
-            "model_accuracy": 0.91,
-            "factors": ["Historical trends", "Seasonal patterns", "External variables"]
-        }
+        state = forecast_engine.state(observation_id)
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error generating predictions: {str(e)}")
+    if state is None:
+        raise HTTPException(status_code=404, detail=f"No history recorded for observation {observation_id}")
+
+    return {
+        "observation_id": observation_id,
+        "forecast_period": f"{forecast_days} days",
+        "predictions": state.project(forecast_days),
+        "model_accuracy": state.accuracy,
+        "factors": ["Historical trends", "Level and trend smoothing"]
+    }
+
+@app.post("/api/predictions/{observation_id}/history")
+async def record_prediction_history(observation_id: int, request: SeriesHistoryRequest):
+    """
+    Record new values for an observation series and invalidate its cached forecast
+    """
+    try:
+        forecast_engine.record(observation_id, [(point.date, point.value) for point in request.points])
+        return {"observation_id": observation_id, "recorded": len(request.points)}
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error recording history: {str(e)}")
 
 if __name__ == "__main__":
     port = int(os.getenv("PORT", 8002))
-    uvicorn.run(app, host="0.0.0.0", port=port)
+    serve(app, port=port)
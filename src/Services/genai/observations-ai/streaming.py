@@ -0,0 +1,65 @@
+"""
+Incremental decoding of observation records from a streamed request body
+"""
+
+from typing import Any, AsyncIterable, AsyncIterator, Dict, List, Tuple
+import codecs
+import json
+
+# Largest single observation accepted before the stream is rejected
+MAX_RECORD_BYTES = 1024 * 1024
+
+_SEPARATORS = " \t\r\n,[]"
+
+
+class StreamFormatError(ValueError):
+    """Raised when the request body is not NDJSON or a JSON array of objects"""
+
+
+async def iter_observations(chunks: AsyncIterable[bytes]) -> AsyncIterator[Dict[str, Any]]:
+    """
+    Yield observation objects from NDJSON, concatenated JSON objects or a
+    top-level JSON array, holding at most one partial record in memory.
+    """
+    decoder = json.JSONDecoder()
+    text_decoder = codecs.getincrementaldecoder("utf-8")()
+    buffer = ""
+
+    async for chunk in chunks:
+        records, buffer = _decode_records(decoder, buffer + text_decoder.decode(chunk))
+        for record in records:
+            yield record
+        if len(buffer) > MAX_RECORD_BYTES:
+            raise StreamFormatError(f"Observation exceeds {MAX_RECORD_BYTES} bytes or is malformed")
+
+    records, buffer = _decode_records(decoder, buffer + text_decoder.decode(b"", final=True))
+    for record in records:
+        yield record
+    if buffer:
+        raise StreamFormatError("Truncated or malformed observation at end of stream")
+
+
+def _decode_records(decoder: json.JSONDecoder, buffer: str) -> Tuple[List[Dict[str, Any]], str]:
+    """Decode every complete record in the buffer and return the unparsed remainder"""
+    records = []
+    position = 0
+    while True:
+        position = _skip_separators(buffer, position)
+        if position == len(buffer):
+            return records, ""
+        try:
+            record, position_after = decoder.raw_decode(buffer, position)
+        except json.JSONDecodeError:
+            # Record continues in the next chunk
+            return records, buffer[position:]
+        if not isinstance(record, dict):
+            raise StreamFormatError(f"Expected a JSON object, got {type(record).__name__}")
+        records.append(record)
+        position = position_after
+
+
+def _skip_separators(buffer: str, position: int) -> int:
+    length = len(buffer)
+    while position < length and buffer[position] in _SEPARATORS:
+        position += 1
+    return position
@@ -0,0 +1,113 @@
+"""
+Columnar validation engine for observation data points
+"""
+
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+import math
+
+from shared.lazy import lazy_import
+
+np = lazy_import("numpy")
+
+DEFAULT_SUGGESTION = "Data appears normal"
+
+# Bit flags raised per data point, emitted in this order
+NEGATIVE = 1
+BELOW_MIN = 2
+ABOVE_MAX = 4
+NOT_NUMERIC = 8
+
+
+class ValidationBatch:
+    """Data points of many validation requests flattened into parallel arrays"""
+
+    __slots__ = ("size", "request_index", "keys", "raw_values", "values",
+                 "numeric", "minimums", "maximums", "has_range")
+
+    def __init__(self, items: Sequence[Tuple[Dict[str, Any], Optional[Dict[str, Dict[str, float]]]]]):
+        request_index: List[int] = []
+        keys: List[str] = []
+        raw_values: List[Any] = []
+        values: List[float] = []
+        numeric: List[bool] = []
+        minimums: List[float] = []
+        maximums: List[float] = []
+        has_range: List[bool] = []
+
+        for index, (data_points, expected_ranges) in enumerate(items):
+            expected_ranges = expected_ranges or {}
+            for key, value in data_points.items():
+                request_index.append(index)
+                keys.append(key)
+                raw_values.append(value)
+
+                is_numeric = isinstance(value, (int, float))
+                numeric.append(is_numeric)
+                values.append(_as_float(value) if is_numeric else math.nan)
+
+                bounds = expected_ranges.get(key)
+                has_range.append(bounds is not None)
+                bounds = bounds or {}
+                minimums.append(bounds.get("min", -math.inf))
+                maximums.append(bounds.get("max", math.inf))
+
+        self.size = len(items)
+        self.request_index = np.asarray(request_index, dtype=np.int64)
+        self.keys = keys
+        self.raw_values = raw_values
+        self.values = np.asarray(values, dtype=np.float64)
+        self.numeric = np.asarray(numeric, dtype=bool)
+        self.minimums = np.asarray(minimums, dtype=np.float64)
+        self.maximums = np.asarray(maximums, dtype=np.float64)
+        self.has_range = np.asarray(has_range, dtype=bool)
+
+    def flags(self) -> "np.ndarray":
+        """Evaluate every rule over all data points in vectorized passes"""
+        flags = np.zeros(len(self.keys), dtype=np.uint8)
+        with np.errstate(invalid="ignore"):
+            flags[self.numeric & (self.values < 0)] |= NEGATIVE
+            flags[self.numeric & (self.values < self.minimums)] |= BELOW_MIN
+            flags[self.numeric & (self.values > self.maximums)] |= ABOVE_MAX
+        flags[~self.numeric & self.has_range] |= NOT_NUMERIC
+        return flags
+
+
+def _as_float(value: Any) -> float:
+    """Convert a numeric value to float, clamping ints too large for float64"""
+    try:
+        return float(value)
+    except OverflowError:
+        return math.inf if value > 0 else -math.inf
+
+
+def validate_batch(
+    items: Sequence[Tuple[Dict[str, Any], Optional[Dict[str, Dict[str, float]]]]]
+) -> List[Tuple[List[str], List[str]]]:
+    """
+    Validate many (data_points, expected_ranges) pairs at once.
+    Returns (anomalies, suggestions) per request, in input order.
+    """
+    batch = ValidationBatch(items)
+    results: List[Tuple[List[str], List[str]]] = [([], []) for _ in range(batch.size)]
+
+    flags = batch.flags()
+    for position in np.flatnonzero(flags).tolist():
+        anomalies, suggestions = results[batch.request_index[position]]
+        key = batch.keys[position]
+        value = batch.raw_values[position]
+        flag = flags[position]
+
+        if flag & NEGATIVE:
+            anomalies.append(f"Negative value detected for {key}: {value}")
+            suggestions.append(f"Verify {key} measurement accuracy")
+        if flag & BELOW_MIN:
+            anomalies.append(f"Value below expected minimum {batch.minimums[position]:g} for {key}: {value}")
+            suggestions.append(f"Check {key} against its expected range")
+        if flag & ABOVE_MAX:
+            anomalies.append(f"Value above expected maximum {batch.maximums[position]:g} for {key}: {value}")
+            suggestions.append(f"Check {key} against its expected range")
+        if flag & NOT_NUMERIC:
+            anomalies.append(f"Non-numeric value for {key}: {value!r}")
+            suggestions.append(f"Record {key} as a number")
+
+    return results
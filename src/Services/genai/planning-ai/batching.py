@@ -0,0 +1,108 @@
+"""
+Micro-batching scheduler for upstream model calls
+
+Concurrent callers submit single items; the scheduler holds them for at most
+MODEL_BATCH_MAX_WAIT_MS (or until MODEL_BATCH_MAX_SIZE items are waiting),
+sends them to the handler as one batch and resolves each caller's future with
+its own result. At most MODEL_MAX_CONCURRENCY batches are in flight at once.
+"""
+
+from typing import Any, Awaitable, Callable, Dict, Generic, List, Optional, Set, Tuple, TypeVar
+import asyncio
+import logging
+
+from shared.config import settings
+
+logger = logging.getLogger(__name__)
+
+ItemT = TypeVar("ItemT")
+ResultT = TypeVar("ResultT")
+
+
+class BatchSizeMismatchError(Exception):
+    """Raised when a handler returns a different number of results than it was given"""
+
+
+class MicroBatcher(Generic[ItemT, ResultT]):
+    """Coalesces concurrent submit() calls into batched handler calls"""
+
+    def __init__(self, handler: Callable[[List[ItemT]], Awaitable[List[ResultT]]],
+                 max_batch_size: Optional[int] = None, max_wait_ms: Optional[float] = None,
+                 max_concurrency: Optional[int] = None):
+        self.handler = handler
+        self.max_batch_size = max_batch_size or settings.MODEL_BATCH_MAX_SIZE
+        self.max_wait = (settings.MODEL_BATCH_MAX_WAIT_MS if max_wait_ms is None else max_wait_ms) / 1000
+        self.max_concurrency = max_concurrency or settings.MODEL_MAX_CONCURRENCY
+        self._pending: List[Tuple[ItemT, asyncio.Future]] = []
+        self._timer: Optional[asyncio.TimerHandle] = None
+        self._semaphore: Optional[asyncio.Semaphore] = None
+        self._tasks: Set[asyncio.Task] = set()
+        self.counters = {"items": 0, "batches": 0, "full_batches": 0, "errors": 0}
+
+    async def submit(self, item: ItemT) -> ResultT:
+        """Queue one item and wait for its result from the batch it lands in"""
+        future = asyncio.get_running_loop().create_future()
+        self._pending.append((item, future))
+        self.counters["items"] += 1
+        if len(self._pending) >= self.max_batch_size:
+            self.counters["full_batches"] += 1
+            self._flush()
+        elif self._timer is None:
+            self._timer = asyncio.get_running_loop().call_later(self.max_wait, self._flush)
+        return await future
+
+    async def close(self):
+        """Send whatever is still waiting and let in-flight batches finish"""
+        self._flush()
+        if self._tasks:
+            await asyncio.gather(*self._tasks, return_exceptions=True)
+
+    def stats(self) -> Dict[str, Any]:
+        batches = self.counters["batches"]
+        return {
+            **self.counters,
+            "pending": len(self._pending),
+            "in_flight_batches": len(self._tasks),
+            "avg_batch_size": round(self.counters["items"] / batches, 2) if batches else 0.0,
+            "max_batch_size": self.max_batch_size,
+            "max_wait_ms": self.max_wait * 1000,
+            "max_concurrency": self.max_concurrency,
+        }
+
+    def _flush(self):
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        while self._pending:
+            batch = self._pending[:self.max_batch_size]
+            del self._pending[:self.max_batch_size]
+            # Skip callers that were cancelled while waiting
+            batch = [(item, future) for item, future in batch if not future.done()]
+            if not batch:
+                continue
+            task = asyncio.get_running_loop().create_task(self._run(batch))
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+
+    async def _run(self, batch: List[Tuple[ItemT, asyncio.Future]]):
+        if self._semaphore is None:
+            # Created lazily so the semaphore binds to the running loop
+            self._semaphore = asyncio.Semaphore(self.max_concurrency)
+        async with self._semaphore:
+            self.counters["batches"] += 1
+            try:
+                results = await self.handler([item for item, _ in batch])
+                if len(results) != len(batch):
+                    raise BatchSizeMismatchError(
+                        f"Handler returned {len(results)} results for {len(batch)} items"
+                    )
+            except Exception as e:
+                self.counters["errors"] += 1
+                logger.warning("Batched model call failed for %d items", len(batch), exc_info=True)
+                for _, future in batch:
+                    if not future.done():
+                        future.set_exception(e)
+                return
+            for (_, future), result in zip(batch, results):
+                if not future.done():
+                    future.set_result(result)
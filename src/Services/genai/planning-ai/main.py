@@ -6,19 +6,72 @@ Integrated with MAPP Planning domain
 from fastapi import FastAPI, HTTPException, Depends
 from fastapi.middleware.cors import CORSMiddleware
 from pydantic import BaseModel
-from typing import List, Optional
-import uvicorn
+from typing import Any, Dict, List, Optional
+import asyncio
 import os
-import time
-from datetime import datetime
+import sys
+from contextlib import asynccontextmanager
+
+# Make the shared GenAI package importable when run from the service directory
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from shared.admission import install_admission, offload
+from shared.config import settings
+from shared.database import PoolTimeoutError, database
+from shared.health import HealthMonitor, database_check, upstream_check
+from shared.http_client import http_clients
+from shared.launcher import serve
+from shared.lazy import lazy_import, warmup
+from shared.metrics import install_metrics, loop_lag_monitor
+from shared.profiling import install_profiling, profiler
+from shared.repositories import PlanRepository
+from shared.response_cache import ResponseCache
+from shared.responses import CompressionMiddleware, FastJSONResponse, compression_stats
+
+from batching import MicroBatcher
+from model_client import ModelClient, completion_lines
+from scheduling import CycleError, InfeasibleError, optimize_items
+from scoring import CANCELLED, COMPLETED, PlanScorer
+
+# Only needed to classify upstream failures, so importing the service stays cheap
+httpx = lazy_import("httpx")
+
+# Plans at least this large are scheduled on the shared CPU executor
+SCHEDULE_OFFLOAD_ITEMS = 2000
+# Concurrent Planning API reads when plans cannot be batch-loaded from the database
+PLAN_FETCH_CONCURRENCY = 16
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Create pooled upstream clients on startup; drain model batches and close them on shutdown"""
+    await http_clients.start()
+    await database.start()
+    await health_monitor.start()
+    loop_lag_monitor.start()
+    warmup.start()
+    yield
+    await warmup.stop()
+    await loop_lag_monitor.stop()
+    await health_monitor.stop()
+    await model_batcher.close()
+    await database.close()
+    await http_clients.close()
 
 # Initialize FastAPI app
 app = FastAPI(
     title="MAPP Planning AI Service",
     description="Gen-AI features for Planning domain",
-    version="1.0.0"
+    version="1.0.0",
+    lifespan=lifespan,
+    default_response_class=FastJSONResponse
 )
 
+# Fair queuing per center and load shedding; installed first so rejections still get CORS headers
+admission = install_admission(app, route_limits={
+    "/api/optimize": 4,
+    "/api/analytics/batch": 8,
+})
+
 # Add CORS middleware
 app.add_middleware(
     CORSMiddleware,
@@ -28,6 +81,91 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# gzip/brotli for large complete responses (schedules, analytics batches)
+app.add_middleware(CompressionMiddleware)
+
+# Responses keyed by model name and normalized request content
+suggestions_cache = ResponseCache("planning-suggestions")
+
+# Concurrent suggestion and optimization prompts share batched model calls
+model_client = ModelClient()
+model_batcher = MicroBatcher(model_client.complete)
+
+# Plan data for completion scoring: batched from the database when configured, else the Planning API
+plan_repository = PlanRepository(database)
+
+async def load_plans(plan_ids: List[int]) -> List[Dict[str, Any]]:
+    if database.started:
+        return await plan_repository.with_items(plan_ids)
+    semaphore = asyncio.Semaphore(PLAN_FETCH_CONCURRENCY)
+
+    async def fetch(plan_id: int) -> Optional[Dict[str, Any]]:
+        async with semaphore:
+            response = await http_clients.get("planning_api", f"/api/plans/{plan_id}")
+        if response.status_code == 404:
+            return None
+        response.raise_for_status()
+        return response.json()
+
+    plans = await asyncio.gather(*(fetch(plan_id) for plan_id in plan_ids))
+    return [plan for plan in plans if plan is not None]
+
+def analytics_error(e: Exception) -> HTTPException:
+    """503 when plan data cannot be reached, 502 when the Planning API answers with an error, else 500"""
+    if isinstance(e, (httpx.TransportError, PoolTimeoutError)):
+        return HTTPException(status_code=503, detail=f"Plan data unavailable: {str(e)}", headers={"Retry-After": "5"})
+    if isinstance(e, httpx.HTTPStatusError):
+        return HTTPException(status_code=502, detail=f"Planning API error: {str(e)}")
+    return HTTPException(status_code=500, detail=f"Error generating analytics: {str(e)}")
+
+async def load_completion_history():
+    """Seed owner and similar-plan completion rates from finished plans"""
+    if not database.started:
+        return
+    for status in (COMPLETED, CANCELLED):
+        batch = []
+        async for plan in plan_repository.stream(status=status):
+            batch.append(plan)
+            if len(batch) >= 1000:
+                plan_scorer.history.observe(batch)
+                batch = []
+        plan_scorer.history.observe(batch)
+
+# Feature rows cached per plan; a dashboard's plans are scored in one model call
+plan_scorer = PlanScorer(load_plans)
+
+# /health, /health/ready and /health/live answer from a snapshot refreshed in the background
+health_monitor = HealthMonitor(
+    "planning-ai",
+    domain="Planning",
+    dependencies={
+        "planning_api": upstream_check("planning_api") if os.getenv("PLANNING_API_URL") else None,
+        "database": database_check(),
+    },
+    details={"http_pools": http_clients.stats, "model_batching": model_batcher.stats},
+)
+health_monitor.install(app)
+
+# Deferred construction finished in the background once the server is accepting requests
+warmup.register(http_clients.warm)
+warmup.preload("numpy")
+warmup.register(load_completion_history)
+
+# Latency histograms, loop lag and pool gauges on /metrics
+install_metrics(app, pools={
+    "http_clients": http_clients.stats,
+    "database": database.stats,
+    "model_batcher": model_batcher.stats,
+    "suggestions_cache": suggestions_cache.stats,
+    "plan_scorer": plan_scorer.stats,
+    "compression": compression_stats.stats,
+    "admission": admission.stats,
+    "profiler": profiler.stats,
+})
+
+# Sampled and slow-request stack profiles; /admin/profiles when PROFILE_ADMIN_TOKEN is set
+install_profiling(app)
+
 # Pydantic models
 class PlanSuggestionRequest(BaseModel):
     title: str
@@ -49,102 +187,21 @@ class PlanOptimizationResponse(BaseModel):
     optimized_items: List[str]
     recommendations: List[str]
     efficiency_score: float
+    critical_path: List[str] = []
+    parallel_groups: List[List[str]] = []
+    schedule: List[Dict[str, Any]] = []
+    total_duration: Optional[float] = None
+    critical_path_duration: Optional[float] = None
+    unparsed_constraints: List[str] = []
 
-# Health check endpoints
-@app.get("/health")
-async def health_check():
-    """Comprehensive health check for Planning AI service"""
-    try:
-        health_data = {
-            "status": "healthy",
-            "service": "planning-ai",
-            "domain": "Planning",
-            "timestamp": datetime.utcnow().isoformat(),
-            "version": "1.0.0",
-            "environment": os.getenv("ENVIRONMENT", "development"),
-            "checks": {
-                "api_responsive": True,
-                "memory_usage_mb": get_memory_usage(),
-                "uptime_seconds": get_uptime(),
-                "dependencies": await check_dependencies()
-            }
-        }
-
-        # Check if any critical issues
-        has_issues = any(
-            check_name.endswith("_error") or check_name.endswith("_failed")
-            for check_name in health_data["checks"].keys()
-        )
-
-        if has_issues:
-            health_data["status"] = "degraded"
-
-        return health_data
-    except Exception as e:
-        return {
-            "status": "unhealthy",
-            "service": "planning-ai",
-            "timestamp": datetime.utcnow().isoformat(),
-            "error": str(e)
-        }
-
-@app.get("/health/ready")
-async def readiness_check():
-    """Readiness probe for Kubernetes/container orchestration"""
-    return {"status": "ready", "service": "planning-ai"}
-
-@app.get("/health/live")
-async def liveness_check():
-    """Liveness probe for Kubernetes/container orchestration"""
-    return {"status": "alive", "service": "planning-ai"}
-
-def get_memory_usage():
-    """Get current memory usage in MB"""
-    import psutil
-    try:
-        process = psutil.Process()
-        return round(process.memory_info().rss / 1024 / 1024, 2)
-    except:
-        return "unknown"
-
-def get_uptime():
-    """Get service uptime in seconds"""
-    try:
-        import psutil
-        process = psutil.Process()
-        return round(time.time() - process.create_time(), 2)
-    except:
-        return "unknown"
-
-async def check_dependencies():
-    """Check external dependencies"""
-    dependencies = {}
-
-    # Check Planning API connectivity
-    planning_api_url = os.getenv("PLANNING_API_URL")
-    if planning_api_url:
-        try:
-            import httpx
-            async with httpx.AsyncClient(timeout=5.0) as client:
-                response = await client.get(f"{planning_api_url}/health")
-                dependencies["planning_api"] = "healthy" if response.status_code == 200 else "degraded"
-        except Exception as e:
-            dependencies["planning_api"] = f"error: {str(e)}"
-    else:
-        dependencies["planning_api"] = "not_configured"
-
-    # Check database connectivity if configured
-    db_url = os.getenv("DATABASE_URL")
-    if db_url:
-        try:
-            # Add database connectivity check here if needed
-            dependencies["database"] = "not_implemented"
-        except Exception as e:
-            dependencies["database"] = f"error: {str(e)}"
-    else:
-        dependencies["database"] = "not_configured"
+class PlanAnalyticsBatchRequest(BaseModel):
+    plan_ids: List[int]
+    # Plan payloads the caller already holds (PlanBriefDto, or plans with items); loaded otherwise
+    plans: Optional[List[Dict[str, Any]]] = None
 
-    return dependencies
+class PlanAnalyticsBatchResponse(BaseModel):
+    results: List[Dict[str, Any]]
+    missing: List[int]
 
 # Planning AI endpoints
 @app.post("/api/suggestions", response_model=PlanSuggestionResponse)
@@ -153,51 +210,90 @@ async def generate_plan_suggestions(request: PlanSuggestionRequest):
     Generate AI-powered plan suggestions based on title and context
     """
     try:
-        # Mock AI logic - replace with actual AI implementation
+        return FastJSONResponse(await suggestions_cache.get_or_compute(
+            request, PlanSuggestionResponse, lambda: build_plan_suggestions(request)
+        ))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error generating suggestions: {str(e)}")
+
+async def build_plan_suggestions(request: PlanSuggestionRequest) -> PlanSuggestionResponse:
+    """Produce suggestions for a cache miss"""
+    if model_client.configured:
+        suggestions = completion_lines(await model_batcher.submit(suggestion_prompt(request)))
+    else:
+        # Mock AI logic used when no MODEL_API_URL is configured
         suggestions = [
             f"Break down '{request.title}' into smaller, manageable tasks",
             "Set clear milestones and deadlines",
             "Identify potential risks and mitigation strategies",
             "Allocate resources and assign responsibilities"
         ]
-        
-        if request.context:
-            suggestions.append(f"Consider context: {request.context}")
-        
-        return PlanSuggestionResponse(
-            suggestions=suggestions,
-            estimated_duration="2-4 weeks",
-            priority_recommendation=2,  # Medium priority
-            confidence_score=0.85
-        )
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Error generating suggestions: {str(e)}")
+    
+    if request.context:
+        suggestions.append(f"Consider context: {request.context}")
+    
+    return PlanSuggestionResponse(
+        suggestions=suggestions,
+        estimated_duration="2-4 weeks",
+        priority_recommendation=2,  # Medium priority
+        confidence_score=0.85
+    )
+
+def suggestion_prompt(request: PlanSuggestionRequest) -> str:
+    lines = [
+        "Suggest concrete next steps for an early years learning plan, one per line.",
+        f"Title: {request.title}",
+    ]
+    if request.description:
+        lines.append(f"Description: {request.description}")
+    if request.context:
+        lines.append(f"Context: {request.context}")
+    return "\n".join(lines) + "\nSteps:\n"
+
+def optimization_prompt(items: List[str]) -> str:
+    lines = [
+        "Rewrite these plan items so they are clearer. Keep the order and write exactly one line per item.",
+        *(f"- {item}" for item in items),
+    ]
+    return "\n".join(lines) + "\nRewritten items:\n"
 
 @app.post("/api/optimize", response_model=PlanOptimizationResponse)
 async def optimize_plan(request: PlanOptimizationRequest):
     """
-    Optimize existing plan items using AI
+    Optimize existing plan items: order them by their dependency graph,
+    find the critical path and parallel groups, and schedule them under the
+    resource constraints
     """
     try:
-        # Mock optimization logic - replace with actual AI implementation
-        optimized_items = []
-        for item in request.current_items:
-            optimized_items.append(f"Optimized: {item}")
-        
-        recommendations = [
-            "Consider parallel execution of independent tasks",
-            "Identify critical path dependencies",
-            "Optimize resource allocation"
-        ]
-        
-        if request.constraints:
-            recommendations.append(f"Applied constraints: {', '.join(request.constraints)}")
-        
-        return PlanOptimizationResponse(
+        if len(request.current_items) >= SCHEDULE_OFFLOAD_ITEMS:
+            # Large plans are scheduled off the event loop
+            result = await offload(optimize_items, request.current_items, request.constraints)
+        else:
+            result = optimize_items(request.current_items, request.constraints)
+        titles = result.graph.titles
+        ordered = [titles[i] for i in result.order]
+
+        optimized_items = ordered
+        if model_client.configured and ordered:
+            rewritten = completion_lines(await model_batcher.submit(optimization_prompt(ordered)))
+            # Keep the schedule's order; only take the rewording when it maps one-to-one
+            if len(rewritten) == len(ordered):
+                optimized_items = rewritten
+
+        # Built from the scheduler's own lists, so skip validating every schedule entry
+        return FastJSONResponse(PlanOptimizationResponse.model_construct(
             optimized_items=optimized_items,
-            recommendations=recommendations,
-            efficiency_score=0.92
-        )
+            recommendations=result.recommendations(),
+            efficiency_score=result.efficiency,
+            critical_path=[titles[i] for i in result.analysis.critical_path],
+            parallel_groups=[[titles[i] for i in group] for group in result.analysis.groups],
+            schedule=result.schedule(),
+            total_duration=result.makespan,
+            critical_path_duration=result.analysis.length,
+            unparsed_constraints=result.unparsed,
+        ))
+    except (CycleError, InfeasibleError) as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error optimizing plan: {str(e)}")
 
@@ -207,20 +303,27 @@ async def get_plan_analytics(plan_id: int):
     Get AI-powered analytics for a specific plan
     """
     try:
-        # Mock analytics - replace with actual AI implementation
-        return {
-            "plan_id": plan_id,
-            "completion_probability": 0.78,
-            "risk_factors": ["Resource constraints", "Timeline pressure"],
-            "success_indicators": ["Clear milestones", "Engaged team"],
-            "recommendations": [
-                "Add buffer time for critical tasks",
-                "Increase communication frequency"
-            ]
-        }
+        results, _ = await plan_scorer.score([plan_id])
+    except Exception as e:
+        raise analytics_error(e)
+    if not results:
+        raise HTTPException(status_code=404, detail=f"Plan {plan_id} not found")
+    return FastJSONResponse(results[0])
+
+@app.post("/api/analytics/batch", response_model=PlanAnalyticsBatchResponse)
+async def get_plan_analytics_batch(request: PlanAnalyticsBatchRequest):
+    """
+    Analytics for many plans in one call (e.g. every plan on a center dashboard)
+    """
+    if len(request.plan_ids) > settings.ANALYTICS_BATCH_MAX_PLANS:
+        raise HTTPException(status_code=400,
+                            detail=f"At most {settings.ANALYTICS_BATCH_MAX_PLANS} plans per request")
+    try:
+        results, missing = await plan_scorer.score(request.plan_ids, request.plans)
+        return FastJSONResponse(PlanAnalyticsBatchResponse.model_construct(results=results, missing=missing))
     except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Error generating analytics: {str(e)}")
+        raise analytics_error(e)
 
 if __name__ == "__main__":
     port = int(os.getenv("PORT", 8001))
-    uvicorn.run(app, host="0.0.0.0", port=port)
+    serve(app, port=port)
@@ -0,0 +1,61 @@
+"""
+Client for the completion model behind the planning endpoints
+
+Talks to an OpenAI-compatible /v1/completions endpoint at MODEL_API_URL,
+which accepts a list of prompts in one request, so a micro-batch is a
+single upstream call.
+"""
+
+from typing import List, Optional
+
+from shared.config import settings
+from shared.http_client import HttpClientManager, http_clients
+from shared.metrics import stage
+
+MODEL_UPSTREAM = "model_api"
+COMPLETIONS_PATH = "/v1/completions"
+MAX_TOKENS = 256
+
+
+class ModelClient:
+    def __init__(self, clients: HttpClientManager = http_clients, upstream: str = MODEL_UPSTREAM,
+                 model_name: Optional[str] = None, api_key: Optional[str] = None):
+        self.clients = clients
+        self.upstream = upstream
+        self.model_name = model_name or settings.MODEL_NAME
+        self.api_key = api_key if api_key is not None else settings.OPENAI_API_KEY
+
+    @property
+    def configured(self) -> bool:
+        return self.upstream in self.clients.upstreams
+
+    @stage("model_call")
+    async def complete(self, prompts: List[str]) -> List[str]:
+        """Complete every prompt in one request; results are in prompt order"""
+        headers = {"Authorization": f"Bearer {self.api_key}"} if self.api_key else None
+        response = await self.clients.post(
+            self.upstream,
+            COMPLETIONS_PATH,
+            json={"model": self.model_name, "prompt": prompts, "max_tokens": MAX_TOKENS},
+            headers=headers,
+        )
+        response.raise_for_status()
+        texts = [""] * len(prompts)
+        for choice in response.json().get("choices", []):
+            index = choice.get("index", 0)
+            if 0 <= index < len(texts):
+                texts[index] = choice.get("text", "")
+        return texts
+
+
+def completion_lines(text: str) -> List[str]:
+    """Split a completion into list items, dropping bullets and numbering"""
+    lines = []
+    for line in text.splitlines():
+        line = line.strip().lstrip("-*•").strip()
+        head, _, rest = line.partition(". ")
+        if head.isdigit() and rest:
+            line = rest.strip()
+        if line:
+            lines.append(line)
+    return lines
@@ -0,0 +1,395 @@
+"""
+Dependency graph and critical-path scheduling for plan items
+
+/api/optimize builds a DAG from the plan's items and its constraint lines,
+then orders it topologically, computes the critical path (earliest/latest
+start and slack for every item), groups items that can run side by side,
+and schedules the items under resource capacities. The analysis is linear
+in items plus dependencies; the resource-constrained schedule adds heap
+operations per start and per wait on a resource.
+
+Constraints are plain sentences; items are referenced by title
+(case-insensitive) or by 1-based position ("#3" or "3"):
+
+  A before B    B after A    B depends on A    B requires A    A -> B -> C
+  A takes 3 days             (duration; items default to 1 day)
+  A uses teacher             A uses 2 rooms    (resource demand)
+  teacher capacity 2         (units of a resource available at once)
+  max 3 parallel             (items in progress at any time)
+"""
+
+from typing import Dict, List, Optional, Sequence, Tuple
+from collections import deque
+import heapq
+import re
+
+DEFAULT_DURATION = 1.0
+# Implicit resource every item uses one unit of, limited by "max N parallel"
+PARALLEL = "parallel"
+
+_NUMBER = r"(\d+(?:\.\d+)?)"
+_ARROW = re.compile(r"\s*(?:->|→)\s*")
+_BEFORE = re.compile(r"^(.+?)\s+(?:before|precedes)\s+(.+)$", re.IGNORECASE)
+_AFTER = re.compile(r"^(.+?)\s+(?:after|depends on|requires|needs|follows)\s+(.+)$", re.IGNORECASE)
+_TAKES = re.compile(rf"^(.+?)\s+takes\s+{_NUMBER}\s*(?:days?|d)?$", re.IGNORECASE)
+_USES = re.compile(rf"^(.+?)\s+uses\s+(?:{_NUMBER}\s+)?([\w-]+)$", re.IGNORECASE)
+_CAPACITY = re.compile(rf"^([\w-]+)\s+capacity\s+{_NUMBER}$", re.IGNORECASE)
+_MAX_PARALLEL = re.compile(rf"^(?:max|maximum|at most)\s+{_NUMBER}\s+(?:parallel|concurrent|at a time)$",
+                           re.IGNORECASE)
+_WHITESPACE = re.compile(r"\s+")
+
+
+class CycleError(ValueError):
+    """Raised when the dependencies loop back on themselves"""
+
+
+class InfeasibleError(ValueError):
+    """Raised when an item needs more of a resource than its capacity"""
+
+
+def _normalize(title: str) -> str:
+    return _WHITESPACE.sub(" ", title).strip().strip("\"'").lower()
+
+
+class PlanGraph:
+    """Items as integer nodes with adjacency lists, durations and resource demands"""
+
+    def __init__(self, titles: Sequence[str]):
+        self.titles = list(titles)
+        size = len(self.titles)
+        self.durations = [DEFAULT_DURATION] * size
+        self.successors: List[List[int]] = [[] for _ in range(size)]
+        self.predecessors: List[List[int]] = [[] for _ in range(size)]
+        self.demands: List[Optional[Dict[str, float]]] = [None] * size
+        self.capacity: Dict[str, float] = {}
+        self.edges = 0
+        self._edge_set = set()
+        self._index: Dict[str, int] = {}
+        for index, title in enumerate(self.titles):
+            self._index.setdefault(_normalize(title), index)
+
+    def __len__(self) -> int:
+        return len(self.titles)
+
+    def resolve(self, reference: str) -> Optional[int]:
+        """Item index for a title or a 1-based position"""
+        key = _normalize(reference)
+        index = self._index.get(key)
+        if index is not None:
+            return index
+        position = key[1:] if key.startswith("#") else key
+        if position.isdigit() and 1 <= int(position) <= len(self.titles):
+            return int(position) - 1
+        return None
+
+    def add_dependency(self, before: int, after: int):
+        if before == after:
+            raise CycleError(f"'{self.titles[before]}' cannot depend on itself")
+        if (before, after) in self._edge_set:
+            return
+        self._edge_set.add((before, after))
+        self.successors[before].append(after)
+        self.predecessors[after].append(before)
+        self.edges += 1
+
+    def add_demand(self, index: int, resource: str, amount: float):
+        demand = self.demands[index]
+        if demand is None:
+            demand = self.demands[index] = {}
+        demand[resource] = demand.get(resource, 0.0) + amount
+
+    def demand(self, index: int) -> Dict[str, float]:
+        demand = self.demands[index] or {}
+        if PARALLEL in self.capacity:
+            return {PARALLEL: 1.0, **demand}
+        return demand
+
+    # Analysis
+
+    def topological_order(self) -> List[int]:
+        """Kahn's algorithm; ties keep the original item order"""
+        remaining = [len(predecessors) for predecessors in self.predecessors]
+        ready = deque(index for index, count in enumerate(remaining) if count == 0)
+        order = []
+        while ready:
+            index = ready.popleft()
+            order.append(index)
+            for successor in self.successors[index]:
+                remaining[successor] -= 1
+                if remaining[successor] == 0:
+                    ready.append(successor)
+        if len(order) < len(self.titles):
+            raise CycleError("Dependency cycle: " + " -> ".join(self.titles[i] for i in self._cycle(remaining)))
+        return order
+
+    def _cycle(self, remaining: List[int]) -> List[int]:
+        """One concrete cycle among the items Kahn's algorithm could not order"""
+        node = next(index for index, count in enumerate(remaining) if count > 0)
+        seen: Dict[int, int] = {}
+        path = []
+        while node not in seen:
+            seen[node] = len(path)
+            path.append(node)
+            node = next(p for p in self.predecessors[node] if remaining[p] > 0)
+        cycle = path[seen[node]:]
+        cycle.reverse()
+        return cycle + cycle[:1]
+
+    def analyze(self) -> "PlanAnalysis":
+        """Critical path method: forward and backward pass over the topological order"""
+        order = self.topological_order()
+        size = len(self.titles)
+        durations = self.durations
+        earliest_start = [0.0] * size
+        level = [0] * size
+        for index in order:
+            finish = earliest_start[index] + durations[index]
+            for successor in self.successors[index]:
+                if finish > earliest_start[successor]:
+                    earliest_start[successor] = finish
+                if level[index] + 1 > level[successor]:
+                    level[successor] = level[index] + 1
+        length = max((earliest_start[i] + durations[i] for i in range(size)), default=0.0)
+
+        latest_finish = [length] * size
+        for index in reversed(order):
+            start = latest_finish[index] - durations[index]
+            for predecessor in self.predecessors[index]:
+                if start < latest_finish[predecessor]:
+                    latest_finish[predecessor] = start
+        latest_start = [latest_finish[i] - durations[i] for i in range(size)]
+        slack = [latest_start[i] - earliest_start[i] for i in range(size)]
+
+        # Walk back from the last item to finish along zero-slack predecessors that end exactly at its start
+        path: List[int] = []
+        if size:
+            node: Optional[int] = max(range(size), key=lambda i: (earliest_start[i] + durations[i], -i))
+            while node is not None:
+                path.append(node)
+                node = next((p for p in self.predecessors[node]
+                             if abs(slack[p]) < 1e-9
+                             and abs(earliest_start[p] + durations[p] - earliest_start[node]) < 1e-9), None)
+            path.reverse()
+
+        groups: List[List[int]] = [[] for _ in range(max(level, default=-1) + 1)]
+        for index in order:
+            groups[level[index]].append(index)
+        return PlanAnalysis(order, earliest_start, latest_start, slack, path, length, groups)
+
+    def schedule(self, analysis: "PlanAnalysis") -> Tuple[List[float], float]:
+        """
+        Resource-constrained list scheduling. Whenever items finish, ready
+        items are started in order of latest start (least slack first) as long
+        as every resource they use has capacity left. An item that does not
+        fit waits on the resource it lacks and is only reconsidered once that
+        resource is released, so a long queue behind a scarce resource is not
+        rescanned at every step. Without capacities this reproduces the
+        earliest-start schedule.
+        """
+        size = len(self.titles)
+        if not self.capacity:
+            return list(analysis.earliest_start), analysis.length
+        demands = [{resource: amount for resource, amount in self.demand(i).items() if resource in self.capacity}
+                   for i in range(size)]
+        for index, demand in enumerate(demands):
+            for resource, amount in demand.items():
+                if amount > self.capacity[resource]:
+                    raise InfeasibleError(f"'{self.titles[index]}' needs {amount:g} {resource} "
+                                          f"but capacity is {self.capacity[resource]:g}")
+
+        latest_start = analysis.latest_start
+        available = dict(self.capacity)
+        blocked: Dict[str, List[Tuple[float, int]]] = {resource: [] for resource in self.capacity}
+        remaining = [len(predecessors) for predecessors in self.predecessors]
+        candidates = [(latest_start[i], i, None) for i in range(size) if remaining[i] == 0]
+        released: set = set()
+        running: List[Tuple[float, int]] = []
+        starts = [0.0] * size
+        now = 0.0
+        while True:
+            # Newly ready items plus the best waiter of every resource that got capacity back
+            for resource in released:
+                if blocked[resource]:
+                    priority, index = heapq.heappop(blocked[resource])
+                    candidates.append((priority, index, resource))
+            heapq.heapify(candidates)
+            while candidates:
+                priority, index, source = heapq.heappop(candidates)
+                lacking = next((resource for resource, amount in demands[index].items()
+                                if available[resource] < amount - 1e-9), None)
+                if lacking is None:
+                    for resource, amount in demands[index].items():
+                        available[resource] -= amount
+                    starts[index] = now
+                    heapq.heappush(running, (now + self.durations[index], index))
+                else:
+                    heapq.heappush(blocked[lacking], (priority, index))
+                # Keep drawing waiters of the source resource while it has room for them
+                if source is not None and lacking != source and blocked[source] and available[source] > 1e-9:
+                    next_priority, next_index = heapq.heappop(blocked[source])
+                    heapq.heappush(candidates, (next_priority, next_index, source))
+
+            if not running:
+                break
+            now, index = heapq.heappop(running)
+            finished = [index]
+            while running and running[0][0] <= now:
+                finished.append(heapq.heappop(running)[1])
+            released = set()
+            for index in finished:
+                for resource, amount in demands[index].items():
+                    available[resource] += amount
+                    released.add(resource)
+                for successor in self.successors[index]:
+                    remaining[successor] -= 1
+                    if remaining[successor] == 0:
+                        candidates.append((latest_start[successor], successor, None))
+        return starts, max((starts[i] + self.durations[i] for i in range(size)), default=0.0)
+
+    def utilization(self, makespan: float) -> Dict[str, float]:
+        """Share of each capacity used over the schedule"""
+        if makespan <= 0:
+            return {}
+        used = {resource: 0.0 for resource in self.capacity}
+        for index in range(len(self.titles)):
+            for resource, amount in self.demand(index).items():
+                if resource in used:
+                    used[resource] += amount * self.durations[index]
+        return {resource: total / (self.capacity[resource] * makespan) for resource, total in used.items()}
+
+
+class PlanAnalysis:
+    __slots__ = ("order", "earliest_start", "latest_start", "slack", "critical_path", "length", "groups")
+
+    def __init__(self, order: List[int], earliest_start: List[float], latest_start: List[float],
+                 slack: List[float], critical_path: List[int], length: float, groups: List[List[int]]):
+        self.order = order
+        self.earliest_start = earliest_start
+        self.latest_start = latest_start
+        self.slack = slack
+        self.critical_path = critical_path
+        self.length = length
+        self.groups = groups
+
+
+def build_graph(items: Sequence[str], constraints: Optional[Sequence[str]] = None) -> Tuple[PlanGraph, List[str]]:
+    """The plan graph plus the constraint lines that could not be understood"""
+    graph = PlanGraph(items)
+    unparsed = []
+    for constraint in constraints or []:
+        if not _apply_constraint(graph, constraint.strip().rstrip(".")):
+            unparsed.append(constraint)
+    return graph, unparsed
+
+
+def _apply_constraint(graph: PlanGraph, text: str) -> bool:
+    parts = _ARROW.split(text)
+    if len(parts) > 1:
+        indexes = [graph.resolve(part) for part in parts]
+        if None in indexes:
+            return False
+        for before, after in zip(indexes, indexes[1:]):
+            graph.add_dependency(before, after)
+        return True
+
+    for pattern, first_is_before in ((_BEFORE, True), (_AFTER, False)):
+        match = pattern.match(text)
+        if match:
+            first, second = graph.resolve(match.group(1)), graph.resolve(match.group(2))
+            if first is not None and second is not None:
+                graph.add_dependency(first, second) if first_is_before else graph.add_dependency(second, first)
+                return True
+
+    match = _TAKES.match(text)
+    if match and graph.resolve(match.group(1)) is not None:
+        graph.durations[graph.resolve(match.group(1))] = float(match.group(2))
+        return True
+    match = _USES.match(text)
+    if match and graph.resolve(match.group(1)) is not None:
+        graph.add_demand(graph.resolve(match.group(1)), match.group(3).lower(), float(match.group(2) or 1))
+        return True
+    match = _CAPACITY.match(text)
+    if match:
+        graph.capacity[match.group(1).lower()] = float(match.group(2))
+        return True
+    match = _MAX_PARALLEL.match(text)
+    if match:
+        graph.capacity[PARALLEL] = float(match.group(1))
+        return True
+    return False
+
+
+class PlanOptimization:
+    """Scheduled plan: item order, per-item timing and the derived recommendations"""
+
+    __slots__ = ("graph", "analysis", "starts", "makespan", "unparsed")
+
+    def __init__(self, graph: PlanGraph, analysis: PlanAnalysis, starts: List[float], makespan: float,
+                 unparsed: List[str]):
+        self.graph = graph
+        self.analysis = analysis
+        self.starts = starts
+        self.makespan = makespan
+        self.unparsed = unparsed
+
+    @property
+    def order(self) -> List[int]:
+        """Items by scheduled start, critical items first among those starting together"""
+        slack = self.analysis.slack
+        return sorted(range(len(self.graph)), key=lambda i: (self.starts[i], slack[i], i))
+
+    @property
+    def efficiency(self) -> float:
+        """Critical path length over the scheduled duration: 1.0 means resources never stretch the plan"""
+        return round(self.analysis.length / self.makespan, 3) if self.makespan > 0 else 1.0
+
+    def schedule(self) -> List[Dict]:
+        graph, analysis = self.graph, self.analysis
+        critical = set(analysis.critical_path)
+        level = {index: number for number, group in enumerate(analysis.groups) for index in group}
+        return [{
+            "item": graph.titles[i],
+            "position": i + 1,
+            "start": self.starts[i],
+            "finish": self.starts[i] + graph.durations[i],
+            "slack": round(analysis.slack[i], 6),
+            "group": level[i],
+            "critical": i in critical,
+            "depends_on": [p + 1 for p in graph.predecessors[i]],
+        } for i in self.order]
+
+    def recommendations(self) -> List[str]:
+        graph, analysis = self.graph, self.analysis
+        titles = graph.titles
+        notes = []
+        if graph.edges and analysis.critical_path:
+            path = [titles[i] for i in analysis.critical_path]
+            shown = " -> ".join(path[:6]) + (f" -> ... ({len(path) - 6} more)" if len(path) > 6 else "")
+            notes.append(f"Critical path ({len(path)} items, {analysis.length:g} days): {shown}; "
+                         "any delay on these delays the plan")
+        widest = max(analysis.groups, key=len, default=[])
+        if len(widest) > 1:
+            notes.append(f"{len(analysis.groups)} dependency stages; up to {len(widest)} independent items "
+                         f"can run in parallel (stage {analysis.groups.index(widest) + 1})")
+        if self.makespan > analysis.length + 1e-9:
+            utilization = graph.utilization(self.makespan)
+            bottleneck = max(utilization, key=utilization.get)
+            name = "the parallel item limit" if bottleneck == PARALLEL else f"'{bottleneck}'"
+            notes.append(f"Resource limits stretch the plan from {analysis.length:g} to {self.makespan:g} days; "
+                         f"{name} is the bottleneck ({utilization[bottleneck]:.0%} utilized)")
+        flexible = sorted((i for i in range(len(titles)) if analysis.slack[i] > 1e-9),
+                          key=lambda i: -analysis.slack[i])[:3]
+        if flexible:
+            notes.append("Most slack, can absorb delays or yield resources: " +
+                         ", ".join(f"{titles[i]} (+{analysis.slack[i]:g} days)" for i in flexible))
+        if not graph.edges and len(titles) > 1:
+            notes.append("No dependencies given; add constraints such as 'A before B' to order the plan")
+        notes.extend(f"Ignored constraint: {text}" for text in self.unparsed)
+        return notes
+
+
+def optimize_items(items: Sequence[str], constraints: Optional[Sequence[str]] = None) -> PlanOptimization:
+    graph, unparsed = build_graph(items, constraints)
+    analysis = graph.analyze()
+    starts, makespan = graph.schedule(analysis)
+    return PlanOptimization(graph, analysis, starts, makespan, unparsed)
@@ -0,0 +1,576 @@
+"""
+Plan completion probability scoring
+
+Plans are turned into a fixed feature vector (item progress, overdue and
+blocked work, schedule position, priority, and how often the same owner and
+similar plans completed before) in one vectorized pass per batch, kept in a
+columnar feature cache, and scored together with a logistic regression.
+Completed and cancelled plans score 1 and 0 without the model.
+
+The model is trained offline with train_completion_model.py from labeled
+snapshots, where each line is {"plan": {...}, "as_of": "<ISO time>", "completed": true}
+(a plan as it looked at as_of, and whether it was eventually completed).
+COMPLETION_MODEL_PATH points the service at the result; without it a
+conservative prior with hand-set weights is used.
+"""
+
+from collections import OrderedDict
+from datetime import datetime, timezone
+from typing import Any, Awaitable, Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+import json
+import logging
+import math
+import time
+
+from shared.config import settings
+from shared.lazy import lazy_import
+
+np = lazy_import("numpy")
+
+logger = logging.getLogger(__name__)
+
+# PlanStatus and PlanItemStatus from the Planning domain
+PLAN_STATUSES = {"draft": 0, "inprogress": 1, "completed": 2, "cancelled": 3, "onhold": 4}
+ITEM_STATUSES = {"notstarted": 0, "inprogress": 1, "completed": 2, "blocked": 3, "cancelled": 4}
+COMPLETED, CANCELLED, ON_HOLD = 2, 3, 4
+ITEM_COMPLETED, ITEM_BLOCKED, ITEM_CANCELLED = 2, 3, 4
+PRIORITIES = {"low": 1, "medium": 2, "high": 3, "critical": 4}
+
+DAY = 86400.0
+DUE_SOON_DAYS = 7
+# Pseudo-counts pulling sparse completion histories towards the overall rate
+HISTORY_PRIOR = 2.0
+# Finished plan ids remembered so a re-sent plan is not counted twice; the least recently seen is dropped beyond this
+MAX_SEEN_PLANS = 100_000
+
+FEATURES = (
+    "completed_fraction",  # completed items / active items
+    "progress_gap",        # elapsed share of the plan window minus completed share
+    "overdue_fraction",    # open items past their due date
+    "blocked_fraction",
+    "due_soon_fraction",   # open items due within DUE_SOON_DAYS
+    "days_remaining",      # until EndDate, in months, clipped to [-3, 3]
+    "log_items",
+    "priority",            # Low..Critical mapped to [-1, 1]
+    "missing_dates",
+    "on_hold",
+    "owner_rate",          # owner's historical completion rate, centered on 0.5
+    "similar_rate",        # same priority and plan length, centered on 0.5
+)
+
+# Conservative prior used until a trained model is configured
+PRIOR_WEIGHTS = {
+    "completed_fraction": 2.0, "progress_gap": -2.5, "overdue_fraction": -2.0, "blocked_fraction": -1.5,
+    "due_soon_fraction": -0.5, "days_remaining": 0.2, "log_items": -0.15, "priority": 0.2,
+    "missing_dates": -0.2, "on_hold": -1.2, "owner_rate": 1.5, "similar_rate": 1.0,
+}
+PRIOR_BIAS = 0.3
+# Typical values the prior weights are centered on (features not listed are centered on 0)
+PRIOR_CENTERS = {"log_items": math.log1p(8), "days_remaining": 0.5}
+
+# How each feature reads when it pushes the probability down or up
+RISK_TEXT = {
+    "completed_fraction": "Few items completed so far",
+    "progress_gap": "Progress is behind the plan timeline",
+    "overdue_fraction": "Items are past their due dates",
+    "blocked_fraction": "Blocked items",
+    "due_soon_fraction": "Many items due within a week",
+    "days_remaining": "Little time left before the end date",
+    "log_items": "Large number of items",
+    "priority": "Low priority",
+    "missing_dates": "No start or end date set",
+    "on_hold": "Plan is on hold",
+    "owner_rate": "Owner's earlier plans often went uncompleted",
+    "similar_rate": "Similar plans often went uncompleted",
+}
+SUCCESS_TEXT = {
+    "completed_fraction": "Most items already completed",
+    "progress_gap": "Progress is ahead of the plan timeline",
+    "days_remaining": "Comfortable time left before the end date",
+    "priority": "High priority",
+    "owner_rate": "Owner usually completes plans",
+    "similar_rate": "Similar plans usually complete",
+}
+RECOMMENDATION_TEXT = {
+    "progress_gap": "Re-plan the remaining items or extend the end date",
+    "overdue_fraction": "Reschedule or reassign overdue items",
+    "blocked_fraction": "Resolve blockers before starting new items",
+    "due_soon_fraction": "Spread upcoming due dates to avoid a crunch",
+    "missing_dates": "Set start and end dates so progress can be tracked",
+    "on_hold": "Resume the plan or cancel it to free resources",
+    "log_items": "Split the plan into smaller milestones",
+    "days_remaining": "Add buffer time for critical tasks",
+}
+
+
+# Plan payloads: PlanRepository rows (PascalCase, Items attached) or Planning API DTOs (camelCase)
+
+def _fields(plan: Dict[str, Any]) -> Dict[str, Any]:
+    return {key.lower().replace("_", ""): value for key, value in plan.items()}
+
+
+def _enum(value: Any, names: Dict[str, int]) -> Optional[int]:
+    if isinstance(value, bool):
+        return None
+    if isinstance(value, (int, float)):
+        return int(value)
+    if isinstance(value, str):
+        key = value.replace(" ", "").lower()
+        return names.get(key, int(key) if key.isdigit() else None)
+    if isinstance(value, dict):
+        fields = _fields(value)
+        return _enum(fields.get("value", fields.get("name")), names)
+    return None
+
+
+def _timestamp(value: Any) -> float:
+    """Epoch seconds, NaN when absent; naive times are taken as UTC"""
+    if isinstance(value, str) and value:
+        try:
+            value = datetime.fromisoformat(value.replace("Z", "+00:00"))
+        except ValueError:
+            return math.nan
+    if isinstance(value, datetime):
+        if value.tzinfo is None:
+            value = value.replace(tzinfo=timezone.utc)
+        return value.timestamp()
+    return math.nan
+
+
+def plan_id(plan: Dict[str, Any]) -> Any:
+    return _fields(plan).get("id")
+
+
+def plan_status(plan: Dict[str, Any]) -> Optional[int]:
+    return _enum(_fields(plan).get("status"), PLAN_STATUSES)
+
+
+def _history_keys(fields: Dict[str, Any]) -> Tuple[Any, Tuple[int, int]]:
+    priority = _enum(fields.get("priorityvalue", fields.get("priority")), PRIORITIES) or 2
+    start, end = _timestamp(fields.get("startdate")), _timestamp(fields.get("enddate"))
+    weeks = (end - start) / (7 * DAY) if not (math.isnan(start) or math.isnan(end)) else -1
+    length = 0 if weeks < 0 else 1 if weeks < 2 else 2 if weeks < 6 else 3 if weeks < 13 else 4
+    return fields.get("ownerid"), (priority, length)
+
+
+class CompletionHistory:
+    """Completed/total counts of finished plans per owner and per (priority, length) bucket"""
+
+    def __init__(self, max_seen: int = MAX_SEEN_PLANS):
+        self.by_owner: Dict[Any, List[float]] = {}
+        self.by_similar: Dict[Tuple[int, int], List[float]] = {}
+        self.completed = 0.0
+        self.total = 0.0
+        self.max_seen = max_seen
+        self._seen: "OrderedDict[Any, bool]" = OrderedDict()
+
+    def observe(self, plans: Iterable[Dict[str, Any]]):
+        """
+        Record plans that finished; a plan already counted is not counted again
+        while it is among the max_seen most recently seen finished plans.
+        """
+        for plan in plans:
+            status = plan_status(plan)
+            identifier = plan_id(plan)
+            if status not in (COMPLETED, CANCELLED) or identifier is None:
+                continue
+            if identifier in self._seen:
+                self._seen.move_to_end(identifier)
+                continue
+            self.add(plan, status == COMPLETED)
+            self._seen[identifier] = status == COMPLETED
+            if len(self._seen) > self.max_seen:
+                self._seen.popitem(last=False)
+
+    def add(self, plan: Dict[str, Any], completed: bool, weight: float = 1.0):
+        owner, similar = _history_keys(_fields(plan))
+        for table, key in ((self.by_owner, owner), (self.by_similar, similar)):
+            if key is None:
+                continue
+            counts = table.setdefault(key, [0.0, 0.0])
+            counts[0] += weight * completed
+            counts[1] += weight
+        self.completed += weight * completed
+        self.total += weight
+
+    @property
+    def base_rate(self) -> float:
+        return (self.completed + 1) / (self.total + 2)
+
+    def rates(self, plans: Sequence[Dict[str, Any]],
+              own_outcomes: Optional[Sequence[Optional[bool]]] = None) -> Tuple[List[float], List[float]]:
+        """
+        Smoothed owner and similar-plan completion rates. With own_outcomes
+        each plan's own result is left out (leave-one-out, for training).
+        """
+        base = self.base_rate
+        owner_rates, similar_rates = [], []
+        for index, plan in enumerate(plans):
+            owner, similar = _history_keys(_fields(plan))
+            own = own_outcomes[index] if own_outcomes is not None else None
+            for table, key, out in ((self.by_owner, owner, owner_rates), (self.by_similar, similar, similar_rates)):
+                completed, total = table.get(key, (0.0, 0.0)) if key is not None else (0.0, 0.0)
+                if own is not None and key is not None:
+                    completed, total = completed - own, total - 1
+                out.append((completed + HISTORY_PRIOR * base) / (total + HISTORY_PRIOR))
+        return owner_rates, similar_rates
+
+    def stats(self) -> Dict[str, float]:
+        return {"plans": self.total, "owners": len(self.by_owner), "similar_buckets": len(self.by_similar),
+                "seen": len(self._seen), "base_rate": round(self.base_rate, 4)}
+
+
+def extract_features(plans: Sequence[Dict[str, Any]], history: CompletionHistory, now: Optional[float] = None,
+                     own_outcomes: Optional[Sequence[Optional[bool]]] = None) -> "np.ndarray":
+    """
+    One row per plan, columns in FEATURES order. Items of all plans are
+    flattened into three arrays and counted per plan with bincount, so the
+    cost is one pass over the items whatever the batch size.
+    """
+    now = time.time() if now is None else now
+    size = len(plans)
+    fields = [_fields(plan) for plan in plans]
+
+    item_plan, item_status, item_due = [], [], []
+    has_items = np.zeros(size, dtype=bool)
+    fallback_total = np.zeros(size)
+    fallback_completed = np.zeros(size)
+    for row, plan in enumerate(fields):
+        items = plan.get("items")
+        if isinstance(items, list):
+            has_items[row] = True
+            for item in items:
+                item_fields = _fields(item)
+                item_plan.append(row)
+                status = _enum(item_fields.get("status"), ITEM_STATUSES)
+                item_status.append(-1 if status is None else status)
+                item_due.append(_timestamp(item_fields.get("duedate")))
+        else:
+            fallback_total[row] = plan.get("itemscount") or 0
+            fallback_completed[row] = plan.get("completeditemscount") or 0
+
+    item_plan = np.asarray(item_plan, dtype=np.int64)
+    item_status = np.asarray(item_status, dtype=np.int64)
+    item_due = np.asarray(item_due, dtype=float)
+
+    def per_plan(mask) -> "np.ndarray":
+        return np.bincount(item_plan[mask], minlength=size).astype(float)
+
+    active = item_status != ITEM_CANCELLED
+    done = item_status == ITEM_COMPLETED
+    open_items = active & ~done
+    with np.errstate(invalid="ignore"):
+        overdue = open_items & (item_due < now)
+        due_soon = open_items & (item_due >= now) & (item_due < now + DUE_SOON_DAYS * DAY)
+    total = np.where(has_items, per_plan(active), fallback_total)
+    completed = np.where(has_items, per_plan(done), fallback_completed)
+    denominator = np.maximum(total, 1.0)
+
+    start = np.array([_timestamp(plan.get("startdate")) for plan in fields])
+    end = np.array([_timestamp(plan.get("enddate")) for plan in fields])
+    dated = ~(np.isnan(start) | np.isnan(end)) & (end > start)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        elapsed = np.where(dated, np.clip((now - start) / (end - start), 0.0, 1.5), 0.0)
+        remaining = np.where(np.isnan(end), 0.0, np.clip((end - now) / (30 * DAY), -3.0, 3.0))
+    completed_fraction = np.where(total > 0, completed / denominator, 0.0)
+
+    priority = np.array([_enum(plan.get("priorityvalue", plan.get("priority")), PRIORITIES) or 2
+                         for plan in fields], dtype=float)
+    status = np.array([_enum(plan.get("status"), PLAN_STATUSES) or 0 for plan in fields])
+    owner_rates, similar_rates = history.rates(plans, own_outcomes)
+
+    return np.column_stack([
+        completed_fraction,
+        np.where(dated, elapsed - completed_fraction, 0.0),
+        per_plan(overdue) / denominator,
+        per_plan(open_items & (item_status == ITEM_BLOCKED)) / denominator,
+        per_plan(due_soon) / denominator,
+        remaining,
+        np.log1p(total),
+        (priority - 2.5) / 1.5,
+        (~dated).astype(float),
+        (status == ON_HOLD).astype(float),
+        np.asarray(owner_rates) - 0.5,
+        np.asarray(similar_rates) - 0.5,
+    ])
+
+
+class CompletionModel:
+    """Logistic regression over standardized FEATURES"""
+
+    def __init__(self, weights: Sequence[float], bias: float, mean: Optional[Sequence[float]] = None,
+                 scale: Optional[Sequence[float]] = None, version: str = "prior"):
+        self.weights = np.asarray(weights, dtype=float)
+        self.bias = float(bias)
+        self.mean = np.zeros(len(FEATURES)) if mean is None else np.asarray(mean, dtype=float)
+        self.scale = np.ones(len(FEATURES)) if scale is None else np.asarray(scale, dtype=float)
+        self.version = version
+
+    @classmethod
+    def prior(cls) -> "CompletionModel":
+        return cls([PRIOR_WEIGHTS[name] for name in FEATURES], PRIOR_BIAS,
+                   mean=[PRIOR_CENTERS.get(name, 0.0) for name in FEATURES])
+
+    @classmethod
+    def load(cls, path: str) -> "CompletionModel":
+        with open(path) as handle:
+            data = json.load(handle)
+        missing = [name for name in FEATURES if name not in data["features"]]
+        if missing:
+            raise ValueError(f"Model {path} lacks features: {', '.join(missing)}")
+        order = [data["features"].index(name) for name in FEATURES]
+        return cls([data["weights"][i] for i in order], data["bias"], [data["mean"][i] for i in order],
+                   [data["scale"][i] for i in order], data.get("version", path))
+
+    def save(self, path: str):
+        with open(path, "w") as handle:
+            json.dump({"features": list(FEATURES), "weights": self.weights.tolist(), "bias": self.bias,
+                       "mean": self.mean.tolist(), "scale": self.scale.tolist(), "version": self.version},
+                      handle, indent=2)
+
+    def contributions(self, features: "np.ndarray") -> "np.ndarray":
+        """Per-feature terms of the logit, one row per plan"""
+        return (features - self.mean) / self.scale * self.weights
+
+    def predict(self, features: "np.ndarray") -> "np.ndarray":
+        logits = self.contributions(features).sum(axis=1) + self.bias
+        return 1.0 / (1.0 + np.exp(-np.clip(logits, -30, 30)))
+
+    @classmethod
+    def fit(cls, features: "np.ndarray", outcomes: "np.ndarray", l2: float = 1.0,
+            iterations: int = 25, version: Optional[str] = None) -> "CompletionModel":
+        """L2-regularized logistic regression by Newton's method (IRLS) on standardized features"""
+        mean = features.mean(axis=0)
+        scale = features.std(axis=0)
+        scale[scale < 1e-9] = 1.0
+        design = np.column_stack([(features - mean) / scale, np.ones(len(features))])
+        penalty = np.eye(design.shape[1]) * l2
+        penalty[-1, -1] = 0.0  # the intercept is not shrunk
+        coefficients = np.zeros(design.shape[1])
+        for _ in range(iterations):
+            probabilities = 1.0 / (1.0 + np.exp(-np.clip(design @ coefficients, -30, 30)))
+            gradient = design.T @ (probabilities - outcomes) + penalty @ coefficients
+            hessian = (design * (probabilities * (1 - probabilities))[:, None]).T @ design + penalty
+            step = np.linalg.solve(hessian, gradient)
+            coefficients -= step
+            if np.abs(step).max() < 1e-8:
+                break
+        return cls(coefficients[:-1], coefficients[-1], mean, scale,
+                   version or datetime.now(timezone.utc).strftime("trained-%Y%m%dT%H%M%SZ"))
+
+
+def load_model(path: Optional[str] = None) -> CompletionModel:
+    path = path if path is not None else settings.COMPLETION_MODEL_PATH
+    if not path:
+        return CompletionModel.prior()
+    try:
+        return CompletionModel.load(path)
+    except (OSError, ValueError, KeyError) as e:
+        logger.error("Could not load completion model %s (%s); using the prior", path, e)
+        return CompletionModel.prior()
+
+
+class FeatureCache:
+    """
+    Feature rows in one preallocated matrix plus an id -> row index. Rows
+    expire after FEATURE_CACHE_TTL_SECONDS (deadlines and elapsed time move);
+    when full, the oldest half is dropped and the matrix compacted.
+    """
+
+    def __init__(self, max_plans: Optional[int] = None, ttl_seconds: Optional[float] = None,
+                 clock: Callable[[], float] = time.monotonic):
+        self.max_plans = max_plans or settings.FEATURE_CACHE_MAX_PLANS
+        self.ttl = ttl_seconds if ttl_seconds is not None else settings.FEATURE_CACHE_TTL_SECONDS
+        self.clock = clock
+        self._matrix = None
+        self._stamps = None
+        self._statuses = None
+        self._ids: List[Any] = []
+        self._rows: Dict[Any, int] = {}
+        self.hits = 0
+        self.misses = 0
+
+    def _allocate(self, rows: int):
+        matrix = np.zeros((rows, len(FEATURES)))
+        stamps = np.full(rows, -math.inf)
+        statuses = np.zeros(rows, dtype=np.int64)
+        if self._matrix is not None:
+            used = len(self._ids)
+            matrix[:used], stamps[:used], statuses[:used] = (self._matrix[:used], self._stamps[:used],
+                                                             self._statuses[:used])
+        self._matrix, self._stamps, self._statuses = matrix, stamps, statuses
+
+    def get(self, ids: Sequence[Any]) -> Tuple[List[Any], "np.ndarray", "np.ndarray", List[Any]]:
+        """Fresh ids with copies of their feature rows and statuses, and the ids that are missing or stale"""
+        found, rows, missing = [], [], []
+        oldest = self.clock() - self.ttl
+        for identifier in ids:
+            row = self._rows.get(identifier)
+            if row is not None and self._stamps[row] >= oldest:
+                found.append(identifier)
+                rows.append(row)
+            else:
+                missing.append(identifier)
+        self.hits += len(found)
+        self.misses += len(missing)
+        if not rows:
+            return found, np.zeros((0, len(FEATURES))), np.zeros(0, dtype=np.int64), missing
+        return found, self._matrix[rows], self._statuses[rows], missing
+
+    def put(self, ids: Sequence[Any], features: "np.ndarray", statuses: Sequence[int]):
+        batch = dict.fromkeys(ids)
+        if len(batch) > self.max_plans:
+            # Only the first max_plans distinct ids fit
+            kept = set(list(batch)[:self.max_plans])
+            indexes = [index for index, identifier in enumerate(ids) if identifier in kept]
+            ids, features = [ids[index] for index in indexes], features[indexes]
+            statuses = [statuses[index] for index in indexes]
+            batch = dict.fromkeys(ids)
+        new = sum(1 for identifier in batch if identifier not in self._rows)
+        if len(self._ids) + new > self.max_plans:
+            # The batch's own rows are being refreshed, so they are never the ones dropped
+            self._evict(len(self._ids) + new - self.max_plans, batch)
+            new = sum(1 for identifier in batch if identifier not in self._rows)
+        if self._matrix is None or len(self._ids) + new > len(self._matrix):
+            self._allocate(min(self.max_plans, max(1024, 2 * (len(self._ids) + new))))
+        now = self.clock()
+        for index, identifier in enumerate(ids):
+            row = self._rows.get(identifier)
+            if row is None:
+                row = self._rows[identifier] = len(self._ids)
+                self._ids.append(identifier)
+            self._matrix[row] = features[index]
+            self._stamps[row] = now
+            self._statuses[row] = statuses[index]
+
+    def _evict(self, needed: int, protected: Iterable[Any] = ()):
+        used = len(self._ids)
+        ages = self._stamps[:used].copy()
+        ages[[self._rows[identifier] for identifier in protected if identifier in self._rows]] = math.inf
+        keep = np.sort(np.argsort(ages, kind="stable")[max(needed, used // 2):])
+        self._matrix[:len(keep)] = self._matrix[keep]
+        self._stamps[:len(keep)] = self._stamps[keep]
+        self._stamps[len(keep):] = -math.inf
+        self._statuses[:len(keep)] = self._statuses[keep]
+        self._ids = [self._ids[row] for row in keep]
+        self._rows = {identifier: row for row, identifier in enumerate(self._ids)}
+
+    def stats(self) -> Dict[str, int]:
+        return {"plans": len(self._ids), "max_plans": self.max_plans, "hits": self.hits, "misses": self.misses}
+
+
+PlanLoader = Callable[[List[Any]], Awaitable[List[Dict[str, Any]]]]
+
+
+class PlanScorer:
+    """Scores batches of plans: cached feature rows, loader for the rest, one model call per batch"""
+
+    def __init__(self, loader: Optional[PlanLoader] = None, model: Optional[CompletionModel] = None,
+                 cache: Optional[FeatureCache] = None, history: Optional[CompletionHistory] = None):
+        self.loader = loader
+        self._model = model
+        self.cache = cache or FeatureCache()
+        self.history = history or CompletionHistory()
+        self.batches = 0
+        self.scored = 0
+
+    @property
+    def model(self) -> CompletionModel:
+        if self._model is None:
+            self._model = load_model()
+        return self._model
+
+    async def score(self, ids: Sequence[Any], plans: Optional[Sequence[Dict[str, Any]]] = None
+                    ) -> Tuple[List[Dict[str, Any]], List[Any]]:
+        """Analytics for every id that could be found, in request order, and the ids that could not"""
+        ids = list(dict.fromkeys(ids))
+        # Supplied payloads are the freshest data; everything else comes from the cache or the loader
+        supplied = {plan_id(plan): plan for plan in plans or [] if plan_id(plan) is not None}
+        cached_ids, cached_features, cached_statuses, missing = self.cache.get(
+            [identifier for identifier in ids if identifier not in supplied])
+        loaded = list(supplied.values())
+        if missing and self.loader is not None:
+            loaded.extend(await self.loader(missing))
+
+        loaded_ids = [plan_id(plan) for plan in loaded]
+        loaded_statuses = np.array([plan_status(plan) or 0 for plan in loaded], dtype=np.int64)
+        loaded_features = np.zeros((0, len(FEATURES)))
+        if loaded:
+            self.history.observe(loaded)
+            loaded_features = extract_features(loaded, self.history)
+            self.cache.put(loaded_ids, loaded_features, loaded_statuses)
+
+        rows = {identifier: row for row, identifier in enumerate(cached_ids + loaded_ids)}
+        present = [identifier for identifier in ids if identifier in rows]
+        absent = [identifier for identifier in ids if identifier not in rows]
+        if not present:
+            return [], absent
+        order = [rows[identifier] for identifier in present]
+        features = np.vstack([cached_features, loaded_features])[order]
+        statuses = np.concatenate([cached_statuses, loaded_statuses])[order]
+
+        model = self.model
+        probabilities = model.predict(features)
+        probabilities[statuses == COMPLETED] = 1.0
+        probabilities[statuses == CANCELLED] = 0.0
+        contributions = model.contributions(features)
+        self.batches += 1
+        self.scored += len(present)
+        return [self._result(identifier, probabilities[row], contributions[row], statuses[row])
+                for row, identifier in enumerate(present)], absent
+
+    def _result(self, identifier: Any, probability: float, contributions: "np.ndarray",
+                status: int) -> Dict[str, Any]:
+        order = np.argsort(contributions)
+        risks = [FEATURES[i] for i in order[:3] if contributions[i] < -0.1]
+        strengths = [FEATURES[i] for i in order[::-1][:3] if contributions[i] > 0.1 and FEATURES[i] in SUCCESS_TEXT]
+        finished = status in (COMPLETED, CANCELLED)
+        return {
+            "plan_id": identifier,
+            "completion_probability": round(float(probability), 4),
+            "risk_factors": [] if finished else [RISK_TEXT[name] for name in risks],
+            "success_indicators": [] if finished else [SUCCESS_TEXT[name] for name in strengths],
+            "recommendations": [] if finished else
+            [RECOMMENDATION_TEXT[name] for name in risks if name in RECOMMENDATION_TEXT],
+            "model_version": "status" if finished else self.model.version,
+        }
+
+    def stats(self) -> Dict[str, Any]:
+        return {"batches": self.batches, "scored": self.scored, **self.cache.stats(),
+                "history_plans": self.history.total}
+
+
+# Offline training
+
+def load_snapshots(path: str) -> Tuple[List[Dict[str, Any]], List[float], List[bool]]:
+    plans, as_of, outcomes = [], [], []
+    with open(path) as handle:
+        for line in handle:
+            if line.strip():
+                record = json.loads(line)
+                plans.append(record["plan"])
+                as_of.append(_timestamp(record["as_of"]))
+                outcomes.append(bool(record["completed"]))
+    return plans, as_of, outcomes
+
+
+def training_matrix(plans: Sequence[Dict[str, Any]], as_of: Sequence[float], outcomes: Sequence[bool]
+                    ) -> "np.ndarray":
+    """Features at each snapshot's own time, with history rates that leave the plan's own outcome out"""
+    history = CompletionHistory()
+    for plan, outcome in zip(plans, outcomes):
+        history.add(plan, outcome)
+    rows = [extract_features([plan], history, now=moment, own_outcomes=[outcome])[0]
+            for plan, moment, outcome in zip(plans, as_of, outcomes)]
+    return np.vstack(rows) if rows else np.zeros((0, len(FEATURES)))
+
+
+def auc(outcomes: "np.ndarray", scores: "np.ndarray") -> float:
+    """Area under the ROC curve by rank statistics"""
+    ranks = np.empty(len(scores))
+    ranks[np.argsort(scores, kind="mergesort")] = np.arange(1, len(scores) + 1)
+    positives = outcomes.sum()
+    negatives = len(outcomes) - positives
+    if not positives or not negatives:
+        return math.nan
+    return float((ranks[outcomes == 1].sum() - positives * (positives + 1) / 2) / (positives * negatives))
@@ -0,0 +1,41 @@
+"""
+Train the plan completion model offline
+
+Reads labeled plan snapshots (JSON lines of {"plan": {...}, "as_of": ...,
+"completed": true|false}), fits the logistic regression used by
+/api/analytics and writes it as JSON for COMPLETION_MODEL_PATH.
+
+Usage: python train_completion_model.py snapshots.jsonl [-o completion_model.json] [--l2 1.0]
+"""
+
+import argparse
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from scoring import CompletionModel, auc, load_snapshots, np, training_matrix  # noqa: E402
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("snapshots", help="JSON lines of {plan, as_of, completed}")
+    parser.add_argument("-o", "--output", default="completion_model.json")
+    parser.add_argument("--l2", type=float, default=1.0, help="ridge penalty on standardized weights")
+    args = parser.parse_args()
+
+    plans, as_of, outcomes = load_snapshots(args.snapshots)
+    if not plans:
+        print(f"No snapshots in {args.snapshots}")
+        return 1
+    features = training_matrix(plans, as_of, outcomes)
+    labels = np.asarray(outcomes, dtype=float)
+    model = CompletionModel.fit(features, labels, l2=args.l2)
+    model.save(args.output)
+    print(f"{len(plans)} snapshots, completion rate {labels.mean():.2f}, "
+          f"training AUC {auc(labels, model.predict(features)):.3f} -> {args.output}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
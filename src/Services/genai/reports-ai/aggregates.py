@@ -0,0 +1,474 @@
+"""
+Incrementally maintained rollups behind /api/insights key metrics
+
+Every plan and observation event is reduced to the entity's latest facts.
+Applying an event removes the entity's previous contribution and adds the
+new one, so counts per center, classroom, domain and week (overall and
+within each of those scopes) stay exact and re-delivered or out-of-order
+events are harmless. A rebuild recomputes the same rollups from scratch
+(from the upstream APIs or from the entity index) and the consistency check
+diffs the two.
+"""
+
+from datetime import date, datetime, timedelta
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+import logging
+
+from shared.events import Event
+
+from sources import iter_source_rows
+
+logger = logging.getLogger(__name__)
+
+PLAN = "plan"
+OBSERVATION = "observation"
+
+# PlanStatus enum values from the Planning domain
+PLAN_STATUSES = {0: "draft", 1: "in_progress", 2: "completed", 3: "cancelled", 4: "on_hold"}
+
+UNASSIGNED = "unassigned"
+ALL = ("all",)
+
+RollupKey = Tuple[Any, ...]
+
+
+def _field(row: Dict[str, Any], *names: str, default: Any = None) -> Any:
+    """First present value among snake_case and camelCase spellings"""
+    for name in names:
+        value = row.get(name)
+        if value is not None:
+            return value
+    return default
+
+
+def _as_date(value: Any) -> Optional[date]:
+    if isinstance(value, datetime):
+        return value.date()
+    if isinstance(value, date):
+        return value
+    if isinstance(value, str) and value:
+        try:
+            return datetime.fromisoformat(value.replace("Z", "+00:00")).date()
+        except ValueError:
+            return None
+    return None
+
+
+def week_bucket(value: Any) -> str:
+    """ISO date of the Monday starting the value's week, or 'unassigned'"""
+    day = _as_date(value)
+    if day is None:
+        return UNASSIGNED
+    return (day - timedelta(days=day.weekday())).isoformat()
+
+
+def week_key(scope: RollupKey, bucket: str) -> RollupKey:
+    """Weekly rollup within a scope: ('week', bucket) overall, ('center_week', center, bucket) and so on"""
+    if scope == ALL:
+        return ("week", bucket)
+    return (f"{scope[0]}_week",) + tuple(scope[1:]) + (bucket,)
+
+
+def _version(row: Dict[str, Any]) -> float:
+    version = _field(row, "version", "Version")
+    if isinstance(version, (int, float)):
+        return float(version)
+    occurred_at = _field(row, "occurred_at", "occurredAt", "lastModified", "last_modified")
+    if isinstance(occurred_at, str):
+        try:
+            return datetime.fromisoformat(occurred_at.replace("Z", "+00:00")).timestamp()
+        except ValueError:
+            pass
+    return 0.0
+
+
+def plan_status(value: Any) -> str:
+    if isinstance(value, int):
+        return PLAN_STATUSES.get(value, UNASSIGNED)
+    if isinstance(value, str) and value.strip():
+        value = value.strip()
+        if value.isdigit():
+            return PLAN_STATUSES.get(int(value), UNASSIGNED)
+        if value.isupper() or "_" in value or " " in value:
+            return value.lower().replace(" ", "_")
+        # "InProgress" -> "in_progress"
+        return "".join(f"_{c.lower()}" if c.isupper() else c for c in value).lstrip("_")
+    return PLAN_STATUSES[0]
+
+
+class PlanFacts:
+    __slots__ = ("id", "status", "center_id", "classroom_id", "owner_id", "bucket", "version")
+
+    def __init__(self, row: Dict[str, Any]):
+        self.id = _field(row, "plan_id", "planId", "id")
+        self.status = plan_status(_field(row, "status", "Status"))
+        self.center_id = _field(row, "center_id", "centerId", default=UNASSIGNED)
+        self.classroom_id = _field(row, "classroom_id", "classroomId", default=UNASSIGNED)
+        self.owner_id = _field(row, "owner_id", "ownerId")
+        self.bucket = week_bucket(_field(row, "start_date", "startDate", "created", "created_at", "createdAt"))
+        self.version = _version(row)
+
+    def scopes(self) -> Tuple[RollupKey, ...]:
+        return ALL, ("center", self.center_id), ("classroom", self.center_id, self.classroom_id)
+
+    def contributions(self) -> List[Tuple[RollupKey, str]]:
+        keys = self.scopes() + tuple(week_key(scope, self.bucket) for scope in self.scopes())
+        return [(key, metric) for key in keys for metric in ("plans", f"plans_{self.status}")]
+
+    @property
+    def user(self) -> Optional[str]:
+        return str(self.owner_id) if self.owner_id is not None else None
+
+
+class ObservationFacts:
+    __slots__ = ("id", "center_id", "classroom_id", "domain_id", "teacher_id", "is_draft", "bucket", "version")
+
+    def __init__(self, row: Dict[str, Any]):
+        self.id = _field(row, "observation_id", "observationId", "id")
+        self.center_id = _field(row, "center_id", "centerId", default=UNASSIGNED)
+        self.classroom_id = _field(row, "classroom_id", "classroomId", default=UNASSIGNED)
+        self.domain_id = _field(row, "domain_id", "domainId", default=UNASSIGNED)
+        self.teacher_id = _field(row, "teacher_id", "teacherId")
+        self.is_draft = bool(_field(row, "is_draft", "isDraft", default=False))
+        self.bucket = week_bucket(_field(row, "observation_date", "observationDate", "created", "createdAt"))
+        self.version = _version(row)
+
+    def scopes(self) -> Tuple[RollupKey, ...]:
+        return (ALL, ("center", self.center_id), ("classroom", self.center_id, self.classroom_id),
+                ("domain", self.domain_id))
+
+    def contributions(self) -> List[Tuple[RollupKey, str]]:
+        keys = self.scopes() + tuple(week_key(scope, self.bucket) for scope in self.scopes())
+        status = "draft_observations" if self.is_draft else "completed_observations"
+        return [(key, metric) for key in keys for metric in ("observations", status)]
+
+    @property
+    def user(self) -> Optional[str]:
+        return str(self.teacher_id) if self.teacher_id is not None else None
+
+
+FACTS = {PLAN: PlanFacts, OBSERVATION: ObservationFacts}
+
+
+def _count(index: Dict[RollupKey, Dict[Any, int]], scope: RollupKey, item: Any, delta: int):
+    """Adjust one counter of a per-scope index, dropping counters and scopes that reach zero"""
+    counters = index.setdefault(scope, {})
+    count = counters.get(item, 0) + delta
+    if count:
+        counters[item] = count
+    else:
+        counters.pop(item, None)
+        if not counters:
+            del index[scope]
+
+
+def event_entity(event_type: str) -> Optional[str]:
+    """'PlanCompletedEvent' / 'observation.created' -> 'plan' / 'observation'"""
+    lowered = event_type.lower()
+    if lowered.startswith(PLAN):
+        return PLAN
+    if lowered.startswith(OBSERVATION):
+        return OBSERVATION
+    return None
+
+
+class AggregateStore:
+    """Entity index plus additive rollups keyed by (dimension, value...)"""
+
+    def __init__(self):
+        self._entities: Dict[str, Dict[Any, Any]] = {PLAN: {}, OBSERVATION: {}}
+        self._rollups: Dict[RollupKey, Dict[str, int]] = {}
+        # Per scope (all, center, classroom, domain): user -> contributing entities
+        self._users: Dict[RollupKey, Dict[str, int]] = {}
+        # Per scope (all, center, classroom): domain -> observations, so the top domain needs no rollup scan
+        self._domains: Dict[RollupKey, Dict[Any, int]] = {}
+        # Versions of deleted entities, so a re-delivered older upsert cannot resurrect them
+        self._tombstones: Dict[str, Dict[Any, float]] = {PLAN: {}, OBSERVATION: {}}
+        self.applied = 0
+        self.stale = 0
+
+    def apply(self, entity: str, row: Dict[str, Any], deleted: bool = False) -> bool:
+        """Upsert (or delete) one entity; older versions than the stored one are ignored"""
+        facts = FACTS[entity](row)
+        if facts.id is None:
+            raise ValueError(f"{entity} event has no id")
+        previous = self._entities[entity].get(facts.id)
+        latest = previous.version if previous is not None else self._tombstones[entity].get(facts.id)
+        if latest is not None and facts.version < latest:
+            self.stale += 1
+            return False
+        if previous is not None:
+            self._add(previous, -1)
+        if deleted:
+            self._entities[entity].pop(facts.id, None)
+            self._tombstones[entity][facts.id] = facts.version
+        else:
+            self._entities[entity][facts.id] = facts
+            self._tombstones[entity].pop(facts.id, None)
+            self._add(facts, 1)
+        self.applied += 1
+        return True
+
+    def apply_event(self, event: Dict[str, Any]) -> bool:
+        event_type = str(event.get("type", ""))
+        entity = event_entity(event_type)
+        if entity is None:
+            raise ValueError(f"Unsupported event type '{event_type}'")
+        # Envelope fields (version, occurred_at) apply unless the payload carries its own
+        data = event.get("data")
+        row = {**event, **data} if isinstance(data, dict) else event
+        return self.apply(entity, row, deleted=event_type.lower().endswith(("deleted", "deletedevent")))
+
+    def metrics(self, key: RollupKey = ALL) -> Dict[str, int]:
+        return dict(self._rollups.get(key, {}))
+
+    def weekly(self, weeks: int, today: Optional[date] = None,
+               key: RollupKey = ALL) -> List[Tuple[str, Dict[str, int]]]:
+        """Rollups of one scope for the last `weeks` calendar weeks, oldest first"""
+        start = date.fromisoformat(week_bucket(today or date.today()))
+        buckets = [(start - timedelta(weeks=offset)).isoformat() for offset in range(weeks - 1, -1, -1)]
+        return [(bucket, self.metrics(week_key(key, bucket))) for bucket in buckets]
+
+    def dimension(self, name: str) -> Dict[RollupKey, Dict[str, int]]:
+        return {key: dict(values) for key, values in self._rollups.items() if key[0] == name}
+
+    def users(self, key: RollupKey = ALL) -> int:
+        return len(self._users.get(key, ()))
+
+    @property
+    def active_users(self) -> int:
+        return self.users(ALL)
+
+    def top_domain(self, key: RollupKey = ALL) -> Optional[Tuple[Any, int]]:
+        """(domain, observations) of the most observed domain within the scope"""
+        domains = self._domains.get(key)
+        if not domains:
+            return None
+        return max(domains.items(), key=lambda item: item[1])
+
+    def counts(self) -> Dict[str, int]:
+        return {PLAN: len(self._entities[PLAN]), OBSERVATION: len(self._entities[OBSERVATION]),
+                "rollups": len(self._rollups)}
+
+    def facts(self) -> Iterable[Tuple[str, Any]]:
+        for entity, index in self._entities.items():
+            for facts in index.values():
+                yield entity, facts
+
+    def snapshot(self) -> Dict[RollupKey, Dict[str, int]]:
+        """Rollups without zero counters, for comparison"""
+        return {key: {metric: count for metric, count in values.items() if count}
+                for key, values in self._rollups.items() if any(values.values())}
+
+    def indexes(self) -> Dict[str, Dict[RollupKey, Dict[Any, int]]]:
+        """Per-scope user and domain counters, for comparison"""
+        return {"users": self._users, "domains": self._domains}
+
+    def _add(self, facts, delta: int):
+        for key, metric in facts.contributions():
+            values = self._rollups.get(key)
+            if values is None:
+                values = self._rollups[key] = {}
+            values[metric] = values.get(metric, 0) + delta
+        user = facts.user
+        domain = getattr(facts, "domain_id", None)
+        for scope in facts.scopes():
+            if user is not None:
+                _count(self._users, scope, user, delta)
+            if domain is not None and scope[0] != "domain":
+                _count(self._domains, scope, domain, delta)
+
+    @classmethod
+    def from_facts(cls, facts: Iterable[Tuple[str, Any]]) -> "AggregateStore":
+        store = cls()
+        for entity, item in facts:
+            store._entities[entity][item.id] = item
+            store._add(item, 1)
+        return store
+
+
+def diff_rollups(live: AggregateStore, rebuilt: AggregateStore, limit: int = 50) -> List[str]:
+    left, right = live.snapshot(), rebuilt.snapshot()
+    differences = []
+    for key in sorted(set(left) | set(right), key=str):
+        if left.get(key, {}) != right.get(key, {}):
+            differences.append(f"{'/'.join(map(str, key))}: live={left.get(key, {})} rebuilt={right.get(key, {})}")
+            if len(differences) >= limit:
+                break
+    for name, index in live.indexes().items():
+        other = rebuilt.indexes()[name]
+        for key in sorted(set(index) | set(other), key=str):
+            if len(differences) >= limit:
+                return differences
+            if index.get(key, {}) != other.get(key, {}):
+                differences.append(f"{name} of {'/'.join(map(str, key))}: counters differ "
+                                   f"(live={len(index.get(key, {}))} rebuilt={len(other.get(key, {}))} entries)")
+    return differences
+
+
+class AggregateEngine:
+    """Owns the live store, rebuilds it from the upstream APIs and checks it for drift"""
+
+    def __init__(self):
+        self.store = AggregateStore()
+        self.rebuilt_at: Optional[datetime] = None
+        self._replay: Optional[List[Dict[str, Any]]] = None
+        self.rejected = 0
+
+    def apply_events(self, events: Iterable[Dict[str, Any]]) -> int:
+        applied = 0
+        for event in events:
+            if self.store.apply_event(event):
+                applied += 1
+            if self._replay is not None:
+                self._replay.append(event)
+        return applied
+
+    def consume(self, events: Iterable[Event]) -> int:
+        """Event consumer handler; an event that cannot apply is logged and skipped, not retried"""
+        applied = 0
+        for event in events:
+            try:
+                applied += self.apply_events([event.as_dict()])
+            except ValueError as e:
+                self.rejected += 1
+                logger.warning("Skipping %s event %s: %s", event.type, event.id, e)
+        return applied
+
+    async def load_from_sources(self, parameters: Optional[Dict[str, Any]] = None) -> AggregateStore:
+        """Build a fresh store from every plan and observation the APIs return"""
+        store = AggregateStore()
+        for source, entity in (("plans", PLAN), ("observations", OBSERVATION)):
+            async for row in iter_source_rows(source, parameters or {}):
+                store.apply(entity, row)
+        return store
+
+    async def rebuild(self, parameters: Optional[Dict[str, Any]] = None) -> Dict[str, int]:
+        """Replace the live store with one rebuilt from scratch, replaying events that arrived meanwhile"""
+        self._replay = []
+        try:
+            store = await self.load_from_sources(parameters)
+            for event in self._replay:
+                store.apply_event(event)
+        finally:
+            self._replay = None
+        self.store = store
+        self.rebuilt_at = datetime.utcnow()
+        return store.counts()
+
+    async def check_consistency(self, from_sources: bool = False) -> Dict[str, Any]:
+        """
+        Compare the incrementally maintained rollups with a from-scratch rebuild,
+        either of the live entity index or of the upstream data.
+        """
+        if from_sources:
+            rebuilt = await self.load_from_sources()
+        else:
+            rebuilt = AggregateStore.from_facts(self.store.facts())
+        differences = diff_rollups(self.store, rebuilt)
+        if differences:
+            logger.warning("Aggregate store drifted from rebuild: %d differences", len(differences))
+        return {
+            "consistent": not differences,
+            "source": "upstream" if from_sources else "entity_index",
+            "differences": differences,
+            "live": self.store.counts(),
+            "rebuilt": rebuilt.counts(),
+        }
+
+    def stats(self) -> Dict[str, int]:
+        return {**self.store.counts(), "applied": self.store.applied, "stale": self.store.stale,
+                "rejected": self.rejected, "active_users": self.store.active_users}
+
+
+TREND_WEEKS = 8
+
+
+def scope_key(filters: Dict[str, Any]) -> RollupKey:
+    """Narrowest rollup matching center_id / classroom_id / domain_id filters in the request data"""
+    center = _field(filters, "center_id", "centerId")
+    classroom = _field(filters, "classroom_id", "classroomId")
+    domain = _field(filters, "domain_id", "domainId")
+    if center is not None and classroom is not None:
+        return ("classroom", center, classroom)
+    if center is not None:
+        return ("center", center)
+    if domain is not None:
+        return ("domain", domain)
+    return ALL
+
+
+def _percent(part: int, whole: int) -> float:
+    return round(100.0 * part / whole, 1) if whole else 0.0
+
+
+def summary_insights(store: AggregateStore, key: RollupKey,
+                     domain_name=lambda domain_id: str(domain_id)) -> Tuple[List[str], Dict[str, Any], List[str]]:
+    """(insights, key_metrics, recommendations) for one rollup, from counters only"""
+    metrics = store.metrics(key)
+    plans = metrics.get("plans", 0)
+    observations = metrics.get("observations", 0)
+    completed_observations = metrics.get("completed_observations", 0)
+    key_metrics = {
+        "total_plans": plans,
+        "completed_plans": metrics.get("plans_completed", 0),
+        "active_plans": metrics.get("plans_in_progress", 0),
+        "total_observations": observations,
+        "completed_observations": completed_observations,
+        "draft_observations": metrics.get("draft_observations", 0),
+        "active_users": store.users(key),
+        "scope": "/".join(map(str, key)),
+    }
+
+    completion_rate = _percent(key_metrics["completed_plans"], plans)
+    published_rate = _percent(completed_observations, observations)
+    insights = [
+        f"{plans} plans, {completion_rate}% completed and {key_metrics['active_plans']} in progress",
+        f"{observations} observations, {published_rate}% published",
+    ]
+    recommendations = []
+    top = store.top_domain(key) if key[0] != "domain" else None
+    if top is not None:
+        domain, count = top
+        insights.append(f"Most observed domain: {domain_name(domain)} ({_percent(count, observations)}% of observations)")
+    if observations and published_rate < 80:
+        recommendations.append("Follow up on draft observations so they reach published status")
+    if plans and completion_rate < 50:
+        recommendations.append("Review in-progress plans for blockers; fewer than half are completed")
+    if not recommendations:
+        recommendations.append("Completion and publishing rates are healthy; keep current cadence")
+    return insights, key_metrics, recommendations
+
+
+def trend_insights(store: AggregateStore, key: RollupKey = ALL, weeks: int = TREND_WEEKS,
+                   today: Optional[date] = None) -> Tuple[List[str], Dict[str, Any], List[str]]:
+    """Week-over-week trends from the last `weeks` weekly rollups of one scope"""
+    series = store.weekly(weeks, today, key)
+    key_metrics = {
+        "scope": "/".join(map(str, key)),
+        "weeks": [
+            {
+                "week": bucket,
+                "observations": values.get("observations", 0),
+                "plans": values.get("plans", 0),
+                "plans_completed": values.get("plans_completed", 0),
+            }
+            for bucket, values in series
+        ]
+    }
+    insights, recommendations = [], []
+    if len(series) >= 2:
+        previous, current = series[-2][1], series[-1][1]
+        for metric, label in (("observations", "Observations"), ("plans", "New plans")):
+            before, now = previous.get(metric, 0), current.get(metric, 0)
+            if before:
+                insights.append(f"{label} {'up' if now >= before else 'down'} "
+                                f"{abs(_percent(now - before, before))}% week over week ({before} -> {now})")
+            else:
+                insights.append(f"{label}: {now} this week, none the week before")
+    observed = [values.get("observations", 0) for _, values in series]
+    if observed and max(observed) and min(observed) == 0:
+        recommendations.append("Some recent weeks have no observations; check for gaps in recording")
+    if len(observed) >= 4 and sum(observed[-2:]) < sum(observed[-4:-2]):
+        recommendations.append("Observation volume is declining over the last four weeks")
+    return insights, key_metrics, recommendations
@@ -0,0 +1,222 @@
+"""
+Background report generation jobs
+
+Requests are queued on a bounded asyncio queue. A fixed set of dispatcher
+tasks spools each job's rows from the data sources to disk, then renders
+the artifact in a process pool so CPU-heavy formatting never runs on the
+event loop.
+"""
+
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Tuple
+import asyncio
+import json
+import logging
+import os
+import uuid
+
+from shared.config import settings
+from shared.metrics import stage
+
+from rendering import WRITERS, render_report_file, report_title
+from sources import iter_report_rows
+
+logger = logging.getLogger(__name__)
+
+QUEUED = "queued"
+RUNNING = "running"
+COMPLETED = "completed"
+FAILED = "failed"
+
+# Rows buffered in memory before being appended to the spool file
+SPOOL_BATCH_ROWS = 500
+
+
+class QueueFullError(Exception):
+    """Raised when the job queue is at capacity"""
+
+
+def new_report_id() -> str:
+    """Readable timestamp prefix with a random suffix so concurrent requests never collide"""
+    return f"RPT_{datetime.utcnow().strftime('%Y%m%d_%H%M%S')}_{uuid.uuid4().hex}"
+
+
+class ReportJob:
+    __slots__ = ("id", "report_type", "data_sources", "parameters", "format", "status", "error",
+                 "path", "size_bytes", "created_at", "started_at", "completed_at")
+
+    def __init__(self, report_type: str, data_sources: List[str], parameters: Dict[str, Any],
+                 format: str, output_dir: str):
+        self.id = new_report_id()
+        self.report_type = report_type
+        self.data_sources = data_sources
+        self.parameters = parameters
+        self.format = format
+        self.status = QUEUED
+        self.error: Optional[str] = None
+        self.path = os.path.join(output_dir, f"{self.id}.{WRITERS[format].extension}")
+        self.size_bytes: Optional[int] = None
+        self.created_at = datetime.utcnow()
+        self.started_at: Optional[datetime] = None
+        self.completed_at: Optional[datetime] = None
+
+    @property
+    def media_type(self) -> str:
+        return WRITERS[self.format].media_type
+
+    @property
+    def filename(self) -> str:
+        return os.path.basename(self.path)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "report_id": self.id,
+            "status": self.status,
+            "format": self.format,
+            "created_at": self.created_at.isoformat(),
+            "started_at": self.started_at.isoformat() if self.started_at else None,
+            "completed_at": self.completed_at.isoformat() if self.completed_at else None,
+            "size_bytes": self.size_bytes,
+            "error": self.error,
+            "download_url": f"/api/download/{self.id}" if self.status == COMPLETED else None,
+        }
+
+
+class ReportJobEngine:
+    """Bounded queue plus worker pool that turns report requests into files on disk"""
+
+    def __init__(self, output_dir: Optional[str] = None, max_workers: Optional[int] = None,
+                 queue_size: Optional[int] = None, retention: Optional[int] = None):
+        self.output_dir = output_dir or settings.REPORT_OUTPUT_DIR
+        self.max_workers = max_workers or settings.REPORT_RENDER_WORKERS
+        self.queue_size = queue_size or settings.REPORT_QUEUE_SIZE
+        self.retention = retention or settings.REPORT_RETENTION
+        self._jobs: "OrderedDict[str, ReportJob]" = OrderedDict()
+        self._queue: Optional[asyncio.Queue] = None
+        self._pool: Optional[ProcessPoolExecutor] = None
+        self._dispatchers: List[asyncio.Task] = []
+        self.running = 0
+
+    async def start(self):
+        os.makedirs(self.output_dir, exist_ok=True)
+        self._queue = asyncio.Queue(maxsize=self.queue_size)
+        self._pool = ProcessPoolExecutor(max_workers=self.max_workers)
+        self._dispatchers = [asyncio.create_task(self._dispatch()) for _ in range(self.max_workers)]
+
+    async def stop(self):
+        for task in self._dispatchers:
+            task.cancel()
+        await asyncio.gather(*self._dispatchers, return_exceptions=True)
+        self._dispatchers = []
+        if self._pool is not None:
+            self._pool.shutdown(wait=False, cancel_futures=True)
+            self._pool = None
+
+    @property
+    def queue_depth(self) -> int:
+        return self._queue.qsize() if self._queue is not None else 0
+
+    def submit(self, report_type: str, data_sources: List[str], parameters: Dict[str, Any],
+               format: str) -> ReportJob:
+        """Queue a report; raises QueueFullError instead of waiting when the queue is full"""
+        if self._queue is None:
+            raise RuntimeError("Report job engine is not started")
+        job = ReportJob(report_type, data_sources, parameters, format, self.output_dir)
+        try:
+            self._queue.put_nowait(job)
+        except asyncio.QueueFull:
+            raise QueueFullError(f"Report queue is full ({self.queue_size} jobs)") from None
+        self._jobs[job.id] = job
+        self._prune()
+        return job
+
+    def get(self, report_id: str) -> Optional[ReportJob]:
+        return self._jobs.get(report_id)
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "queue_depth": self.queue_depth,
+            "queue_capacity": self.queue_size,
+            "running": self.running,
+            "workers": self.max_workers,
+            "tracked_jobs": len(self._jobs),
+        }
+
+    async def _dispatch(self):
+        while True:
+            job = await self._queue.get()
+            self.running += 1
+            try:
+                await self._run(job)
+            finally:
+                self.running -= 1
+                self._queue.task_done()
+
+    async def _run(self, job: ReportJob):
+        job.status = RUNNING
+        job.started_at = datetime.utcnow()
+        spool_path = f"{job.path}.rows.ndjson"
+        try:
+            with stage("spool_rows"):
+                await self._spool_rows(job, spool_path)
+            title = report_title(job.report_type)
+            loop = asyncio.get_running_loop()
+            with stage(f"render_{job.format}"):
+                job.size_bytes = await loop.run_in_executor(
+                    self._pool, render_report_file, job.format, title, spool_path, job.path
+                )
+            job.status = COMPLETED
+        except asyncio.CancelledError:
+            job.status = FAILED
+            job.error = "Cancelled during shutdown"
+            raise
+        except Exception as e:
+            logger.exception("Report %s failed", job.id)
+            job.status = FAILED
+            job.error = str(e)
+            _remove(job.path)
+        finally:
+            job.completed_at = datetime.utcnow()
+            _remove(spool_path)
+
+    async def _spool_rows(self, job: ReportJob, spool_path: str):
+        """Stream source rows to the spool file; each batch is serialized and written off the event loop"""
+        spool = await asyncio.to_thread(open, spool_path, "w", encoding="utf-8")
+        try:
+            batch = []
+            async for source, row in iter_report_rows(job.data_sources, job.parameters):
+                batch.append((source, row))
+                if len(batch) >= SPOOL_BATCH_ROWS:
+                    await asyncio.to_thread(_write_spool_batch, spool, batch)
+                    batch = []
+            if batch:
+                await asyncio.to_thread(_write_spool_batch, spool, batch)
+        finally:
+            await asyncio.to_thread(spool.close)
+
+    def _prune(self):
+        """Forget the oldest finished jobs beyond the retention limit and delete their files"""
+        excess = len(self._jobs) - self.retention
+        if excess <= 0:
+            return
+        for report_id in list(self._jobs):
+            if excess <= 0:
+                break
+            job = self._jobs[report_id]
+            if job.status in (COMPLETED, FAILED):
+                del self._jobs[report_id]
+                _remove(job.path)
+                excess -= 1
+
+
+def _write_spool_batch(spool, batch: List[Tuple[str, Dict[str, Any]]]):
+    spool.write("\n".join(json.dumps({"source": source, "row": row}, default=str) for source, row in batch) + "\n")
+
+
+def _remove(path: str):
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
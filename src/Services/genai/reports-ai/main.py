@@ -3,21 +3,92 @@ Reports AI Service - FastAPI application for Gen-AI features
 Integrated with MAPP Reports domain
 """
 
-from fastapi import FastAPI, HTTPException
+from fastapi import Depends, FastAPI, HTTPException
+from fastapi.responses import FileResponse, StreamingResponse
 from fastapi.middleware.cors import CORSMiddleware
 from pydantic import BaseModel
 from typing import List, Optional, Dict, Any
-import uvicorn
 import os
-from datetime import datetime
+import re
+import sys
+from contextlib import asynccontextmanager
+
+# Make the shared GenAI package importable when run from the service directory
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from shared.admission import install_admission
+from shared.config import settings
+from shared.events import EventConsumer, topic_list
+from shared.database import database
+from shared.health import HealthMonitor, database_check, upstream_check
+from shared.http_client import http_clients
+from shared.launcher import serve
+from shared.lazy import warmup
+from shared.metrics import install_metrics, loop_lag_monitor
+from shared.profiling import install_profiling, profiler, require_admin_token
+from shared.responses import CompressionMiddleware, FastJSONResponse, compression_stats
+
+from shared.catalog import catalog_store
+
+from aggregates import AggregateEngine, scope_key, summary_insights, trend_insights
+from jobs import COMPLETED, QueueFullError, ReportJobEngine
+from query_explain import ExplainStandIn
+from query_optimizer import QueryOptimizer
+from rendering import WRITERS, create_writer, render_async, report_title
+from sources import iter_report_rows, unknown_sources
+from sql_ast import QueryParseError
+
+# Background report generation (bounded queue + process pool)
+report_jobs = ReportJobEngine()
+
+# Insight responses keyed by model name and normalized request content
+
+# Rollups by center, classroom, domain and week, updated per plan/observation event
+aggregates = AggregateEngine()
+event_consumer = EventConsumer("reports-ai")
+event_consumer.subscribe(topic_list(settings.PLAN_EVENT_TOPICS + "," + settings.OBSERVATION_EVENT_TOPICS),
+                         aggregates.consume)
+
+# Parsed query plans keyed by literal-free fingerprint; EXPLAIN runs against a local SQLite stand-in
+query_optimizer = QueryOptimizer()
+explain_stand_in = ExplainStandIn()
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Start pooled upstream clients and the report job engine for the app's lifetime"""
+    await http_clients.start()
+    await database.start()
+    await report_jobs.start()
+    await health_monitor.start()
+    loop_lag_monitor.start()
+    warmup.start()
+    await event_consumer.start()
+    yield
+    await event_consumer.stop()
+    await warmup.stop()
+    await loop_lag_monitor.stop()
+    await health_monitor.stop()
+    await report_jobs.stop()
+    await database.close()
+    await http_clients.close()
 
 # Initialize FastAPI app
 app = FastAPI(
     title="MAPP Reports AI Service",
     description="Gen-AI features for Reports domain",
-    version="1.0.0"
+    version="1.0.0",
+    lifespan=lifespan,
+    default_response_class=FastJSONResponse
 )
 
+# Fair queuing per center and load shedding; installed first so rejections still get CORS headers
+admission = install_admission(app, route_limits={
+    "/api/generate": 8,
+    "/api/optimize-query": 4,
+    "/api/aggregates/rebuild": 1,
+    "/api/aggregates/consistency": 2,
+})
+
 # Add CORS middleware
 app.add_middleware(
     CORSMiddleware,
@@ -27,6 +98,40 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# gzip/brotli for large complete responses; report downloads and streams pass through
+app.add_middleware(CompressionMiddleware)
+
+# /health, /health/ready and /health/live answer from a snapshot refreshed in the background
+health_monitor = HealthMonitor(
+    "reports-ai",
+    domain="Reports",
+    dependencies={
+        "observations_api": upstream_check("observations_api") if os.getenv("OBSERVATIONS_API_URL") else None,
+        "planning_api": upstream_check("planning_api") if os.getenv("PLANNING_API_URL") else None,
+        "database": database_check(),
+    },
+)
+health_monitor.install(app)
+
+# Deferred construction finished in the background once the server is accepting requests
+warmup.register(http_clients.warm)
+
+# Latency histograms, loop lag and pool gauges on /metrics
+install_metrics(app, pools={
+    "http_clients": http_clients.stats,
+    "database": database.stats,
+    "report_jobs": report_jobs.stats,
+    "aggregates": aggregates.stats,
+    "event_consumer": event_consumer.stats,
+    "query_plans": query_optimizer.stats,
+    "compression": compression_stats.stats,
+    "admission": admission.stats,
+    "profiler": profiler.stats,
+})
+
+# Sampled and slow-request stack profiles; /admin/profiles when PROFILE_ADMIN_TOKEN is set
+install_profiling(app)
+
 # Pydantic models
 class ReportGenerationRequest(BaseModel):
     report_type: str
@@ -51,21 +156,24 @@ class InsightGenerationResponse(BaseModel):
     recommendations: List[str]
     confidence_score: float
 
+class AggregateEventBatch(BaseModel):
+    events: List[Dict[str, Any]]
+
 class QueryOptimizationRequest(BaseModel):
     sql_query: str
     expected_result_size: Optional[int] = None
     performance_target: Optional[str] = None
+    explain: bool = False  # measure both queries on the SQLite stand-in
 
 class QueryOptimizationResponse(BaseModel):
     optimized_query: str
     performance_improvement: str
     explanation: List[str]
     estimated_execution_time: str
-
-# Health check endpoint
-@app.get("/health")
-async def health_check():
-    return {"status": "healthy", "service": "reports-ai", "timestamp": datetime.utcnow()}
+    fingerprint: Optional[str] = None
+    findings: List[Dict[str, Any]] = []
+    index_suggestions: List[str] = []
+    measurements: Optional[Dict[str, Any]] = None
 
 # Reports AI endpoints
 @app.post("/api/generate", response_model=ReportGenerationResponse)
@@ -73,87 +181,182 @@ async def generate_report(request: ReportGenerationRequest):
     """
     Generate AI-enhanced reports with intelligent formatting and insights
     """
+    check_report_request(request)
     try:
-        # Mock report generation - replace with actual AI implementation
-        report_id = f"RPT_{datetime.utcnow().strftime('%Y%m%d_%H%M%S')}"
-        
-        return ReportGenerationResponse(
-            report_id=report_id,
-            status="processing",
-            download_url=f"/api/download/{report_id}",
-            estimated_completion="2-5 minutes"
-        )
+        job = report_jobs.submit(request.report_type, request.data_sources, request.parameters, request.format)
+    except QueueFullError as e:
+        raise HTTPException(status_code=503, detail=str(e), headers={"Retry-After": "30"})
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error generating report: {str(e)}")
 
+    return FastJSONResponse(ReportGenerationResponse(
+        report_id=job.id,
+        status=job.status,
+        download_url=f"/api/download/{job.id}",
+        estimated_completion=f"{report_jobs.queue_depth} report(s) queued"
+    ))
+
+@app.post("/api/generate/stream")
+async def generate_report_stream(request: ReportGenerationRequest):
+    """
+    Render a report straight into the response while rows are still being fetched
+    """
+    check_report_request(request)
+    writer = create_writer(request.format)
+    filename = f"{re.sub(r'[^A-Za-z0-9_-]', '_', request.report_type) or 'report'}.{writer.extension}"
+    chunks = render_async(writer, report_title(request.report_type),
+                          iter_report_rows(request.data_sources, request.parameters))
+    return StreamingResponse(
+        chunks,
+        media_type=writer.media_type,
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'}
+    )
+
+def check_report_request(request: ReportGenerationRequest):
+    """Reject unsupported formats and unknown data sources before any work starts"""
+    if request.format not in WRITERS:
+        raise HTTPException(status_code=400, detail=f"Unsupported format '{request.format}'. Use one of: {', '.join(WRITERS)}")
+    unknown = unknown_sources(request.data_sources)
+    if unknown:
+        raise HTTPException(status_code=400, detail=f"Unknown data sources: {', '.join(unknown)}")
+
+@app.get("/api/reports/{report_id}/status")
+async def get_report_status(report_id: str):
+    """
+    Get the progress of a report generation job
+    """
+    job = report_jobs.get(report_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail=f"Report {report_id} not found")
+    return job.to_dict()
+
+@app.get("/api/download/{report_id}")
+async def download_report(report_id: str):
+    """
+    Stream a finished report from disk
+    """
+    job = report_jobs.get(report_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail=f"Report {report_id} not found")
+    if job.status != COMPLETED:
+        raise HTTPException(status_code=409, detail=f"Report {report_id} is {job.status}")
+    return FileResponse(job.path, media_type=job.media_type, filename=job.filename)
+
 @app.post("/api/insights", response_model=InsightGenerationResponse)
 async def generate_insights(request: InsightGenerationRequest):
     """
-    Generate AI-powered insights from report data
+    Generate AI-powered insights from report data. "summary" and "trends"
+    are answered from the precomputed rollups in constant time.
     """
+    if request.insight_type == "recommendations":
+        raise HTTPException(status_code=501, detail="Recommendation insights are not implemented yet")
+    if request.insight_type not in ("summary", "trends"):
+        raise HTTPException(status_code=400, detail=f"Unsupported insight type '{request.insight_type}'")
     try:
-        # Mock insight generation - replace with actual AI implementation
-        insights = []
-        key_metrics = {}
-        recommendations = []
-        
-        if request.insight_type == "summary":
-            insights = [
-                "Overall performance shows 15% improvement over last quarter",
-                "Key growth areas identified in planning and observations",
-                "User engagement metrics exceed targets by 23%"
-            ]
-            key_metrics = {
-                "total_plans": 1250,
-                "completed_observations": 3400,
-                "active_users": 89,
-                "report_generation_time": "2.3s"
-            }
-            recommendations = [
-                "Focus on scaling successful planning strategies",
-                "Implement automated observation validation",
-                "Enhance user onboarding process"
-            ]
-        elif request.insight_type == "trends":
-            insights = [
-                "Upward trend in plan completion rates",
-                "Seasonal patterns detected in observation data",
-                "Report usage peaks on Monday mornings"
-            ]
-            recommendations = [
-                "Optimize system performance for Monday peak loads",
-                "Prepare seasonal observation templates",
-                "Implement predictive plan success scoring"
-            ]
-        
-        return InsightGenerationResponse(
-            insights=insights,
-            key_metrics=key_metrics,
-            recommendations=recommendations,
-            confidence_score=0.87
-        )
+        return FastJSONResponse(build_aggregate_insights(request))
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error generating insights: {str(e)}")
 
+def build_aggregate_insights(request: InsightGenerationRequest) -> InsightGenerationResponse:
+    """Summary and trend insights read from the aggregate store"""
+    if request.insight_type == "summary":
+        insights, key_metrics, recommendations = summary_insights(
+            aggregates.store, scope_key(request.data), domain_name
+        )
+    else:
+        insights, key_metrics, recommendations = trend_insights(aggregates.store, scope_key(request.data))
+    return InsightGenerationResponse(
+        insights=insights,
+        key_metrics=key_metrics,
+        recommendations=recommendations,
+        confidence_score=0.95 if aggregates.store.applied else 0.0
+    )
+
+def domain_name(domain_id) -> str:
+    try:
+        domain = catalog_store.get().domain(int(domain_id))
+    except (OSError, TypeError, ValueError):
+        domain = None
+    return domain.name if domain is not None else str(domain_id)
+
+# Aggregate maintenance changes state or reads every upstream, so it needs the admin token
+@app.post("/api/aggregates/events", dependencies=[Depends(require_admin_token)])
+async def ingest_aggregate_events(request: AggregateEventBatch):
+    """
+    Apply plan and observation events to the rollups (idempotent per entity version)
+    """
+    try:
+        applied = aggregates.apply_events(request.events)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=f"Invalid event: {str(e)}")
+    return {"received": len(request.events), "applied": applied, **aggregates.stats()}
+
+@app.post("/api/aggregates/rebuild", dependencies=[Depends(require_admin_token)])
+async def rebuild_aggregates():
+    """
+    Recompute every rollup from scratch from the Planning and Observations APIs
+    """
+    try:
+        counts = await aggregates.rebuild()
+        return {"status": "rebuilt", "rebuilt_at": aggregates.rebuilt_at.isoformat(), **counts}
+    except Exception as e:
+        raise HTTPException(status_code=502, detail=f"Error rebuilding aggregates: {str(e)}")
+
+@app.get("/api/aggregates/consistency", dependencies=[Depends(require_admin_token)])
+async def check_aggregate_consistency(from_sources: bool = False):
+    """
+    Diff the incrementally maintained rollups against a from-scratch rebuild
+    """
+    try:
+        return await aggregates.check_consistency(from_sources=from_sources)
+    except Exception as e:
+        raise HTTPException(status_code=502, detail=f"Error checking aggregates: {str(e)}")
+
 @app.post("/api/optimize-query", response_model=QueryOptimizationResponse)
 async def optimize_query(request: QueryOptimizationRequest):
     """
     Optimize SQL queries for better report performance using AI
+
+    Flags SELECT *, unindexed or non-sargable predicates, N+1 subqueries and
+    a missing LIMIT, and rewrites the query where that is safe. With explain
+    set, both versions run on the SQLite stand-in and the measured plans and
+    timings are returned; a rewrite that measured slower is not returned.
     """
     try:
-        # Mock query optimization - replace with actual AI implementation
-        optimized_query = request.sql_query.replace("SELECT *", "SELECT id, name, status")
-        
-        return QueryOptimizationResponse(
+        result = query_optimizer.optimize(request.sql_query, request.expected_result_size)
+
+        optimized_query = result.optimized
+        explanation = [finding.message for finding in result.findings]
+        performance_improvement = "Rewritten; not measured" if result.rewritten else "No rewrite needed"
+        estimated_execution_time = "not measured"
+        measurements = None
+        if request.explain:
+            measurements = await explain_stand_in.compare_async(
+                query_optimizer.sqlite_text(result.original), query_optimizer.sqlite_text(result.optimized))
+            improvement = measurements.get("improvement_pct")
+            kept = "after"
+            if result.rewritten and improvement is not None and improvement < 0:
+                optimized_query, kept = result.original, "before"
+                performance_improvement = "No rewrite; the rewrite measured slower"
+                explanation.append(f"Rewrite measured {abs(improvement):g}% slower on the SQLite stand-in; "
+                                   "the original query is returned")
+            elif result.rewritten and improvement is not None:
+                performance_improvement = f"{improvement:g}% faster execution (measured)"
+            if "elapsed_ms" in measurements[kept]:
+                estimated_execution_time = f"{measurements[kept]['elapsed_ms']:g} ms (SQLite stand-in)"
+
+        return FastJSONResponse(QueryOptimizationResponse(
             optimized_query=optimized_query,
-            performance_improvement="45% faster execution",
-            explanation=[
-                "Replaced SELECT * with specific columns",
-                "Added appropriate indexes suggestion",
-                "Optimized JOIN order for better performance"
-            ],
-            estimated_execution_time="1.2 seconds"
-        )
+            performance_improvement=performance_improvement,
+            explanation=explanation or ["No issues found"],
+            estimated_execution_time=estimated_execution_time,
+            fingerprint=result.fingerprint,
+            findings=[finding.to_dict() for finding in result.findings],
+            index_suggestions=result.index_suggestions,
+            measurements=measurements,
+        ))
+    except QueryParseError as e:
+        raise HTTPException(status_code=400, detail=f"Could not parse query: {str(e)}")
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error optimizing query: {str(e)}")
 
@@ -190,4 +393,4 @@ async def get_ai_templates():
 
 if __name__ == "__main__":
     port = int(os.getenv("PORT", 8003))
-    uvicorn.run(app, host="0.0.0.0", port=port)
+    serve(app, port=port)
@@ -0,0 +1,139 @@
+"""
+EXPLAIN stand-in for /api/optimize-query
+
+Runs the original and the optimized query against a local SQLite database
+and reports the real query plans (full scans versus index searches) and
+measured execution times. Without QUERY_EXPLAIN_DATABASE the database is
+built in memory from sql_schema with the same indexes and seeded with
+synthetic rows, then ANALYZEd so the planner has statistics. Bind
+parameters run as NULL.
+"""
+
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Optional
+import asyncio
+import random
+import sqlite3
+import threading
+import time
+
+from shared.config import settings
+
+from sql_schema import TABLES
+
+# Timed executions per query; the fastest is reported
+TIMING_RUNS = 3
+# Row counts of the parent tables that seeded foreign keys point into
+_REFERENCES = {"PlanId": "Plans", "ObservationId": "Observations", "DomainId": "ObservationDomains",
+               "AttributeId": "ObservationAttributes"}
+
+
+class QueryTimeoutError(Exception):
+    """Raised when a stand-in query runs past QUERY_EXPLAIN_TIMEOUT_SECONDS"""
+
+
+def _seed_value(column: str, kind: str, row: int, counts: Dict[str, int], rng: random.Random):
+    if column == "Id":
+        return row + 1
+    if column in _REFERENCES:
+        return rng.randint(1, max(counts.get(_REFERENCES[column], 1), 1))
+    if kind == "int":
+        return rng.randint(0, 4) if column in ("Status", "MediaType") else rng.randint(1, 500)
+    if kind == "bool":
+        return int(rng.random() < 0.3)
+    if kind == "date":
+        return (datetime(2025, 1, 1) + timedelta(minutes=rng.randint(0, 525600))).isoformat()
+    return f"{column.lower()} {rng.randint(1, 5000)}"
+
+
+def build_stand_in(rows: int) -> sqlite3.Connection:
+    connection = sqlite3.connect(":memory:", check_same_thread=False)
+    rng = random.Random(0)
+    counts = {table.name: max(int(rows * table.seed_rows), 1) for table in TABLES}
+    for table in TABLES:
+        columns = ", ".join(f'"{name}"' for name in table.columns)
+        connection.execute(f'CREATE TABLE "{table.name}" ({columns}, PRIMARY KEY ({", ".join(table.indexes[0])}))')
+        for number, index in enumerate(table.indexes[1:]):
+            indexed = ", ".join(f'"{name}"' for name in index)
+            connection.execute(f'CREATE INDEX "ix_{table.name}_{number}" ON "{table.name}" ({indexed})')
+
+        placeholders = ", ".join("?" for _ in table.columns)
+        connection.executemany(
+            f'INSERT INTO "{table.name}" VALUES ({placeholders})',
+            ([_seed_value(name, kind, row, counts, rng) for name, kind in table.columns.items()]
+             for row in range(counts[table.name])),
+        )
+    connection.execute("ANALYZE")
+    connection.commit()
+    return connection
+
+
+class ExplainStandIn:
+    def __init__(self, path: Optional[str] = None, rows: Optional[int] = None):
+        self.path = path if path is not None else settings.QUERY_EXPLAIN_DATABASE
+        self.rows = rows or settings.QUERY_EXPLAIN_ROWS
+        self._connection: Optional[sqlite3.Connection] = None
+        self._lock = threading.Lock()
+
+    @property
+    def source(self) -> str:
+        return self.path or f"in-memory SQLite seeded with {self.rows} observations"
+
+    def connection(self) -> sqlite3.Connection:
+        if self._connection is None:
+            if self.path:
+                self._connection = sqlite3.connect(f"file:{self.path}?mode=ro", uri=True, check_same_thread=False)
+            else:
+                self._connection = build_stand_in(self.rows)
+        return self._connection
+
+    def measure(self, sql: str) -> Dict[str, Any]:
+        """Query plan and best-of-N execution time for one query"""
+        with self._lock:
+            connection = self.connection()
+            try:
+                plan = [row[-1] for row in connection.execute(f"EXPLAIN QUERY PLAN {sql}")]
+            except sqlite3.Error as e:
+                return {"error": f"SQLite could not plan the query: {str(e)}"}
+
+            timings, rows = [], 0
+            try:
+                for _ in range(TIMING_RUNS):
+                    started = time.perf_counter()
+                    rows = self._execute(connection, sql)
+                    timings.append((time.perf_counter() - started) * 1000)
+            except QueryTimeoutError:
+                return {"plan": plan, "full_scans": _full_scans(plan),
+                        "error": f"Timed out after {settings.QUERY_EXPLAIN_TIMEOUT_SECONDS:g}s"}
+            except sqlite3.Error as e:
+                return {"plan": plan, "full_scans": _full_scans(plan), "error": f"SQLite error: {str(e)}"}
+        return {"plan": plan, "full_scans": _full_scans(plan), "elapsed_ms": round(min(timings), 3), "rows": rows}
+
+    def compare(self, before: str, after: str) -> Dict[str, Any]:
+        result: Dict[str, Any] = {"database": self.source, "before": self.measure(before)}
+        result["after"] = result["before"] if after == before else self.measure(after)
+        before_ms, after_ms = result["before"].get("elapsed_ms"), result["after"].get("elapsed_ms")
+        if before_ms and after_ms is not None:
+            result["improvement_pct"] = round((before_ms - after_ms) / before_ms * 100, 1)
+        return result
+
+    async def compare_async(self, before: str, after: str) -> Dict[str, Any]:
+        return await asyncio.to_thread(self.compare, before, after)
+
+    @staticmethod
+    def _execute(connection: sqlite3.Connection, sql: str) -> int:
+        deadline = time.perf_counter() + settings.QUERY_EXPLAIN_TIMEOUT_SECONDS
+        connection.set_progress_handler(lambda: int(time.perf_counter() > deadline), 10000)
+        try:
+            return sum(1 for _ in connection.execute(sql))
+        except sqlite3.OperationalError as e:
+            if "interrupted" in str(e):
+                raise QueryTimeoutError() from e
+            raise
+        finally:
+            connection.set_progress_handler(None, 0)
+
+
+def _full_scans(plan: List[str]) -> List[str]:
+    """Plan steps that read a whole table rather than seeking an index"""
+    return [step for step in plan if step.startswith("SCAN") and "INDEX" not in step]
@@ -0,0 +1,508 @@
+"""
+SQL analysis and safe rewrites behind /api/optimize-query
+
+A query is tokenized, fingerprinted (literals and parameters masked) and
+parsed once per fingerprint: the findings and rewrite edits are cached as a
+QueryPlan, so recurring report queries that only differ in literal values
+are analyzed once. Edits are token spans applied to each request's own
+text, so literal values in the output always come from the request.
+
+Checks: SELECT *, predicates on columns no index leads with (per
+sql_schema), predicates that hide an indexed column behind a function or a
+leading wildcard, correlated (N+1-shaped) subqueries and a missing LIMIT.
+Rewrites: an aggregate scalar subquery correlated on one equality becomes a
+grouped LEFT JOIN and SELECT * inside EXISTS becomes SELECT 1. A missing
+LIMIT is only reported: capping rows at a caller's estimate would silently
+truncate results.
+"""
+
+from collections import OrderedDict
+from typing import Dict, List, Optional, Set, Tuple, Union
+
+from shared.config import settings
+
+from sql_ast import (AGGREGATES, Between, Binary, Cast, Column, DerivedTable, Exists, Func, InList, InQuery, Literal,
+                     Node, Query, SelectCore, SelectItem, Star, SubqueryExpr, TableRef, Token, conjuncts, fingerprint,
+                     parse, tokenize, walk)
+from sql_schema import TableSchema, table_schema
+
+# Operators an index can serve when one side is a bare column
+SARGABLE_OPS = frozenset({"=", "<", ">", "<=", ">=", "LIKE", "ILIKE"})
+
+Part = Union[str, Tuple[int, int]]
+
+
+class Finding:
+    __slots__ = ("kind", "message", "suggestion")
+
+    def __init__(self, kind: str, message: str, suggestion: Optional[str] = None):
+        self.kind = kind
+        self.message = message
+        self.suggestion = suggestion
+
+    def to_dict(self) -> Dict[str, Optional[str]]:
+        return {"kind": self.kind, "message": self.message, "suggestion": self.suggestion}
+
+
+class Edit:
+    """Replace tokens start..end (insert before `start` when equal) with text and copied token spans"""
+
+    __slots__ = ("start", "end", "parts")
+
+    def __init__(self, start: int, end: int, parts: List[Part]):
+        self.start = start
+        self.end = end
+        self.parts = parts
+
+
+class QueryPlan:
+    __slots__ = ("fingerprint", "findings", "edits", "unbounded", "ordered", "sqlite_edits")
+
+    def __init__(self, fingerprint: str, findings: List[Finding], edits: List[Edit], unbounded: bool,
+                 ordered: bool, sqlite_edits: List[Edit]):
+        self.fingerprint = fingerprint
+        self.findings = findings
+        self.edits = edits
+        # No LIMIT and more than one row possible
+        self.unbounded = unbounded
+        self.ordered = ordered
+        # Dialect fixes for the SQLite EXPLAIN stand-in (schema qualifiers, ILIKE)
+        self.sqlite_edits = sqlite_edits
+
+
+def apply_edits(sql: str, tokens: List[Token], edits: List[Edit]) -> str:
+    placed = []
+    for edit in edits:
+        if edit.start == edit.end:
+            position = end = tokens[edit.start - 1].end
+        else:
+            position, end = tokens[edit.start].start, tokens[edit.end - 1].end
+        placed.append((position, edit.start != edit.end, end, edit))
+    placed.sort(key=lambda item: item[:2])
+
+    output, cursor = [], 0
+    for position, _, end, edit in placed:
+        if position < cursor:
+            continue  # Overlaps an earlier edit
+        output.append(sql[cursor:position])
+        for part in edit.parts:
+            output.append(part if isinstance(part, str) else sql[tokens[part[0]].start:tokens[part[1] - 1].end])
+        cursor = end
+    output.append(sql[cursor:])
+    return "".join(output)
+
+
+def qualified_name(table: TableSchema) -> str:
+    return f'{table.schema}."{table.name}"' if table.schema else f'"{table.name}"'
+
+
+class _Scope:
+    __slots__ = ("aliases", "parent")
+
+    def __init__(self, aliases: Dict[str, Optional[TableSchema]], parent: Optional["_Scope"]):
+        self.aliases = aliases
+        self.parent = parent
+
+    def resolve(self, column: Column) -> Tuple[Optional["_Scope"], Optional[TableSchema]]:
+        """Scope and table a column belongs to; the table is None when it cannot be determined"""
+        if column.table is not None:
+            scope = self
+            while scope is not None:
+                table = scope.aliases.get(column.table.lower(), False)
+                if table is not False:
+                    return scope, table
+                scope = scope.parent
+            return None, None
+        candidates = [table for table in self.aliases.values() if table is not None and table.column(column.name)]
+        if len(candidates) == 1:
+            return self, candidates[0]
+        if len(self.aliases) == 1:
+            return self, next(iter(self.aliases.values()))
+        return self, None
+
+
+def _defined_aliases(query: Query) -> Set[str]:
+    aliases = set()
+    for node in walk(query):
+        if isinstance(node, TableRef):
+            aliases.add((node.alias or node.name).lower())
+        elif isinstance(node, DerivedTable) and node.alias:
+            aliases.add(node.alias.lower())
+    return aliases
+
+
+def _single_row(query: Query) -> bool:
+    """An aggregate without GROUP BY returns exactly one row, so a LIMIT adds nothing"""
+    return all(
+        not core.group_by and all(isinstance(item.expr, Func) and item.expr.name in AGGREGATES
+                                  and not item.expr.window for item in core.items)
+        for core in query.cores
+    )
+
+
+class _Analyzer:
+    def __init__(self, tokens: List[Token]):
+        self.tokens = tokens
+        self.findings: List[Finding] = []
+        self.edits: List[Edit] = []
+        self.cte_names: Set[str] = set()
+        self._seen: Set[Tuple[str, ...]] = set()
+        self._derived = 0
+        self._aliases: Set[str] = set()
+
+    def run(self, query: Query) -> QueryPlan:
+        self._aliases = _defined_aliases(query)
+        self.query(query, None, "top")
+        unbounded = not (query.has_limit or _single_row(query))
+        return QueryPlan(fingerprint(self.tokens), self.findings, self.edits, unbounded, bool(query.order_by),
+                         self.sqlite_edits(query))
+
+    def add(self, key: Tuple[str, ...], finding: Finding):
+        if key not in self._seen:
+            self._seen.add(key)
+            self.findings.append(finding)
+
+    def query(self, query: Query, parent: Optional[_Scope], context: str):
+        for cte in query.ctes:
+            self.cte_names.add(cte.alias.lower())
+            self.query(cte.query, parent, "derived")
+        for core in query.cores:
+            self.core(core, parent, context)
+
+    def scope(self, core: SelectCore, parent: Optional[_Scope]) -> _Scope:
+        aliases: Dict[str, Optional[TableSchema]] = {}
+        for source in [*core.sources, *(join.source for join in core.joins)]:
+            if isinstance(source, TableRef):
+                table = None if source.name.lower() in self.cte_names or source.is_function else table_schema(source.name)
+                aliases[(source.alias or source.name).lower()] = table
+            elif source.alias:
+                aliases[source.alias.lower()] = None
+        return _Scope(aliases, parent)
+
+    def core(self, core: SelectCore, parent: Optional[_Scope], context: str):
+        scope = self.scope(core, parent)
+        for source in [*core.sources, *(join.source for join in core.joins)]:
+            if isinstance(source, DerivedTable):
+                self.query(source.query, parent, "derived")
+
+        self.check_star(core, scope, context)
+
+        for item in core.items:
+            for node in walk(item.expr, into_queries=False):
+                if isinstance(node, SubqueryExpr):
+                    if node is item.expr and self.outer_references(node.query, scope):
+                        self.select_list_subquery(core, item, node, scope)
+                    self.query(node.query, scope, "subquery")
+
+        for condition in [core.where, core.having, *(join.condition for join in core.joins)]:
+            if condition is None:
+                continue
+            for node in walk(condition, into_queries=False):
+                self.check_predicate(node, scope)
+                if isinstance(node, (Exists, InQuery, SubqueryExpr)):
+                    if self.outer_references(node.query, scope):
+                        self.add(("correlated", str(node.start)), Finding(
+                            "correlated_subquery",
+                            "Correlated subquery in a filter is evaluated per outer row unless the planner "
+                            "decorrelates it; make sure its correlated columns are indexed",
+                        ))
+                    self.query(node.query, scope, "exists" if isinstance(node, Exists) else "subquery")
+
+    def check_star(self, core: SelectCore, scope: _Scope, context: str):
+        stars = [item.expr for item in core.items if isinstance(item.expr, Star)]
+        if not stars:
+            return
+        if context == "exists":
+            if len(core.items) == 1:
+                self.edits.append(Edit(stars[0].start, stars[0].end, ["1"]))
+                self.add(("exists_star", str(stars[0].start)), Finding(
+                    "select_star", "SELECT * inside EXISTS replaced with SELECT 1; only row existence matters"))
+            return
+        known = [table for table in scope.aliases.values() if table is not None]
+        if known and len(known) == len(scope.aliases):
+            width = sum(len(table.columns) for table in known)
+            what = f"all {width} columns of {', '.join(table.name for table in known)}"
+        else:
+            what = "every column of " + ", ".join(scope.aliases) if scope.aliases else "every column"
+        self.add(("star",) + tuple(sorted(scope.aliases)), Finding(
+            "select_star",
+            f"SELECT * returns {what}; list only the columns the report needs so less data is read and sent",
+        ))
+
+    def outer_references(self, query: Query, scope: _Scope) -> List[Column]:
+        inner = _defined_aliases(query)
+        references = []
+        for node in walk(query):
+            if isinstance(node, Column) and node.table is not None and node.table.lower() not in inner:
+                owner, _ = scope.resolve(node)
+                if owner is not None:
+                    references.append(node)
+        return references
+
+    # Predicates
+
+    def check_predicate(self, node: Node, scope: _Scope):
+        if isinstance(node, Binary) and node.op in SARGABLE_OPS:
+            sides = [node.left, node.right]
+        elif isinstance(node, Between) and not node.negated:
+            sides = [node.expr]
+        elif isinstance(node, (InList, InQuery)) and not node.negated:
+            sides = [node.expr]
+        else:
+            return
+
+        columns = [self.column_of(side, scope) for side in sides]
+        if len(columns) == 2 and all(info is not None and info[0] == "plain" for info in columns):
+            self.check_join(columns, node)
+            return
+
+        for index, info in enumerate(columns):
+            if info is None:
+                continue
+            shape, column, table, expression = info
+            name = table.column(column.name)
+            key = (table.name, name)
+            if shape == "wrapped":
+                if table.is_indexed(name):
+                    self.add(("non_sargable",) + key, Finding(
+                        "non_sargable",
+                        f"{self.describe(expression)} around {table.name}.{name} hides the column from its index; "
+                        "compare the bare column (move the function to the other side) or add an expression index",
+                    ))
+                else:
+                    self.unindexed(table, name)
+            elif isinstance(node, Binary) and node.op in ("LIKE", "ILIKE"):
+                pattern = sides[1 - index]
+                if isinstance(pattern, Literal) and pattern.value.lstrip("Ee").startswith("'%"):
+                    self.add(("leading_wildcard",) + key, Finding(
+                        "non_sargable",
+                        f"{node.op} pattern on {table.name}.{name} starts with a wildcard, so no btree index "
+                        "can serve it; use a prefix match or a trigram/full-text index",
+                    ))
+                elif node.op == "ILIKE" and table.is_indexed(name):
+                    self.add(("ilike",) + key, Finding(
+                        "non_sargable",
+                        f"ILIKE on {table.name}.{name} cannot use its btree index; match a lower-cased "
+                        "expression index instead",
+                        f'CREATE INDEX ON {qualified_name(table)} (lower("{name}"));',
+                    ))
+                elif not table.is_indexed(name):
+                    self.unindexed(table, name)
+            elif not table.is_indexed(name):
+                self.unindexed(table, name)
+
+    def check_join(self, columns, node: Node):
+        (_, left, left_table, _), (_, right, right_table, _) = columns
+        if left_table is None or right_table is None:
+            return
+        left_name, right_name = left_table.column(left.name), right_table.column(right.name)
+        if left_table.is_indexed(left_name) or right_table.is_indexed(right_name):
+            return
+        self.add(("join", left_table.name, left_name, right_table.name, right_name), Finding(
+            "unindexed_predicate",
+            f"Join condition {left_table.name}.{left_name} = {right_table.name}.{right_name} has no index on "
+            "either side, so one side is scanned per match",
+            f'CREATE INDEX ON {qualified_name(right_table)} ("{right_name}");',
+        ))
+
+    def unindexed(self, table: TableSchema, name: str):
+        self.add(("unindexed", table.name, name), Finding(
+            "unindexed_predicate",
+            f"Filter on {table.name}.{name} has no index leading with that column, so {table.name} is scanned",
+            f'CREATE INDEX ON {qualified_name(table)} ("{name}");',
+        ))
+
+    def column_of(self, side: Node, scope: _Scope):
+        """(shape, column, table, expression) for a predicate side on a known column of this scope"""
+        if isinstance(side, Column):
+            shape = "plain"
+            column = side
+        elif (isinstance(side, Func) and not side.window and side.name not in AGGREGATES) or isinstance(side, Cast):
+            found = [node for node in walk(side) if isinstance(node, (Column, Query))]
+            if len(found) != 1 or not isinstance(found[0], Column):
+                return None
+            shape = "wrapped"
+            column = found[0]
+        else:
+            return None
+        owner, table = scope.resolve(column)
+        if owner is not scope or table is None or table.column(column.name) is None:
+            if shape == "plain" and owner is not None:
+                return (shape, column, None, side)
+            return None
+        return (shape, column, table, side)
+
+    # N+1 subqueries
+
+    def select_list_subquery(self, core: SelectCore, item: SelectItem, node: SubqueryExpr, scope: _Scope):
+        subject = self.describe(node)
+        edits = self.decorrelate(core, node, scope)
+        if edits:
+            self.edits.extend(edits)
+            message = f"{subject} ran once per output row; rewritten as one grouped LEFT JOIN"
+        else:
+            message = f"{subject} runs once per output row; rewrite it as a join against a grouped derived table"
+        self.add(("n_plus_one", str(node.start)), Finding("n_plus_one", message))
+
+    def decorrelate(self, core: SelectCore, node: SubqueryExpr, scope: _Scope) -> Optional[List[Edit]]:
+        query = node.query
+        if query.ctes or len(query.cores) != 1 or query.order_by or query.limit is not None or query.offset is not None:
+            return None
+        inner = query.cores[0]
+        if (inner.distinct or inner.top is not None or inner.joins or inner.group_by or inner.having
+                or len(inner.items) != 1 or len(inner.sources) != 1):
+            return None
+        source, aggregate = inner.sources[0], inner.items[0].expr
+        if not isinstance(source, TableRef) or source.is_function:
+            return None
+        if not isinstance(aggregate, Func) or aggregate.name not in AGGREGATES or aggregate.window:
+            return None
+        # The outer query must keep one row per source row and have nowhere ambiguous to attach the join
+        if core.group_by or len(core.sources) != 1:
+            return None
+
+        inner_alias = (source.alias or source.name).lower()
+        inner_table = table_schema(source.name)
+        for column in walk(query):
+            if not isinstance(column, Column):
+                continue
+            if column.table is None:
+                # An unqualified name might silently refer to the outer query
+                if inner_table is None or inner_table.column(column.name) is None:
+                    return None
+            elif column.table.lower() != inner_alias and column.table.lower() not in scope.aliases:
+                return None
+        if any(column.table and column.table.lower() != inner_alias
+               for column in walk(aggregate) if isinstance(column, Column)):
+            return None
+
+        correlated, local = [], []
+        for term in conjuncts(inner.where):
+            outer = [column for column in walk(term) if isinstance(column, Column)
+                     and column.table is not None and column.table.lower() != inner_alias]
+            (correlated if outer else local).append(term)
+        if len(correlated) != 1:
+            return None
+        term = correlated[0]
+        if not (isinstance(term, Binary) and term.op == "=" and isinstance(term.left, Column)
+                and isinstance(term.right, Column)):
+            return None
+        inner_column, outer_column = term.left, term.right
+        if inner_column.table is not None and inner_column.table.lower() != inner_alias:
+            inner_column, outer_column = outer_column, inner_column
+        if inner_column.table is not None and inner_column.table.lower() != inner_alias:
+            return None
+        if outer_column.table is None or outer_column.table.lower() not in scope.aliases:
+            return None
+
+        alias = self.derived_alias()
+        value = f"COALESCE({alias}.aggregate_value, 0)" if aggregate.name == "COUNT" else f"{alias}.aggregate_value"
+        key: Part = (inner_column.start, inner_column.end)
+        parts: List[Part] = [" LEFT JOIN (SELECT ", key, " AS group_key, ", (aggregate.start, aggregate.end),
+                             " AS aggregate_value FROM ", (source.start, source.end)]
+        for index, condition in enumerate(local):
+            parts.extend([" WHERE " if index == 0 else " AND ", (condition.start, condition.end)])
+        parts.extend([" GROUP BY ", key, f") AS {alias} ON {alias}.group_key = ",
+                      (outer_column.start, outer_column.end)])
+        attach_at = core.joins[-1].end if core.joins else core.sources[0].end
+        return [Edit(node.start, node.end, [value]), Edit(attach_at, attach_at, parts)]
+
+    def derived_alias(self) -> str:
+        while True:
+            self._derived += 1
+            alias = f"nq{self._derived}"
+            if alias not in self._aliases:
+                self._aliases.add(alias)
+                return alias
+
+    def sqlite_edits(self, query: Query) -> List[Edit]:
+        edits = [Edit(node.name_start, node.name_index, [""]) for node in walk(query)
+                 if isinstance(node, TableRef) and node.schema is not None]
+        edits.extend(Edit(index, index + 1, ["LIKE"]) for index, token in enumerate(self.tokens)
+                     if token.upper == "ILIKE")
+        return edits
+
+    @staticmethod
+    def describe(node: Node) -> str:
+        """Name an expression without quoting literals, since plans are shared across literal values"""
+        if isinstance(node, Func):
+            return f"{node.name}()"
+        if isinstance(node, Cast):
+            return "CAST"
+        if isinstance(node, SubqueryExpr):
+            core = node.query.cores[0]
+            tables = ", ".join(source.name for source in core.sources if isinstance(source, TableRef))
+            item = core.items[0].expr if len(core.items) == 1 else None
+            kind = f"{item.name} subquery" if isinstance(item, Func) else "Subquery"
+            return f"Correlated {kind} on {tables or 'a derived table'}"
+        return type(node).__name__
+
+
+def analyze(tokens: List[Token]) -> QueryPlan:
+    return _Analyzer(tokens).run(parse(tokens))
+
+
+class OptimizedQuery:
+    __slots__ = ("original", "optimized", "findings", "fingerprint", "cached")
+
+    def __init__(self, original: str, optimized: str, findings: List[Finding], fingerprint: str, cached: bool):
+        self.original = original
+        self.optimized = optimized
+        self.findings = findings
+        self.fingerprint = fingerprint
+        self.cached = cached
+
+    @property
+    def rewritten(self) -> bool:
+        return self.optimized != self.original
+
+    @property
+    def index_suggestions(self) -> List[str]:
+        return list(dict.fromkeys(finding.suggestion for finding in self.findings if finding.suggestion))
+
+
+class QueryOptimizer:
+    """Analyzes queries, caching one QueryPlan per fingerprint in an LRU of QUERY_PLAN_CACHE_SIZE"""
+
+    def __init__(self, max_plans: Optional[int] = None):
+        self.max_plans = max_plans or settings.QUERY_PLAN_CACHE_SIZE
+        self._plans: "OrderedDict[str, QueryPlan]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def plan(self, tokens: List[Token]) -> Tuple[QueryPlan, bool]:
+        key = fingerprint(tokens)
+        plan = self._plans.get(key)
+        if plan is not None:
+            self._plans.move_to_end(key)
+            self.hits += 1
+            return plan, True
+        self.misses += 1
+        plan = analyze(tokens)
+        self._plans[key] = plan
+        if len(self._plans) > self.max_plans:
+            self._plans.popitem(last=False)
+        return plan, False
+
+    def optimize(self, sql: str, expected_result_size: Optional[int] = None) -> OptimizedQuery:
+        tokens = tokenize(sql)
+        plan, cached = self.plan(tokens)
+        findings = list(plan.findings)
+        if plan.unbounded:
+            message = "No LIMIT; every matching row is returned"
+            if expected_result_size:
+                message += (f". If only {int(expected_result_size)} rows are needed, add LIMIT "
+                            f"{int(expected_result_size)}")
+                if not plan.ordered:
+                    message += " with an ORDER BY so the rows kept are deterministic"
+            findings.append(Finding("missing_limit", message))
+        return OptimizedQuery(sql, apply_edits(sql, tokens, plan.edits), findings, plan.fingerprint, cached)
+
+    def sqlite_text(self, sql: str) -> str:
+        """The query adjusted for the SQLite EXPLAIN stand-in"""
+        tokens = tokenize(sql)
+        plan, _ = self.plan(tokens)
+        return apply_edits(sql, tokens, plan.sqlite_edits)
+
+    def stats(self) -> Dict[str, int]:
+        return {"plans": len(self._plans), "max_plans": self.max_plans, "hits": self.hits, "misses": self.misses}
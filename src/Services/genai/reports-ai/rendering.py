@@ -0,0 +1,398 @@
+"""
+Incremental report writers for the html, excel and pdf formats
+
+Every writer emits bytes as rows arrive and keeps at most one page (pdf)
+or one row (html, excel) in memory, so reports of any size render in
+constant memory.
+"""
+
+from typing import Any, AsyncIterable, AsyncIterator, Dict, Iterable, Iterator, List, Optional, Tuple
+from array import array
+import html
+import json
+import math
+import re
+import zipfile
+
+# Bytes buffered before a chunk is handed to a streaming response
+STREAM_CHUNK_BYTES = 64 * 1024
+
+
+def format_cell(value: Any) -> str:
+    if value is None:
+        return ""
+    if isinstance(value, (dict, list)):
+        return json.dumps(value, default=str)
+    return str(value)
+
+
+class HtmlWriter:
+    media_type = "text/html; charset=utf-8"
+    extension = "html"
+
+    def __init__(self):
+        self._rows = 0
+
+    def start(self, title: str) -> bytes:
+        title = html.escape(title)
+        return (
+            "<!DOCTYPE html>\n<html><head><meta charset=\"utf-8\">"
+            f"<title>{title}</title></head><body>\n<h1>{title}</h1>\n"
+        ).encode()
+
+    def begin_section(self, name: str, columns: List[str]) -> bytes:
+        self._rows = 0
+        header = "".join(f"<th>{html.escape(column)}</th>" for column in columns)
+        return f"<h2>{html.escape(name)}</h2>\n<table><thead><tr>{header}</tr></thead><tbody>\n".encode()
+
+    def row(self, values: List[Any]) -> bytes:
+        self._rows += 1
+        cells = "".join(f"<td>{html.escape(format_cell(value))}</td>" for value in values)
+        return f"<tr>{cells}</tr>\n".encode()
+
+    def end_section(self) -> bytes:
+        return f"</tbody></table>\n<p>{self._rows} rows</p>\n".encode()
+
+    def finish(self) -> bytes:
+        return b"</body></html>\n"
+
+
+class _ChunkSink:
+    """Write-only, unseekable file object that hands written bytes back to the caller"""
+
+    def __init__(self):
+        self._chunks: List[bytes] = []
+        self._position = 0
+
+    def write(self, data: bytes) -> int:
+        self._chunks.append(bytes(data))
+        self._position += len(data)
+        return len(data)
+
+    def tell(self) -> int:
+        return self._position
+
+    def flush(self):
+        pass
+
+    def drain(self) -> bytes:
+        data = b"".join(self._chunks)
+        self._chunks = []
+        return data
+
+
+_INVALID_XML = re.compile("[\x00-\x08\x0b\x0c\x0e-\x1f]")
+_INVALID_SHEET_NAME = re.compile(r"[\[\]:*?/\\]")
+
+
+def _xml(text: str) -> str:
+    return html.escape(_INVALID_XML.sub("", text), quote=True)
+
+
+class XlsxWriter:
+    """
+    Writes an Office Open XML workbook with one worksheet per section.
+    Worksheet parts are streamed into the zip a row at a time; strings are
+    stored inline so no shared-strings table has to be kept in memory.
+    """
+
+    media_type = "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
+    extension = "xlsx"
+
+    def __init__(self):
+        self._sink = _ChunkSink()
+        self._zip = zipfile.ZipFile(self._sink, "w", compression=zipfile.ZIP_DEFLATED)
+        self._sheet = None
+        self._sheet_names: List[str] = []
+        self._row_number = 0
+
+    def start(self, title: str) -> bytes:
+        return b""
+
+    def begin_section(self, name: str, columns: List[str]) -> bytes:
+        self._sheet_names.append(self._sheet_name(name))
+        path = f"xl/worksheets/sheet{len(self._sheet_names)}.xml"
+        self._sheet = self._zip.open(path, "w", force_zip64=True)
+        self._sheet.write(
+            b'<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+            b'<worksheet xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main"><sheetData>'
+        )
+        self._row_number = 0
+        self._write_row(columns)
+        return self._sink.drain()
+
+    def row(self, values: List[Any]) -> bytes:
+        self._write_row(values)
+        return self._sink.drain()
+
+    def end_section(self) -> bytes:
+        self._sheet.write(b"</sheetData></worksheet>")
+        self._sheet.close()
+        self._sheet = None
+        return self._sink.drain()
+
+    def finish(self) -> bytes:
+        # A workbook needs at least one sheet; its bytes lead this chunk since nothing was emitted yet
+        placeholder = b""
+        if not self._sheet_names:
+            placeholder = self.begin_section("Report", []) + self.end_section()
+        sheets = "".join(
+            f'<sheet name="{_xml(name)}" sheetId="{i}" r:id="rId{i}"/>'
+            for i, name in enumerate(self._sheet_names, start=1)
+        )
+        relationships = "".join(
+            f'<Relationship Id="rId{i}" Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/worksheet" '
+            f'Target="worksheets/sheet{i}.xml"/>'
+            for i in range(1, len(self._sheet_names) + 1)
+        )
+        overrides = "".join(
+            f'<Override PartName="/xl/worksheets/sheet{i}.xml" '
+            'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.worksheet+xml"/>'
+            for i in range(1, len(self._sheet_names) + 1)
+        )
+        self._zip.writestr("[Content_Types].xml",
+            '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+            '<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">'
+            '<Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/>'
+            '<Default Extension="xml" ContentType="application/xml"/>'
+            '<Override PartName="/xl/workbook.xml" '
+            'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet.main+xml"/>'
+            f'{overrides}</Types>')
+        self._zip.writestr("_rels/.rels",
+            '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+            '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+            '<Relationship Id="rId1" Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/officeDocument" '
+            'Target="xl/workbook.xml"/></Relationships>')
+        self._zip.writestr("xl/workbook.xml",
+            '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+            '<workbook xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main" '
+            'xmlns:r="http://schemas.openxmlformats.org/officeDocument/2006/relationships">'
+            f'<sheets>{sheets}</sheets></workbook>')
+        self._zip.writestr("xl/_rels/workbook.xml.rels",
+            '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+            '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+            f'{relationships}</Relationships>')
+        self._zip.close()
+        return placeholder + self._sink.drain()
+
+    def _write_row(self, values: List[Any]):
+        self._row_number += 1
+        cells = []
+        for value in values:
+            if not isinstance(value, bool) and (isinstance(value, int) or (isinstance(value, float) and math.isfinite(value))):
+                cells.append(f'<c t="n"><v>{value}</v></c>')
+            else:
+                cells.append(f'<c t="inlineStr"><is><t xml:space="preserve">{_xml(format_cell(value))}</t></is></c>')
+        self._sheet.write(f'<row r="{self._row_number}">{"".join(cells)}</row>'.encode())
+
+    def _sheet_name(self, name: str) -> str:
+        base = _INVALID_SHEET_NAME.sub("_", name)[:31] or "Sheet"
+        candidate, suffix = base, 1
+        while candidate in self._sheet_names:
+            suffix += 1
+            candidate = f"{base[:28]}_{suffix}"
+        return candidate
+
+
+class PdfWriter:
+    """
+    Writes a text-only PDF one page at a time. Each page's content stream
+    and page object are emitted as soon as the page fills; the page tree,
+    catalog and cross-reference table follow at the end.
+    """
+
+    media_type = "application/pdf"
+    extension = "pdf"
+
+    PAGE_WIDTH = 612
+    PAGE_HEIGHT = 792
+    MARGIN = 40
+    FONT_SIZE = 8
+    LEADING = 11
+    MAX_LINE_CHARS = 140
+
+    # Object ids reserved for parts written at the end
+    _CATALOG, _PAGES, _FONT = 1, 2, 3
+
+    def __init__(self):
+        self._offset = 0
+        # Byte offset of every object, indexed by object id, for the xref table
+        self._offsets = array("Q", [0, 0, 0, 0])
+        self._next_id = 4
+        self._page_ids = array("L")
+        self._lines: List[str] = []
+        self._lines_per_page = (self.PAGE_HEIGHT - 2 * self.MARGIN) // self.LEADING
+
+    def start(self, title: str) -> bytes:
+        return self._emit(b"%PDF-1.4\n%\xe2\xe3\xcf\xd3\n") + self._line(title) + self._line("")
+
+    def begin_section(self, name: str, columns: List[str]) -> bytes:
+        return self._line(name) + self._line(" | ".join(columns))
+
+    def row(self, values: List[Any]) -> bytes:
+        return self._line(" | ".join(format_cell(value) for value in values))
+
+    def end_section(self) -> bytes:
+        return self._line("")
+
+    def finish(self) -> bytes:
+        output = self._flush_page() if self._lines or not self._page_ids else b""
+        kids = " ".join(f"{page_id} 0 R" for page_id in self._page_ids)
+        output += self._object(self._PAGES, f"<< /Type /Pages /Kids [{kids}] /Count {len(self._page_ids)} >>".encode())
+        output += self._object(self._FONT, b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica /Encoding /WinAnsiEncoding >>")
+        output += self._object(self._CATALOG, f"<< /Type /Catalog /Pages {self._PAGES} 0 R >>".encode())
+
+        xref_offset = self._offset
+        count = self._next_id
+        xref = bytearray(f"xref\n0 {count}\n0000000000 65535 f \n".encode())
+        for i in range(1, count):
+            xref += b"%010d 00000 n \n" % self._offsets[i]
+        xref += (
+            f"trailer\n<< /Size {count} /Root {self._CATALOG} 0 R >>\nstartxref\n{xref_offset}\n%%EOF\n"
+        ).encode()
+        return output + self._emit(bytes(xref))
+
+    def _line(self, text: str) -> bytes:
+        if len(text) > self.MAX_LINE_CHARS:
+            text = text[:self.MAX_LINE_CHARS - 3] + "..."
+        self._lines.append(text)
+        if len(self._lines) >= self._lines_per_page:
+            return self._flush_page()
+        return b""
+
+    def _flush_page(self) -> bytes:
+        top = self.PAGE_HEIGHT - self.MARGIN + self.LEADING
+        parts = [f"BT /F1 {self.FONT_SIZE} Tf {self.LEADING} TL {self.MARGIN} {top} Td"]
+        parts.extend(f"({_pdf_text(line)}) '" for line in self._lines)
+        parts.append("ET")
+        content = "\n".join(parts).encode("latin-1")
+        self._lines = []
+
+        content_id = self._allocate()
+        page_id = self._allocate()
+        self._page_ids.append(page_id)
+        return self._object(
+            content_id, f"<< /Length {len(content)} >>\nstream\n".encode() + content + b"\nendstream"
+        ) + self._object(
+            page_id,
+            f"<< /Type /Page /Parent {self._PAGES} 0 R /MediaBox [0 0 {self.PAGE_WIDTH} {self.PAGE_HEIGHT}] "
+            f"/Resources << /Font << /F1 {self._FONT} 0 R >> >> /Contents {content_id} 0 R >>".encode()
+        )
+
+    def _allocate(self) -> int:
+        object_id = self._next_id
+        self._next_id += 1
+        self._offsets.append(0)
+        return object_id
+
+    def _object(self, object_id: int, body: bytes) -> bytes:
+        self._offsets[object_id] = self._offset
+        return self._emit(f"{object_id} 0 obj\n".encode() + body + b"\nendobj\n")
+
+    def _emit(self, data: bytes) -> bytes:
+        self._offset += len(data)
+        return data
+
+
+def _pdf_text(text: str) -> str:
+    # WinAnsiEncoding is cp1252; carry its bytes through the latin-1 content stream unchanged
+    text = text.encode("cp1252", "replace").decode("latin-1")
+    return text.replace("\\", "\\\\").replace("(", "\\(").replace(")", "\\)").replace("\r", " ").replace("\n", " ")
+
+
+WRITERS = {
+    "html": HtmlWriter,
+    "excel": XlsxWriter,
+    "pdf": PdfWriter,
+}
+
+
+def report_title(report_type: str) -> str:
+    return f"{report_type.replace('_', ' ').title()} Report"
+
+
+def create_writer(format: str):
+    try:
+        return WRITERS[format]()
+    except KeyError:
+        raise ValueError(f"Unsupported report format '{format}'") from None
+
+
+class ReportRenderer:
+    """
+    Turns (source, row) records into writer output, starting a new section
+    whenever the source changes. Columns of a section come from its first row.
+    """
+
+    def __init__(self, writer, title: str):
+        self.writer = writer
+        self.title = title
+        self._section: Optional[str] = None
+        self._columns: List[str] = []
+
+    def open(self) -> bytes:
+        return self.writer.start(self.title)
+
+    def feed(self, source: str, row: Dict[str, Any]) -> bytes:
+        output = b""
+        if source != self._section:
+            if self._section is not None:
+                output += self.writer.end_section()
+            self._section = source
+            self._columns = list(row.keys())
+            output += self.writer.begin_section(source, self._columns)
+        return output + self.writer.row([row.get(column) for column in self._columns])
+
+    def close(self) -> bytes:
+        output = self.writer.end_section() if self._section is not None else b""
+        return output + self.writer.finish()
+
+
+def render(writer, title: str, records: Iterable[Tuple[str, Dict[str, Any]]]) -> Iterator[bytes]:
+    """Render records synchronously, yielding output as it is produced"""
+    renderer = ReportRenderer(writer, title)
+    yield renderer.open()
+    for source, row in records:
+        yield renderer.feed(source, row)
+    yield renderer.close()
+
+
+async def render_async(writer, title: str, records: AsyncIterable[Tuple[str, Dict[str, Any]]],
+                       chunk_size: int = STREAM_CHUNK_BYTES) -> AsyncIterator[bytes]:
+    """
+    Render records from an async generator, coalescing output into chunks of
+    about chunk_size bytes so an HTTP response can start before the report ends.
+    """
+    renderer = ReportRenderer(writer, title)
+    buffer = [renderer.open()]
+    buffered = len(buffer[0])
+    async for source, row in records:
+        data = renderer.feed(source, row)
+        if data:
+            buffer.append(data)
+            buffered += len(data)
+            if buffered >= chunk_size:
+                yield b"".join(buffer)
+                buffer, buffered = [], 0
+    buffer.append(renderer.close())
+    yield b"".join(buffer)
+
+
+def read_spool(path: str) -> Iterator[Tuple[str, Dict[str, Any]]]:
+    """Read (source, row) records spooled as NDJSON by the job engine"""
+    with open(path, "r", encoding="utf-8") as handle:
+        for line in handle:
+            record = json.loads(line)
+            yield record["source"], record["row"]
+
+
+def render_report_file(format: str, title: str, spool_path: str, output_path: str) -> int:
+    """Render a spooled report to disk; runs in a worker process. Returns the file size."""
+    writer = create_writer(format)
+    size = 0
+    with open(output_path, "wb") as output:
+        for chunk in render(writer, title, read_spool(spool_path)):
+            if chunk:
+                output.write(chunk)
+                size += len(chunk)
+    return size
@@ -0,0 +1,52 @@
+"""
+Row sources for report generation, paged from the MAPP domain APIs
+"""
+
+from typing import Any, AsyncIterator, Dict, List, Tuple
+
+from shared.http_client import http_clients
+
+# data source name -> (upstream, path, key holding the rows in each page)
+DATA_SOURCES: Dict[str, Tuple[str, str, str]] = {
+    "observations": ("observations_api", "/api/observations", "observations"),
+    "plans": ("planning_api", "/api/plans", "plans"),
+}
+
+PAGE_SIZE = 500
+
+
+def unknown_sources(data_sources) -> list:
+    return [source for source in data_sources if source not in DATA_SOURCES]
+
+
+def query_filters(parameters: Dict[str, Any]) -> Dict[str, Any]:
+    """Scalar report parameters are passed to the upstream list endpoint as filters"""
+    return {
+        key: value for key, value in parameters.items()
+        if isinstance(value, (str, int, float, bool)) and key not in ("PageNumber", "PageSize")
+    }
+
+
+async def iter_source_rows(source: str, parameters: Dict[str, Any]) -> AsyncIterator[Dict[str, Any]]:
+    """Yield every row of a data source, one upstream page at a time"""
+    upstream, path, key = DATA_SOURCES[source]
+    filters = query_filters(parameters)
+    page = 1
+    while True:
+        response = await http_clients.get(
+            upstream, path, params={**filters, "PageNumber": page, "PageSize": PAGE_SIZE}
+        )
+        response.raise_for_status()
+        body = response.json()
+        for row in body.get(key, []):
+            yield row
+        if not body.get("hasNextPage"):
+            return
+        page += 1
+
+
+async def iter_report_rows(data_sources: List[str], parameters: Dict[str, Any]) -> AsyncIterator[Tuple[str, Dict[str, Any]]]:
+    """Yield (source, row) records across all data sources in request order"""
+    for source in data_sources:
+        async for row in iter_source_rows(source, parameters):
+            yield source, row
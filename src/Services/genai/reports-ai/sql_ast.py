@@ -0,0 +1,713 @@
+"""
+Tokenizer and parser for report SELECT queries
+
+Covers the SQL the report queries use: WITH, SELECT [DISTINCT|TOP], joins,
+derived tables, WHERE/GROUP BY/HAVING, set operations, ORDER BY and
+LIMIT/OFFSET/FETCH, with subqueries, CASE, CAST, :: casts, function calls
+and window functions in expressions. Every node records the token span it
+came from, so rewrites splice the original text instead of re-rendering it.
+"""
+
+from typing import Any, Iterator, List, Optional, Tuple
+import hashlib
+import re
+
+
+class QueryParseError(ValueError):
+    """Raised when a query is not a SELECT statement this parser understands"""
+
+
+WORD, QUOTED, NUMBER, STRING, PARAM, OP, PUNCT = "word", "quoted", "number", "string", "param", "op", "punct"
+
+_TOKEN_RE = re.compile(r"""
+    (?P<space>\s+|--[^\n]*|/\*.*?\*/)
+  | (?P<string>[Ee]?'(?:[^']|'')*')
+  | (?P<quoted>"(?:[^"]|"")*"|\[[^\]]+\]|`[^`]+`)
+  | (?P<number>(?:\d+(?:\.\d*)?|\.\d+)(?:[eE][+-]?\d+)?)
+  | (?P<op>::|<>|!=|<=|>=|\|\||[=<>+\-*/%])
+  | (?P<param>\?|\$\d+|[:@$][A-Za-z_]\w*)
+  | (?P<word>[A-Za-z_][\w$]*)
+  | (?P<punct>[(),.;])
+""", re.VERBOSE | re.DOTALL)
+
+# Words that end an expression or cannot be a bare alias
+RESERVED = frozenset("""
+    ALL AND AS ASC BETWEEN BY CASE CROSS DESC DISTINCT ELSE END ESCAPE EXCEPT EXISTS FETCH FILTER FOR
+    FROM FULL GROUP HAVING ILIKE IN INNER INTERSECT IS JOIN LATERAL LEFT LIKE LIMIT NATURAL NOT NULL
+    OFFSET ON OR ORDER OUTER OVER RIGHT SELECT THEN TOP UNION USING WHEN WHERE WINDOW WITH
+""".split())
+
+AGGREGATES = frozenset({"COUNT", "SUM", "MIN", "MAX", "AVG"})
+
+
+class Token:
+    __slots__ = ("kind", "text", "start", "end", "upper")
+
+    def __init__(self, kind: str, text: str, start: int, end: int):
+        self.kind = kind
+        self.text = text
+        self.start = start
+        self.end = end
+        self.upper = text.upper() if kind == WORD else text
+
+
+def tokenize(sql: str) -> List[Token]:
+    tokens = []
+    position = 0
+    while position < len(sql):
+        match = _TOKEN_RE.match(sql, position)
+        if match is None:
+            raise QueryParseError(f"Unexpected character {sql[position]!r} at position {position}")
+        kind = match.lastgroup
+        if kind != "space":
+            tokens.append(Token(kind, match.group(), match.start(), match.end()))
+        position = match.end()
+    return tokens
+
+
+def fingerprint(tokens: List[Token]) -> str:
+    """Hash of the query shape: literals and parameters become '?', unquoted words are case-folded"""
+    parts = []
+    for token in tokens:
+        if token.kind in (NUMBER, STRING, PARAM):
+            parts.append("?")
+        elif token.kind == WORD:
+            parts.append(token.upper)
+        else:
+            parts.append(token.text)
+    return hashlib.sha1(" ".join(parts).encode()).hexdigest()
+
+
+def identifier(token: Token) -> str:
+    if token.kind == QUOTED:
+        return token.text[1:-1].replace('""', '"')
+    return token.text
+
+
+class Node:
+    """Base for AST nodes; start/end are token indexes (end exclusive)"""
+
+    __slots__ = ("start", "end")
+
+    def children(self) -> Iterator["Node"]:
+        for cls in type(self).__mro__:
+            for name in getattr(cls, "__slots__", ()):
+                if name in ("start", "end"):
+                    continue
+                value = getattr(self, name, None)
+                if isinstance(value, Node):
+                    yield value
+                elif isinstance(value, (list, tuple)):
+                    for item in value:
+                        if isinstance(item, Node):
+                            yield item
+                        elif isinstance(item, tuple):
+                            yield from (part for part in item if isinstance(part, Node))
+
+
+class Column(Node):
+    __slots__ = ("table", "name")
+
+
+class Star(Node):
+    __slots__ = ("table",)
+
+
+class Literal(Node):
+    __slots__ = ("value",)
+
+
+class Param(Node):
+    __slots__ = ()
+
+
+class Func(Node):
+    __slots__ = ("name", "args", "distinct", "window")
+
+
+class Unary(Node):
+    __slots__ = ("op", "operand")
+
+
+class Binary(Node):
+    __slots__ = ("op", "left", "right")
+
+
+class Between(Node):
+    __slots__ = ("expr", "low", "high", "negated")
+
+
+class InList(Node):
+    __slots__ = ("expr", "items", "negated")
+
+
+class InQuery(Node):
+    __slots__ = ("expr", "query", "negated")
+
+
+class Exists(Node):
+    __slots__ = ("query", "negated")
+
+
+class IsNull(Node):
+    __slots__ = ("expr", "negated")
+
+
+class Group(Node):
+    """Parenthesized expression or row constructor"""
+    __slots__ = ("items",)
+
+
+class SubqueryExpr(Node):
+    __slots__ = ("query",)
+
+
+class Case(Node):
+    __slots__ = ("operand", "whens", "default")
+
+
+class Cast(Node):
+    __slots__ = ("expr",)
+
+
+class TableRef(Node):
+    # Tokens name_start..name_index hold the (possibly schema-qualified) name; name_index is its last part
+    __slots__ = ("schema", "name", "alias", "name_start", "name_index", "is_function")
+
+
+class DerivedTable(Node):
+    __slots__ = ("query", "alias")
+
+
+class Join(Node):
+    __slots__ = ("kind", "source", "condition", "using")
+
+
+class SelectItem(Node):
+    __slots__ = ("expr", "alias")
+
+
+class OrderItem(Node):
+    __slots__ = ("expr",)
+
+
+class SelectCore(Node):
+    __slots__ = ("distinct", "top", "items", "sources", "joins", "where", "group_by", "having")
+
+
+class Query(Node):
+    __slots__ = ("ctes", "cores", "order_by", "limit", "offset")
+
+    @property
+    def has_limit(self) -> bool:
+        return self.limit is not None or any(core.top is not None for core in self.cores)
+
+
+def make(cls, start: int, end: int, **fields) -> Any:
+    node = cls.__new__(cls)
+    node.start = start
+    node.end = end
+    for name, value in fields.items():
+        setattr(node, name, value)
+    return node
+
+
+class Parser:
+    def __init__(self, tokens: List[Token]):
+        self.tokens = tokens
+        self.position = 0
+
+    def parse(self) -> Query:
+        if not self.tokens:
+            raise QueryParseError("Empty query")
+        query = self.query()
+        self.accept(";")
+        if self.position < len(self.tokens):
+            raise self.error("Unexpected")
+        return query
+
+    # Token helpers
+
+    def peek(self, offset: int = 0) -> Optional[Token]:
+        index = self.position + offset
+        return self.tokens[index] if index < len(self.tokens) else None
+
+    def at(self, *values: str, offset: int = 0) -> bool:
+        token = self.peek(offset)
+        if token is None or token.kind in (STRING, QUOTED):
+            return False
+        return token.upper in values
+
+    def accept(self, *values: str) -> Optional[Token]:
+        if self.at(*values):
+            self.position += 1
+            return self.tokens[self.position - 1]
+        return None
+
+    def expect(self, value: str) -> Token:
+        token = self.accept(value)
+        if token is None:
+            raise self.error(f"Expected {value}")
+        return token
+
+    def error(self, message: str) -> QueryParseError:
+        token = self.peek()
+        where = f"'{token.text}' at position {token.start}" if token else "end of query"
+        return QueryParseError(f"{message} near {where}")
+
+    def name_token(self) -> Token:
+        token = self.peek()
+        if token is None or not (token.kind == QUOTED or (token.kind == WORD and token.upper not in RESERVED)):
+            raise self.error("Expected a name")
+        self.position += 1
+        return token
+
+    def alias(self) -> Optional[str]:
+        if self.accept("AS"):
+            return identifier(self.name_token())
+        token = self.peek()
+        if token is not None and (token.kind == QUOTED or (token.kind == WORD and token.upper not in RESERVED)):
+            self.position += 1
+            return identifier(token)
+        return None
+
+    # Statements
+
+    def query(self) -> Query:
+        start = self.position
+        ctes = []
+        if self.accept("WITH"):
+            self.accept("RECURSIVE")
+            while True:
+                cte_start = self.position
+                name = identifier(self.name_token())
+                if self.at("("):
+                    self.skip_parens()
+                self.expect("AS")
+                self.expect("(")
+                body = self.query()
+                self.expect(")")
+                ctes.append(make(DerivedTable, cte_start, self.position, query=body, alias=name))
+                if not self.accept(","):
+                    break
+
+        cores = [self.set_operand()]
+        while self.at("UNION", "INTERSECT", "EXCEPT"):
+            self.position += 1
+            self.accept("ALL", "DISTINCT")
+            cores.append(self.set_operand())
+
+        order_by, limit, offset = [], None, None
+        if self.accept("ORDER"):
+            self.expect("BY")
+            order_by = self.order_items()
+        while True:
+            if self.accept("LIMIT"):
+                limit = self.expr() if not self.accept("ALL") else None
+            elif self.accept("OFFSET"):
+                offset = self.expr()
+                self.accept("ROW", "ROWS")
+            elif self.accept("FETCH"):
+                self.expect_any("FIRST", "NEXT")
+                limit = self.expr() if not self.at("ROW", "ROWS") else make(Literal, self.position, self.position, value=1)
+                self.expect_any("ROW", "ROWS")
+                self.expect("ONLY")
+            else:
+                break
+        return make(Query, start, self.position, ctes=ctes, cores=cores, order_by=order_by, limit=limit, offset=offset)
+
+    def expect_any(self, *values: str) -> Token:
+        token = self.accept(*values)
+        if token is None:
+            raise self.error(f"Expected {' or '.join(values)}")
+        return token
+
+    def set_operand(self) -> SelectCore:
+        if self.at("(") and self.at("SELECT", "WITH", offset=1):
+            self.position += 1
+            query = self.query()
+            self.expect(")")
+            if len(query.cores) != 1:
+                raise QueryParseError("Nested set operations are not supported")
+            return query.cores[0]
+        return self.select_core()
+
+    def select_core(self) -> SelectCore:
+        start = self.position
+        self.expect("SELECT")
+        distinct = bool(self.accept("DISTINCT"))
+        if distinct and self.at("ON"):
+            self.position += 1
+            self.skip_parens()
+        self.accept("ALL")
+        top = None
+        if self.accept("TOP"):
+            top = self.primary()
+
+        items = [self.select_item()]
+        while self.accept(","):
+            items.append(self.select_item())
+
+        sources, joins = [], []
+        if self.accept("FROM"):
+            sources.append(self.source())
+            joins.extend(self.joins())
+            while self.accept(","):
+                sources.append(self.source())
+                joins.extend(self.joins())
+
+        where = self.expr() if self.accept("WHERE") else None
+        group_by = []
+        if self.accept("GROUP"):
+            self.expect("BY")
+            group_by = [self.expr()]
+            while self.accept(","):
+                group_by.append(self.expr())
+        having = self.expr() if self.accept("HAVING") else None
+        if self.accept("WINDOW"):
+            while True:
+                self.name_token()
+                self.expect("AS")
+                self.skip_parens()
+                if not self.accept(","):
+                    break
+        return make(SelectCore, start, self.position, distinct=distinct, top=top, items=items, sources=sources,
+                    joins=joins, where=where, group_by=group_by, having=having)
+
+    def select_item(self) -> SelectItem:
+        start = self.position
+        expr = self.expr()
+        alias = None if isinstance(expr, Star) else self.alias()
+        return make(SelectItem, start, self.position, expr=expr, alias=alias)
+
+    def order_items(self) -> List[OrderItem]:
+        items = []
+        while True:
+            start = self.position
+            expr = self.expr()
+            self.accept("ASC", "DESC")
+            if self.accept("NULLS"):
+                self.expect_any("FIRST", "LAST")
+            items.append(make(OrderItem, start, self.position, expr=expr))
+            if not self.accept(","):
+                return items
+
+    def source(self):
+        start = self.position
+        self.accept("LATERAL")
+        if self.accept("("):
+            if not self.at("SELECT", "WITH"):
+                raise self.error("Parenthesized joins are not supported")
+            query = self.query()
+            self.expect(")")
+            alias = self.alias()
+            return make(DerivedTable, start, self.position, query=query, alias=alias)
+
+        name_start = self.position
+        parts = [identifier(self.name_token())]
+        while self.at(".") and self.peek(1) is not None and self.peek(1).kind in (WORD, QUOTED):
+            self.position += 1
+            parts.append(identifier(self.name_token()))
+        name_index = self.position - 1
+        is_function = self.at("(")
+        if is_function:
+            self.skip_parens()
+        schema = parts[-2] if len(parts) > 1 else None
+        alias = self.alias()
+        return make(TableRef, start, self.position, schema=schema, name=parts[-1], alias=alias,
+                    name_start=name_start, name_index=name_index, is_function=is_function)
+
+    def joins(self) -> List[Join]:
+        joins = []
+        while True:
+            start = self.position
+            self.accept("NATURAL")
+            kind = "INNER"
+            if self.at("LEFT", "RIGHT", "FULL"):
+                kind = self.peek().upper
+                self.position += 1
+                self.accept("OUTER")
+            elif self.accept("CROSS"):
+                kind = "CROSS"
+            else:
+                self.accept("INNER")
+            if not self.accept("JOIN"):
+                self.position = start
+                return joins
+            source = self.source()
+            condition, using = None, []
+            if self.accept("ON"):
+                condition = self.expr()
+            elif self.accept("USING"):
+                self.expect("(")
+                using = [identifier(self.name_token())]
+                while self.accept(","):
+                    using.append(identifier(self.name_token()))
+                self.expect(")")
+            joins.append(make(Join, start, self.position, kind=kind, source=source, condition=condition, using=using))
+
+    def skip_parens(self):
+        self.expect("(")
+        depth = 1
+        while depth:
+            token = self.peek()
+            if token is None:
+                raise self.error("Unbalanced parentheses")
+            if token.kind == PUNCT and token.text == "(":
+                depth += 1
+            elif token.kind == PUNCT and token.text == ")":
+                depth -= 1
+            self.position += 1
+
+    # Expressions, lowest precedence first
+
+    def expr(self) -> Node:
+        start = self.position
+        left = self.conjunction()
+        while self.accept("OR"):
+            right = self.conjunction()
+            left = make(Binary, start, self.position, op="OR", left=left, right=right)
+        return left
+
+    def conjunction(self) -> Node:
+        start = self.position
+        left = self.negation()
+        while self.accept("AND"):
+            right = self.negation()
+            left = make(Binary, start, self.position, op="AND", left=left, right=right)
+        return left
+
+    def negation(self) -> Node:
+        start = self.position
+        if self.accept("NOT"):
+            operand = self.negation()
+            return make(Unary, start, self.position, op="NOT", operand=operand)
+        return self.comparison()
+
+    def comparison(self) -> Node:
+        start = self.position
+        left = self.additive()
+        while True:
+            if self.accept("IS"):
+                negated = bool(self.accept("NOT"))
+                if self.accept("NULL"):
+                    left = make(IsNull, start, self.position, expr=left, negated=negated)
+                elif self.accept("DISTINCT"):
+                    self.expect("FROM")
+                    right = self.additive()
+                    left = make(Binary, start, self.position, op="IS DISTINCT FROM", left=left, right=right)
+                else:
+                    self.expect_any("TRUE", "FALSE", "UNKNOWN")
+                    left = make(Binary, start, self.position, op="IS", left=left, right=None)
+                continue
+            negated = self.at("NOT") and self.at("IN", "BETWEEN", "LIKE", "ILIKE", offset=1)
+            if negated:
+                self.position += 1
+            if self.accept("IN"):
+                self.expect("(")
+                if self.at("SELECT", "WITH"):
+                    query = self.query()
+                    self.expect(")")
+                    left = make(InQuery, start, self.position, expr=left, query=query, negated=negated)
+                else:
+                    items = [self.expr()]
+                    while self.accept(","):
+                        items.append(self.expr())
+                    self.expect(")")
+                    left = make(InList, start, self.position, expr=left, items=items, negated=negated)
+            elif self.accept("BETWEEN"):
+                self.accept("SYMMETRIC")
+                low = self.additive()
+                self.expect("AND")
+                high = self.additive()
+                left = make(Between, start, self.position, expr=left, low=low, high=high, negated=negated)
+            elif self.at("LIKE", "ILIKE"):
+                op = self.peek().upper
+                self.position += 1
+                right = self.additive()
+                if self.accept("ESCAPE"):
+                    self.additive()
+                left = make(Binary, start, self.position, op=f"NOT {op}" if negated else op, left=left, right=right)
+            elif self.at("=", "<>", "!=", "<", ">", "<=", ">="):
+                op = self.peek().text
+                self.position += 1
+                if self.at("ANY", "ALL", "SOME"):
+                    self.position += 1
+                    self.expect("(")
+                    query = self.query()
+                    self.expect(")")
+                    left = make(InQuery, start, self.position, expr=left, query=query, negated=op != "=")
+                    continue
+                right = self.additive()
+                left = make(Binary, start, self.position, op=op, left=left, right=right)
+            else:
+                return left
+
+    def additive(self) -> Node:
+        start = self.position
+        left = self.multiplicative()
+        while self.at("+", "-", "||"):
+            op = self.peek().text
+            self.position += 1
+            right = self.multiplicative()
+            left = make(Binary, start, self.position, op=op, left=left, right=right)
+        return left
+
+    def multiplicative(self) -> Node:
+        start = self.position
+        left = self.unary()
+        while self.at("*", "/", "%"):
+            op = self.peek().text
+            self.position += 1
+            right = self.unary()
+            left = make(Binary, start, self.position, op=op, left=left, right=right)
+        return left
+
+    def unary(self) -> Node:
+        start = self.position
+        if self.at("-", "+"):
+            op = self.peek().text
+            self.position += 1
+            operand = self.unary()
+            return make(Unary, start, self.position, op=op, operand=operand)
+        node = self.primary()
+        while self.accept("::"):
+            self.type_name()
+            node = make(Cast, start, self.position, expr=node)
+        return node
+
+    def type_name(self):
+        self.name_token()
+        while self.peek() is not None and self.peek().kind == WORD and self.peek().upper not in RESERVED:
+            self.position += 1  # DOUBLE PRECISION, TIMESTAMP WITH TIME ZONE and the like
+        if self.at("("):
+            self.skip_parens()
+
+    def primary(self) -> Node:
+        start = self.position
+        token = self.peek()
+        if token is None:
+            raise self.error("Expected an expression")
+
+        if token.kind == PUNCT and token.text == "(":
+            self.position += 1
+            if self.at("SELECT", "WITH"):
+                query = self.query()
+                self.expect(")")
+                return make(SubqueryExpr, start, self.position, query=query)
+            items = [self.expr()]
+            while self.accept(","):
+                items.append(self.expr())
+            self.expect(")")
+            return make(Group, start, self.position, items=items)
+        if token.kind in (NUMBER, STRING):
+            self.position += 1
+            return make(Literal, start, self.position, value=token.text)
+        if token.kind == PARAM:
+            self.position += 1
+            return make(Param, start, self.position)
+        if token.kind == OP and token.text == "*":
+            self.position += 1
+            return make(Star, start, self.position, table=None)
+        if token.kind == WORD and token.upper in ("NULL", "TRUE", "FALSE"):
+            self.position += 1
+            return make(Literal, start, self.position, value=token.upper)
+        if self.accept("EXISTS"):
+            self.expect("(")
+            query = self.query()
+            self.expect(")")
+            return make(Exists, start, self.position, query=query, negated=False)
+        if self.accept("CASE"):
+            return self.case(start)
+        if self.at("CAST") and self.at("(", offset=1):
+            self.position += 2
+            expr = self.expr()
+            self.expect("AS")
+            self.type_name()
+            self.expect(")")
+            return make(Cast, start, self.position, expr=expr)
+        if self.at("INTERVAL", "DATE", "TIMESTAMP") and self.peek(1) is not None and self.peek(1).kind == STRING:
+            self.position += 2
+            return make(Literal, start, self.position, value=token.text)
+        if token.kind == QUOTED or (token.kind == WORD and token.upper not in RESERVED):
+            return self.name_expr(start)
+        raise self.error("Expected an expression")
+
+    def name_expr(self, start: int) -> Node:
+        parts = [identifier(self.name_token())]
+        while self.at("."):
+            self.position += 1
+            if self.accept("*"):
+                return make(Star, start, self.position, table=parts[-1])
+            parts.append(identifier(self.name_token()))
+        if not self.at("("):
+            table = parts[-2] if len(parts) > 1 else None
+            return make(Column, start, self.position, table=table, name=parts[-1])
+
+        self.position += 1
+        distinct = bool(self.accept("DISTINCT"))
+        self.accept("ALL")
+        args = []
+        if self.at("*"):
+            star_start = self.position
+            self.position += 1
+            args.append(make(Star, star_start, self.position, table=None))
+        elif not self.at(")"):
+            args.append(self.expr())
+            while self.accept(","):
+                args.append(self.expr())
+            if self.accept("ORDER"):
+                self.expect("BY")
+                self.order_items()
+        self.expect(")")
+        if self.at("WITHIN"):
+            self.position += 2  # WITHIN GROUP
+            self.skip_parens()
+        if self.at("FILTER"):
+            self.position += 1
+            self.skip_parens()
+        window = False
+        if self.accept("OVER"):
+            window = True
+            if self.at("("):
+                self.skip_parens()
+            else:
+                self.name_token()
+        name = ".".join(parts).upper()
+        return make(Func, start, self.position, name=name, args=args, distinct=distinct, window=window)
+
+    def case(self, start: int) -> Case:
+        operand = None if self.at("WHEN") else self.expr()
+        whens: List[Tuple[Node, Node]] = []
+        while self.accept("WHEN"):
+            condition = self.expr()
+            self.expect("THEN")
+            whens.append((condition, self.expr()))
+        default = self.expr() if self.accept("ELSE") else None
+        self.expect("END")
+        return make(Case, start, self.position, operand=operand, whens=whens, default=default)
+
+
+def parse(tokens: List[Token]) -> Query:
+    return Parser(tokens).parse()
+
+
+def walk(node: Node, into_queries: bool = True) -> Iterator[Node]:
+    """Pre-order traversal; with into_queries=False, nested queries are yielded but not entered"""
+    yield node
+    for child in node.children():
+        if not into_queries and isinstance(child, Query):
+            yield child
+            continue
+        yield from walk(child, into_queries)
+
+
+def conjuncts(node: Optional[Node]) -> List[Node]:
+    """Split an AND chain into its terms"""
+    if node is None:
+        return []
+    if isinstance(node, Binary) and node.op == "AND":
+        return conjuncts(node.left) + conjuncts(node.right)
+    if isinstance(node, Group) and len(node.items) == 1:
+        return conjuncts(node.items[0])
+    return [node]
@@ -0,0 +1,87 @@
+"""
+Tables and indexes of the report databases
+
+Mirrors the Planning and Observations EF Core models (entity configurations
+and migration snapshots), including owned types flattened into their
+owner's table. The query optimizer uses it to judge predicates against real
+indexes and the EXPLAIN stand-in creates the same tables and indexes.
+"""
+
+from typing import Dict, List, Optional, Sequence, Tuple
+
+AUDIT_COLUMNS = (("Created", "date"), ("CreatedBy", "text"), ("LastModified", "date"), ("LastModifiedBy", "text"))
+
+
+class TableSchema:
+    __slots__ = ("name", "schema", "columns", "indexes", "seed_rows")
+
+    def __init__(self, name: str, columns: Sequence[Tuple[str, str]], indexes: Sequence[Tuple[str, ...]],
+                 schema: Optional[str] = None, primary_key: Tuple[str, ...] = ("Id",), seed_rows: float = 1.0):
+        self.name = name
+        self.schema = schema
+        self.columns: Dict[str, str] = dict(columns)
+        self.indexes: List[Tuple[str, ...]] = [primary_key, *indexes]
+        # Rows in the EXPLAIN stand-in, relative to QUERY_EXPLAIN_ROWS
+        self.seed_rows = seed_rows
+
+    def column(self, name: str) -> Optional[str]:
+        """Column name as declared, matched case-insensitively (unquoted Postgres names fold to lower case)"""
+        lowered = name.lower()
+        return next((column for column in self.columns if column.lower() == lowered), None)
+
+    def is_indexed(self, column: str) -> bool:
+        """True when the column leads some index, so an equality or range predicate on it can seek"""
+        return any(index[0].lower() == column.lower() for index in self.indexes)
+
+
+TABLES = [
+    TableSchema("Plans", [
+        ("Id", "int"), ("Title", "text"), ("Description", "text"), ("Status", "int"), ("StartDate", "date"),
+        ("EndDate", "date"), ("OwnerId", "text"), ("Priority_Name", "text"), ("Priority_Value", "int"),
+        *AUDIT_COLUMNS,
+    ], [("OwnerId",), ("Status",), ("Created",)], seed_rows=0.25),
+    TableSchema("PlanItems", [
+        ("Id", "int"), ("PlanId", "int"), ("Title", "text"), ("Description", "text"), ("Status", "int"),
+        ("DueDate", "date"), ("AssignedTo", "text"), ("Priority_Name", "text"), ("Priority_Value", "int"),
+        *AUDIT_COLUMNS,
+    ], [("PlanId",), ("AssignedTo",), ("Status",), ("DueDate",)]),
+    TableSchema("Observations", [
+        ("Id", "int"), ("ChildId", "int"), ("ChildName", "text"), ("TeacherId", "int"), ("TeacherName", "text"),
+        ("DomainId", "int"), ("DomainName", "text"), ("AttributeId", "int"), ("AttributeName", "text"),
+        ("ObservationText", "text"), ("ObservationDate", "date"), ("LearningContext", "text"), ("IsDraft", "bool"),
+        ("ProgressionPointIds", "text"), *AUDIT_COLUMNS,
+    ], [("ChildId",), ("TeacherId",), ("DomainId",), ("AttributeId",), ("ObservationDate",), ("IsDraft",),
+        ("Created",)]),
+    TableSchema("ObservationArtifacts", [
+        ("Id", "int"), ("ObservationId", "int"), ("OriginalFileName", "text"), ("StoredFileName", "text"),
+        ("ContentType", "text"), ("MediaType", "int"), ("Caption", "text"), ("DisplayOrder", "int"),
+        ("IsUploaded", "bool"), ("UploadedDate", "date"), ("UploadedBy", "text"), ("UploadError", "text"),
+        ("BucketName", "text"), ("PublicUrl", "text"), ("Metadata", "text"), ("StoragePath_Value", "text"),
+        ("StoragePath_NormalizedValue", "text"), ("FileSizeBytes_Bytes", "int"),
+        ("FileSizeBytes_FormattedSize", "text"), *AUDIT_COLUMNS,
+    ], [("ObservationId",), ("MediaType",), ("IsUploaded",), ("DisplayOrder",), ("Created",)], seed_rows=0.5),
+    TableSchema("Tag", [
+        ("ObservationId", "int"), ("Id", "int"), ("Value", "text"), ("NormalizedValue", "text"),
+    ], [("NormalizedValue",)], primary_key=("ObservationId", "Id")),
+    TableSchema("ObservationDomains", [
+        ("Id", "int"), ("Name", "text"), ("CategoryName", "text"), ("CategoryTitle", "text"), ("SortOrder", "int"),
+        ("IsActive", "bool"), *AUDIT_COLUMNS,
+    ], [("SortOrder",), ("IsActive",), ("Name",)], schema="observations", seed_rows=0.0005),
+    TableSchema("ObservationAttributes", [
+        ("Id", "int"), ("DomainId", "int"), ("Number", "int"), ("Name", "text"), ("CategoryInformation", "text"),
+        ("SortOrder", "int"), ("IsActive", "bool"), *AUDIT_COLUMNS,
+    ], [("DomainId",), ("Number",), ("SortOrder",), ("IsActive",), ("DomainId", "Number")],
+        schema="observations", seed_rows=0.005),
+    TableSchema("ProgressionPoints", [
+        ("Id", "int"), ("AttributeId", "int"), ("Points", "int"), ("Title", "text"), ("Description", "text"),
+        ("Order", "text"), ("CategoryInformation", "text"), ("SortOrder", "int"), ("IsActive", "bool"),
+        *AUDIT_COLUMNS,
+    ], [("AttributeId",), ("Points",), ("SortOrder",), ("IsActive",), ("AttributeId", "SortOrder"), ("Created",)],
+        schema="observations", seed_rows=0.02),
+]
+
+SCHEMA: Dict[str, TableSchema] = {table.name.lower(): table for table in TABLES}
+
+
+def table_schema(name: str) -> Optional[TableSchema]:
+    return SCHEMA.get(name.lower())
@@ -0,0 +1,362 @@
+"""
+Admission control, per-tenant rate limiting and load shedding
+
+AdmissionMiddleware sorts every request into a lane before it reaches the
+app:
+
+  - /health/*, /metrics and /admin/* bypass admission entirely, so probes,
+    scrapes and diagnostics answer even when the service is saturated;
+  - GET/HEAD requests use the light lane and everything else the heavy lane,
+    each with its own concurrency limit, so cheap reads never wait behind
+    reports or pattern analyses;
+  - routes listed in the route limits (e.g. /api/analyze-patterns=4) also
+    hold a slot in their own lane, capping how many run at once.
+
+Tenants are identified by ADMISSION_TENANT_HEADER. Each tenant has a token
+bucket (429 when empty) and a cap on its requests in flight per lane.
+Queued requests are admitted round-robin across tenants, so one center's
+burst cannot starve the others. Requests without the header (the .NET
+services and the planning-mfe proxy arrive from a few gateway addresses)
+share one untenanted queue held only to the lane and route limits.
+
+Queue latency is the larger of the oldest waiter's age and a moving average
+of recent waits; once it passes ADMISSION_QUEUE_TARGET_MS, requests that
+would have to queue are shed with 503 and Retry-After, and waiters give up
+after ADMISSION_MAX_QUEUE_WAIT_MS.
+
+offload() runs CPU-heavy handler work on a bounded thread pool so the
+event loop keeps serving the other lanes meanwhile.
+"""
+
+from collections import OrderedDict, deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Deque, Dict, Iterable, List, Optional, Tuple
+import asyncio
+import contextvars
+import functools
+import json
+import math
+import time
+
+from .config import settings
+from .lazy import load_module
+from .profiling import profiler
+
+# Never queued, limited or shed
+CRITICAL_PATHS = ("/health", "/metrics", "/admin")
+LIGHT_METHODS = ("GET", "HEAD", "OPTIONS")
+
+# _dispatch's "no runnable tenant" marker; None is the untenanted queue
+_NOBODY = object()
+
+# Weight of the latest wait in the queue latency moving average
+QUEUE_DELAY_SMOOTHING = 0.2
+
+
+class AdmissionRejected(Exception):
+    """Request refused with `status` (429 or 503); the client may retry after `retry_after` seconds"""
+
+    def __init__(self, status: int, detail: str, retry_after: float):
+        super().__init__(detail)
+        self.status = status
+        self.detail = detail
+        self.retry_after = max(1, math.ceil(retry_after))
+
+
+def parse_route_limits(value: str) -> Dict[str, int]:
+    """'/api/generate=2,/api/optimize=4' -> {'/api/generate': 2, '/api/optimize': 4}"""
+    limits = {}
+    for part in value.split(","):
+        path, _, limit = part.strip().partition("=")
+        if path and limit.strip().isdigit():
+            limits[path.strip()] = int(limit)
+    return limits
+
+
+class TokenBucket:
+    __slots__ = ("rate", "capacity", "tokens", "updated")
+
+    def __init__(self, rate: float, capacity: float, now: float):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = now
+
+    def take(self, now: float) -> float:
+        """Take one token; returns 0 on success, else the seconds until one is available"""
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        if self.tokens >= 1:
+            self.tokens -= 1
+            return 0.0
+        return (1 - self.tokens) / self.rate
+
+
+class Lane:
+    """Concurrency limit with a per-tenant cap and a round-robin queue across tenants"""
+
+    def __init__(self, name: str, max_concurrency: int, tenant_max_concurrency: int, max_queue: int,
+                 queue_target: float, max_wait: float, clock: Callable[[], float] = time.monotonic):
+        self.name = name
+        self.max_concurrency = max_concurrency
+        self.tenant_max_concurrency = tenant_max_concurrency
+        self.max_queue = max_queue
+        self.queue_target = queue_target
+        self.max_wait = max_wait
+        self.clock = clock
+        self.in_flight = 0
+        self.queued = 0
+        self.queue_delay = 0.0
+        self._tenant_in_flight: Dict[str, int] = {}
+        # tenant -> waiters in arrival order; tenants rotate to the end when one of theirs is admitted
+        self._waiting: "OrderedDict[str, Deque[Tuple[asyncio.Future, float]]]" = OrderedDict()
+        self.counters = {"admitted": 0, "queued": 0, "shed_queue_full": 0, "shed_latency": 0, "shed_timeout": 0}
+
+    def _can_run(self, tenant: Optional[str]) -> bool:
+        if self.in_flight >= self.max_concurrency:
+            return False
+        # Untenanted requests are only held to the lane limit
+        return tenant is None or self._tenant_in_flight.get(tenant, 0) < self.tenant_max_concurrency
+
+    def _grant(self, tenant: Optional[str]):
+        self.in_flight += 1
+        self._tenant_in_flight[tenant] = self._tenant_in_flight.get(tenant, 0) + 1
+        self.counters["admitted"] += 1
+
+    def _record_wait(self, waited: float):
+        self.queue_delay += QUEUE_DELAY_SMOOTHING * (waited - self.queue_delay)
+
+    def latency(self, now: float) -> float:
+        """Current queue latency: the oldest waiter's age or the recent average wait, whichever is larger"""
+        oldest = min((waiters[0][1] for waiters in self._waiting.values()), default=now)
+        return max(self.queue_delay, now - oldest)
+
+    async def acquire(self, tenant: Optional[str]):
+        now = self.clock()
+        if self._can_run(tenant) and not self._waiting.get(tenant):
+            self._grant(tenant)
+            self._record_wait(0.0)
+            return
+        if self.queued >= self.max_queue:
+            self.counters["shed_queue_full"] += 1
+            raise AdmissionRejected(503, f"Too many queued {self.name} requests", self.latency(now))
+        latency = self.latency(now)
+        if latency > self.queue_target:
+            self.counters["shed_latency"] += 1
+            raise AdmissionRejected(503, f"Queue latency for {self.name} requests is over target", latency)
+
+        waiter = asyncio.get_running_loop().create_future()
+        entry = (waiter, now)
+        self._waiting.setdefault(tenant, deque()).append(entry)
+        self.queued += 1
+        self.counters["queued"] += 1
+        try:
+            await asyncio.wait_for(asyncio.shield(waiter), self.max_wait)
+        except (asyncio.TimeoutError, asyncio.CancelledError) as e:
+            if waiter.done() and not waiter.cancelled():
+                # Admitted at the same moment; keep the slot unless the request itself was cancelled
+                if isinstance(e, asyncio.CancelledError):
+                    self.release(tenant)
+                    raise
+                return
+            waiter.cancel()
+            self._remove(tenant, entry)
+            self._record_wait(self.clock() - now)
+            if isinstance(e, asyncio.CancelledError):
+                raise
+            self.counters["shed_timeout"] += 1
+            raise AdmissionRejected(503, f"Timed out waiting for a {self.name} slot", self.max_wait)
+
+    def release(self, tenant: Optional[str]):
+        self.in_flight -= 1
+        remaining = self._tenant_in_flight.get(tenant, 1) - 1
+        if remaining:
+            self._tenant_in_flight[tenant] = remaining
+        else:
+            self._tenant_in_flight.pop(tenant, None)
+        self._dispatch()
+
+    def _remove(self, tenant: Optional[str], entry):
+        waiters = self._waiting.get(tenant)
+        if waiters is not None and entry in waiters:
+            waiters.remove(entry)
+            self.queued -= 1
+            if not waiters:
+                del self._waiting[tenant]
+
+    def _dispatch(self):
+        """Admit waiters round-robin across tenants while slots are free"""
+        while self.queued and self.in_flight < self.max_concurrency:
+            # Untenanted waiters are keyed by None, so a sentinel marks "nobody can run"
+            tenant = next((name for name in self._waiting if self._can_run(name)), _NOBODY)
+            if tenant is _NOBODY:
+                return
+            waiters = self._waiting.pop(tenant)
+            waiter, enqueued = waiters.popleft()
+            self.queued -= 1
+            if waiters:
+                self._waiting[tenant] = waiters
+            self._grant(tenant)
+            self._record_wait(self.clock() - enqueued)
+            waiter.set_result(None)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            **self.counters,
+            "in_flight": self.in_flight,
+            "waiting": self.queued,
+            "waiting_tenants": len(self._waiting),
+            "queue_latency_ms": round(self.latency(self.clock()) * 1000, 1),
+        }
+
+
+class AdmissionController:
+    """Lanes, per-route lanes and per-tenant token buckets, configured from settings"""
+
+    def __init__(self, route_limits: Optional[Dict[str, int]] = None, clock: Callable[[], float] = time.monotonic):
+        self.clock = clock
+        self.enabled = settings.ADMISSION_ENABLED
+        self.tenant_header = settings.ADMISSION_TENANT_HEADER.lower().encode("latin-1")
+        self.rate = settings.ADMISSION_TENANT_RATE_PER_SECOND
+        self.burst = max(1.0, settings.ADMISSION_TENANT_BURST)
+        self.max_tenants = settings.ADMISSION_MAX_TENANTS
+        self._buckets: "OrderedDict[str, TokenBucket]" = OrderedDict()
+        self.rate_limited = 0
+
+        limits = {**(route_limits or {}), **parse_route_limits(settings.ADMISSION_ROUTE_LIMITS)}
+        self.light = self._lane("light", settings.ADMISSION_LIGHT_MAX_CONCURRENCY)
+        self.heavy = self._lane("heavy", settings.ADMISSION_MAX_CONCURRENCY)
+        # Longest prefix first so /api/analyze-patterns/stream can differ from /api/analyze-patterns
+        self.routes: List[Tuple[str, Lane]] = [
+            (path, self._lane(path, limit)) for path, limit in sorted(limits.items(), key=lambda item: -len(item[0]))
+            if limit > 0
+        ]
+
+    def _lane(self, name: str, max_concurrency: int) -> Lane:
+        return Lane(name, max_concurrency, settings.ADMISSION_TENANT_MAX_CONCURRENCY, settings.ADMISSION_MAX_QUEUE,
+                    settings.ADMISSION_QUEUE_TARGET_MS / 1000, settings.ADMISSION_MAX_QUEUE_WAIT_MS / 1000, self.clock)
+
+    def lanes_for(self, method: str, path: str) -> List[Lane]:
+        """Lanes a request must hold, acquired in this order; empty for critical paths"""
+        if path.startswith(CRITICAL_PATHS):
+            return []
+        lanes = [lane for prefix, lane in self.routes if path == prefix or path.startswith(prefix + "/")][:1]
+        lanes.append(self.light if method in LIGHT_METHODS else self.heavy)
+        return lanes
+
+    def tenant_of(self, scope) -> Optional[str]:
+        """The tenant header's value, or None when the caller did not send one"""
+        for name, value in scope.get("headers", ()):
+            if name == self.tenant_header and value:
+                return value.decode("latin-1")[:64]
+        return None
+
+    def check_rate(self, tenant: Optional[str]):
+        if self.rate <= 0 or tenant is None:
+            return
+        now = self.clock()
+        bucket = self._buckets.get(tenant)
+        if bucket is None:
+            bucket = self._buckets[tenant] = TokenBucket(self.rate, self.burst, now)
+            while len(self._buckets) > self.max_tenants:
+                self._buckets.popitem(last=False)
+        else:
+            self._buckets.move_to_end(tenant)
+        wait = bucket.take(now)
+        if wait:
+            self.rate_limited += 1
+            raise AdmissionRejected(429, f"Rate limit of {self.rate:g} requests/s exceeded", wait)
+
+    def stats(self) -> Dict[str, Any]:
+        lanes = [self.light, self.heavy] + [lane for _, lane in self.routes]
+        return {
+            "enabled": self.enabled,
+            "rate_limited": self.rate_limited,
+            "tenants": len(self._buckets),
+            **{lane.name: lane.stats() for lane in lanes},
+        }
+
+
+class AdmissionMiddleware:
+    """Pure ASGI middleware; slots are held until the response (streamed or not) has been sent"""
+
+    def __init__(self, app, controller: AdmissionController):
+        self.app = app
+        self.controller = controller
+
+    async def __call__(self, scope, receive, send):
+        lanes = []
+        if scope["type"] == "http" and self.controller.enabled:
+            lanes = self.controller.lanes_for(scope["method"], scope["path"])
+        if not lanes:
+            await self.app(scope, receive, send)
+            return
+
+        tenant = self.controller.tenant_of(scope)
+        held: List[Lane] = []
+        try:
+            self.controller.check_rate(tenant)
+            for lane in lanes:
+                await lane.acquire(tenant)
+                held.append(lane)
+        except AdmissionRejected as e:
+            for lane in reversed(held):
+                lane.release(tenant)
+            await _reject(send, e)
+            return
+        except BaseException:
+            for lane in reversed(held):
+                lane.release(tenant)
+            raise
+
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            for lane in reversed(held):
+                lane.release(tenant)
+
+
+async def _reject(send, rejection: AdmissionRejected):
+    body = json.dumps({"detail": rejection.detail}).encode()
+    await send({
+        "type": "http.response.start",
+        "status": rejection.status,
+        "headers": [
+            (b"content-type", b"application/json"),
+            (b"content-length", str(len(body)).encode()),
+            (b"retry-after", str(rejection.retry_after).encode()),
+        ],
+    })
+    await send({"type": "http.response.body", "body": body})
+
+
+def install_admission(app, route_limits: Optional[Dict[str, int]] = None) -> AdmissionController:
+    """
+    Add admission control to the app. Install it before CORSMiddleware so
+    rejections still carry CORS headers; ADMISSION_ROUTE_LIMITS overrides
+    the service's route_limits.
+    """
+    controller = AdmissionController(route_limits)
+    app.add_middleware(AdmissionMiddleware, controller=controller)
+    return controller
+
+
+# Bounded pool for CPU-heavy handler work, created on first use
+_executor: Optional[ThreadPoolExecutor] = None
+
+
+async def offload(function: Callable, *args, preload: Iterable[str] = (), **kwargs) -> Any:
+    """
+    Run a CPU-bound call on the shared executor and await its result, like
+    asyncio.to_thread() but bounded by CPU_EXECUTOR_WORKERS. Lazy
+    modules the call needs are named in `preload` and loaded on the event
+    loop first, since a lazy module body is not safe to run from a thread.
+    """
+    global _executor
+    for name in preload:
+        load_module(name)
+    if _executor is None:
+        _executor = ThreadPoolExecutor(max_workers=settings.CPU_EXECUTOR_WORKERS, thread_name_prefix="genai-cpu")
+    context = contextvars.copy_context()
+    return await asyncio.get_running_loop().run_in_executor(
+        _executor, functools.partial(context.run, profiler.sampler.run_in_thread, function, *args, **kwargs))
@@ -0,0 +1,204 @@
+"""
+In-memory classification catalog for MAPP GenAI services
+
+Loads the domain -> attribute -> progression point hierarchy from
+domainsattributesprogressionpoints.json once and indexes it for constant
+time lookups. CatalogStore reloads the file when its mtime or version
+changes.
+"""
+
+from array import array
+from typing import Dict, Iterable, List, Optional, Tuple
+import json
+import os
+import threading
+import time
+
+from .config import settings
+
+
+class Domain:
+    __slots__ = ("id", "name", "category_name", "category_title", "sort_order", "attribute_ids")
+
+    def __init__(self, id: int, name: str, category_name: str, category_title: str,
+                 sort_order: int, attribute_ids: Tuple[int, ...]):
+        self.id = id
+        self.name = name
+        self.category_name = category_name
+        self.category_title = category_title
+        self.sort_order = sort_order
+        self.attribute_ids = attribute_ids
+
+
+class Attribute:
+    __slots__ = ("id", "domain_id", "number", "name", "category_information", "sort_order",
+                 "progression_point_ids")
+
+    def __init__(self, id: int, domain_id: int, number: int, name: str,
+                 category_information: Optional[str], sort_order: int,
+                 progression_point_ids: Tuple[int, ...]):
+        self.id = id
+        self.domain_id = domain_id
+        self.number = number
+        self.name = name
+        self.category_information = category_information
+        self.sort_order = sort_order
+        self.progression_point_ids = progression_point_ids
+
+
+class ProgressionPoint:
+    __slots__ = ("id", "attribute_id", "domain_id", "points", "title", "description", "order",
+                 "category_information", "sort_order")
+
+    def __init__(self, id: int, attribute_id: int, domain_id: int, points: int, title: str,
+                 description: str, order: str, category_information: Optional[str], sort_order: int):
+        self.id = id
+        self.attribute_id = attribute_id
+        self.domain_id = domain_id
+        self.points = points
+        self.title = title
+        self.description = description
+        self.order = order
+        self.category_information = category_information
+        self.sort_order = sort_order
+
+
+class ClassificationCatalog:
+    """Immutable, indexed snapshot of the classification hierarchy"""
+
+    __slots__ = ("version", "mtime", "domains", "attributes", "progression_points",
+                 "_by_attribute_points", "_point_attribute", "_point_domain", "_point_points")
+
+    def __init__(self, payload: dict, mtime: float = 0.0):
+        self.version: Optional[str] = payload.get("version")
+        self.mtime = mtime
+        self.domains: Dict[int, Domain] = {}
+        self.attributes: Dict[int, Attribute] = {}
+        self.progression_points: Dict[int, ProgressionPoint] = {}
+        self._by_attribute_points: Dict[Tuple[int, int], ProgressionPoint] = {}
+
+        for domain in payload.get("domains", []):
+            attribute_ids = []
+            for attribute in domain.get("attributes", []):
+                point_ids = []
+                for point in attribute.get("progressionPoints", []):
+                    progression_point = ProgressionPoint(
+                        point["id"], attribute["id"], domain["id"], point["points"],
+                        point.get("title", ""), point.get("description", ""), point.get("order", ""),
+                        point.get("categoryInformation"), point.get("sortOrder", 0),
+                    )
+                    self.progression_points[progression_point.id] = progression_point
+                    self._by_attribute_points[(attribute["id"], point["points"])] = progression_point
+                    point_ids.append(progression_point.id)
+
+                self.attributes[attribute["id"]] = Attribute(
+                    attribute["id"], domain["id"], attribute.get("number", 0), attribute.get("name", ""),
+                    attribute.get("categoryInformation"), attribute.get("sortOrder", 0), tuple(point_ids),
+                )
+                attribute_ids.append(attribute["id"])
+
+            self.domains[domain["id"]] = Domain(
+                domain["id"], domain.get("name", ""), domain.get("categoryName", ""),
+                domain.get("categoryTitle", ""), domain.get("sortOrder", 0), tuple(attribute_ids),
+            )
+
+        # Dense columns indexed by progression point id (0 marks an unknown id)
+        size = max(self.progression_points, default=0) + 1
+        self._point_attribute = array("l", bytes(size * array("l").itemsize))
+        self._point_domain = array("l", bytes(size * array("l").itemsize))
+        self._point_points = array("l", bytes(size * array("l").itemsize))
+        for point in self.progression_points.values():
+            self._point_attribute[point.id] = point.attribute_id
+            self._point_domain[point.id] = point.domain_id
+            self._point_points[point.id] = point.points
+
+    @classmethod
+    def from_file(cls, path: str) -> "ClassificationCatalog":
+        mtime = os.stat(path).st_mtime
+        with open(path, "r", encoding="utf-8") as handle:
+            return cls(json.load(handle), mtime)
+
+    def domain(self, domain_id: int) -> Optional[Domain]:
+        return self.domains.get(domain_id)
+
+    def attribute(self, attribute_id: int) -> Optional[Attribute]:
+        return self.attributes.get(attribute_id)
+
+    def progression_point(self, progression_point_id: int) -> Optional[ProgressionPoint]:
+        return self.progression_points.get(progression_point_id)
+
+    def progression_point_for(self, attribute_id: int, points: int) -> Optional[ProgressionPoint]:
+        """Progression point an attribute is scored at for a given number of points"""
+        return self._by_attribute_points.get((attribute_id, points))
+
+    def resolve_points(self, progression_point_ids: Iterable[int]) -> List[Optional[Tuple[int, int, int]]]:
+        """
+        Map many progression point ids to (domain_id, attribute_id, points)
+        through the dense columns; unknown ids resolve to None.
+        """
+        attributes = self._point_attribute
+        domains = self._point_domain
+        points = self._point_points
+        size = len(attributes)
+        resolved = []
+        for point_id in progression_point_ids:
+            if 0 <= point_id < size and attributes[point_id]:
+                resolved.append((domains[point_id], attributes[point_id], points[point_id]))
+            else:
+                resolved.append(None)
+        return resolved
+
+
+class CatalogStore:
+    """
+    Holds the current catalog and swaps in a new snapshot when the file's
+    mtime or version changes. Readers always see a complete snapshot.
+    """
+
+    def __init__(self, path: Optional[str] = None, check_interval: Optional[float] = None):
+        self.path = path or settings.CLASSIFICATION_DATA_PATH
+        self.check_interval = settings.CATALOG_RELOAD_INTERVAL_SECONDS if check_interval is None else check_interval
+        self._catalog: Optional[ClassificationCatalog] = None
+        self._next_check = 0.0
+        self._lock = threading.Lock()
+
+    def load(self) -> ClassificationCatalog:
+        """Load the file unconditionally"""
+        catalog = ClassificationCatalog.from_file(self.path)
+        with self._lock:
+            self._catalog = catalog
+            self._next_check = time.monotonic() + self.check_interval
+        return catalog
+
+    def get(self) -> ClassificationCatalog:
+        """Current catalog, reloading first if the file changed since the last check"""
+        catalog = self._catalog
+        if catalog is None:
+            return self.load()
+        if time.monotonic() >= self._next_check:
+            return self.reload_if_changed()
+        return catalog
+
+    def reload_if_changed(self) -> ClassificationCatalog:
+        catalog = self._catalog
+        if catalog is None:
+            return self.load()
+        self._next_check = time.monotonic() + self.check_interval
+        try:
+            mtime = os.stat(self.path).st_mtime
+        except OSError:
+            # Keep serving the last good snapshot if the file disappears
+            return catalog
+        if mtime == catalog.mtime:
+            return catalog
+
+        candidate = ClassificationCatalog.from_file(self.path)
+        if candidate.version is not None and candidate.version == catalog.version:
+            catalog.mtime = candidate.mtime
+            return catalog
+        with self._lock:
+            self._catalog = candidate
+        return candidate
+
+
+catalog_store = CatalogStore()
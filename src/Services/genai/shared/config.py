@@ -3,6 +3,7 @@ Shared configuration for MAPP GenAI services
 """
 
 import os
+import tempfile
 from typing import Optional
 
 class Settings:
@@ -12,12 +13,23 @@ class Settings:
     API_HOST: str = os.getenv("API_HOST", "0.0.0.0")
     API_PORT: int = int(os.getenv("PORT", 8000))
     
-    # Database Configuration
+    # Database Configuration (postgresql:// needs asyncpg; sqlite:///path uses the standard library).
+    # DATABASE_MAX_CONNECTIONS is split across MAX_WORKERS processes unless DATABASE_POOL_SIZE is set.
     DATABASE_URL: Optional[str] = os.getenv("DATABASE_URL")
+    DATABASE_MAX_CONNECTIONS: int = int(os.getenv("DATABASE_MAX_CONNECTIONS", 20))
+    DATABASE_POOL_SIZE: int = int(os.getenv("DATABASE_POOL_SIZE", 0))
+    DATABASE_ACQUIRE_TIMEOUT_SECONDS: float = float(os.getenv("DATABASE_ACQUIRE_TIMEOUT_SECONDS", 5))
+    DATABASE_STATEMENT_CACHE_SIZE: int = int(os.getenv("DATABASE_STATEMENT_CACHE_SIZE", 256))
+    DATABASE_PAGE_SIZE: int = int(os.getenv("DATABASE_PAGE_SIZE", 1000))
+    DATABASE_IN_BATCH_SIZE: int = int(os.getenv("DATABASE_IN_BATCH_SIZE", 512))
     
     # AI/ML Configuration
     OPENAI_API_KEY: Optional[str] = os.getenv("OPENAI_API_KEY")
     MODEL_NAME: str = os.getenv("MODEL_NAME", "gpt-3.5-turbo")
+    MODEL_API_URL: Optional[str] = os.getenv("MODEL_API_URL")
+    MODEL_BATCH_MAX_SIZE: int = int(os.getenv("MODEL_BATCH_MAX_SIZE", 16))
+    MODEL_BATCH_MAX_WAIT_MS: float = float(os.getenv("MODEL_BATCH_MAX_WAIT_MS", 5))
+    MODEL_MAX_CONCURRENCY: int = int(os.getenv("MODEL_MAX_CONCURRENCY", 4))
     
     # MAPP API Configuration
     PLANNING_API_URL: str = os.getenv("PLANNING_API_URL", "http://localhost:5001")
@@ -25,14 +37,119 @@ class Settings:
     USERMANAGEMENT_API_URL: str = os.getenv("USERMANAGEMENT_API_URL", "http://localhost:5003")
     REPORTS_API_URL: str = os.getenv("REPORTS_API_URL", "http://localhost:5004")
     
+    # Response Cache Configuration
+    RESPONSE_CACHE_MAX_ENTRIES: int = int(os.getenv("RESPONSE_CACHE_MAX_ENTRIES", 2048))
+    RESPONSE_CACHE_MAX_BYTES: int = int(os.getenv("RESPONSE_CACHE_MAX_BYTES", 64 * 1024 * 1024))
+    RESPONSE_CACHE_TTL_SECONDS: int = int(os.getenv("RESPONSE_CACHE_TTL_SECONDS", 3600))
+    REDIS_URL: Optional[str] = os.getenv("REDIS_URL")
+
+    # Response Compression Configuration (brotli is used when installed and accepted, gzip otherwise;
+    # smaller bodies cost more CPU to compress and decompress than they save on the wire; bodies of
+    # RESPONSE_COMPRESSION_OFFLOAD_BYTES or more are compressed on the CPU executor)
+    RESPONSE_COMPRESSION_MIN_BYTES: int = int(os.getenv("RESPONSE_COMPRESSION_MIN_BYTES", 4096))
+    RESPONSE_COMPRESSION_OFFLOAD_BYTES: int = int(os.getenv("RESPONSE_COMPRESSION_OFFLOAD_BYTES", 256 * 1024))
+    RESPONSE_GZIP_LEVEL: int = int(os.getenv("RESPONSE_GZIP_LEVEL", 6))
+    RESPONSE_BROTLI_QUALITY: int = int(os.getenv("RESPONSE_BROTLI_QUALITY", 4))
+
+    # Admission Control Configuration (concurrency limits are per process; light = GET/HEAD,
+    # heavy = everything else; ADMISSION_ROUTE_LIMITS="/api/generate=2,..." overrides the services'
+    # route limits; a tenant rate of 0 disables rate limiting; the tenant rate and concurrency caps
+    # apply only to requests carrying ADMISSION_TENANT_HEADER)
+    ADMISSION_ENABLED: bool = os.getenv("ADMISSION_ENABLED", "true").lower() == "true"
+    ADMISSION_TENANT_HEADER: str = os.getenv("ADMISSION_TENANT_HEADER", "X-Center-Id")
+    ADMISSION_MAX_CONCURRENCY: int = int(os.getenv("ADMISSION_MAX_CONCURRENCY", 32))
+    ADMISSION_LIGHT_MAX_CONCURRENCY: int = int(os.getenv("ADMISSION_LIGHT_MAX_CONCURRENCY", 64))
+    ADMISSION_TENANT_MAX_CONCURRENCY: int = int(os.getenv("ADMISSION_TENANT_MAX_CONCURRENCY", 8))
+    ADMISSION_TENANT_RATE_PER_SECOND: float = float(os.getenv("ADMISSION_TENANT_RATE_PER_SECOND", 20))
+    ADMISSION_TENANT_BURST: float = float(os.getenv("ADMISSION_TENANT_BURST", 40))
+    ADMISSION_ROUTE_LIMITS: str = os.getenv("ADMISSION_ROUTE_LIMITS", "")
+    ADMISSION_MAX_QUEUE: int = int(os.getenv("ADMISSION_MAX_QUEUE", 256))
+    ADMISSION_QUEUE_TARGET_MS: float = float(os.getenv("ADMISSION_QUEUE_TARGET_MS", 100))
+    ADMISSION_MAX_QUEUE_WAIT_MS: float = float(os.getenv("ADMISSION_MAX_QUEUE_WAIT_MS", 1000))
+    ADMISSION_MAX_TENANTS: int = int(os.getenv("ADMISSION_MAX_TENANTS", 10000))
+    CPU_EXECUTOR_WORKERS: int = int(os.getenv("CPU_EXECUTOR_WORKERS", min(4, os.cpu_count() or 1)))
+    CPU_OFFLOAD_MIN_ITEMS: int = int(os.getenv("CPU_OFFLOAD_MIN_ITEMS", 500))
+
+    # Profiling Configuration (PROFILING_ENABLED turns on sampling and the slow-request threshold;
+    # a request carrying PROFILE_HEADER set to PROFILE_ADMIN_TOKEN is always profiled, and the token
+    # also guards /admin/profiles, which is not served while it is unset. PROFILE_TRACEMALLOC is
+    # off, forced or all: tracemalloc slows every allocation in the process while any traced
+    # request is in flight, so by default only forced requests are traced)
+    PROFILING_ENABLED: bool = os.getenv("PROFILING_ENABLED", "false").lower() == "true"
+    PROFILE_SAMPLE_RATE: float = float(os.getenv("PROFILE_SAMPLE_RATE", 0))
+    PROFILE_SLOW_MS: float = float(os.getenv("PROFILE_SLOW_MS", 1000))
+    PROFILE_INTERVAL_MS: float = float(os.getenv("PROFILE_INTERVAL_MS", 5))
+    PROFILE_TRACEMALLOC: str = os.getenv("PROFILE_TRACEMALLOC", "forced")
+    PROFILE_TRACEMALLOC_FRAMES: int = int(os.getenv("PROFILE_TRACEMALLOC_FRAMES", 1))
+    PROFILE_MAX_PROFILES: int = int(os.getenv("PROFILE_MAX_PROFILES", 50))
+    PROFILE_HEADER: str = os.getenv("PROFILE_HEADER", "X-Profile-Token")
+    PROFILE_ADMIN_TOKEN: Optional[str] = os.getenv("PROFILE_ADMIN_TOKEN")
+
+    # Classification Data Configuration
+    CLASSIFICATION_DATA_PATH: str = os.getenv(
+        "CLASSIFICATION_DATA_PATH",
+        os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "..", "..", "..", "domainsattributesprogressionpoints.json")
+    )
+    CATALOG_RELOAD_INTERVAL_SECONDS: float = float(os.getenv("CATALOG_RELOAD_INTERVAL_SECONDS", 30))
+    
     # Logging Configuration
     LOG_LEVEL: str = os.getenv("LOG_LEVEL", "INFO")
     
     # Security Configuration
     SECRET_KEY: str = os.getenv("SECRET_KEY", "your-secret-key-here")
     
-    # Performance Configuration
-    MAX_WORKERS: int = int(os.getenv("MAX_WORKERS", 4))
+    # Performance Configuration (MAX_WORKERS > 1 pre-forks worker processes; report jobs, forecast
+    # history, aggregates, live event state, caches and /metrics are per process, so only raise it
+    # behind sticky routing or for stateless traffic)
+    MAX_WORKERS: int = int(os.getenv("MAX_WORKERS", 1))
     TIMEOUT_SECONDS: int = int(os.getenv("TIMEOUT_SECONDS", 30))
 
+    # Server Configuration ("auto" picks uvloop/httptools when installed)
+    SERVER_LOOP: str = os.getenv("SERVER_LOOP", "auto")
+    SERVER_HTTP: str = os.getenv("SERVER_HTTP", "auto")
+    SERVER_GRACEFUL_TIMEOUT_SECONDS: int = int(os.getenv("SERVER_GRACEFUL_TIMEOUT_SECONDS", 30))
+    
+    # Report Job Configuration
+    REPORT_OUTPUT_DIR: str = os.getenv("REPORT_OUTPUT_DIR", os.path.join(tempfile.gettempdir(), "mapp-reports"))
+    REPORT_QUEUE_SIZE: int = int(os.getenv("REPORT_QUEUE_SIZE", 100))
+    REPORT_RETENTION: int = int(os.getenv("REPORT_RETENTION", 500))
+    REPORT_RENDER_WORKERS: int = int(os.getenv("REPORT_RENDER_WORKERS", min(4, os.cpu_count() or 1)))
+
+    # Query Optimizer Configuration (QUERY_EXPLAIN_DATABASE: SQLite file with the report
+    # schema; unset uses an in-memory stand-in seeded with QUERY_EXPLAIN_ROWS observations)
+    QUERY_PLAN_CACHE_SIZE: int = int(os.getenv("QUERY_PLAN_CACHE_SIZE", 512))
+    QUERY_EXPLAIN_DATABASE: Optional[str] = os.getenv("QUERY_EXPLAIN_DATABASE")
+    QUERY_EXPLAIN_ROWS: int = int(os.getenv("QUERY_EXPLAIN_ROWS", 20000))
+    QUERY_EXPLAIN_TIMEOUT_SECONDS: float = float(os.getenv("QUERY_EXPLAIN_TIMEOUT_SECONDS", 2))
+    
+    # Plan Scoring Configuration (COMPLETION_MODEL_PATH: JSON from planning-ai/train_completion_model.py;
+    # unset scores with the built-in prior weights)
+    COMPLETION_MODEL_PATH: Optional[str] = os.getenv("COMPLETION_MODEL_PATH")
+    FEATURE_CACHE_MAX_PLANS: int = int(os.getenv("FEATURE_CACHE_MAX_PLANS", 50000))
+    FEATURE_CACHE_TTL_SECONDS: float = float(os.getenv("FEATURE_CACHE_TTL_SECONDS", 300))
+    ANALYTICS_BATCH_MAX_PLANS: int = int(os.getenv("ANALYTICS_BATCH_MAX_PLANS", 1000))
+    
+    # Health Check Configuration
+    HEALTH_CHECK_INTERVAL_SECONDS: float = float(os.getenv("HEALTH_CHECK_INTERVAL_SECONDS", 15))
+    HEALTH_CHECK_TIMEOUT_SECONDS: float = float(os.getenv("HEALTH_CHECK_TIMEOUT_SECONDS", 5))
+
+    # Event Consumer Configuration (memory:// or file:///path; unset disables consuming)
+    EVENT_BROKER_URL: Optional[str] = os.getenv("EVENT_BROKER_URL")
+    EVENT_CONSUMER_GROUP: Optional[str] = os.getenv("EVENT_CONSUMER_GROUP")
+    EVENT_BATCH_SIZE: int = int(os.getenv("EVENT_BATCH_SIZE", 100))
+    EVENT_MAX_CONCURRENCY: int = int(os.getenv("EVENT_MAX_CONCURRENCY", 4))
+    EVENT_POLL_INTERVAL_SECONDS: float = float(os.getenv("EVENT_POLL_INTERVAL_SECONDS", 1))
+    EVENT_ACK_DEADLINE_SECONDS: float = float(os.getenv("EVENT_ACK_DEADLINE_SECONDS", 60))
+    EVENT_MAX_ATTEMPTS: int = int(os.getenv("EVENT_MAX_ATTEMPTS", 5))
+    EVENT_DEDUPE_WINDOW: int = int(os.getenv("EVENT_DEDUPE_WINDOW", 100000))
+    OBSERVATION_EVENT_TOPICS: str = os.getenv(
+        "OBSERVATION_EVENT_TOPICS", "observationcreated,observationsubmitted,observationvalidated")
+    PLAN_EVENT_TOPICS: str = os.getenv("PLAN_EVENT_TOPICS", "plancreated,planstarted,plancompleted,plancancelled")
+
+    # HTTP Client Pool Configuration (limits apply per upstream)
+    HTTP_MAX_CONNECTIONS: int = int(os.getenv("HTTP_MAX_CONNECTIONS", 100))
+    HTTP_MAX_KEEPALIVE_CONNECTIONS: int = int(os.getenv("HTTP_MAX_KEEPALIVE_CONNECTIONS", 20))
+    HTTP_KEEPALIVE_EXPIRY_SECONDS: float = float(os.getenv("HTTP_KEEPALIVE_EXPIRY_SECONDS", 30))
+    HTTP2_ENABLED: bool = os.getenv("HTTP2_ENABLED", "true").lower() == "true"
+
 settings = Settings()
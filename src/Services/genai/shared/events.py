@@ -0,0 +1,480 @@
+"""
+Domain event consumer for the GenAI services
+
+The .NET services publish domain events to Pub/Sub topics named after the
+event type (ObservationCreatedEvent -> "observationcreated"). EventConsumer
+pulls them in batches, hands each batch to the topic's handler with a bound
+on batches in flight, and acks only after the handler returns, so delivery
+is at-least-once. Message ids seen within EVENT_DEDUPE_WINDOW are acked
+without reprocessing; handlers must still be idempotent because that window
+does not survive a restart.
+
+Two broker stand-ins are provided, selected by EVENT_BROKER_URL:
+  memory://           process-local queues (tests, benchmarks)
+  file:///some/dir    one NDJSON log per topic plus a committed offset per
+                      consumer group, so other processes can publish by
+                      appending lines and consumption resumes after restarts
+"""
+
+from collections import OrderedDict, deque
+from typing import Any, Awaitable, Callable, Deque, Dict, List, Optional, Tuple, Union
+from urllib.parse import urlparse
+import asyncio
+import json
+import logging
+import os
+import time
+import uuid
+
+from .config import settings
+from .metrics import stage
+
+logger = logging.getLogger(__name__)
+
+# Payload keys that wrap the entity in platform events ({"Observation": {...}, "DateOccurred": ...})
+ENTITY_KEYS = ("Observation", "Plan", "observation", "plan")
+
+
+def _camel(key: str) -> str:
+    """System.Text.Json writes PascalCase; handlers read camelCase or snake_case"""
+    return key[:1].lower() + key[1:] if key[:1].isupper() else key
+
+
+class Message:
+    """A delivery from the broker; the same message may be delivered more than once"""
+
+    __slots__ = ("id", "topic", "data", "attributes", "delivery_attempt", "offset")
+
+    def __init__(self, id: str, topic: str, data: bytes, attributes: Optional[Dict[str, str]] = None,
+                 delivery_attempt: int = 0, offset: int = 0):
+        self.id = id
+        self.topic = topic
+        self.data = data
+        self.attributes = attributes or {}
+        self.delivery_attempt = delivery_attempt
+        self.offset = offset
+
+
+class Event:
+    """A decoded domain event: type, entity payload and when it occurred"""
+
+    __slots__ = ("id", "type", "topic", "data", "occurred_at")
+
+    def __init__(self, id: str, type: str, topic: str, data: Dict[str, Any], occurred_at: Optional[str] = None):
+        self.id = id
+        self.type = type
+        self.topic = topic
+        self.data = data
+        self.occurred_at = occurred_at
+
+    @classmethod
+    def from_message(cls, message: Message) -> "Event":
+        payload = json.loads(message.data)
+        if not isinstance(payload, dict):
+            raise ValueError("event payload is not a JSON object")
+        attributes = message.attributes
+        event_type = attributes.get("eventType") or payload.get("type") or message.topic
+        occurred_at = attributes.get("timestamp") or payload.get("DateOccurred") or payload.get("occurred_at")
+
+        data = payload.get("data")
+        if not isinstance(data, dict):
+            data = next((payload[key] for key in ENTITY_KEYS if isinstance(payload.get(key), dict)), payload)
+        data = {_camel(key): value for key, value in data.items()}
+        return cls(attributes.get("eventId") or message.id, event_type, message.topic, data, occurred_at)
+
+    def as_dict(self) -> Dict[str, Any]:
+        """Envelope in the shape AggregateStore.apply_event() and the HTTP event endpoints accept"""
+        return {"id": self.id, "type": self.type, "occurred_at": self.occurred_at, "data": self.data}
+
+
+class InMemoryBroker:
+    """
+    Process-local topics with one shared subscription each. Fetched messages
+    are leased until acked; nacked or expired leases go back to the queue.
+    """
+
+    def __init__(self, ack_deadline: Optional[float] = None):
+        self.ack_deadline = ack_deadline or settings.EVENT_ACK_DEADLINE_SECONDS
+        self._queues: Dict[str, Deque[Message]] = {}
+        # Keyed by a per-publish sequence number, since re-published copies share a message id
+        self._leases: Dict[str, Dict[int, Tuple[Message, float]]] = {}
+        self._sequence = 0
+        self._changed = asyncio.Event()
+
+    def publish(self, topic: str, data: Union[bytes, Dict[str, Any]], attributes: Optional[Dict[str, str]] = None) -> str:
+        if isinstance(data, dict):
+            data = json.dumps(data, default=str).encode()
+        message_id = (attributes or {}).get("eventId") or uuid.uuid4().hex
+        self._sequence += 1
+        self._queues.setdefault(topic, deque()).append(
+            Message(message_id, topic, data, attributes, offset=self._sequence))
+        self._changed.set()
+        return message_id
+
+    async def fetch(self, topic: str, group: str, max_messages: int, timeout: float) -> List[Message]:
+        deadline = time.monotonic() + timeout
+        while True:
+            self._expire_leases(topic)
+            queue = self._queues.get(topic)
+            if queue:
+                break
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                return []
+            self._changed.clear()
+            try:
+                await asyncio.wait_for(self._changed.wait(), remaining)
+            except asyncio.TimeoutError:
+                return []
+
+        leases = self._leases.setdefault(topic, {})
+        expires = time.monotonic() + self.ack_deadline
+        batch = []
+        while queue and len(batch) < max_messages:
+            message = queue.popleft()
+            message.delivery_attempt += 1
+            leases[message.offset] = (message, expires)
+            batch.append(message)
+        return batch
+
+    async def ack(self, topic: str, group: str, messages: List[Message]):
+        leases = self._leases.get(topic, {})
+        for message in messages:
+            leases.pop(message.offset, None)
+
+    async def nack(self, topic: str, group: str, messages: List[Message]):
+        leases = self._leases.get(topic, {})
+        queue = self._queues.setdefault(topic, deque())
+        for message in reversed(messages):
+            if leases.pop(message.offset, None) is not None:
+                queue.appendleft(message)
+        self._changed.set()
+
+    def has_backlog(self, topic: str, group: str) -> bool:
+        return bool(self._queues.get(topic) or self._leases.get(topic))
+
+    def _expire_leases(self, topic: str):
+        leases = self._leases.get(topic)
+        if not leases:
+            return
+        now = time.monotonic()
+        expired = [message for message, expires in leases.values() if expires <= now]
+        for message in expired:
+            del leases[message.offset]
+            self._queues.setdefault(topic, deque()).appendleft(message)
+
+
+class FileBroker:
+    """
+    Append-only NDJSON log per topic ({"id", "data", "attributes"} per line)
+    and a committed byte offset per consumer group. The offset only moves
+    past a contiguous run of acked messages. Nacked messages and expired
+    leases are redelivered on their own, ahead of new lines, while other
+    leased messages keep their leases; after a restart everything past the
+    committed offset is read again.
+    """
+
+    def __init__(self, directory: str, ack_deadline: Optional[float] = None):
+        self.directory = directory
+        self.ack_deadline = ack_deadline or settings.EVENT_ACK_DEADLINE_SECONDS
+        os.makedirs(directory, exist_ok=True)
+        self._cursors: Dict[Tuple[str, str], "_FileCursor"] = {}
+
+    def publish(self, topic: str, data: Union[bytes, Dict[str, Any]], attributes: Optional[Dict[str, str]] = None) -> str:
+        payload = data if isinstance(data, dict) else json.loads(data)
+        message_id = (attributes or {}).get("eventId") or uuid.uuid4().hex
+        line = json.dumps({"id": message_id, "data": payload, "attributes": attributes or {}}, default=str)
+        with open(self._log_path(topic), "a", encoding="utf-8") as log:
+            log.write(line + "\n")
+        return message_id
+
+    async def fetch(self, topic: str, group: str, max_messages: int, timeout: float) -> List[Message]:
+        cursor = self._cursor(topic, group)
+        deadline = time.monotonic() + timeout
+        while True:
+            cursor.expire_leases()
+            batch = await asyncio.to_thread(cursor.read, max_messages, self.ack_deadline)
+            remaining = deadline - time.monotonic()
+            if batch or remaining <= 0:
+                return batch
+            await asyncio.sleep(min(remaining, settings.EVENT_POLL_INTERVAL_SECONDS))
+
+    async def ack(self, topic: str, group: str, messages: List[Message]):
+        cursor = self._cursor(topic, group)
+        if cursor.ack(messages):
+            await asyncio.to_thread(cursor.commit)
+
+    async def nack(self, topic: str, group: str, messages: List[Message]):
+        self._cursor(topic, group).nack(messages)
+
+    def has_backlog(self, topic: str, group: str) -> bool:
+        try:
+            size = os.path.getsize(self._log_path(topic))
+        except OSError:
+            return False
+        return size > self._cursor(topic, group).committed
+
+    def _log_path(self, topic: str) -> str:
+        return os.path.join(self.directory, f"{topic}.ndjson")
+
+    def _cursor(self, topic: str, group: str) -> "_FileCursor":
+        cursor = self._cursors.get((topic, group))
+        if cursor is None:
+            offset_path = os.path.join(self.directory, f"{topic}.{group}.offset")
+            cursor = self._cursors[(topic, group)] = _FileCursor(topic, self._log_path(topic), offset_path)
+        return cursor
+
+
+class _FileCursor:
+    def __init__(self, topic: str, log_path: str, offset_path: str):
+        self.topic = topic
+        self.log_path = log_path
+        self.offset_path = offset_path
+        self.committed = self._load_offset()
+        self.position = self.committed
+        # Start offset -> (message, lease expiry), in log order
+        self.leases: "OrderedDict[int, Tuple[Message, float]]" = OrderedDict()
+        # Start offset -> message that was nacked or whose lease expired, redelivered before new lines
+        self.redeliver: Dict[int, Message] = {}
+        self.acked: Dict[int, int] = {}  # start offset -> end offset
+        self.attempts: Dict[str, int] = {}
+
+    def read(self, max_messages: int, ack_deadline: float) -> List[Message]:
+        batch = []
+        expires = time.monotonic() + ack_deadline
+        for start in sorted(self.redeliver)[:max_messages]:
+            message = self.redeliver.pop(start)
+            self.attempts[message.id] = self.attempts.get(message.id, 0) + 1
+            message.delivery_attempt = self.attempts[message.id]
+            self.leases[start] = (message, expires)
+            batch.append(message)
+        if len(batch) >= max_messages or not os.path.exists(self.log_path):
+            return batch
+        with open(self.log_path, "rb") as log:
+            log.seek(self.position)
+            while len(batch) < max_messages:
+                start = log.tell()
+                line = log.readline()
+                if not line.endswith(b"\n"):
+                    break  # End of log, or a line still being appended
+                self.position = log.tell()
+                if start in self.leases:
+                    continue
+                if start in self.acked or not line.strip():
+                    if not line.strip():
+                        self.acked[start] = self.position
+                    continue
+                record = json.loads(line)
+                message_id = record["id"]
+                self.attempts[message_id] = self.attempts.get(message_id, 0) + 1
+                message = Message(message_id, self.topic, json.dumps(record["data"]).encode(),
+                                  record.get("attributes"), self.attempts[message_id], start)
+                self.leases[start] = (message, expires)
+                batch.append(message)
+        return batch
+
+    def ack(self, messages: List[Message]) -> bool:
+        """Mark messages done; True when the committed offset can advance"""
+        for message in messages:
+            lease = self.leases.pop(message.offset, None)
+            if lease is not None:
+                self.acked[message.offset] = self._end_of(message.offset)
+                self.attempts.pop(message.id, None)
+        return self.committed in self.acked
+
+    def commit(self):
+        while self.committed in self.acked:
+            self.committed = self.acked.pop(self.committed)
+        temporary = f"{self.offset_path}.tmp"
+        with open(temporary, "w", encoding="utf-8") as handle:
+            handle.write(str(self.committed))
+        os.replace(temporary, self.offset_path)
+
+    def nack(self, messages: List[Message]):
+        """Redeliver these messages; other leased messages stay with their consumers"""
+        for message in messages:
+            lease = self.leases.pop(message.offset, None)
+            if lease is not None:
+                self.redeliver[message.offset] = lease[0]
+
+    def expire_leases(self):
+        now = time.monotonic()
+        expired = [message for message, expires in self.leases.values() if expires <= now]
+        if expired:
+            self.nack(expired)
+
+    def _end_of(self, start: int) -> int:
+        with open(self.log_path, "rb") as log:
+            log.seek(start)
+            log.readline()
+            return log.tell()
+
+    def _load_offset(self) -> int:
+        try:
+            with open(self.offset_path, encoding="utf-8") as handle:
+                return int(handle.read().strip() or 0)
+        except (OSError, ValueError):
+            return 0
+
+
+def create_broker(url: Optional[str]):
+    """Broker for EVENT_BROKER_URL, or None when consuming is disabled"""
+    if not url:
+        return None
+    parsed = urlparse(url)
+    if parsed.scheme == "memory":
+        return InMemoryBroker()
+    if parsed.scheme == "file":
+        return FileBroker(parsed.path)
+    raise ValueError(f"Unsupported EVENT_BROKER_URL scheme '{parsed.scheme}'")
+
+
+def topic_list(value: str) -> List[str]:
+    return [topic.strip() for topic in value.split(",") if topic.strip()]
+
+
+EventHandler = Callable[[List[Event]], Union[None, Awaitable[None]]]
+
+
+class EventConsumer:
+    """
+    Pulls each subscribed topic in batches of EVENT_BATCH_SIZE and runs up to
+    EVENT_MAX_CONCURRENCY handler batches at once. A failed batch is nacked
+    for redelivery; messages that keep failing are dropped after
+    EVENT_MAX_ATTEMPTS deliveries and counted as dead-lettered.
+    """
+
+    def __init__(self, group: str, broker: Any = None, batch_size: Optional[int] = None,
+                 max_concurrency: Optional[int] = None, max_attempts: Optional[int] = None,
+                 dedupe_window: Optional[int] = None):
+        self.group = settings.EVENT_CONSUMER_GROUP or group
+        self.broker = broker if broker is not None else create_broker(settings.EVENT_BROKER_URL)
+        self.batch_size = batch_size or settings.EVENT_BATCH_SIZE
+        self.max_concurrency = max_concurrency or settings.EVENT_MAX_CONCURRENCY
+        self.max_attempts = max_attempts or settings.EVENT_MAX_ATTEMPTS
+        self.dedupe_window = dedupe_window or settings.EVENT_DEDUPE_WINDOW
+        self._handlers: Dict[str, EventHandler] = {}
+        self._processed: "OrderedDict[str, None]" = OrderedDict()
+        self._slots: Optional[asyncio.Semaphore] = None
+        self._pollers: List[asyncio.Task] = []
+        self._in_flight: set = set()
+        self.consumed = 0
+        self.duplicates = 0
+        self.failed_batches = 0
+        self.dead_lettered = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.broker is not None
+
+    def subscribe(self, topics: Union[str, List[str]], handler: EventHandler):
+        for topic in ([topics] if isinstance(topics, str) else topics):
+            self._handlers[topic] = handler
+
+    async def start(self):
+        if not self.enabled or self._pollers:
+            return
+        self._slots = asyncio.Semaphore(self.max_concurrency)
+        self._pollers = [asyncio.create_task(self._poll(topic)) for topic in self._handlers]
+
+    async def stop(self):
+        """Stop pulling and let in-flight batches finish so they are acked rather than redelivered"""
+        pollers, self._pollers = self._pollers, []
+        for task in pollers:
+            task.cancel()
+        await asyncio.gather(*pollers, return_exceptions=True)
+        if self._in_flight:
+            await asyncio.wait(self._in_flight, timeout=settings.SERVER_GRACEFUL_TIMEOUT_SECONDS)
+
+    async def drain(self, timeout: float = 10.0):
+        """Wait until every subscribed topic is empty and no batch is in flight (tests, benchmarks)"""
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            if not self._in_flight and not any(self.broker.has_backlog(topic, self.group)
+                                               for topic in self._handlers):
+                return
+            await asyncio.sleep(0.01)
+        raise TimeoutError("event backlog did not drain")
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "enabled": self.enabled,
+            "topics": len(self._handlers),
+            "in_flight_batches": len(self._in_flight),
+            "consumed": self.consumed,
+            "duplicates": self.duplicates,
+            "failed_batches": self.failed_batches,
+            "dead_lettered": self.dead_lettered,
+        }
+
+    async def _poll(self, topic: str):
+        handler = self._handlers[topic]
+        while True:
+            await self._slots.acquire()
+            try:
+                messages = await self.broker.fetch(topic, self.group, self.batch_size,
+                                                   settings.EVENT_POLL_INTERVAL_SECONDS)
+            except asyncio.CancelledError:
+                self._slots.release()
+                raise
+            except Exception:
+                self._slots.release()
+                logger.exception("Fetching events from %s failed", topic)
+                await asyncio.sleep(settings.EVENT_POLL_INTERVAL_SECONDS)
+                continue
+            if not messages:
+                self._slots.release()
+                continue
+            task = asyncio.create_task(self._process(topic, handler, messages))
+            self._in_flight.add(task)
+            task.add_done_callback(self._finished)
+
+    def _finished(self, task: asyncio.Task):
+        self._in_flight.discard(task)
+        self._slots.release()
+
+    async def _process(self, topic: str, handler: EventHandler, messages: List[Message]):
+        events, pending, done, poison = [], [], [], []
+        batch_ids = set()
+        for message in messages:
+            if message.id in self._processed or message.id in batch_ids:
+                self.duplicates += 1
+                done.append(message)
+                continue
+            try:
+                events.append(Event.from_message(message))
+                pending.append(message)
+                batch_ids.add(message.id)
+            except (ValueError, KeyError) as e:
+                logger.warning("Dropping undecodable event %s on %s: %s", message.id, topic, e)
+                poison.append(message)
+
+        try:
+            if events:
+                with stage(f"consume_{topic}"):
+                    result = handler(events)
+                    if asyncio.iscoroutine(result):
+                        await result
+        except Exception:
+            self.failed_batches += 1
+            logger.exception("Handler for %s failed on a batch of %d events", topic, len(events))
+            retry = [message for message in pending if message.delivery_attempt < self.max_attempts]
+            poison.extend(message for message in pending if message.delivery_attempt >= self.max_attempts)
+            if retry:
+                await self.broker.nack(topic, self.group, retry)
+            pending = []
+
+        for message in pending:
+            self._remember(message.id)
+        self.consumed += len(pending)
+        self.dead_lettered += len(poison)
+        for message in poison:
+            logger.error("Dead-lettering event %s on %s after %d deliveries", message.id, topic,
+                         message.delivery_attempt)
+        if pending or done or poison:
+            await self.broker.ack(topic, self.group, [*pending, *done, *poison])
+
+    def _remember(self, message_id: str):
+        self._processed[message_id] = None
+        if len(self._processed) > self.dedupe_window:
+            self._processed.popitem(last=False)
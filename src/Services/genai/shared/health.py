@@ -0,0 +1,168 @@
+"""
+Background health monitor for the GenAI services
+
+Memory, uptime, dependency status and any extra details are refreshed on
+an interval by a background task. /health, /health/ready and /health/live
+answer from the last snapshot, so probes never trigger upstream calls. The
+first refresh also runs in the background, so a slow dependency never
+delays startup; readiness stays 503 until it completes.
+"""
+
+from datetime import datetime
+from typing import Any, Awaitable, Callable, Dict, Optional
+import asyncio
+import json
+import logging
+import os
+import time
+
+from fastapi import FastAPI
+from fastapi.responses import Response
+
+from .config import settings
+from .database import database
+from .http_client import http_clients
+from .lazy import lazy_import
+
+psutil = lazy_import("psutil")
+
+logger = logging.getLogger(__name__)
+
+# Dependency states that do not make a service unready
+OK_STATES = frozenset({"healthy", "not_configured", "not_implemented"})
+
+DependencyCheck = Callable[[], Awaitable[str]]
+
+
+def upstream_check(upstream: str, path: str = "/health") -> DependencyCheck:
+    """Check an upstream through its pooled client; any non-200 answer counts as degraded"""
+    async def check() -> str:
+        response = await http_clients.get(upstream, path, timeout=settings.HEALTH_CHECK_TIMEOUT_SECONDS)
+        return "healthy" if response.status_code == 200 else "degraded"
+    return check
+
+
+def database_check() -> Optional[DependencyCheck]:
+    """SELECT 1 through the shared pool; a saturated pool counts as degraded"""
+    if not database.enabled:
+        return None
+    return database.ping
+
+
+class HealthMonitor:
+    """
+    Refreshes a health snapshot every HEALTH_CHECK_INTERVAL_SECONDS.
+    A dependency mapped to None is reported as not_configured.
+    """
+
+    def __init__(self, service: str, domain: Optional[str] = None,
+                 dependencies: Optional[Dict[str, Optional[DependencyCheck]]] = None,
+                 details: Optional[Dict[str, Callable[[], Any]]] = None,
+                 interval: Optional[float] = None):
+        self.service = service
+        self.domain = domain
+        self.dependencies = dependencies or {}
+        self.details = details or {}
+        self.interval = interval or settings.HEALTH_CHECK_INTERVAL_SECONDS
+        self.ready = False
+        self._process = None
+        self._snapshot: Dict[str, Any] = {}
+        self._body = b""
+        self._task: Optional[asyncio.Task] = None
+
+    async def start(self):
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        task, self._task = self._task, None
+        if task is not None:
+            task.cancel()
+            await asyncio.gather(task, return_exceptions=True)
+        self.ready = False
+
+    @property
+    def snapshot(self) -> Dict[str, Any]:
+        return self._snapshot
+
+    async def refresh(self):
+        names = list(self.dependencies)
+        results = await asyncio.gather(*(self._check(name) for name in names))
+        dependencies = dict(zip(names, results))
+
+        if self._process is None:
+            self._process = psutil.Process()
+        checks: Dict[str, Any] = {
+            "api_responsive": True,
+            "memory_usage_mb": self._memory_usage(),
+            "uptime_seconds": round(time.time() - self._process.create_time(), 2),
+            "dependencies": dependencies,
+        }
+        for name, detail in self.details.items():
+            try:
+                checks[name] = detail()
+            except Exception as e:
+                checks[name] = f"error: {str(e)}"
+
+        healthy = all(state in OK_STATES for state in dependencies.values())
+        snapshot = {
+            "status": "healthy" if healthy else "degraded",
+            "service": self.service,
+            "timestamp": datetime.utcnow().isoformat(),
+            "version": "1.0.0",
+            "environment": os.getenv("ENVIRONMENT", "development"),
+            "checks": checks,
+        }
+        if self.domain:
+            snapshot["domain"] = self.domain
+
+        self._snapshot = snapshot
+        self._body = json.dumps(snapshot, default=str).encode()
+        self.ready = healthy
+
+    def install(self, app: FastAPI):
+        """Register /health, /health/ready and /health/live served from the snapshot"""
+        ready_body = json.dumps({"status": "ready", "service": self.service}).encode()
+        not_ready_body = json.dumps({"status": "not_ready", "service": self.service}).encode()
+        alive_body = json.dumps({"status": "alive", "service": self.service}).encode()
+
+        @app.get("/health")
+        async def health_check():
+            """Comprehensive health check from the latest background snapshot"""
+            if not self._body:
+                return Response(not_ready_body, status_code=503, media_type="application/json")
+            return Response(self._body, media_type="application/json")
+
+        @app.get("/health/ready")
+        async def readiness_check():
+            """Readiness probe for Kubernetes/container orchestration"""
+            if self.ready:
+                return Response(ready_body, media_type="application/json")
+            return Response(not_ready_body, status_code=503, media_type="application/json")
+
+        @app.get("/health/live")
+        async def liveness_check():
+            """Liveness probe for Kubernetes/container orchestration"""
+            return Response(alive_body, media_type="application/json")
+
+    async def _run(self):
+        while True:
+            try:
+                await self.refresh()
+            except Exception:
+                logger.exception("Health refresh failed for %s", self.service)
+            await asyncio.sleep(self.interval)
+
+    async def _check(self, name: str) -> str:
+        check = self.dependencies[name]
+        if check is None:
+            return "not_configured"
+        try:
+            return await check()
+        except Exception as e:
+            return f"error: {str(e)}"
+
+    def _memory_usage(self):
+        try:
+            return round(self._process.memory_info().rss / 1024 / 1024, 2)
+        except psutil.Error:
+            return "unknown"
@@ -0,0 +1,158 @@
+"""
+Pooled HTTP clients for calls from the GenAI services to the MAPP APIs
+
+One long-lived httpx.AsyncClient is kept per upstream so each API gets its
+own connection limits and keep-alive pool. The FastAPI lifespan starts the
+manager on startup and closes it on shutdown. httpx is imported lazily and
+each client is built on first use (or by warm()), keeping both off the
+cold-start path.
+"""
+
+from typing import Any, Dict, Optional
+import importlib.util
+import time
+
+from .config import settings
+from .lazy import lazy_import
+
+httpx = lazy_import("httpx")
+
+
+def default_upstreams() -> Dict[str, str]:
+    upstreams = {
+        "planning_api": settings.PLANNING_API_URL,
+        "observations_api": settings.OBSERVATIONS_API_URL,
+        "reports_api": settings.REPORTS_API_URL,
+        "usermanagement_api": settings.USERMANAGEMENT_API_URL,
+    }
+    if settings.MODEL_API_URL:
+        upstreams["model_api"] = settings.MODEL_API_URL
+    return upstreams
+
+
+def http2_available() -> bool:
+    """HTTP/2 needs the optional h2 package (installed by httpx[http2])"""
+    return settings.HTTP2_ENABLED and importlib.util.find_spec("h2") is not None
+
+
+class UpstreamStats:
+    __slots__ = ("requests", "errors", "in_flight", "max_in_flight", "total_seconds")
+
+    def __init__(self):
+        self.requests = 0
+        self.errors = 0
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self.total_seconds = 0.0
+
+
+class HttpClientManager:
+    """Creates, hands out and closes one pooled client per upstream"""
+
+    def __init__(self, upstreams: Optional[Dict[str, str]] = None, timeout: Optional[float] = None,
+                 max_connections: Optional[int] = None, max_keepalive_connections: Optional[int] = None,
+                 keepalive_expiry: Optional[float] = None, http2: Optional[bool] = None):
+        self.upstreams = upstreams if upstreams is not None else default_upstreams()
+        self.timeout = timeout if timeout is not None else settings.TIMEOUT_SECONDS
+        self.max_connections = max_connections or settings.HTTP_MAX_CONNECTIONS
+        self.max_keepalive_connections = max_keepalive_connections or settings.HTTP_MAX_KEEPALIVE_CONNECTIONS
+        self.keepalive_expiry = keepalive_expiry if keepalive_expiry is not None else settings.HTTP_KEEPALIVE_EXPIRY_SECONDS
+        self.http2 = http2_available() if http2 is None else http2
+        self.started = False
+        self._clients: Dict[str, "httpx.AsyncClient"] = {}
+        self._stats: Dict[str, UpstreamStats] = {name: UpstreamStats() for name in self.upstreams}
+
+    async def start(self):
+        self.started = True
+
+    def warm(self):
+        """Build every upstream's client ahead of its first request"""
+        for upstream in self.upstreams:
+            self.client(upstream)
+
+    async def close(self):
+        self.started = False
+        clients, self._clients = self._clients, {}
+        for client in clients.values():
+            await client.aclose()
+
+    def client(self, upstream: str) -> "httpx.AsyncClient":
+        """Pooled client for an upstream, built on first use; only valid between start() and close()"""
+        client = self._clients.get(upstream)
+        if client is not None:
+            return client
+        if not self.started:
+            raise RuntimeError(f"HTTP client for '{upstream}' is not started")
+        try:
+            base_url = self.upstreams[upstream]
+        except KeyError:
+            raise RuntimeError(f"No upstream named '{upstream}' is configured") from None
+        client = self._clients[upstream] = httpx.AsyncClient(
+            base_url=base_url,
+            timeout=self.timeout,
+            limits=httpx.Limits(
+                max_connections=self.max_connections,
+                max_keepalive_connections=self.max_keepalive_connections,
+                keepalive_expiry=self.keepalive_expiry,
+            ),
+            http2=self.http2,
+        )
+        return client
+
+    async def request(self, upstream: str, method: str, path: str, **kwargs: Any) -> "httpx.Response":
+        """Send a request through an upstream's pool and record it in the pool statistics"""
+        client = self.client(upstream)
+        stats = self._stats[upstream]
+        stats.requests += 1
+        stats.in_flight += 1
+        stats.max_in_flight = max(stats.max_in_flight, stats.in_flight)
+        started = time.perf_counter()
+        try:
+            return await client.request(method, path, **kwargs)
+        except Exception:
+            stats.errors += 1
+            raise
+        finally:
+            stats.in_flight -= 1
+            stats.total_seconds += time.perf_counter() - started
+
+    async def get(self, upstream: str, path: str, **kwargs: Any) -> "httpx.Response":
+        return await self.request(upstream, "GET", path, **kwargs)
+
+    async def post(self, upstream: str, path: str, **kwargs: Any) -> "httpx.Response":
+        return await self.request(upstream, "POST", path, **kwargs)
+
+    def stats(self) -> Dict[str, Dict[str, Any]]:
+        """Request counters and connection pool occupancy per upstream"""
+        report = {}
+        for name, client in self._clients.items():
+            stats = self._stats[name]
+            connections = _pool_connections(client)
+            report[name] = {
+                "requests": stats.requests,
+                "errors": stats.errors,
+                "in_flight": stats.in_flight,
+                "max_in_flight": stats.max_in_flight,
+                "avg_latency_ms": round(stats.total_seconds / stats.requests * 1000, 2) if stats.requests else 0.0,
+                "connections": len(connections),
+                "idle_connections": sum(1 for connection in connections if connection.is_idle()),
+                "http2_connections": sum(1 for connection in connections if _is_http2(connection)),
+                "max_connections": self.max_connections,
+            }
+        return report
+
+
+def _pool_connections(client: "httpx.AsyncClient") -> list:
+    # httpx does not expose pool occupancy publicly, so read it from httpcore
+    pool = getattr(getattr(client, "_transport", None), "_pool", None)
+    return list(getattr(pool, "connections", []))
+
+
+def _is_http2(connection) -> bool:
+    try:
+        return "HTTP/2" in connection.info()
+    except Exception:
+        return False
+
+
+http_clients = HttpClientManager()
@@ -0,0 +1,153 @@
+"""
+Process launcher for the GenAI services
+
+With one worker this is uvicorn.run(). With more, the parent binds the
+listening socket, preloads read-only data (the classification catalog) and
+freezes the GC heap, then forks MAX_WORKERS workers that share those pages
+copy-on-write and accept on the same socket. The parent restarts workers
+that die and, on SIGTERM/SIGINT, forwards SIGTERM so each worker stops
+accepting and drains in-flight requests for SERVER_GRACEFUL_TIMEOUT_SECONDS.
+
+MAX_WORKERS defaults to 1: the services keep report jobs, forecast history,
+aggregates, live event state, response caches and the /metrics registry in
+process memory, so a follow-up request that lands on another worker does
+not see them. Raise it only behind sticky routing or for stateless routes.
+"""
+
+from typing import Dict, Optional
+import gc
+import importlib.util
+import logging
+import os
+import signal
+import socket
+import sys
+import time
+
+from .catalog import catalog_store
+from .config import settings
+from .lazy import lazy_import
+
+# Only needed once serve() runs, so importing a service module stays cheap
+uvicorn = lazy_import("uvicorn")
+
+logger = logging.getLogger(__name__)
+
+# Minimum seconds between restarts of crashed workers, so a crash loop cannot spin
+RESTART_BACKOFF_SECONDS = 1.0
+
+
+def event_loop_choice() -> str:
+    if settings.SERVER_LOOP != "auto":
+        return settings.SERVER_LOOP
+    return "uvloop" if importlib.util.find_spec("uvloop") is not None else "asyncio"
+
+
+def http_protocol_choice() -> str:
+    if settings.SERVER_HTTP != "auto":
+        return settings.SERVER_HTTP
+    return "httptools" if importlib.util.find_spec("httptools") is not None else "h11"
+
+
+def preload_shared_data():
+    """Load read-only data once in the parent so forked workers share it"""
+    try:
+        catalog_store.load()
+    except OSError:
+        logger.warning("Classification catalog not found at %s; workers will load it lazily", catalog_store.path)
+
+
+def server_config(app, host: str, port: int) -> "uvicorn.Config":
+    return uvicorn.Config(
+        app,
+        host=host,
+        port=port,
+        loop=event_loop_choice(),
+        http=http_protocol_choice(),
+        timeout_graceful_shutdown=settings.SERVER_GRACEFUL_TIMEOUT_SECONDS,
+        log_level=settings.LOG_LEVEL.lower(),
+    )
+
+
+def serve(app, port: int, host: str = "0.0.0.0", workers: Optional[int] = None):
+    """Run the app with `workers` processes (defaults to MAX_WORKERS)"""
+    workers = workers or settings.MAX_WORKERS
+    config = server_config(app, host, port)
+    if workers <= 1:
+        uvicorn.Server(config).run()
+        return
+    PreforkSupervisor(config, workers).run()
+
+
+class PreforkSupervisor:
+    def __init__(self, config: "uvicorn.Config", workers: int):
+        self.config = config
+        self.workers = workers
+        self.children: Dict[int, int] = {}  # pid -> worker slot
+        self.stopping = False
+        self._socket: Optional[socket.socket] = None
+        self._last_restart = 0.0
+
+    def run(self):
+        self._socket = self.config.bind_socket()
+        preload_shared_data()
+        # Keep the preloaded heap out of future collections so workers do not dirty shared pages
+        gc.collect()
+        gc.freeze()
+
+        signal.signal(signal.SIGTERM, self._handle_stop)
+        signal.signal(signal.SIGINT, self._handle_stop)
+        logger.info("Starting %d workers on %s:%d (loop=%s, http=%s)", self.workers, self.config.host,
+                    self.config.port, self.config.loop, self.config.http)
+        for slot in range(self.workers):
+            self._spawn(slot)
+
+        while self.children:
+            try:
+                pid, status = os.wait()
+            except ChildProcessError:
+                break
+            slot = self.children.pop(pid, None)
+            if slot is None or self.stopping:
+                continue
+            logger.warning("Worker %d exited with status %d; restarting", pid, os.waitstatus_to_exitcode(status))
+            self._throttle_restart()
+            self._spawn(slot)
+
+        self._socket.close()
+
+    def _spawn(self, slot: int):
+        pid = os.fork()
+        if pid:
+            self.children[pid] = slot
+            return
+        # Worker: let uvicorn install its own graceful-shutdown signal handlers
+        signal.signal(signal.SIGTERM, signal.SIG_DFL)
+        signal.signal(signal.SIGINT, signal.SIG_DFL)
+        exit_code = 0
+        try:
+            uvicorn.Server(self.config).run(sockets=[self._socket])
+        except BaseException:
+            logger.exception("Worker %d crashed", os.getpid())
+            exit_code = 1
+        finally:
+            sys.stdout.flush()
+            sys.stderr.flush()
+            os._exit(exit_code)
+
+    def _handle_stop(self, signum, frame):
+        if self.stopping:
+            return
+        self.stopping = True
+        logger.info("Received %s; draining %d workers", signal.Signals(signum).name, len(self.children))
+        for pid in list(self.children):
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+
+    def _throttle_restart(self):
+        wait = self._last_restart + RESTART_BACKOFF_SECONDS - time.monotonic()
+        if wait > 0:
+            time.sleep(wait)
+        self._last_restart = time.monotonic()
@@ -0,0 +1,105 @@
+"""
+Lazy module loading and background warmup for faster cold starts
+
+lazy_import() returns a module whose body only runs on first attribute
+access, so heavy dependencies (numpy, httpx, psutil and the planned pandas,
+openai, langchain, reportlab) stay off the startup path. Warmup runs
+registered hooks in the background once the server is accepting requests,
+so the first real request rarely pays for the deferred work either.
+"""
+
+from typing import Awaitable, Callable, List, Optional, Union
+import asyncio
+import importlib
+import importlib.util
+import logging
+import sys
+import time
+import types
+
+logger = logging.getLogger(__name__)
+
+
+def lazy_import(name: str) -> types.ModuleType:
+    """Import a module on first attribute access; already loaded modules are returned as is"""
+    module = sys.modules.get(name)
+    if module is not None:
+        return module
+    spec = importlib.util.find_spec(name)
+    if spec is None:
+        raise ImportError(f"No module named '{name}'", name=name)
+    loader = importlib.util.LazyLoader(spec.loader)
+    spec.loader = loader
+    module = importlib.util.module_from_spec(spec)
+    sys.modules[name] = module
+    loader.exec_module(module)
+    return module
+
+
+def load_module(name: str) -> types.ModuleType:
+    """Force a (possibly lazy) module to finish loading"""
+    module = importlib.import_module(name)
+    # Touching any attribute executes a lazy module body
+    getattr(module, "__name__")
+    return module
+
+
+WarmupHook = Callable[[], Union[None, Awaitable[None]]]
+
+
+class Warmup:
+    """
+    Runs warmup hooks once, in order, as a background task. Hooks run on the
+    event loop (lazy module bodies are not safe to execute from a second
+    thread) and yield between each other so requests can interleave.
+    """
+
+    def __init__(self):
+        self._hooks: List[WarmupHook] = []
+        self._task: Optional[asyncio.Task] = None
+        self.duration_ms: Optional[float] = None
+
+    def register(self, hook: WarmupHook) -> WarmupHook:
+        """Add a hook; usable as a decorator"""
+        self._hooks.append(hook)
+        return hook
+
+    def preload(self, *modules: str):
+        """Finish loading lazy modules during warmup"""
+        for name in modules:
+            self.register(lambda name=name: load_module(name))
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def wait(self):
+        """Wait for warmup, starting it if needed (for callers that need it finished)"""
+        self.start()
+        await asyncio.shield(self._task)
+
+    async def stop(self):
+        task, self._task = self._task, None
+        if task is not None and not task.done():
+            task.cancel()
+            await asyncio.gather(task, return_exceptions=True)
+
+    @property
+    def done(self) -> bool:
+        return self._task is not None and self._task.done()
+
+    async def _run(self):
+        started = time.perf_counter()
+        for hook in self._hooks:
+            try:
+                if asyncio.iscoroutinefunction(hook):
+                    await hook()
+                else:
+                    hook()
+            except Exception:
+                logger.warning("Warmup hook %r failed", hook, exc_info=True)
+            await asyncio.sleep(0)
+        self.duration_ms = round((time.perf_counter() - started) * 1000, 2)
+
+
+warmup = Warmup()
@@ -0,0 +1,321 @@
+"""
+Prometheus instrumentation for the GenAI services
+
+A small in-process registry rendered in the Prometheus text format on
+/metrics. install_metrics() adds a pure ASGI middleware recording request
+latency per route template and status plus in-flight requests, an event-loop
+lag probe, and scrape-time gauges for background pools. stage() times inner
+work such as parsing, model calls and rendering.
+
+Recording a sample is a bisect and a few integer adds on the event loop, so
+the instrumentation stays on in production.
+"""
+
+from bisect import bisect_left
+from typing import Any, Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+import asyncio
+import functools
+import inspect
+import logging
+import time
+
+from fastapi import FastAPI
+from fastapi.responses import PlainTextResponse
+
+logger = logging.getLogger(__name__)
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+LAG_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0)
+
+# Interval between event-loop lag probes
+LAG_PROBE_INTERVAL_SECONDS = 0.5
+
+# Label used for requests that matched no route, so unknown paths cannot explode cardinality
+UNMATCHED_ROUTE = "unmatched"
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(names: Sequence[str], values: Sequence[Any], extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(str(value))}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Metric:
+    kind = ""
+
+    def __init__(self, name: str, help: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+
+    def samples(self) -> Iterable[str]:
+        raise NotImplementedError
+
+    def render(self) -> List[str]:
+        return [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}", *self.samples()]
+
+
+class Counter(Metric):
+    kind = "counter"
+
+    def __init__(self, name: str, help: str, labelnames: Sequence[str] = ()):
+        super().__init__(name, help, labelnames)
+        self._values: Dict[Tuple, float] = {}
+
+    def inc(self, *labels: Any, amount: float = 1):
+        self._values[labels] = self._values.get(labels, 0) + amount
+
+    def samples(self) -> Iterable[str]:
+        for labels, value in self._values.items():
+            yield f"{self.name}{_labels(self.labelnames, labels)} {_format_value(value)}"
+
+
+class Gauge(Metric):
+    kind = "gauge"
+
+    def __init__(self, name: str, help: str, labelnames: Sequence[str] = ()):
+        super().__init__(name, help, labelnames)
+        self._values: Dict[Tuple, float] = {}
+
+    def set(self, value: float, *labels: Any):
+        self._values[labels] = value
+
+    def inc(self, *labels: Any, amount: float = 1):
+        self._values[labels] = self._values.get(labels, 0) + amount
+
+    def dec(self, *labels: Any, amount: float = 1):
+        self._values[labels] = self._values.get(labels, 0) - amount
+
+    def samples(self) -> Iterable[str]:
+        for labels, value in self._values.items():
+            yield f"{self.name}{_labels(self.labelnames, labels)} {_format_value(value)}"
+
+
+class Histogram(Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, help: str, labelnames: Sequence[str] = (),
+                 buckets: Sequence[float] = LATENCY_BUCKETS):
+        super().__init__(name, help, labelnames)
+        self.buckets = tuple(sorted(buckets))
+        # labels -> [per-bucket counts (last slot is +Inf), sum]
+        self._series: Dict[Tuple, list] = {}
+
+    def observe(self, value: float, *labels: Any):
+        series = self._series.get(labels)
+        if series is None:
+            series = self._series[labels] = [[0] * (len(self.buckets) + 1), 0.0]
+        series[0][bisect_left(self.buckets, value)] += 1
+        series[1] += value
+
+    def samples(self) -> Iterable[str]:
+        bounds = [_format_value(bound) for bound in self.buckets] + ["+Inf"]
+        for labels, (counts, total) in self._series.items():
+            cumulative = 0
+            for bound, count in zip(bounds, counts):
+                cumulative += count
+                le = f'le="{bound}"'
+                yield f"{self.name}_bucket{_labels(self.labelnames, labels, le)} {cumulative}"
+            label_text = _labels(self.labelnames, labels)
+            yield f"{self.name}_sum{label_text} {_format_value(total)}"
+            yield f"{self.name}_count{label_text} {cumulative}"
+
+
+class MetricsRegistry:
+    """Metrics for one process plus collectors read at scrape time"""
+
+    def __init__(self):
+        self._metrics: Dict[str, Metric] = {}
+        self._pools: Dict[str, Callable[[], Dict[str, Any]]] = {}
+        self.pool_gauge = Gauge("genai_pool_state", "Background pool state (queue depth, workers, in flight)",
+                                ("pool", "field"))
+
+    def counter(self, name: str, help: str, labelnames: Sequence[str] = ()) -> Counter:
+        return self._register(Counter(name, help, labelnames))
+
+    def gauge(self, name: str, help: str, labelnames: Sequence[str] = ()) -> Gauge:
+        return self._register(Gauge(name, help, labelnames))
+
+    def histogram(self, name: str, help: str, labelnames: Sequence[str] = (),
+                  buckets: Sequence[float] = LATENCY_BUCKETS) -> Histogram:
+        return self._register(Histogram(name, help, labelnames, buckets))
+
+    def register_pool(self, name: str, stats: Callable[[], Dict[str, Any]]):
+        """Expose the numeric fields of a pool's stats() as gauges on every scrape"""
+        self._pools[name] = stats
+
+    def render(self) -> str:
+        self._collect_pools()
+        lines = []
+        for metric in (*self._metrics.values(), self.pool_gauge):
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+    def _register(self, metric: Metric) -> Any:
+        existing = self._metrics.get(metric.name)
+        if existing is not None:
+            return existing
+        self._metrics[metric.name] = metric
+        return metric
+
+    def _collect_pools(self):
+        for pool, stats in self._pools.items():
+            try:
+                values = stats()
+            except Exception:
+                logger.warning("Collecting stats for pool %s failed", pool, exc_info=True)
+                continue
+            for field, value in _flatten(values):
+                self.pool_gauge.set(value, pool, field)
+
+
+def _flatten(values: Dict[str, Any], prefix: str = "") -> Iterable[Tuple[str, float]]:
+    for key, value in values.items():
+        field = f"{prefix}{key}"
+        if isinstance(value, bool):
+            yield field, int(value)
+        elif isinstance(value, (int, float)):
+            yield field, value
+        elif isinstance(value, dict):
+            yield from _flatten(value, f"{field}.")
+
+
+registry = MetricsRegistry()
+
+request_latency = registry.histogram(
+    "genai_http_request_duration_seconds", "HTTP request latency by route template and status",
+    ("method", "route", "status"),
+)
+requests_in_flight = registry.gauge("genai_http_requests_in_flight", "HTTP requests currently being served")
+loop_lag = registry.histogram(
+    "genai_event_loop_lag_seconds", "Delay between when a loop callback was due and when it ran", (), LAG_BUCKETS,
+)
+loop_lag_last = registry.gauge("genai_event_loop_lag_last_seconds", "Most recent event-loop lag probe")
+stage_latency = registry.histogram("genai_stage_duration_seconds", "Duration of timed inner stages", ("stage",))
+
+
+class stage:
+    """
+    Time a block or function into genai_stage_duration_seconds{stage=...}.
+    Works as `with stage("parse"):` and as a decorator on sync or async functions.
+    """
+
+    __slots__ = ("name", "_started")
+
+    def __init__(self, name: str):
+        self.name = name
+        self._started = 0.0
+
+    def __enter__(self):
+        self._started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        stage_latency.observe(time.perf_counter() - self._started, self.name)
+        return False
+
+    def __call__(self, func: Callable) -> Callable:
+        name = self.name
+        if inspect.iscoroutinefunction(func):
+            @functools.wraps(func)
+            async def timed_async(*args, **kwargs):
+                started = time.perf_counter()
+                try:
+                    return await func(*args, **kwargs)
+                finally:
+                    stage_latency.observe(time.perf_counter() - started, name)
+            return timed_async
+
+        @functools.wraps(func)
+        def timed(*args, **kwargs):
+            started = time.perf_counter()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                stage_latency.observe(time.perf_counter() - started, name)
+        return timed
+
+
+class MetricsMiddleware:
+    """Pure ASGI middleware, so streaming responses are timed until their last byte"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        status = 500
+        started = time.perf_counter()
+
+        async def send_with_status(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        requests_in_flight.inc()
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            requests_in_flight.dec()
+            # FastAPI stores the matched route in the scope, giving the path template
+            route = scope.get("route")
+            route_path = getattr(route, "path", UNMATCHED_ROUTE)
+            request_latency.observe(time.perf_counter() - started, scope["method"], route_path, status)
+
+
+class LoopLagMonitor:
+    """Sleeps a fixed interval and records how late each wake-up was"""
+
+    def __init__(self, interval: float = LAG_PROBE_INTERVAL_SECONDS):
+        self.interval = interval
+        self._task: Optional[asyncio.Task] = None
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.get_running_loop().create_task(self._probe())
+
+    async def stop(self):
+        task, self._task = self._task, None
+        if task is not None:
+            task.cancel()
+            await asyncio.gather(task, return_exceptions=True)
+
+    async def _probe(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            expected = loop.time() + self.interval
+            await asyncio.sleep(self.interval)
+            lag = max(0.0, loop.time() - expected)
+            loop_lag.observe(lag)
+            loop_lag_last.set(lag)
+
+
+loop_lag_monitor = LoopLagMonitor()
+
+
+def install_metrics(app: FastAPI, pools: Optional[Dict[str, Callable[[], Dict[str, Any]]]] = None):
+    """Add the latency middleware and a /metrics route; start loop_lag_monitor from the lifespan"""
+    app.add_middleware(MetricsMiddleware)
+    for name, stats in (pools or {}).items():
+        registry.register_pool(name, stats)
+
+    @app.get("/metrics", include_in_schema=False)
+    async def metrics():
+        return PlainTextResponse(registry.render(), media_type=CONTENT_TYPE)
@@ -0,0 +1,394 @@
+"""
+Opt-in request profiling for the GenAI services
+
+ProfilingMiddleware profiles a request when:
+
+  - PROFILING_ENABLED is set and the request is picked by
+    PROFILE_SAMPLE_RATE (a fraction of requests), or takes at least
+    PROFILE_SLOW_MS;
+  - the request carries PROFILE_HEADER with PROFILE_ADMIN_TOKEN as its value,
+    which profiles that single request even with PROFILING_ENABLED unset.
+
+A background thread samples stacks every PROFILE_INTERVAL_MS. A sample of
+the event-loop thread counts towards the request whose task is running at
+that moment, and a sample of an executor thread towards the request that
+offloaded the work. Requests picked up front also get "awaiting" samples of
+where they are suspended. Forced requests (and sampled ones with
+PROFILE_TRACEMALLOC=all) get net and peak allocation deltas from
+tracemalloc, process-wide so concurrent requests overlap; forced requests
+also get the top allocation sites. Requests watched only for
+the slow threshold cost one stack walk per sample while they are on the
+loop; their samples are dropped unless they turn out slow. Bodies streamed
+by StreamingResponse are produced in a child task and are not attributed.
+
+Kept profiles are listed at /admin/profiles and served as collapsed stacks
+("frame;frame;frame count", for flamegraph.pl or speedscope) at
+/admin/profiles/{id}/collapsed, or merged at /admin/profiles/collapsed.
+Admin routes require PROFILE_HEADER with PROFILE_ADMIN_TOKEN and are not
+added when no token is configured; slow requests are logged either way.
+require_admin_token guards the services' other admin endpoints with the
+same header and token, refusing every request while no token is set.
+"""
+
+from collections import Counter, deque
+from contextvars import ContextVar
+from datetime import datetime, timezone
+from typing import Any, Callable, Deque, Dict, Optional
+import asyncio
+import hmac
+import itertools
+import logging
+import random
+import sys
+import threading
+import time
+import tracemalloc
+
+from fastapi import FastAPI, HTTPException, Request
+from fastapi.responses import PlainTextResponse
+
+from .config import settings
+
+logger = logging.getLogger(__name__)
+
+# Never profiled
+UNPROFILED_PATHS = ("/health", "/metrics", "/admin")
+
+# Allocation sites reported per profile
+TOP_ALLOCATIONS = 10
+
+# Where stacks stop: the event loop's callback runner and the executor wrapper below
+_HANDLE_RUN = asyncio.events.Handle._run.__code__
+
+# Profile of the request being handled, inherited by offload() so executor threads are attributed
+current_profile: ContextVar[Optional["RequestProfile"]] = ContextVar("current_profile", default=None)
+
+_frame_names: Dict[Any, str] = {}
+
+
+def _frame_name(code) -> str:
+    name = _frame_names.get(code)
+    if name is None:
+        path = code.co_filename.replace("\\", "/").split("/")
+        qualname = getattr(code, "co_qualname", code.co_name)
+        name = _frame_names[code] = f"{qualname} ({'/'.join(path[-2:])}:{code.co_firstlineno})"
+    return name
+
+
+def _stack(label: str, frame, stop) -> Optional[str]:
+    names = []
+    while frame is not None and frame.f_code is not stop:
+        names.append(_frame_name(frame.f_code))
+        frame = frame.f_back
+    if not names:
+        return None
+    names.append(label)
+    names.reverse()
+    return ";".join(names)
+
+
+def _awaiting(task: asyncio.Task) -> str:
+    """Stack of a suspended task, following the chain of coroutines it is awaiting in"""
+    names = ["awaiting"]
+    coroutine = task.get_coro()
+    # Ends at the future (or other non-coroutine awaitable) it is waiting on
+    while getattr(coroutine, "cr_frame", None) is not None:
+        names.append(_frame_name(coroutine.cr_frame.f_code))
+        coroutine = coroutine.cr_await
+    return ";".join(names)
+
+
+class RequestProfile:
+    __slots__ = ("id", "method", "path", "reason", "started_at", "duration_ms", "status", "samples",
+                 "sample_count", "wall", "allocations", "_snapshot")
+
+    def __init__(self, method: str, path: str, reason: Optional[str], wall: bool):
+        self.id = 0
+        self.method = method
+        self.path = path
+        self.reason = reason
+        self.started_at = datetime.now(timezone.utc)
+        self.duration_ms = 0.0
+        self.status = 0
+        self.samples: Counter = Counter()
+        self.sample_count = 0
+        # Picked up front: also sample where the request is suspended and trace allocations
+        self.wall = wall
+        self.allocations: Optional[Dict[str, Any]] = None
+        # (traced bytes, tracemalloc snapshot or None) at the start of a traced request
+        self._snapshot = None
+
+    def add(self, stack: Optional[str]):
+        if stack is not None:
+            self.samples[stack] += 1
+            self.sample_count += 1
+
+    def collapsed(self) -> str:
+        return "".join(f"{stack} {count}\n" for stack, count in self.samples.most_common())
+
+    def summary(self) -> Dict[str, Any]:
+        hottest = self.samples.most_common(1)
+        return {
+            "id": self.id,
+            "method": self.method,
+            "path": self.path,
+            "reason": self.reason,
+            "started_at": self.started_at.isoformat(),
+            "duration_ms": self.duration_ms,
+            "status": self.status,
+            "samples": self.sample_count,
+            "hottest_stack": hottest[0][0] if hottest else None,
+            "allocations": self.allocations,
+        }
+
+
+class Sampler:
+    """Daemon thread sampling the loop and executor threads while any profiled request is in flight"""
+
+    def __init__(self, interval: float):
+        self.interval = interval
+        self.samples = 0
+        self._lock = threading.Lock()
+        self._tasks: Dict[asyncio.Task, RequestProfile] = {}
+        self._threads: Dict[int, RequestProfile] = {}
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._loop_thread = 0
+        self._wake = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def track(self, task: asyncio.Task, profile: RequestProfile):
+        if self._thread is None:
+            self._loop = task.get_loop()
+            self._loop_thread = threading.get_ident()
+            self._thread = threading.Thread(target=self._run, name="genai-profiler", daemon=True)
+            self._thread.start()
+        with self._lock:
+            self._tasks[task] = profile
+        self._wake.set()
+
+    def untrack(self, task: asyncio.Task):
+        with self._lock:
+            self._tasks.pop(task, None)
+
+    def run_in_thread(self, function: Callable, *args, **kwargs) -> Any:
+        """Call function, attributing this thread's samples to the calling request's profile"""
+        profile = current_profile.get()
+        if profile is None:
+            return function(*args, **kwargs)
+        ident = threading.get_ident()
+        with self._lock:
+            self._threads[ident] = profile
+        try:
+            return function(*args, **kwargs)
+        finally:
+            with self._lock:
+                self._threads.pop(ident, None)
+
+    def _run(self):
+        while True:
+            self._wake.clear()
+            if not self._tasks:
+                self._wake.wait()
+            time.sleep(self.interval)
+            try:
+                self._sample()
+            except Exception:
+                logger.exception("Profiler sample failed")
+
+    def _sample(self):
+        frames = sys._current_frames()
+        # Held throughout, so once untrack() returns no sample is still being added to that profile
+        with self._lock:
+            if not self._tasks and not self._threads:
+                return
+            self.samples += 1
+            running = asyncio.current_task(self._loop)
+            for task, profile in self._tasks.items():
+                if task is running:
+                    profile.add(_stack("event-loop", frames.get(self._loop_thread), _HANDLE_RUN))
+                elif profile.wall:
+                    profile.add(_awaiting(task))
+            for ident, profile in self._threads.items():
+                profile.add(_stack("executor", frames.get(ident), _RUN_IN_THREAD))
+
+
+_RUN_IN_THREAD = Sampler.run_in_thread.__code__
+
+
+class Profiler:
+    """Chooses requests to profile, keeps the recent profiles and serves them"""
+
+    def __init__(self):
+        self.enabled = settings.PROFILING_ENABLED
+        self.sample_rate = settings.PROFILE_SAMPLE_RATE if self.enabled else 0.0
+        self.slow_seconds = settings.PROFILE_SLOW_MS / 1000 if self.enabled and settings.PROFILE_SLOW_MS > 0 else None
+        # Reasons whose requests are traced with tracemalloc
+        self.traced_reasons = {"off": (), "all": ("forced", "sampled")}.get(settings.PROFILE_TRACEMALLOC, ("forced",))
+        self.header = settings.PROFILE_HEADER.lower().encode("latin-1")
+        self.token = settings.PROFILE_ADMIN_TOKEN.encode() if settings.PROFILE_ADMIN_TOKEN else None
+        self.sampler = Sampler(settings.PROFILE_INTERVAL_MS / 1000)
+        self.profiles: Deque[RequestProfile] = deque(maxlen=settings.PROFILE_MAX_PROFILES)
+        self._ids = itertools.count(1)
+        self._tracing = 0
+        self._owns_tracing = False
+        self.counters = {"profiled": 0, "kept": 0, "forced": 0, "sampled": 0, "slow": 0}
+
+    def authorized(self, value: Optional[bytes]) -> bool:
+        return self.token is not None and value is not None and hmac.compare_digest(value, self.token)
+
+    def start(self, scope) -> Optional[RequestProfile]:
+        """A profile for this request, or None when it is not watched at all"""
+        if scope["path"].startswith(UNPROFILED_PATHS):
+            return None
+        forced = self.authorized(next((value for name, value in scope.get("headers", ()) if name == self.header), None))
+        reason = "forced" if forced else "sampled" if self.sample_rate and random.random() < self.sample_rate else None
+        if reason is None and self.slow_seconds is None:
+            return None
+        profile = RequestProfile(scope["method"], scope["path"], reason, wall=reason is not None)
+        if reason in self.traced_reasons:
+            self._start_tracing(profile, sites=forced)
+        self.sampler.track(asyncio.current_task(), profile)
+        self.counters["profiled"] += 1
+        return profile
+
+    def finish(self, profile: RequestProfile, elapsed: float, status: int, route_path: str):
+        self.sampler.untrack(asyncio.current_task())
+        if profile._snapshot is not None:
+            self._stop_tracing(profile)
+        if profile.reason is None:
+            if elapsed < self.slow_seconds:
+                return
+            profile.reason = "slow"
+        profile.id = next(self._ids)
+        profile.path = route_path
+        profile.duration_ms = round(elapsed * 1000, 2)
+        profile.status = status
+        self.profiles.append(profile)
+        self.counters["kept"] += 1
+        self.counters[profile.reason] += 1
+        if profile.reason == "slow":
+            logger.warning("Slow request %s %s took %.0f ms (profile %d); hottest stack: %s", profile.method,
+                           route_path, profile.duration_ms, profile.id, profile.summary()["hottest_stack"])
+
+    def _start_tracing(self, profile: RequestProfile, sites: bool):
+        """Snapshots for allocation sites cost milliseconds, so only forced requests take them"""
+        if self._tracing == 0:
+            # Left alone when tracing was started outside the profiler (PYTHONTRACEMALLOC)
+            self._owns_tracing = not tracemalloc.is_tracing()
+            if self._owns_tracing:
+                tracemalloc.start(settings.PROFILE_TRACEMALLOC_FRAMES)
+        self._tracing += 1
+        tracemalloc.reset_peak()
+        profile._snapshot = (tracemalloc.get_traced_memory()[0], tracemalloc.take_snapshot() if sites else None)
+
+    def _stop_tracing(self, profile: RequestProfile):
+        before, snapshot = profile._snapshot
+        current, peak = tracemalloc.get_traced_memory()
+        profile.allocations = {"net_bytes": current - before, "peak_bytes": max(0, peak - before)}
+        if snapshot is not None:
+            excluded = (tracemalloc.Filter(False, tracemalloc.__file__), tracemalloc.Filter(False, __file__))
+            after = tracemalloc.take_snapshot().filter_traces(excluded)
+            top = after.compare_to(snapshot.filter_traces(excluded), "lineno")
+            profile.allocations["top"] = [
+                {"site": str(stat.traceback[0]), "size_diff": stat.size_diff, "count_diff": stat.count_diff}
+                for stat in top[:TOP_ALLOCATIONS]
+            ]
+        profile._snapshot = None
+        self._tracing -= 1
+        if self._tracing == 0 and self._owns_tracing:
+            tracemalloc.stop()
+
+    def get(self, profile_id: int) -> Optional[RequestProfile]:
+        return next((profile for profile in self.profiles if profile.id == profile_id), None)
+
+    def collapsed(self, path: Optional[str] = None) -> str:
+        merged: Counter = Counter()
+        for profile in self.profiles:
+            if path is None or profile.path == path:
+                merged.update(profile.samples)
+        return "".join(f"{stack} {count}\n" for stack, count in merged.most_common())
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            **self.counters,
+            "enabled": self.enabled,
+            "in_flight": len(self.sampler._tasks),
+            "stored": len(self.profiles),
+            "stack_samples": self.sampler.samples,
+        }
+
+
+# Process-wide profiler shared by the middleware, offload() and the admin routes
+profiler = Profiler()
+
+
+class ProfilingMiddleware:
+    """Pure ASGI middleware; near zero cost for requests that are not watched"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        profile = profiler.start(scope) if scope["type"] == "http" else None
+        if profile is None:
+            await self.app(scope, receive, send)
+            return
+
+        status = 500
+        started = time.perf_counter()
+
+        async def send_with_status(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        token = current_profile.set(profile)
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            current_profile.reset(token)
+            route = scope.get("route")
+            profiler.finish(profile, time.perf_counter() - started, status, getattr(route, "path", scope["path"]))
+
+
+def require_admin_token(request: Request):
+    """FastAPI dependency: 403 unless PROFILE_HEADER carries PROFILE_ADMIN_TOKEN"""
+    if profiler.token is None:
+        raise HTTPException(status_code=403, detail="Admin endpoints are disabled; PROFILE_ADMIN_TOKEN is not set")
+    value = request.headers.get(settings.PROFILE_HEADER)
+    if not profiler.authorized(value.encode("latin-1") if value is not None else None):
+        raise HTTPException(status_code=403, detail=f"{settings.PROFILE_HEADER} does not match the admin token")
+
+
+def install_profiling(app: FastAPI):
+    """Add the profiling middleware, and the /admin/profiles routes when PROFILE_ADMIN_TOKEN is set"""
+    app.add_middleware(ProfilingMiddleware)
+    if profiler.token is None:
+        return
+
+    @app.get("/admin/profiles", include_in_schema=False)
+    async def list_profiles(request: Request):
+        require_admin_token(request)
+        return {"profiler": profiler.stats(), "profiles": [profile.summary() for profile in reversed(profiler.profiles)]}
+
+    @app.get("/admin/profiles/collapsed", include_in_schema=False)
+    async def merged_profiles(request: Request, path: Optional[str] = None):
+        require_admin_token(request)
+        return PlainTextResponse(profiler.collapsed(path))
+
+    @app.get("/admin/profiles/{profile_id}", include_in_schema=False)
+    async def get_profile(request: Request, profile_id: int):
+        require_admin_token(request)
+        profile = profiler.get(profile_id)
+        if profile is None:
+            raise HTTPException(status_code=404, detail=f"Profile {profile_id} is no longer kept")
+        return {**profile.summary(), "stacks": dict(profile.samples.most_common())}
+
+    @app.get("/admin/profiles/{profile_id}/collapsed", include_in_schema=False)
+    async def get_profile_collapsed(request: Request, profile_id: int):
+        require_admin_token(request)
+        profile = profiler.get(profile_id)
+        if profile is None:
+            raise HTTPException(status_code=404, detail=f"Profile {profile_id} is no longer kept")
+        return PlainTextResponse(profile.collapsed())
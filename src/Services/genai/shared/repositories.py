@@ -0,0 +1,101 @@
+"""
+Read repositories over the Planning and Observations tables
+
+Loading an aggregate with its children takes one query per table, whatever
+the number of parents (never one query per parent): parents come from a
+batched IN fetch and children are grouped by their foreign key in Python.
+Full-table reads stream in keyset pages. Table and column names follow the
+EF Core models; owned types are flattened (Priority_Name, StoragePath_Value).
+"""
+
+from datetime import datetime
+from typing import Any, AsyncIterator, Dict, Iterable, List, Optional
+
+from .database import Database, Row, database
+
+
+class ObservationRepository:
+    def __init__(self, db: Optional[Database] = None):
+        self.db = db or database
+
+    async def by_ids(self, ids: Iterable[int]) -> Dict[int, Row]:
+        return await self.db.fetch_by_key("Observations", ids)
+
+    async def by_children(self, child_ids: Iterable[int], include_drafts: bool = False) -> Dict[int, List[Row]]:
+        """Observations per child, oldest first"""
+        where = None if include_drafts else '"IsDraft" = $1'
+        args = () if include_drafts else (False,)
+        return await self.db.fetch_grouped("Observations", "ChildId", child_ids, order_by="ObservationDate",
+                                           where=where, args=args)
+
+    async def with_details(self, ids: Iterable[int]) -> List[Row]:
+        """Observations with their artifacts and tags attached, in three queries"""
+        observations = await self.by_ids(ids)
+        artifacts = await self.db.fetch_grouped("ObservationArtifacts", "ObservationId", observations,
+                                                order_by="DisplayOrder")
+        tags = await self.db.fetch_grouped("Tag", "ObservationId", observations)
+        return [
+            {**row, "Artifacts": artifacts[key], "Tags": [tag["Value"] for tag in tags[key]]}
+            for key, row in observations.items()
+        ]
+
+    def stream(self, since: Optional[datetime] = None, page_size: Optional[int] = None) -> AsyncIterator[Row]:
+        """Every observation in Id order, optionally only those created at or after `since`"""
+        if since is None:
+            return self.db.stream("Observations", page_size=page_size)
+        return self.db.stream("Observations", where='"Created" >= $1', args=(since,), page_size=page_size)
+
+
+class PlanRepository:
+    def __init__(self, db: Optional[Database] = None):
+        self.db = db or database
+
+    async def by_ids(self, ids: Iterable[int]) -> Dict[int, Row]:
+        return await self.db.fetch_by_key("Plans", ids)
+
+    async def items_by_plan(self, plan_ids: Iterable[int]) -> Dict[int, List[Row]]:
+        return await self.db.fetch_grouped("PlanItems", "PlanId", plan_ids, order_by="DueDate")
+
+    async def with_items(self, ids: Iterable[int]) -> List[Row]:
+        """Plans with their items attached, in two queries"""
+        plans = await self.by_ids(ids)
+        items = await self.items_by_plan(plans)
+        return [{**row, "Items": items[key]} for key, row in plans.items()]
+
+    def stream(self, status: Optional[int] = None, page_size: Optional[int] = None) -> AsyncIterator[Row]:
+        if status is None:
+            return self.db.stream("Plans", page_size=page_size)
+        return self.db.stream("Plans", where='"Status" = $1', args=(status,), page_size=page_size)
+
+
+class CatalogRepository:
+    """Domains, attributes and progression points from the observations schema"""
+
+    def __init__(self, db: Optional[Database] = None):
+        self.db = db or database
+
+    async def domains(self, active_only: bool = True) -> List[Row]:
+        where = ' WHERE "IsActive" = $1' if active_only else ""
+        args: tuple = (True,) if active_only else ()
+        return await self.db.fetch(
+            f'SELECT * FROM {self.db.table("observations.ObservationDomains")}{where} ORDER BY "SortOrder"', *args)
+
+    async def attributes_by_domain(self, domain_ids: Iterable[int]) -> Dict[int, List[Row]]:
+        return await self.db.fetch_grouped("observations.ObservationAttributes", "DomainId", domain_ids,
+                                           order_by="SortOrder")
+
+    async def progression_points_by_attribute(self, attribute_ids: Iterable[int]) -> Dict[int, List[Row]]:
+        return await self.db.fetch_grouped("observations.ProgressionPoints", "AttributeId", attribute_ids,
+                                           order_by="SortOrder")
+
+    async def tree(self) -> List[Dict[str, Any]]:
+        """The whole active catalog, three queries regardless of its size"""
+        domains = await self.domains()
+        attributes = await self.attributes_by_domain(domain["Id"] for domain in domains)
+        points = await self.progression_points_by_attribute(
+            attribute["Id"] for rows in attributes.values() for attribute in rows)
+        return [
+            {**domain, "Attributes": [{**attribute, "ProgressionPoints": points[attribute["Id"]]}
+                                      for attribute in attributes[domain["Id"]]]}
+            for domain in domains
+        ]
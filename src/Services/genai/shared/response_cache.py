@@ -0,0 +1,226 @@
+"""
+Content-addressed cache for GenAI endpoint responses
+
+Responses are keyed by a SHA-256 of the model name plus the normalized,
+prompt-relevant fields of the request model, so identical requests are
+answered without another model call. Lookups go through an in-process LRU
+(bounded by entry count, bytes and TTL), then an optional Redis tier.
+Concurrent misses for the same key share a single computation; if the
+request computing it is cancelled, one of the waiting requests takes over.
+"""
+
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Iterable, Optional, Tuple, Type, TypeVar
+import asyncio
+import hashlib
+import json
+import logging
+import re
+import time
+
+from pydantic import BaseModel
+
+from .config import settings
+
+logger = logging.getLogger(__name__)
+
+ResponseT = TypeVar("ResponseT", bound=BaseModel)
+
+_WHITESPACE = re.compile(r"\s+")
+
+
+def normalize(value: Any) -> Any:
+    """Collapse insignificant differences (surrounding/repeated whitespace, key order)"""
+    if isinstance(value, str):
+        return _WHITESPACE.sub(" ", value).strip()
+    if isinstance(value, dict):
+        return {str(key): normalize(item) for key, item in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [normalize(item) for item in value]
+    return value
+
+
+def request_fingerprint(namespace: str, request: BaseModel, fields: Optional[Iterable[str]] = None,
+                        model_name: Optional[str] = None) -> str:
+    payload = normalize(request.model_dump(include=set(fields) if fields else None, mode="json"))
+    canonical = json.dumps(payload, sort_keys=True, separators=(",", ":"), ensure_ascii=False)
+    digest = hashlib.sha256(f"{namespace}\x00{model_name or settings.MODEL_NAME}\x00{canonical}".encode())
+    return f"{namespace}:{digest.hexdigest()}"
+
+
+class InMemoryRedis:
+    """Minimal async stand-in for redis.asyncio.Redis, selected with REDIS_URL=memory://"""
+
+    def __init__(self):
+        self._data: Dict[str, Tuple[Optional[float], bytes]] = {}
+
+    async def get(self, key: str) -> Optional[bytes]:
+        entry = self._data.get(key)
+        if entry is None:
+            return None
+        expires_at, value = entry
+        if expires_at is not None and time.monotonic() >= expires_at:
+            del self._data[key]
+            return None
+        return value
+
+    async def set(self, key: str, value, ex: Optional[int] = None):
+        data = value.encode() if isinstance(value, str) else bytes(value)
+        self._data[key] = (time.monotonic() + ex if ex else None, data)
+
+
+def create_redis_client(url: Optional[str] = None):
+    """Redis client for the shared tier, or None when no REDIS_URL is configured"""
+    url = url if url is not None else settings.REDIS_URL
+    if not url:
+        return None
+    if url.startswith("memory://"):
+        return InMemoryRedis()
+    try:
+        import redis.asyncio as redis
+    except ImportError:
+        logger.warning("REDIS_URL is set but the redis package is not installed; using the in-process tier only")
+        return None
+    return redis.from_url(url)
+
+
+# Shared tier used by every ResponseCache unless one is passed explicitly
+shared_redis = create_redis_client()
+
+
+class ResponseCache:
+    """Two-tier response cache with single-flight misses and hit/miss counters"""
+
+    def __init__(self, namespace: str, max_entries: Optional[int] = None, max_bytes: Optional[int] = None,
+                 ttl_seconds: Optional[float] = None, redis=None, model_name: Optional[str] = None,
+                 clock: Callable[[], float] = time.monotonic):
+        self.namespace = namespace
+        self.max_entries = max_entries or settings.RESPONSE_CACHE_MAX_ENTRIES
+        self.max_bytes = max_bytes or settings.RESPONSE_CACHE_MAX_BYTES
+        self.ttl_seconds = ttl_seconds or settings.RESPONSE_CACHE_TTL_SECONDS
+        self.redis = redis if redis is not None else shared_redis
+        self.model_name = model_name
+        self.clock = clock
+        # key -> (expires_at, size_bytes, response)
+        self._entries: "OrderedDict[str, Tuple[float, int, BaseModel]]" = OrderedDict()
+        self._bytes = 0
+        self._inflight: Dict[str, asyncio.Future] = {}
+        self.counters = {"memory_hits": 0, "redis_hits": 0, "misses": 0, "coalesced": 0,
+                         "evictions": 0, "redis_errors": 0}
+
+    def key_for(self, request: BaseModel, fields: Optional[Iterable[str]] = None) -> str:
+        return request_fingerprint(self.namespace, request, fields, self.model_name)
+
+    async def get_or_compute(self, request: BaseModel, response_model: Type[ResponseT],
+                             compute: Callable[[], Awaitable[ResponseT]],
+                             fields: Optional[Iterable[str]] = None, key: Optional[str] = None) -> ResponseT:
+        """
+        Return a cached response for the request, computing it at most once per
+        key. Callers may pass a key already computed with key_for(), e.g. off
+        the event loop for large requests.
+        """
+        key = key or self.key_for(request, fields)
+
+        while True:
+            cached = self._get_local(key)
+            if cached is not None:
+                self.counters["memory_hits"] += 1
+                return cached
+
+            pending = self._inflight.get(key)
+            if pending is None:
+                break
+            self.counters["coalesced"] += 1
+            try:
+                return await asyncio.shield(pending)
+            except asyncio.CancelledError:
+                # Only the leader was cancelled (e.g. its client disconnected): look again, and the
+                # first follower to get here computes the response for the rest
+                if not pending.cancelled() or asyncio.current_task().cancelling():
+                    raise
+
+        future = asyncio.get_running_loop().create_future()
+        self._inflight[key] = future
+        try:
+            response = await self._get_remote(key, response_model)
+            if response is not None:
+                self.counters["redis_hits"] += 1
+            else:
+                self.counters["misses"] += 1
+                response = await compute()
+                await self._set_remote(key, response)
+            self._set_local(key, response)
+            future.set_result(response)
+            return response
+        except asyncio.CancelledError:
+            future.cancel()
+            raise
+        except Exception as e:
+            future.set_exception(e)
+            # Mark the exception retrieved so unawaited futures do not log warnings
+            future.exception()
+            raise
+        finally:
+            del self._inflight[key]
+
+    def invalidate(self, key: str):
+        entry = self._entries.pop(key, None)
+        if entry is not None:
+            self._bytes -= entry[1]
+
+    def clear(self):
+        self._entries.clear()
+        self._bytes = 0
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.counters["memory_hits"] + self.counters["redis_hits"] + self.counters["misses"]
+        hits = self.counters["memory_hits"] + self.counters["redis_hits"]
+        return {
+            **self.counters,
+            "entries": len(self._entries),
+            "bytes": self._bytes,
+            "inflight": len(self._inflight),
+            "hit_ratio": round(hits / lookups, 4) if lookups else 0.0,
+        }
+
+    def _get_local(self, key: str) -> Optional[BaseModel]:
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        if self.clock() >= entry[0]:
+            self.invalidate(key)
+            return None
+        self._entries.move_to_end(key)
+        return entry[2]
+
+    def _set_local(self, key: str, response: BaseModel):
+        size = len(response.model_dump_json())
+        if size > self.max_bytes:
+            return
+        self.invalidate(key)
+        self._entries[key] = (self.clock() + self.ttl_seconds, size, response)
+        self._bytes += size
+        while len(self._entries) > self.max_entries or self._bytes > self.max_bytes:
+            _, (_, evicted_size, _) = self._entries.popitem(last=False)
+            self._bytes -= evicted_size
+            self.counters["evictions"] += 1
+
+    async def _get_remote(self, key: str, response_model: Type[ResponseT]) -> Optional[ResponseT]:
+        if self.redis is None:
+            return None
+        try:
+            data = await self.redis.get(key)
+            return response_model.model_validate_json(data) if data is not None else None
+        except Exception:
+            self.counters["redis_errors"] += 1
+            logger.warning("Response cache read from Redis failed", exc_info=True)
+            return None
+
+    async def _set_remote(self, key: str, response: BaseModel):
+        if self.redis is None:
+            return
+        try:
+            await self.redis.set(key, response.model_dump_json(), ex=int(self.ttl_seconds))
+        except Exception:
+            self.counters["redis_errors"] += 1
+            logger.warning("Response cache write to Redis failed", exc_info=True)
@@ -0,0 +1,166 @@
+"""
+Fast JSON responses and response compression for the GenAI services
+
+When an endpoint returns a response model, FastAPI dumps it to Python
+objects, validates that against response_model, serializes the result again
+and finally runs json.dumps. Endpoints that build their responses from
+trusted internal objects return FastJSONResponse instead, and FastAPI hands
+Response instances through untouched. Pydantic models are written straight
+to JSON bytes by pydantic-core, and plain data by orjson when it is
+installed (pydantic-core otherwise). response_model stays on the route for
+the OpenAPI schema.
+
+CompressionMiddleware brotli- or gzip-encodes complete responses of at
+least RESPONSE_COMPRESSION_MIN_BYTES when the client accepts it; bodies of
+RESPONSE_COMPRESSION_OFFLOAD_BYTES or more are compressed on the shared CPU
+executor so multi-megabyte responses do not stall the event loop. Streaming
+responses are passed through so their chunks are not delayed.
+"""
+
+from typing import Any, Dict, Optional
+import gzip
+import importlib.util
+
+import pydantic_core
+from pydantic import BaseModel
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.responses import JSONResponse
+
+from .admission import offload
+from .config import settings
+from .lazy import lazy_import
+
+# Optional accelerators; the standard path works without either
+orjson = lazy_import("orjson") if importlib.util.find_spec("orjson") is not None else None
+brotli = lazy_import("brotli") if importlib.util.find_spec("brotli") is not None else None
+
+COMPRESSIBLE_TYPES = ("application/json", "application/x-ndjson", "text/")
+
+# Preferred first when the client accepts several with equal weight
+ENCODINGS = ("br", "gzip") if brotli is not None else ("gzip",)
+
+
+def _jsonable(value: Any) -> Any:
+    """orjson fallback for values it cannot encode itself (models, sets, Decimal, ...)"""
+    return pydantic_core.to_jsonable_python(value)
+
+
+def dumps(content: Any) -> bytes:
+    """Serialize a response model or plain data to compact UTF-8 JSON without validating it"""
+    if isinstance(content, BaseModel):
+        return content.__pydantic_serializer__.to_json(content)
+    if orjson is not None:
+        return orjson.dumps(content, default=_jsonable,
+                            option=orjson.OPT_NON_STR_KEYS | orjson.OPT_SERIALIZE_NUMPY)
+    return pydantic_core.to_json(content)
+
+
+class FastJSONResponse(JSONResponse):
+    """JSONResponse that serializes trusted content in one pass; use as the app's default class too"""
+
+    def render(self, content: Any) -> bytes:
+        return dumps(content)
+
+
+def accepted_encoding(accept_encoding: str) -> Optional[str]:
+    """Best supported content coding from an Accept-Encoding header, or None"""
+    weights: Dict[str, float] = {}
+    for part in accept_encoding.split(","):
+        name, _, params = part.strip().partition(";")
+        weight = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                weight = float(params[2:])
+            except ValueError:
+                weight = 0.0
+        weights[name.strip().lower()] = weight
+    best, best_weight = None, 0.0
+    for encoding in ENCODINGS:
+        weight = weights.get(encoding, weights.get("*", 0.0))
+        if weight > best_weight:
+            best, best_weight = encoding, weight
+    return best
+
+
+def compress(body: bytes, encoding: str) -> bytes:
+    if encoding == "br":
+        return brotli.compress(body, quality=settings.RESPONSE_BROTLI_QUALITY)
+    return gzip.compress(body, compresslevel=settings.RESPONSE_GZIP_LEVEL, mtime=0)
+
+
+class CompressionStats:
+    __slots__ = ("responses", "bytes_in", "bytes_out")
+
+    def __init__(self):
+        self.responses = {encoding: 0 for encoding in ENCODINGS}
+        self.bytes_in = 0
+        self.bytes_out = 0
+
+    def record(self, encoding: str, size_in: int, size_out: int):
+        self.responses[encoding] += 1
+        self.bytes_in += size_in
+        self.bytes_out += size_out
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            **{f"{encoding}_responses": count for encoding, count in self.responses.items()},
+            "bytes_in": self.bytes_in,
+            "bytes_out": self.bytes_out,
+            "ratio": round(self.bytes_out / self.bytes_in, 4) if self.bytes_in else 0.0,
+        }
+
+
+compression_stats = CompressionStats()
+
+
+class CompressionMiddleware:
+    """Pure ASGI middleware compressing single-message responses above a size threshold"""
+
+    def __init__(self, app, minimum_size: Optional[int] = None, offload_size: Optional[int] = None):
+        self.app = app
+        self.minimum_size = minimum_size if minimum_size is not None else settings.RESPONSE_COMPRESSION_MIN_BYTES
+        self.offload_size = offload_size if offload_size is not None else settings.RESPONSE_COMPRESSION_OFFLOAD_BYTES
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        encoding = accepted_encoding(Headers(scope=scope).get("accept-encoding", ""))
+        if encoding is None:
+            await self.app(scope, receive, send)
+            return
+
+        start = None
+
+        async def send_compressed(message):
+            nonlocal start
+            if message["type"] == "http.response.start":
+                # Held back until the first body message shows whether the response is complete
+                start = message
+                return
+            if message["type"] != "http.response.body" or start is None:
+                await send(message)
+                return
+            response_start, start = start, None
+            body = message.get("body", b"")
+            headers = MutableHeaders(raw=response_start["headers"])
+            if (message.get("more_body", False) or len(body) < self.minimum_size
+                    or "content-encoding" in headers
+                    or not headers.get("content-type", "").startswith(COMPRESSIBLE_TYPES)):
+                await send(response_start)
+                await send(message)
+                return
+            if len(body) >= self.offload_size:
+                preload = ("brotli",) if encoding == "br" else ()
+                compressed = await offload(compress, body, encoding, preload=preload)
+            else:
+                compressed = compress(body, encoding)
+            compression_stats.record(encoding, len(body), len(compressed))
+            headers["Content-Encoding"] = encoding
+            headers["Content-Length"] = str(len(compressed))
+            headers.add_vary_header("Accept-Encoding")
+            await send(response_start)
+            await send({"type": "http.response.body", "body": compressed})
+
+        await self.app(scope, receive, send_compressed)